@@ -0,0 +1,95 @@
+# Inside backend/ai_cache.py
+import os
+import json
+import time
+import hashlib
+import threading
+
+from cache_store import TieredCache
+
+# --- AI Response Cache Settings (override via .env) ---
+AI_CACHE_ENABLED = os.getenv("AI_CACHE_ENABLED", "1") == "1"
+AI_CACHE_TTL = int(os.getenv("AI_CACHE_TTL", 86400)) # Seconds a generated response may be reused
+AI_CACHE_MAX_ENTRIES = int(os.getenv("AI_CACHE_MAX_ENTRIES", 512)) # In-memory LRU size cap
+AI_CACHE_PATH = os.getenv("AI_CACHE_PATH") # Optional SQLite file for a persistent, shared tier
+AI_CACHE_DISK_ENTRIES = int(os.getenv("AI_CACHE_DISK_ENTRIES", 20000))
+
+
+def response_key(model_name, generation_config, safety_settings, prompt_text):
+    """Content address of a model call: hash of model, generation parameters and the exact prompt."""
+    material = json.dumps({
+        "model": model_name,
+        "generation_config": generation_config,
+        "safety_settings": safety_settings,
+        "prompt": prompt_text,
+    }, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """Content-addressed cache of raw model response texts with a TTL."""
+
+    def __init__(self, store, ttl=AI_CACHE_TTL, enabled=AI_CACHE_ENABLED):
+        self.store = store
+        self.ttl = ttl
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.bypassed = 0
+        self.stores = 0
+
+    def get(self, key, bypass=False):
+        """Returns the cached response text, or None on a miss, expiry or bypass."""
+        if not self.enabled:
+            return None
+        if bypass:
+            with self._lock:
+                self.bypassed += 1
+            return None
+        cached = self.store.get(key)
+        with self._lock:
+            if cached is None:
+                self.misses += 1
+                return None
+            value, stored_at = cached
+            if time.time() - stored_at >= self.ttl:
+                self.expired += 1
+                self.misses += 1
+                return None
+            self.hits += 1
+        return value
+
+    def put(self, key, response_text):
+        if not self.enabled:
+            return
+        self.store.set(key, response_text)
+        with self._lock:
+            self.stores += 1
+
+    def invalidate(self):
+        self.store.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            stats = {
+                "enabled": self.enabled,
+                "hits": self.hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "bypassed": self.bypassed,
+                "stores": self.stores,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+        stats["store"] = self.store.stats()
+        return stats
+
+
+ai_cache = ResponseCache(TieredCache(
+    "ai_response_cache",
+    max_entries=AI_CACHE_MAX_ENTRIES,
+    disk_path=AI_CACHE_PATH or None,
+    disk_max_entries=AI_CACHE_DISK_ENTRIES,
+))
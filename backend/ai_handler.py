@@ -1,352 +1,794 @@
 # Inside backend/ai_handler.py
 import os
-import google.generativeai as genai
-from langdetect import detect, LangDetectException
 import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import json # Import json module
 
-# --- Configure AI ---
-API_KEY = os.getenv("GEMINI_API_KEY")
-model = None # Initialize model variable
+from ai_cache import ai_cache, response_key
+from gemini_governor import gemini_governor, GovernorRejected
+from seo_rules import run_seo_rules, rules_prompt_summary
+from prompt_compiler import (compile_shopify_seo_prompt, compile_social_media_prompt, compile_combined_social_prompt, SHOPIFY_SECTIONS,
+                             shopify_section_shape, social_shape)
+from json_repair import parse_model_json, schema_problems, record_answer, record_invalid, record_unparseable, record_retry, JSON_SECTION_RETRY
+from snapshots import snapshots, field_digests
+from observability import span, record_span, in_context, count_error, RESPONSE_CHARS
+from startup import record_resource, register_warmer
+
+log = logging.getLogger(__name__)
 
-if API_KEY:
+# --- Configure AI (lazily, once per process: see get_model) ---
+API_KEY = os.getenv("GEMINI_API_KEY")
+MODEL_NAME = 'gemini-1.5-flash-latest' # Use appropriate model
+model = None # This process's model, once get_model() has created it
+_model_pid = None # Process that created `model`; a forked worker creates its own client
+_model_lock = threading.Lock()
+
+# Configure safety settings and generation parameters (also part of the response cache key; the SDK takes both as plain dicts)
+SAFETY_SETTINGS = [
+    {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+    {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+    {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+    {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+]
+GENERATION_CONFIG = {
+    "temperature": 0.7, # Adjust creativity vs factualness
+    # "max_output_tokens": 2048, # Increase if needed for complex JSON
+    "response_mime_type": "application/json", # Request JSON output directly if supported
+}
+
+def _create_model():
+    if not API_KEY:
+        log.warning("GEMINI_API_KEY not found. AI functions disabled.")
+        return None
+    started = time.perf_counter()
     try:
+        import google.generativeai as genai # Deferred: importing the SDK is most of this module's cold-start time
         genai.configure(api_key=API_KEY)
-        model = genai.GenerativeModel('gemini-1.5-flash-latest') # Use appropriate model
-        print("AI Handler: Gemini model configured.")
+        created = genai.GenerativeModel(MODEL_NAME)
     except Exception as e:
-        print(f"AI Handler: Error configuring Gemini: {e}")
-        model = None
-else:
-    print("AI Handler: GEMINI_API_KEY not found. AI functions disabled.")
+        log.error("Error configuring Gemini: %s", e)
+        return None
+    record_resource("gemini_model", time.perf_counter() - started)
+    log.info("Gemini model configured.")
+    return created
+
+def get_model():
+    """ The Gemini model of this process (None if AI is not configured), created on first use rather than at import or before fork(). """
+    global model, _model_pid
+    if _model_pid == os.getpid():
+        return model
+    with _model_lock:
+        if _model_pid != os.getpid(): # Never reuse a client across fork(): its gRPC channel belongs to the parent
+            model, _model_pid = _create_model(), os.getpid()
+    return model
+
+def set_model(replacement):
+    """ Swaps in a stand-in model for this process (tests, benchmarks) and returns the previous one; None restores lazy creation. """
+    global model, _model_pid
+    with _model_lock:
+        previous = model if _model_pid == os.getpid() else None
+        model, _model_pid = replacement, (os.getpid() if replacement is not None else None)
+    return previous
+
+# --- Language Detection (profiles are loaded on first use; plain data, so a forked child may share its parent's) ---
+_detector = None
+_detector_lock = threading.Lock()
+
+def _language_detector():
+    global _detector
+    if _detector is None:
+        with _detector_lock:
+            if _detector is None:
+                started = time.perf_counter()
+                from langdetect import detect
+                from langdetect.detector_factory import init_factory
+                init_factory() # Reads every language profile from disk; otherwise the first detect() pays for it
+                record_resource("language_detector", time.perf_counter() - started)
+                _detector = detect
+    return _detector
+
+def _reset_after_fork():
+    global _model_lock, _detector_lock
+    # A lock held by another thread at fork() time would never be released in the child
+    _model_lock, _detector_lock = threading.Lock(), threading.Lock()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+register_warmer("gemini_model", get_model)
+register_warmer("language_detector", _language_detector)
 
 # --- Helper Functions ---
 
 def detect_language(text):
     """Detects language using langdetect."""
     if not text or not isinstance(text, str) or len(text.strip()) < 20:
-         print("Warning: Not enough text to reliably detect language, defaulting to English.")
+         log.warning("Not enough text to reliably detect language, defaulting to English.")
          return "en"
+    from langdetect import LangDetectException
     try:
-        lang = detect(text[:500]) # Detect based on first 500 chars
-        print(f"Detected language: {lang}")
+        lang = _language_detector()(text[:500]) # Detect based on first 500 chars
+        log.info("Detected language: %s", lang)
         return lang
     except LangDetectException as e: # Catch specific exception
-        print(f"Could not detect language: {e}, defaulting to English.")
+        log.warning("Could not detect language: %s, defaulting to English.", e)
         return "en"
     except Exception as e: # Catch any other unexpected errors
-        print(f"An unexpected error occurred during language detection: {e}")
+        log.exception("An unexpected error occurred during language detection: %s", e)
         return "en"
 
-def call_gemini_api(prompt_text, retry_count=2, delay=5):
-    """ Helper function to call the API with retry logic. """
-    if not model:
-         print("Error: AI Model not configured or API key test failed.")
-         return None # Indicate failure clearly
+def _is_cacheable(response_text):
+    """ Only complete, error-free JSON responses are worth reusing. """
     try:
-         # Configure safety settings and generation parameters
-         safety_settings=[
-              {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
-              {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
-              {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
-              {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
-         ]
-         generation_config = genai.types.GenerationConfig(
-             temperature=0.7, # Adjust creativity vs factualness
-             # max_output_tokens=2048 # Increase if needed for complex JSON
-             response_mime_type="application/json" # Request JSON output directly if supported
-         )
-
-         print(f"\n--- Sending Prompt to AI (length: {len(prompt_text)} chars) ---")
-         # print(f"Prompt Snippet:\n{prompt_text[:500]}...") # Uncomment for debugging prompts
-
-         response = model.generate_content(
-             prompt_text,
-             generation_config=generation_config,
-             safety_settings=safety_settings
-         )
-         print("--- Received AI Response ---")
-
-         # Handle potential blocks or empty responses
-         if not response.candidates:
-             print("Warning: AI response blocked or empty. Check safety settings or prompt.")
-             if hasattr(response, 'prompt_feedback') and response.prompt_feedback: print(f"Prompt Feedback: {response.prompt_feedback}")
-             # Return a structured error
-             return json.dumps({"error": "AI response blocked or empty.", "details": str(getattr(response, 'prompt_feedback', 'N/A'))})
-
-         # Check if text attribute exists and has content
-         if hasattr(response, 'text') and response.text:
-             # Assuming the response text IS the JSON string
-             return response.text
-         else:
-             print("Warning: No text parts found in AI response or response.text is empty.")
-             # Return a structured error
-             return json.dumps({"error": "AI generated empty or non-text response."})
+        parsed = json.loads(response_text)
+    except (json.JSONDecodeError, TypeError):
+        return False
+    return isinstance(parsed, dict) and "error" not in parsed
+
+def call_gemini_api(prompt_text, bypass_cache=False, call=None):
+    """ Helper function to call the API through the shared governor, with a content-addressed response cache. The model's usage is noted on call (a ModelCall), if given. """
+    if not get_model():
+         log.error("AI Model not configured or API key test failed.")
+         return None # Indicate failure clearly
 
+    cache_key = response_key(MODEL_NAME, GENERATION_CONFIG, SAFETY_SETTINGS, prompt_text)
+    with span("ai_cache") as lookup:
+        cached_text = ai_cache.get(cache_key, bypass=bypass_cache)
+        lookup.set(hit=cached_text is not None)
+    if cached_text is not None:
+        log.info("AI response served from cache")
+        return cached_text
+    return _generate_content(prompt_text, cache_key, call)
+
+def _generate_content(prompt_text, cache_key, call=None):
+    """ Sends the prompt to the model; rate limits, retries and the circuit breaker live in gemini_governor.py. """
+    try:
+         log.info("Sending prompt to AI (length: %d chars)", len(prompt_text))
+         log.debug("Prompt snippet: %s...", prompt_text[:500])
+
+         with span("gemini_call", prompt_chars=len(prompt_text)): # Queueing, every attempt and the backoffs between them
+             response = gemini_governor.call(lambda: get_model().generate_content(
+                 prompt_text,
+                 generation_config=GENERATION_CONFIG,
+                 safety_settings=SAFETY_SETTINGS
+             ), prompt_text)
+         log.info("Received AI response")
+         _note_usage(call, response)
+         return _response_text(response, cache_key)
+
+    except GovernorRejected as e:
+         log.warning("AI call rejected by governor: %s", e)
+         return json.dumps({"error": f"AI temporarily unavailable: {e}"})
     except Exception as e:
-         print(f"Error calling AI API: {e}")
-         if retry_count > 0:
-             print(f"Retrying AI call in {delay} seconds... ({retry_count} retries left)")
-             time.sleep(delay)
-             return call_gemini_api(prompt_text, retry_count - 1, delay * 2) # Exponential backoff
-         else:
-             print("AI call failed after multiple retries.")
-             # Return a structured error in JSON format
-             return json.dumps({"error": f"AI call failed after multiple retries: {e}"})
+         log.error("AI call failed after retries: %s", e)
+         # Return a structured error in JSON format
+         return json.dumps({"error": f"AI call failed after multiple retries: {e}"})
+
+def _note_usage(call, response):
+    """ Keeps the model's own prompt token count on the ModelCall that asked for it; streamed chunks each carry the running usage. """
+    prompt_token_count = getattr(getattr(response, 'usage_metadata', None), 'prompt_token_count', None)
+    if call is not None and prompt_token_count:
+        call.prompt_token_count = prompt_token_count
+
+def _response_text(response, cache_key):
+    """ Turns a model response into its JSON text (or a JSON error); caches good responses. """
+    # Handle potential blocks or empty responses
+    if not response.candidates:
+        log.warning("AI response blocked or empty. Check safety settings or prompt.")
+        count_error("gemini_call", "blocked_or_empty")
+        if hasattr(response, 'prompt_feedback') and response.prompt_feedback: log.warning("Prompt feedback: %s", response.prompt_feedback)
+        # Return a structured error
+        return json.dumps({"error": "AI response blocked or empty.", "details": str(getattr(response, 'prompt_feedback', 'N/A'))})
+
+    # Check if text attribute exists and has content
+    if hasattr(response, 'text') and response.text:
+        RESPONSE_CHARS.labels("complete").observe(len(response.text))
+        # Assuming the response text IS the JSON string
+        if _is_cacheable(response.text):
+            ai_cache.put(cache_key, response.text)
+        return response.text
+    else:
+        log.warning("No text parts found in AI response or response.text is empty.")
+        count_error("gemini_call", "empty_response")
+        # Return a structured error
+        return json.dumps({"error": "AI generated empty or non-text response."})
+
+# --- Async Variants (ASGI serving path, see main.py) ---
+async def call_gemini_api_async(prompt_text, bypass_cache=False, call=None):
+    """ Non-blocking call_gemini_api: awaits the model and the governor's backoff without holding a thread. """
+    if not get_model():
+         log.error("AI Model not configured or API key test failed.")
+         return None
+
+    cache_key = response_key(MODEL_NAME, GENERATION_CONFIG, SAFETY_SETTINGS, prompt_text)
+    with span("ai_cache") as lookup:
+        cached_text = await asyncio.to_thread(ai_cache.get, cache_key, bypass_cache) # May hit the SQLite tier
+        lookup.set(hit=cached_text is not None)
+    if cached_text is not None:
+        log.info("AI response served from cache")
+        return cached_text
+    return await _generate_content_async(prompt_text, cache_key, call)
+
+async def _generate_content_async(prompt_text, cache_key, call=None):
+    try:
+         log.info("Sending prompt to AI (length: %d chars)", len(prompt_text))
+         with span("gemini_call", prompt_chars=len(prompt_text)):
+             response = await gemini_governor.call_async(lambda: get_model().generate_content_async(
+                 prompt_text,
+                 generation_config=GENERATION_CONFIG,
+                 safety_settings=SAFETY_SETTINGS
+             ), prompt_text)
+         log.info("Received AI response")
+         _note_usage(call, response)
+         return await asyncio.to_thread(_response_text, response, cache_key)
+
+    except GovernorRejected as e:
+         log.warning("AI call rejected by governor: %s", e)
+         return json.dumps({"error": f"AI temporarily unavailable: {e}"})
+    except Exception as e:
+         log.error("AI call failed after retries: %s", e)
+         return json.dumps({"error": f"AI call failed after multiple retries: {e}"})
+
+# --- Streaming (SSE endpoints, see streaming.py) ---
+def _chunk_text(chunk):
+    try:
+        return chunk.text
+    except ValueError: # Chunk without text parts (e.g. a safety block)
+        return ""
+
+def _blocked_or_empty():
+    log.warning("AI response blocked or empty. Check safety settings or prompt.")
+    count_error("gemini_call", "blocked_or_empty")
+    return json.dumps({"error": "AI response blocked or empty."})
+
+def stream_gemini_api(prompt_text, bypass_cache=False, call=None):
+    """ Yields the response text as the model generates it; a cached response arrives in one piece. """
+    if not get_model():
+         log.error("AI Model not configured or API key test failed.")
+         return
+
+    cache_key = response_key(MODEL_NAME, GENERATION_CONFIG, SAFETY_SETTINGS, prompt_text)
+    with span("ai_cache") as lookup:
+        cached_text = ai_cache.get(cache_key, bypass=bypass_cache)
+        lookup.set(hit=cached_text is not None)
+    if cached_text is not None:
+        log.info("AI response served from cache")
+        yield cached_text
+        return
+
+    log.info("Streaming prompt to AI (length: %d chars)", len(prompt_text))
+    started = time.perf_counter()
+    parts = []
+    for chunk in gemini_governor.stream(lambda: get_model().generate_content(
+        prompt_text,
+        generation_config=GENERATION_CONFIG,
+        safety_settings=SAFETY_SETTINGS,
+        stream=True
+    ), prompt_text):
+        _note_usage(call, chunk)
+        text = _chunk_text(chunk)
+        if text:
+            parts.append(text)
+            yield text
+    # Timed by hand rather than with span(): the stream is suspended at every yield, possibly across contexts
+    record_span("gemini_call", time.perf_counter() - started, prompt_chars=len(prompt_text), stream=True)
+    RESPONSE_CHARS.labels("stream").observe(sum(map(len, parts)))
+    if not parts:
+        yield _blocked_or_empty()
+    elif _is_cacheable(''.join(parts)):
+        ai_cache.put(cache_key, ''.join(parts))
+    log.info("AI response stream complete")
+
+async def stream_gemini_api_async(prompt_text, bypass_cache=False, call=None):
+    """ stream_gemini_api for the ASGI path. """
+    if not get_model():
+         log.error("AI Model not configured or API key test failed.")
+         return
+
+    cache_key = response_key(MODEL_NAME, GENERATION_CONFIG, SAFETY_SETTINGS, prompt_text)
+    with span("ai_cache") as lookup:
+        cached_text = await asyncio.to_thread(ai_cache.get, cache_key, bypass_cache)
+        lookup.set(hit=cached_text is not None)
+    if cached_text is not None:
+        log.info("AI response served from cache")
+        yield cached_text
+        return
+
+    log.info("Streaming prompt to AI (length: %d chars)", len(prompt_text))
+    started = time.perf_counter()
+    parts = []
+    async for chunk in gemini_governor.stream_async(lambda: get_model().generate_content_async(
+        prompt_text,
+        generation_config=GENERATION_CONFIG,
+        safety_settings=SAFETY_SETTINGS,
+        stream=True
+    ), prompt_text):
+        _note_usage(call, chunk)
+        text = _chunk_text(chunk)
+        if text:
+            parts.append(text)
+            yield text
+    record_span("gemini_call", time.perf_counter() - started, prompt_chars=len(prompt_text), stream=True)
+    RESPONSE_CHARS.labels("stream").observe(sum(map(len, parts)))
+    if not parts:
+        yield _blocked_or_empty()
+    elif _is_cacheable(''.join(parts)):
+        await asyncio.to_thread(ai_cache.put, cache_key, ''.join(parts))
+    log.info("AI response stream complete")
+
+# --- Running a pipeline (blocking, async, streaming) ---
+# Each analysis is written once, as a generator of steps: it yields a ModelCall
+# wherever it needs the model's answer and is sent the raw text back, or yields
+# Concurrently to run other pipelines side by side and is sent their results.
+# The drivers below differ only in how they answer those requests.
+class ModelCall:
+    """ A pipeline's request for one model answer; prompt_token_count is the model's own count, once it has answered (not from the cache). """
+    __slots__ = ("prompt_text", "bypass_cache", "prompt_token_count")
+
+    def __init__(self, prompt_text, bypass_cache):
+        self.prompt_text = prompt_text
+        self.bypass_cache = bypass_cache
+        self.prompt_token_count = None
+
+class Concurrently:
+    """ A pipeline's request to run other pipelines at the same time; answered with {name: result}. """
+    __slots__ = ("pipelines",)
+
+    def __init__(self, pipelines):
+        self.pipelines = pipelines
+
+def _advance(steps, answer):
+    """ Runs a pipeline up to its next request: (request, None), or (None, result) once it has finished. """
+    try:
+        return steps.send(answer), None
+    except StopIteration as done: # Returned rather than raised: StopIteration cannot cross asyncio.to_thread
+        return None, done.value
+
+def _answer(request):
+    if isinstance(request, Concurrently):
+        with ThreadPoolExecutor(max_workers=len(request.pipelines), thread_name_prefix="ai_pipeline") as pool:
+            # in_context: each pipeline's spans land in this request's trace
+            futures = {name: pool.submit(in_context(_run_steps), steps) for name, steps in request.pipelines.items()}
+        return {name: future.result() for name, future in futures.items()}
+    return call_gemini_api(request.prompt_text, bypass_cache=request.bypass_cache, call=request)
+
+async def _answer_async(request):
+    if isinstance(request, Concurrently):
+        results = await asyncio.gather(*(_run_steps_async(steps) for steps in request.pipelines.values()))
+        return dict(zip(request.pipelines, results))
+    return await call_gemini_api_async(request.prompt_text, bypass_cache=request.bypass_cache, call=request)
+
+def _stream_failure(e):
+    """ A failed stream as the JSON error text call_gemini_api would have answered with. """
+    count_error("gemini_call", type(e).__name__)
+    if isinstance(e, GovernorRejected):
+        log.warning("AI call rejected by governor: %s", e)
+        return json.dumps({"error": f"AI temporarily unavailable: {e}"})
+    log.error("AI stream failed: %s", e)
+    return json.dumps({"error": f"AI call failed: {e}"})
+
+def _run_steps(steps):
+    """ Runs a pipeline with blocking model calls and returns its result. """
+    answer = None
+    while True:
+        request, result = _advance(steps, answer)
+        if request is None:
+            return result
+        answer = _answer(request)
+
+async def _run_steps_async(steps):
+    """ _run_steps for the ASGI path; the steps between model calls run in a thread, as they may hit the SQLite tier. """
+    answer = None
+    while True:
+        request, result = await asyncio.to_thread(_advance, steps, answer)
+        if request is None:
+            return result
+        answer = await _answer_async(request)
+
+def _stream_steps(steps):
+    """ Yields ("chunk", text) while the model writes its first answer, then ("result", dict); re-requests arrive whole. """
+    answer, streamed = None, False
+    while True:
+        request, result = _advance(steps, answer)
+        if request is None:
+            yield "result", result
+            return
+        if streamed or not isinstance(request, ModelCall):
+            answer = _answer(request)
+            continue
+        streamed, parts = True, []
+        try:
+            for text in stream_gemini_api(request.prompt_text, request.bypass_cache, request):
+                parts.append(text)
+                yield "chunk", text
+            answer = ''.join(parts)
+        except Exception as e:
+            answer = _stream_failure(e)
+
+async def _stream_steps_async(steps):
+    """ _stream_steps for the ASGI path. """
+    answer, streamed = None, False
+    while True:
+        request, result = await asyncio.to_thread(_advance, steps, answer)
+        if request is None:
+            yield "result", result
+            return
+        if streamed or not isinstance(request, ModelCall):
+            answer = await _answer_async(request)
+            continue
+        streamed, parts = True, []
+        try:
+            async for text in stream_gemini_api_async(request.prompt_text, request.bypass_cache, request):
+                parts.append(text)
+                yield "chunk", text
+            answer = ''.join(parts)
+        except Exception as e:
+            answer = _stream_failure(e)
+
+def _language_name(target_language):
+    return "Romanian" if target_language == "ro" else "English"
+
+def _with_prompt_report(result, prompt, call=None):
+    """
+    Adds the prompt's token accounting to a successful result: the local
+    estimate it was budgeted with, and next to it ("measured") the model's own
+    count from usage_metadata, or None when the answer came from the cache.
+    """
+    measured = call.prompt_token_count if call is not None else None
+    log.info("Prompt: %d tokens estimated (%d static, %d dynamic), %s measured%s", prompt.tokens, prompt.static_tokens, prompt.dynamic_tokens,
+             measured if measured is not None else "not", f", omitted: {', '.join(prompt.omitted)}" if prompt.omitted else "")
+    if isinstance(result, dict) and "error" not in result:
+        result["prompt_tokens"] = dict(prompt.report(), measured=measured)
+    return result
 
 
 # === Shopify SEO AI Function ===
-def get_shopify_seo_ai(scraped_data, target_language):
-    """ Generates complex SEO analysis for Shopify, expecting JSON output. """
-    if not model: return {"error": "AI Model not configured"}
+def get_shopify_seo_ai(scraped_data, target_language, bypass_cache=False):
+    """ Generates complex SEO analysis for Shopify, expecting JSON output. Only sections whose inputs changed since the last run are regenerated. """
+    return _run_steps(_shopify_seo_steps(scraped_data, target_language, bypass_cache))
+
+async def get_shopify_seo_ai_async(scraped_data, target_language, bypass_cache=False):
+    """ get_shopify_seo_ai for the ASGI path. """
+    return await _run_steps_async(_shopify_seo_steps(scraped_data, target_language, bypass_cache))
+
+def stream_shopify_seo_ai(scraped_data, target_language, bypass_cache=False):
+    """ Streaming get_shopify_seo_ai: yields ("chunk", text) pieces, then ("result", dict). """
+    return _stream_steps(_shopify_seo_steps(scraped_data, target_language, bypass_cache))
+
+def stream_shopify_seo_ai_async(scraped_data, target_language, bypass_cache=False):
+    """ stream_shopify_seo_ai for the ASGI path. """
+    return _stream_steps_async(_shopify_seo_steps(scraped_data, target_language, bypass_cache))
+
+def _shopify_seo_steps(scraped_data, target_language, bypass_cache):
+    if not get_model(): return {"error": "AI Model not configured"}
     if not scraped_data or scraped_data.get("error"):
         return {"error": f"Invalid or missing scraped data provided: {scraped_data.get('error', 'N/A')}"}
 
-    lang_name = "Romanian" if target_language == "ro" else "English"
-    print(f"--- Getting Shopify SEO AI analysis in {lang_name} ---")
-
-    # Prepare snippets of complex data for the prompt
-    headings_summary = {k: v[:2] for k, v in scraped_data.get('headings', {}).items() if v} # Show first 2 of each level
-    alt_texts_summary = scraped_data.get('alt_texts', [])[:5] # Show first 5 alt texts
-    schema_summary = [s.get('@type', 'Unknown Type') for s in scraped_data.get('schema_data', [])][:3] # Show first 3 schema types
-    links_summary = scraped_data.get('links', {})
-
-    prompt = f"""
-    Analyze the following data scraped from a potential Shopify page ({scraped_data.get('url', 'N/A')}) for SEO optimization opportunities in {lang_name}.
-
-    **Scraped Data:**
-    - Title: {scraped_data.get('title', 'N/A')}
-    - Meta Description: {scraped_data.get('meta_description', 'N/A')}
-    - H1 Heading: {scraped_data.get('h1', 'N/A')}
-    - Headings Structure (Sample): {json.dumps(headings_summary)}
-    - Image Alt Texts (Sample): {json.dumps(alt_texts_summary)}
-    - Detected Schema Types (Sample): {json.dumps(schema_summary)}
-    - Link Counts: Internal: {links_summary.get('internal', 'N/A')}, External: {links_summary.get('external', 'N/A')}
-    - Content Snippet: "{scraped_data.get('content_snippet', 'N/A')[:500]}..."
-
-    **Analysis Tasks (Perform in {lang_name}):**
-
-    1.  **Core SEO Elements Critique & Suggestions:**
-        * Critique the current Title (length, clarity, keywords). Suggest 1 improved SEO Title (max 60 chars), explaining the reasoning.
-        * Critique the current Meta Description (length, clarity, call-to-action, keywords). Suggest 1 improved Meta Description (max 155 chars), explaining the reasoning.
-        * Analyze the H1 heading. Is it effective? Suggest an improvement if necessary.
-
-    2.  **Content & Keywords:**
-        * Based on the headings and content snippet, identify the main topic and suggest 5-7 relevant keywords (mix of short/long-tail).
-        * Suggest 2 specific Shopify blog post titles relevant to the scraped content that could drive traffic.
-
-    3.  **On-Page & Technical Considerations:**
-        * Based on the sample alt texts, provide 1 specific recommendation for improving image SEO on this page or Shopify stores in general.
-        * Based on the detected schema types (or lack thereof), recommend the MOST appropriate Schema.org type (e.g., Product, Article, CollectionPage) for this page and list 3 essential properties to include. If schema exists, briefly evaluate its type.
-        * Provide 2 actionable, technical SEO tips relevant for Shopify stores (e.g., related to site speed, mobile-friendliness, URL structure, duplicate content).
-
-    **Output Format:**
-    Generate your response *exclusively* as a single, valid JSON object. Use the following structure precisely. All string values within the JSON should be in {lang_name}.
-
-    ```json
-    {{
-      "analysis_language": "{target_language}",
-      "core_seo": {{
-        "title_critique": "[Your critique of the current title]",
-        "suggested_title": "[Your suggested title]",
-        "title_reasoning": "[Reasoning for suggested title]",
-        "description_critique": "[Your critique of the current meta description]",
-        "suggested_description": "[Your suggested description]",
-        "description_reasoning": "[Reasoning for suggested description]",
-        "h1_analysis": "[Your analysis of the H1 heading]",
-        "suggested_h1": "[Suggested H1 only if improvement needed, else null]"
-      }},
-      "content_keywords": {{
-        "main_topic": "[Identified main topic]",
-        "suggested_keywords": ["[keyword1", "keyword2", "...", "keyword7"],
-        "blog_post_ideas": ["[Blog title idea 1]", "[Blog title idea 2]"]
-      }},
-      "on_page_technical": {{
-        "image_seo_tip": "[Specific alt text/image SEO recommendation]",
-        "schema_recommendation": {{
-          "suggested_type": "[Recommended Schema.org type e.g., Product]",
-          "required_properties": ["[property1", "property2", "property3"],
-          "current_schema_evaluation": "[Brief evaluation if schema was found, else null]"
-        }},
-        "technical_tips": ["[Technical SEO Tip 1]", "[Technical SEO Tip 2]"]
-      }}
-    }}
-    ```
-
-    --- End of Instructions ---
+    log.info("Getting Shopify SEO AI analysis in %s", _language_name(target_language))
+    with span("seo_rules"):
+        rule_results = run_seo_rules(scraped_data, target_language)
+    plan = plan_sections(scraped_data, target_language, bypass_cache)
+    if not plan.sections:
+        return merge_sections({}, scraped_data, target_language, plan, rule_results)
+    prompt = build_shopify_seo_prompt(scraped_data, target_language, rule_results, plan.sections)
+    call = ModelCall(prompt.text, bypass_cache)
+    raw_json_response = yield call
+    parsed_results = _with_prompt_report(parse_shopify_seo_response(raw_json_response, rule_results, plan.sections), prompt, call)
+    parsed_results = yield from _section_retry_steps(parsed_results, scraped_data, target_language, rule_results, plan.sections)
+    return merge_sections(parsed_results, scraped_data, target_language, plan, rule_results)
+
+def build_shopify_seo_prompt(scraped_data, target_language, rule_results=None, sections=SHOPIFY_SECTIONS):
+    """ Compiles the Shopify SEO prompt within the token budget (prompt_compiler.py), with the local rule checks (seo_rules.py). """
+    if rule_results is None:
+        rule_results = run_seo_rules(scraped_data, target_language)
+    with span("prompt_build", prompt="shopify_seo", sections=len(sections)):
+        return compile_shopify_seo_prompt(scraped_data, target_language, rules_prompt_summary(rule_results, sections), sections)
+
+# --- Incremental re-analysis (snapshots.py) ---
+class SectionPlan:
+    """ Which report sections to generate for a page, and the snapshot the others come from. """
+    __slots__ = ("digests", "snapshot", "sections")
+
+    def __init__(self, digests, snapshot, sections):
+        self.digests = digests
+        self.snapshot = snapshot
+        self.sections = sections
+
+def plan_sections(scraped_data, target_language, bypass_cache=False):
+    """ Diffs the page against its last snapshot. A first analysis or a forced refresh generates every section. """
+    with span("snapshot_diff") as diff:
+        digests = field_digests(scraped_data)
+        snapshot = None if bypass_cache else snapshots.lookup(scraped_data.get("url"), target_language)
+        sections = snapshot.stale_sections(digests, snapshots.max_age) if snapshot else list(SHOPIFY_SECTIONS)
+        diff.set(snapshot=snapshot is not None, regenerate=len(sections))
+    return SectionPlan(digests, snapshot, sections)
+
+def merge_sections(parsed_results, scraped_data, target_language, plan, rule_results):
+    """ Fills the sections that were not regenerated from the snapshot, then stores the merged report as the new snapshot (unless nothing was regenerated). """
+    if "error" in parsed_results:
+        return parsed_results
+    reused = [section for section in SHOPIFY_SECTIONS if section not in plan.sections] if plan.snapshot else []
+    merged = {"analysis_language": parsed_results.get("analysis_language", target_language)}
+    for section in SHOPIFY_SECTIONS:
+        if section in reused:
+            merged[section] = plan.snapshot.sections[section]
+        elif section in parsed_results:
+            merged[section] = parsed_results[section]
+    merged.update((key, value) for key, value in parsed_results.items() if key not in merged)
+    merged["rule_checks"] = rule_results
+    merged["incremental"] = {"regenerated": plan.sections, "reused": reused,
+                             "changed_fields": plan.snapshot.changed_fields(plan.digests) if plan.snapshot else None}
+    if plan.sections: # An unchanged snapshot keeps its stored time, so its sections still age out
+        snapshots.save(scraped_data.get("url"), target_language, plan.digests, merged, plan.sections, plan.snapshot)
+    snapshots.record(len(plan.sections), len(reused))
+    if reused:
+        log.info("Reused %s from the last analysis; regenerated: %s", ', '.join(reused), ', '.join(plan.sections) or 'none')
+    return merged
+
+def parse_shopify_seo_response(raw_json_response, rule_results=None, sections=SHOPIFY_SECTIONS):
+    """
+    The model's report for the requested sections. Sections missing from the
+    answer or not matching their prompt shape are dropped and listed under
+    "invalid_sections", for retry_invalid_sections to ask for again.
     """
-
-    raw_json_response = call_gemini_api(prompt)
-
     if not raw_json_response:
         return {"error": "Failed to get response from AI after retries."}
+    with span("json_parse", chars=len(raw_json_response)):
+        return _parse_shopify_seo_json(raw_json_response, rule_results, sections)
 
+def _parse_shopify_seo_json(raw_json_response, rule_results, sections):
     try:
-        # Parse the JSON response from the AI
-        parsed_results = json.loads(raw_json_response)
+        # Parse the JSON response from the AI, salvaging fenced, truncated or trailing-comma answers (json_repair.py)
+        parsed_results, fixes = parse_model_json(raw_json_response)
         if "error" in parsed_results: # Handle errors returned *within* the JSON
-             print(f"AI returned an error in its JSON response: {parsed_results['error']}")
+             log.warning("AI returned an error in its JSON response: %s", parsed_results['error'])
              # Optionally add more details if available: parsed_results.get('details')
              return {"error": f"AI Error: {parsed_results['error']}"}
 
-        print("--- Shopify SEO AI analysis generated and parsed successfully ---")
+        problems = {section: schema_problems(parsed_results.get(section), shopify_section_shape(section), section) for section in sections}
+        invalid = [section for section in sections if problems[section]]
+        record_answer(fixes)
+        record_invalid(len(invalid))
+        if fixes:
+            log.info("Repaired AI JSON response (%s)", ', '.join(fixes))
+        if invalid:
+            log.warning("AI response has invalid sections: %s", '; '.join(f"{section}: {', '.join(problems[section][:3])}" for section in invalid))
+            for section in invalid:
+                parsed_results.pop(section, None)
+            parsed_results["invalid_sections"] = invalid
+        else:
+            log.info("Shopify SEO AI analysis generated and parsed successfully")
+        if rule_results is not None:
+            parsed_results["rule_checks"] = rule_results # Local checks ride along with the model's answer
         return parsed_results
     except json.JSONDecodeError as e:
-        print(f"Error: Failed to decode JSON response from AI: {e}")
-        print(f"Raw AI Response Snippet: {raw_json_response[:500]}") # Log snippet for debugging
-        return {"error": "Failed to parse AI response as JSON.", "raw_response_snippet": raw_json_response[:500]}
+        log.error("Failed to decode JSON response from AI: %s (raw response snippet: %r)", e, raw_json_response[:500])
+        count_error("json_parse", type(e).__name__)
+        record_unparseable()
+        return {"error": "Failed to parse AI response as JSON.", "raw_response_snippet": raw_json_response[:500],
+                "invalid_sections": list(sections)}
     except Exception as e:
-        print(f"Error processing AI response: {e}")
+        log.exception("Error processing AI response: %s", e)
+        count_error("json_parse", type(e).__name__)
         return {"error": f"Unexpected error processing AI response: {e}"}
 
 
+# --- Re-requesting invalid sections (json_repair.py) ---
+def retry_invalid_sections(parsed_results, scraped_data, target_language, rule_results, sections):
+    """
+    Asks the model again, once and uncached, for just the sections its answer
+    got wrong, and merges them into the sections it got right. An unparseable
+    answer has every section invalid, so it costs one full re-request here
+    rather than a new scrape and analysis when the user resubmits.
+    """
+    return _run_steps(_section_retry_steps(parsed_results, scraped_data, target_language, rule_results, sections))
+
+def _section_retry_steps(parsed_results, scraped_data, target_language, rule_results, sections):
+    invalid = parsed_results.get("invalid_sections")
+    if not invalid or not JSON_SECTION_RETRY:
+        return _settle_sections(parsed_results, sections)
+    log.info("Re-requesting invalid sections: %s", ', '.join(invalid))
+    prompt = build_shopify_seo_prompt(scraped_data, target_language, rule_results, invalid)
+    started = time.perf_counter() # Timed by hand: a span cannot stay open across the yield
+    retry = parse_shopify_seo_response((yield ModelCall(prompt.text, True)), rule_results, invalid)
+    record_span("json_section_retry", time.perf_counter() - started, sections=len(invalid))
+    return _merge_retried_sections(parsed_results, retry, invalid, sections)
+
+def _merge_retried_sections(parsed_results, retry, invalid, sections):
+    recovered = [] if "error" in retry else [section for section in invalid if section in retry and section not in retry.get("invalid_sections", ())]
+    record_retry(len(recovered) == len(invalid))
+    if "error" in parsed_results: # Nothing was salvaged from the first answer: the retry is the answer
+        return _settle_sections(retry, sections) if "error" not in retry else parsed_results
+    merged = dict(parsed_results)
+    merged.update((section, retry[section]) for section in recovered)
+    still_invalid = [section for section in invalid if section not in recovered]
+    if still_invalid:
+        merged["invalid_sections"] = still_invalid
+    else:
+        merged.pop("invalid_sections", None)
+    return _settle_sections(merged, sections)
+
+def _settle_sections(parsed_results, sections):
+    """ A report where no requested section is usable is an error, as an unparseable answer used to be. """
+    invalid = parsed_results.get("invalid_sections")
+    if "error" in parsed_results or not invalid or len(invalid) < len(sections):
+        return parsed_results
+    return {"error": f"AI response did not contain valid sections: {', '.join(invalid)}", "invalid_sections": invalid}
+
+
 # === Social Media AI Function ===
-def get_social_media_ai(platform, topic, keywords, target_language):
+def get_social_media_ai(platform, topic, keywords, target_language, bypass_cache=False):
     """ Generates complex social media content ideas, expecting JSON output. """
-    if not model: return {"error": "AI Model not configured"}
+    return _run_steps(_social_media_steps(platform, topic, keywords, target_language, bypass_cache))
+
+async def get_social_media_ai_async(platform, topic, keywords, target_language, bypass_cache=False):
+    """ get_social_media_ai for the ASGI path. """
+    return await _run_steps_async(_social_media_steps(platform, topic, keywords, target_language, bypass_cache))
+
+def stream_social_media_ai(platform, topic, keywords, target_language, bypass_cache=False):
+    """ Streaming get_social_media_ai: yields ("chunk", text) pieces, then ("result", dict). """
+    return _stream_steps(_social_media_steps(platform, topic, keywords, target_language, bypass_cache))
+
+def stream_social_media_ai_async(platform, topic, keywords, target_language, bypass_cache=False):
+    """ stream_social_media_ai for the ASGI path. """
+    return _stream_steps_async(_social_media_steps(platform, topic, keywords, target_language, bypass_cache))
+
+def _social_media_steps(platform, topic, keywords, target_language, bypass_cache):
+    if not get_model(): return {"error": "AI Model not configured"}
     if not topic: return {"error": "Topic/description input is required"}
 
-    lang_name = "Romanian" if target_language == "ro" else "English"
-    print(f"--- Getting Social Media AI suggestions for {platform} about '{topic[:50]}...' in {lang_name} ---")
-
-    prompt = f"Act as a creative social media marketing expert specializing in {platform.upper()}."
-    prompt += f"\nGenerate content ideas in {lang_name} for **{platform.upper()}** based on the following:"
-    prompt += f"\n- Main Topic/Product: '{topic}'"
-    if keywords:
-        prompt += f"\n- Keywords: {keywords}"
-    prompt += "\n\n**Content Requirements:**\n"
-
-    # Platform-specific instructions requesting more detail and JSON output
-    if platform == "youtube":
-        prompt += """
-        - Generate 2 distinct YouTube video concepts:
-            - For each concept, provide:
-                - An engaging Title (max 70 chars).
-                - A brief Hook (first 5-10 seconds idea).
-                - A 3-4 bullet point Outline covering key segments.
-                - A specific Call-to-Action.
-                - A relevant Thumbnail concept description (visual idea).
-        - Suggest 5 relevant YouTube tags/keywords.
-        - Justify *why* one of the video concepts is particularly suited for YouTube engagement.
-
-        **Output Format:** Respond *only* with a valid JSON object using this structure:
-        ```json
-        {
-          "platform": "youtube",
-          "language": "%s",
-          "concepts": [
-            {
-              "title": "[Generated Title 1]",
-              "hook": "[Hook idea 1]",
-              "outline": ["[Point 1.1]", "[Point 1.2]", "[Point 1.3]"],
-              "call_to_action": "[CTA 1]",
-              "thumbnail_concept": "[Thumbnail description 1]"
-            },
-            {
-              "title": "[Generated Title 2]",
-              "hook": "[Hook idea 2]",
-              "outline": ["[Point 2.1]", "[Point 2.2]", "[Point 2.3]", "[Point 2.4]"],
-              "call_to_action": "[CTA 2]",
-              "thumbnail_concept": "[Thumbnail description 2]"
-            }
-          ],
-          "suggested_tags": ["tag1", "tag2", "tag3", "tag4", "tag5"],
-          "justification": "[Explanation why one concept is well-suited]"
-        }
-        ```
-        """ % target_language
-    elif platform == "instagram": # Assuming Reels/Posts focus
-        prompt += """
-        - Generate 2 distinct Instagram post/Reel ideas:
-            - For each idea, provide:
-                - A hook-focused Caption Idea (under 30 words).
-                - A Visual Concept (e.g., type of image, Reel style, trending audio suggestion).
-                - A specific Call-to-Action.
-        - Suggest 1 set of 7 relevant Hashtags (mix broad, niche, specific).
-        - Provide 1 Instagram Story idea (e.g., poll, Q&A, behind-the-scenes) related to the topic.
-        - Briefly explain how one idea uses a common engagement tactic (e.g., question, user-generated content prompt).
-
-        **Output Format:** Respond *only* with a valid JSON object using this structure:
-        ```json
-        {
-          "platform": "instagram",
-          "language": "%s",
-          "post_ideas": [
-            {
-              "caption_idea": "[Generated Caption 1]",
-              "visual_concept": "[Visual/audio concept 1]",
-              "call_to_action": "[CTA 1]"
-            },
-            {
-              "caption_idea": "[Generated Caption 2]",
-              "visual_concept": "[Visual/audio concept 2]",
-              "call_to_action": "[CTA 2]"
-            }
-          ],
-          "suggested_hashtags": ["#hashtag1", "#hashtag2", ..., "#hashtag7"],
-          "story_idea": "[Instagram story idea description]",
-          "engagement_tactic_explanation": "[Explanation of engagement tactic used]"
-        }
-        ```
-        """ % target_language
-    elif platform == "pinterest":
-         prompt += """
-         - Generate 2 distinct Pin concepts:
-             - For each concept, provide:
-                 - An SEO-optimized Pin Title (keyword-rich).
-                 - A compelling Pin Description (1-3 sentences, include keywords and CTA).
-                 - A visual description (what the Pin image/video should show).
-         - Suggest 3 relevant Pinterest Board names.
-         - Explain why one of the Pin concepts is visually appealing for Pinterest.
-
-         **Output Format:** Respond *only* with a valid JSON object using this structure:
-         ```json
-         {
-           "platform": "pinterest",
-           "language": "%s",
-           "pin_concepts": [
-             {
-               "title": "[Generated Title 1]",
-               "description": "[Generated Description 1]",
-               "visual_description": "[Visual description 1]"
-             },
-             {
-               "title": "[Generated Title 2]",
-               "description": "[Generated Description 2]",
-               "visual_description": "[Visual description 2]"
-             }
-           ],
-           "suggested_boards": ["BoardName1", "BoardName2", "BoardName3"],
-           "visual_appeal_explanation": "[Explanation of visual appeal]"
-         }
-         ```
-         """ % target_language
-    else:
+    log.info("Getting Social Media AI suggestions for %s about '%s...' in %s", platform, topic[:50], _language_name(target_language))
+    prompt = build_social_media_prompt(platform, topic, keywords, target_language)
+    if prompt is None:
         return {"error": f"Unsupported social platform: {platform}"}
+    call = ModelCall(prompt.text, bypass_cache)
+    raw_json_response = yield call
+    result = _with_prompt_report(parse_social_media_response(platform, raw_json_response), prompt, call)
+    return (yield from _social_retry_steps(platform, prompt, result))
 
-    prompt += "\n--- End of Instructions ---"
-
-    raw_json_response = call_gemini_api(prompt)
+def build_social_media_prompt(platform, topic, keywords, target_language):
+    """ Compiles the content-ideas prompt for a platform (prompt_compiler.py); None if the platform is unsupported. """
+    with span("prompt_build", prompt="social", platform=platform):
+        return compile_social_media_prompt(platform, topic, keywords, target_language)
 
+def parse_social_media_response(platform, raw_json_response):
     if not raw_json_response:
        return {"error": f"Failed to get {platform} response from AI after retries."}
+    with span("json_parse", chars=len(raw_json_response), platform=platform):
+        return _parse_social_media_json(platform, raw_json_response)
 
+def _parse_social_media_json(platform, raw_json_response):
     try:
-        # Parse the JSON response from the AI
-        parsed_results = json.loads(raw_json_response)
+        # Parse the JSON response from the AI, salvaging fenced, truncated or trailing-comma answers (json_repair.py)
+        parsed_results, fixes = parse_model_json(raw_json_response)
         if "error" in parsed_results: # Handle errors returned *within* the JSON
-            print(f"AI returned an error in its JSON response: {parsed_results['error']}")
+            log.warning("AI returned an error in its JSON response: %s", parsed_results['error'])
             return {"error": f"AI Error for {platform}: {parsed_results['error']}"}
 
-        print(f"--- {platform.capitalize()} AI suggestions generated and parsed successfully ---")
+        record_answer(fixes)
+        if fixes:
+            log.info("Repaired %s AI JSON response (%s)", platform, ', '.join(fixes))
+        if platform == "combined": # Validated per platform by parse_combined_social_response
+            return parsed_results
+        problems = schema_problems(parsed_results, social_shape(platform))
+        record_invalid(bool(problems))
+        if problems:
+            log.warning("%s AI response does not match the requested format: %s", platform.capitalize(), ', '.join(problems[:5]))
+            parsed_results["invalid_sections"] = [platform] # Kept as the answer unless the re-request does better
+            return parsed_results
+        log.info("%s AI suggestions generated and parsed successfully", platform.capitalize())
         # Add back platform/topic for context if needed by frontend, though it's in the JSON now
         # parsed_results['platform_requested'] = platform
         # parsed_results['topic_used'] = topic
         return parsed_results
     except json.JSONDecodeError as e:
-        print(f"Error: Failed to decode JSON response from AI for {platform}: {e}")
-        print(f"Raw AI Response Snippet: {raw_json_response[:500]}") # Log snippet
-        return {"error": f"Failed to parse {platform} AI response as JSON.", "raw_response_snippet": raw_json_response[:500]}
+        log.error("Failed to decode JSON response from AI for %s: %s (raw response snippet: %r)", platform, e, raw_json_response[:500])
+        count_error("json_parse", type(e).__name__)
+        record_unparseable()
+        return {"error": f"Failed to parse {platform} AI response as JSON.", "raw_response_snippet": raw_json_response[:500],
+                "invalid_sections": [platform]}
     except Exception as e:
-        print(f"Error processing AI response for {platform}: {e}")
-        return {"error": f"Unexpected error processing {platform} AI response: {e}"}
\ No newline at end of file
+        log.exception("Error processing AI response for %s: %s", platform, e)
+        count_error("json_parse", type(e).__name__)
+        return {"error": f"Unexpected error processing {platform} AI response: {e}"}
+
+
+def retry_social_answer(platform, prompt, result):
+    """ Asks again, once and uncached, when the answer could not be parsed or did not match the platform's shape. """
+    return _run_steps(_social_retry_steps(platform, prompt, result))
+
+def _social_retry_steps(platform, prompt, result):
+    if not result.get("invalid_sections") or not JSON_SECTION_RETRY:
+        return result
+    log.info("Re-requesting %s answer", platform)
+    started = time.perf_counter()
+    call = ModelCall(prompt.text, True)
+    retry = _with_prompt_report(parse_social_media_response(platform, (yield call)), prompt, call)
+    record_span("json_section_retry", time.perf_counter() - started, platform=platform)
+    return _better_answer(result, retry)
+
+def _better_answer(result, retry):
+    """ The retry if it came back valid; otherwise whichever of the two is an answer rather than an error. """
+    valid = "error" not in retry and not retry.get("invalid_sections")
+    record_retry(valid)
+    if valid or ("error" in result and "error" not in retry):
+        return retry
+    return result
+
+
+# === Multi-platform Social Media AI ===
+def get_multi_social_media_ai(platforms, topic, keywords, target_language, combined=False, bypass_cache=False):
+    """
+    Content ideas for several platforms in one request. By default each platform
+    is its own model call and they run concurrently, so the request takes as long
+    as the slowest one; with combined=True a single call answers for all of them.
+    """
+    return _run_steps(_multi_social_steps(platforms, topic, keywords, target_language, combined, bypass_cache))
+
+async def get_multi_social_media_ai_async(platforms, topic, keywords, target_language, combined=False, bypass_cache=False):
+    """ get_multi_social_media_ai for the ASGI path. """
+    return await _run_steps_async(_multi_social_steps(platforms, topic, keywords, target_language, combined, bypass_cache))
+
+def _multi_social_steps(platforms, topic, keywords, target_language, combined, bypass_cache):
+    if not get_model(): return {"error": "AI Model not configured"}
+    if not topic: return {"error": "Topic/description input is required"}
+
+    log.info("Getting Social Media AI suggestions for %s (%s) in %s", ', '.join(platforms), 'combined' if combined else 'concurrent', _language_name(target_language))
+    started = time.monotonic()
+    if not combined:
+        results = yield Concurrently({platform: _social_media_steps(platform, topic, keywords, target_language, bypass_cache)
+                                      for platform in platforms})
+        return _multi_social_response(results, "concurrent", started)
+
+    with span("prompt_build", prompt="social_combined", platforms=len(platforms)):
+        prompt = compile_combined_social_prompt(platforms, topic, keywords, target_language)
+    if prompt is None:
+        return {"error": f"Unsupported social platform in: {', '.join(platforms)}"}
+    call = ModelCall(prompt.text, bypass_cache)
+    results = parse_combined_social_response(platforms, (yield call))
+    invalid = [platform for platform, result in results.items() if result.get("invalid_sections")]
+    if invalid and JSON_SECTION_RETRY: # Only the platforms the combined answer got wrong, each with its own prompt
+        log.info("Re-requesting invalid platforms: %s", ', '.join(invalid))
+        retried = yield Concurrently({platform: _social_media_steps(platform, topic, keywords, target_language, bypass_cache)
+                                      for platform in invalid})
+        results.update((platform, _better_answer(results[platform], retried[platform])) for platform in invalid)
+    return _with_prompt_report(_multi_social_response(results, "combined", started), prompt, call)
+
+def parse_combined_social_response(platforms, raw_json_response):
+    """
+    Splits a combined answer into per-platform results. A platform missing
+    from it gets its own error, and one not matching its shape is marked
+    with "invalid_sections"; either can then be re-requested on its own.
+    """
+    parsed_results = parse_social_media_response("combined", raw_json_response)
+    if "error" in parsed_results:
+        return {platform: dict(parsed_results, invalid_sections=[platform]) if "invalid_sections" in parsed_results else parsed_results
+                for platform in platforms}
+    results = {}
+    for platform in platforms:
+        answer = parsed_results.get(platform)
+        problems = schema_problems(answer, social_shape(platform), platform) if isinstance(answer, dict) else [platform]
+        if not isinstance(answer, dict):
+            answer = {"error": f"No {platform} section in the combined AI response.", "invalid_sections": [platform]}
+        elif problems:
+            log.warning("%s part of the combined AI response does not match the requested format: %s", platform.capitalize(), ', '.join(problems[:5]))
+            answer["invalid_sections"] = [platform]
+        results[platform] = answer
+    record_invalid(sum(1 for answer in results.values() if answer.get("invalid_sections")))
+    return results
+
+def _multi_social_response(results, mode, started):
+    failed = [platform for platform, result in results.items() if not result or "error" in result]
+    response = {
+        "mode": mode,
+        "platforms": results,
+        "succeeded": [platform for platform in results if platform not in failed],
+        "failed": failed,
+        "elapsed_ms": round((time.monotonic() - started) * 1000),
+    }
+    if failed and len(failed) == len(results): # Nothing to show: surface it as an error like the single-platform call
+        response["error"] = "; ".join(f"{platform}: {(results[platform] or {}).get('error', 'no response')}" for platform in failed)
+    return response
@@ -0,0 +1,269 @@
+# Inside backend/analysis_store.py
+"""
+Persistent history of analyses (SQLite, WAL mode).
+
+Every successful /analyze-shopify result is stored with the scraped page it
+was generated from, and every /generate-social result with its parameters,
+keyed by URL (or social parameters), language and time. Indexes on URL,
+domain and date keep the lookups below a single index read:
+
+- latest_shopify() / latest_social(): the newest stored result for the same
+  request, when it is newer than the caller's max_age_hours, so a repeat
+  view is a database read instead of a scrape plus a model run;
+- history(): filtered, keyset-paginated summaries (newest first);
+- export(): the same filters as a generator of full records, read in
+  batches so an export of the whole table never holds the connection.
+
+Writes are best effort: a failing database is logged and counted, and the
+request is answered as if the store were disabled. History reads that fail
+are logged and counted too, and raise AnalysisStoreUnavailable so the API
+can answer 503 instead of a 500 or a silently truncated export.
+"""
+import os
+import json
+import time
+import logging
+import sqlite3
+import hashlib
+import threading
+from urllib.parse import urlparse
+
+from cache_store import CACHE_DIR
+from observability import span
+
+log = logging.getLogger(__name__)
+
+# --- Analysis Store Settings (override via .env) ---
+ANALYSIS_STORE_ENABLED = os.getenv("ANALYSIS_STORE_ENABLED", "1") == "1"
+ANALYSIS_STORE_PATH = os.getenv("ANALYSIS_STORE_PATH", os.path.join(CACHE_DIR, "analyses.sqlite3"))
+ANALYSIS_STORE_MAX_ROWS = int(os.getenv("ANALYSIS_STORE_MAX_ROWS", 200000)) # Oldest analyses are dropped beyond this; 0 keeps everything
+ANALYSIS_SERVE_MAX_AGE_HOURS = float(os.getenv("ANALYSIS_SERVE_MAX_AGE_HOURS", 0)) # Default for requests without max_age_hours; 0 always re-analyses
+ANALYSIS_HISTORY_PAGE_SIZE = int(os.getenv("ANALYSIS_HISTORY_PAGE_SIZE", 50))
+ANALYSIS_HISTORY_MAX_PAGE_SIZE = int(os.getenv("ANALYSIS_HISTORY_MAX_PAGE_SIZE", 500))
+ANALYSIS_EXPORT_BATCH = 500 # Rows read per query while exporting
+
+KINDS = ("shopify_seo", "social")
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS analyses ("
+    " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+    " kind TEXT NOT NULL,"
+    " lookup_key TEXT NOT NULL," # URL, or platform plus a hash of topic and keywords
+    " subject TEXT NOT NULL," # Human-readable: the URL, or 'platform: topic'
+    " url TEXT,"
+    " domain TEXT,"
+    " language TEXT NOT NULL,"
+    " created_at REAL NOT NULL,"
+    " result TEXT NOT NULL,"
+    " scraped TEXT)",
+    "CREATE INDEX IF NOT EXISTS analyses_lookup ON analyses (lookup_key, kind, language, created_at)",
+    "CREATE INDEX IF NOT EXISTS analyses_url ON analyses (url, created_at)",
+    "CREATE INDEX IF NOT EXISTS analyses_domain ON analyses (domain, created_at)",
+    "CREATE INDEX IF NOT EXISTS analyses_created ON analyses (created_at)",
+)
+_SUMMARY_COLUMNS = "id, kind, subject, url, domain, language, created_at, length(result) AS result_bytes"
+
+
+class AnalysisStoreUnavailable(Exception):
+    """The history could not be read (locked or corrupt database)."""
+
+
+def domain_of(url):
+    """Host of the URL, lower-cased and without a leading 'www.' (so both spellings group together)."""
+    host = (urlparse(url).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def social_key(platform, topic, keywords):
+    material = json.dumps([topic, keywords], ensure_ascii=False)
+    return f"{platform}|{hashlib.sha256(material.encode('utf-8')).hexdigest()[:32]}"
+
+
+class AnalysisStore:
+    """Append-only table of analyses, shared by every worker process pointing at the same file."""
+
+    TRIM_EVERY = 200 # Check the row bound every N writes
+
+    def __init__(self, path=ANALYSIS_STORE_PATH, max_rows=ANALYSIS_STORE_MAX_ROWS, enabled=ANALYSIS_STORE_ENABLED):
+        self.path = path
+        self.max_rows = max_rows
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self.hits = 0
+        self.misses = 0
+        self.saves = 0
+        self.errors = 0
+
+    def _connection(self):
+        if self._conn is None or self._pid != os.getpid(): # Never reuse a connection across fork()
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            for statement in _SCHEMA:
+                conn.execute(statement)
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def _query(self, sql, parameters=()):
+        with self._lock:
+            return self._connection().execute(sql, parameters).fetchall()
+
+    def _read(self, sql, parameters=()):
+        """_query for the history API: a database error is counted and raised as AnalysisStoreUnavailable."""
+        try:
+            return self._query(sql, parameters)
+        except sqlite3.Error as e:
+            self._failed("read", e)
+            raise AnalysisStoreUnavailable("Analysis history is temporarily unavailable") from e
+
+    def _failed(self, action, error):
+        log.warning("Analysis store %s failed: %s", action, error)
+        with self._lock:
+            self.errors += 1
+
+    # --- Writes ---
+    def save_shopify(self, url, language, scraped_data, result):
+        """Stores a successful SEO analysis with the scraped page it was generated from."""
+        self._save("shopify_seo", url, url, language, result, url=url, scraped=scraped_data)
+
+    def save_social(self, platform, topic, keywords, language, result):
+        """Stores a successful social generation."""
+        self._save("social", social_key(platform, topic, keywords), f"{platform}: {topic[:200]}", language, result)
+
+    def _save(self, kind, lookup_key, subject, language, result, url=None, scraped=None):
+        if not self.enabled or not result or result.get("error") or result.get("invalid_sections"):
+            return # Incomplete answers are not worth serving again
+        row = (kind, lookup_key, subject, url, domain_of(url) if url else None, language, time.time(),
+               json.dumps(result, ensure_ascii=False), json.dumps(scraped, ensure_ascii=False) if scraped is not None else None)
+        try:
+            with span("analysis_store_save"), self._lock:
+                conn = self._connection()
+                conn.execute("INSERT INTO analyses (kind, lookup_key, subject, url, domain, language, created_at, result, scraped) "
+                             "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+                self.saves += 1
+                if self.max_rows and self.saves % self.TRIM_EVERY == 0:
+                    self._trim(conn)
+        except sqlite3.Error as e:
+            self._failed("write", e)
+
+    def _trim(self, conn):
+        newest = conn.execute("SELECT MAX(id) FROM analyses").fetchone()[0] or 0
+        conn.execute("DELETE FROM analyses WHERE id <= ?", (newest - self.max_rows,)) # ids only grow, so this keeps the newest rows
+
+    # --- Serve-latest ---
+    def latest_shopify(self, url, language, max_age_hours):
+        return self._latest("shopify_seo", url, language, max_age_hours)
+
+    def latest_social(self, platform, topic, keywords, language, max_age_hours):
+        return self._latest("social", social_key(platform, topic, keywords), language, max_age_hours)
+
+    def _latest(self, kind, lookup_key, language, max_age_hours):
+        """
+        The newest stored result for the request if it is younger than
+        max_age_hours, with a "stored_analysis" entry saying when it was made;
+        None otherwise (or when max_age_hours is falsy).
+        """
+        if not self.enabled or not max_age_hours:
+            return None
+        try:
+            with span("analysis_store_lookup") as lookup:
+                rows = self._query("SELECT id, created_at, result FROM analyses "
+                                   "WHERE lookup_key = ? AND kind = ? AND language = ? AND created_at >= ? "
+                                   "ORDER BY created_at DESC LIMIT 1",
+                                   (lookup_key, kind, language, time.time() - max_age_hours * 3600))
+                lookup.set(hit=bool(rows))
+        except sqlite3.Error as e:
+            self._failed("read", e)
+            return None
+        with self._lock:
+            if not rows:
+                self.misses += 1
+                return None
+            self.hits += 1
+        row = rows[0]
+        result = json.loads(row["result"])
+        result["stored_analysis"] = {"id": row["id"], "created_at": row["created_at"],
+                                     "age_hours": round((time.time() - row["created_at"]) / 3600, 2)}
+        return result
+
+    # --- History and export ---
+    @staticmethod
+    def _where(filters, before_id=None):
+        """SQL conditions and parameters for history filters: kind, url, domain, language, since, until (epoch seconds)."""
+        conditions, parameters = [], []
+        for column in ("kind", "url", "language"):
+            if filters.get(column):
+                conditions.append(f"{column} = ?")
+                parameters.append(filters[column])
+        if filters.get("domain"):
+            domain = filters["domain"]
+            conditions.append("domain = ?")
+            parameters.append(domain_of(domain if "//" in domain else f"//{domain}")) # Accepts a bare host or a URL
+        if filters.get("since") is not None:
+            conditions.append("created_at >= ?")
+            parameters.append(filters["since"])
+        if filters.get("until") is not None:
+            conditions.append("created_at < ?")
+            parameters.append(filters["until"])
+        if before_id is not None:
+            conditions.append("id < ?")
+            parameters.append(before_id)
+        return (" WHERE " + " AND ".join(conditions)) if conditions else "", parameters
+
+    def history(self, filters, limit=ANALYSIS_HISTORY_PAGE_SIZE, cursor=None):
+        """
+        One page of analysis summaries, newest first: (items, next_cursor).
+        Pass next_cursor back as cursor for the following page; it is None on
+        the last page. Keyset pagination, so deep pages cost the same as the first.
+        """
+        limit = max(1, min(limit, ANALYSIS_HISTORY_MAX_PAGE_SIZE))
+        where, parameters = self._where(filters, before_id=cursor)
+        rows = self._read(f"SELECT {_SUMMARY_COLUMNS} FROM analyses{where} ORDER BY id DESC LIMIT ?", parameters + [limit + 1])
+        items = [dict(row) for row in rows[:limit]]
+        return items, (items[-1]["id"] if len(rows) > limit else None)
+
+    def get(self, analysis_id, include_scraped=False):
+        """The full stored record (result and, optionally, the scraped page), or None."""
+        rows = self._read("SELECT * FROM analyses WHERE id = ?", (analysis_id,))
+        return self._record(rows[0], include_scraped) if rows else None
+
+    def export(self, filters, include_scraped=False):
+        """
+        Full records matching the filters, newest first, read
+        ANALYSIS_EXPORT_BATCH rows at a time. A failing batch raises
+        AnalysisStoreUnavailable, also partway through the export.
+        """
+        cursor = None
+        while True:
+            where, parameters = self._where(filters, before_id=cursor)
+            rows = self._read(f"SELECT * FROM analyses{where} ORDER BY id DESC LIMIT ?", parameters + [ANALYSIS_EXPORT_BATCH])
+            for row in rows:
+                yield self._record(row, include_scraped)
+            if len(rows) < ANALYSIS_EXPORT_BATCH:
+                return
+            cursor = rows[-1]["id"]
+
+    @staticmethod
+    def _record(row, include_scraped):
+        record = {key: row[key] for key in ("id", "kind", "subject", "url", "domain", "language", "created_at")}
+        record["result"] = json.loads(row["result"])
+        if include_scraped:
+            record["scraped"] = json.loads(row["scraped"]) if row["scraped"] else None
+        return record
+
+    def stats(self):
+        with self._lock:
+            stats = {"enabled": self.enabled, "hits": self.hits, "misses": self.misses, "saves": self.saves, "errors": self.errors}
+        if self.enabled:
+            try:
+                stats["rows"] = self._query("SELECT COUNT(*) FROM analyses")[0][0]
+            except sqlite3.Error:
+                stats["rows"] = None
+        return stats
+
+
+analysis_store = AnalysisStore()
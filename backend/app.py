@@ -1,27 +1,95 @@
 # Inside backend/app.py
 import os
-from flask import Flask, request, jsonify, render_template, session, redirect, url_for # Keep session import
+import json
+import time
+import logging
+import itertools
+from datetime import datetime, timezone
+from flask import Flask, request, jsonify, render_template, session, redirect, url_for, Response, stream_with_context, g # Keep session import
 from dotenv import load_dotenv
 import secrets
 
+_imports_started = time.perf_counter() # Import time of the modules below (the model client itself is created lazily)
+
 # --- Import your custom modules ---
 # Make sure these point to the updated files
 from scraper import scrape_store_data
-from ai_handler import get_shopify_seo_ai, get_social_media_ai, detect_language
+from ai_handler import (get_shopify_seo_ai, get_social_media_ai, get_multi_social_media_ai, detect_language, stream_shopify_seo_ai,
+                        stream_social_media_ai)
+from robots_cache import robots_cache
+from politeness import politeness
+from page_cache import page_cache
+from ai_cache import ai_cache
+from snapshots import snapshots
+from analysis_store import analysis_store, AnalysisStoreUnavailable, KINDS as ANALYSIS_KINDS, ANALYSIS_SERVE_MAX_AGE_HOURS, ANALYSIS_HISTORY_PAGE_SIZE
+from gemini_governor import gemini_governor
+from single_flight import SingleFlight, SingleFlightTimeout
+from streaming import sse, error_event, scraped_summary, traced_events, JsonSectionScanner, SSE_HEADERS
+from jobs import JobManager, BatchQueueFull, BATCH_MAX_URLS
+from seo_rules import run_seo_rules, fast_analysis
+import crawler
+import prompt_compiler
+import json_repair
+from prompt_compiler import SOCIAL_PLATFORMS
+from crawler import crawl_site, CrawlBusy, SiteAggregate, CRAWL_MAX_PAGES, CRAWL_MAX_PAGES_LIMIT
+from shopify_catalog import scrape_shopify_catalog, CATALOG_KINDS
+from observability import configure_logging, logging_stats, traced, with_trace, metrics_payload, register_cache, REQUEST_SECONDS
+import startup
 
 # Load environment variables
 load_dotenv()
+configure_logging() # Leveled, non-blocking logging (LOG_LEVEL, LOG_FORMAT), see observability.py
+log = logging.getLogger(__name__)
+startup.record_import("app", _imports_started)
+startup.start_warm_up() # WARM_UP=1: create the model client, language detector, ... now instead of on the first request
 
 app = Flask(__name__, template_folder='templates', static_folder='../frontend/static')
 
 # --- Configure Flask Sessions (Still useful for flash messages, future features) ---
 app.config['SECRET_KEY'] = os.getenv('FLASK_SECRET_KEY', secrets.token_hex(16))
 if not os.getenv('FLASK_SECRET_KEY'):
-     print("WARNING: FLASK_SECRET_KEY not set in .env. Using temporary key.")
+     log.warning("FLASK_SECRET_KEY not set in .env. Using temporary key.")
 
 # --- AI Configuration Check ---
 API_KEY = os.getenv("GEMINI_API_KEY")
-if not API_KEY: print("WARNING: GEMINI_API_KEY environment variable not found.")
+if not API_KEY: log.warning("GEMINI_API_KEY environment variable not found.")
+
+# --- Admin API (disabled unless ADMIN_TOKEN is set) ---
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+HISTORY_API_PUBLIC = os.getenv("HISTORY_API_PUBLIC", "0") == "1" # Serve /history without X-Admin-Token (scraped pages still need it)
+
+# --- In-flight Coalescing (identical concurrent requests share one scrape / AI call) ---
+scrape_flight = SingleFlight("scrape")
+ai_flight = SingleFlight("AI")
+
+# --- Request Metrics ---
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def observe_request(response):
+    """ Observes the request duration once the response is closed, so streamed responses count until their last event. """
+    started = g.get('request_started')
+    if started is not None:
+        endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+        method, status = request.method, str(response.status_code)
+        response.call_on_close(lambda: record_request(endpoint, method, status, time.perf_counter() - started))
+    return response
+
+def record_request(endpoint, method, status, seconds):
+    REQUEST_SECONDS.labels(endpoint, method, status).observe(seconds)
+    startup.note_request(seconds) # The first one is this worker's cold-start latency
+
+def admin_authorized():
+    """ True if the request carries the configured admin token. """
+    return bool(ADMIN_TOKEN) and secrets.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN)
+
+def history_authorized():
+    """ True if the request may read the analysis history: the admin token, or HISTORY_API_PUBLIC without ?include_scraped=1. """
+    if request.args.get('include_scraped') == '1':
+        return admin_authorized()
+    return HISTORY_API_PUBLIC or admin_authorized()
 
 # === Page Routes ===
 
@@ -41,72 +109,537 @@ def social_media_page():
     return render_template('social_media.html') # References shopify_seo_tool/backend/templates/social_media.html
 
 # === API Endpoints ===
+# The checks and error mapping below are shared with the ASGI endpoints in main.py
 
-@app.route('/analyze-shopify', methods=['POST'])
-def analyze_shopify_api():
-    """ Handles the Shopify SEO analysis request using the updated modules. """
-    if not request.is_json: return jsonify({"error": "Request must be JSON"}), 400
-    data = request.get_json()
+def parse_max_age(data):
+    """ 'max_age_hours' (serve a stored analysis younger than this, see analysis_store.py): (hours, None) or (None, error). """
+    max_age_hours = data.get('max_age_hours', ANALYSIS_SERVE_MAX_AGE_HOURS)
+    if isinstance(max_age_hours, bool) or not isinstance(max_age_hours, (int, float)) or max_age_hours < 0:
+        return None, ({"error": "'max_age_hours' must be a non-negative number"}, 400)
+    return max_age_hours, None
+
+def parse_analyze_request(data):
+    """ Validates an /analyze-shopify body. Returns (params, None) or (None, (error_body, status)). """
     store_url = data.get('url')
     language = data.get('language', 'en') # Default to English if not provided
+    no_cache = bool(data.get('no_cache', False)) # Force a fresh scrape and AI run
+    mode = data.get('mode', 'full') # "fast": local rule checks only (seo_rules.py), no AI call
 
     if not store_url or not store_url.startswith(('http://', 'https://')):
-        return jsonify({"error": "Invalid or missing 'url' parameter"}), 400
+        return None, ({"error": "Invalid or missing 'url' parameter"}, 400)
+    if mode not in ('full', 'fast'):
+        return None, ({"error": "'mode' must be 'full' or 'fast'"}, 400)
+    max_age_hours, invalid = parse_max_age(data)
+    if invalid: return None, invalid
+    return {"store_url": store_url, "language": language, "no_cache": no_cache, "mode": mode, "max_age_hours": max_age_hours}, None
+
+def parse_social_request(data):
+    """ Validates a /generate-social body. Returns (params, None) or (None, (error_body, status)). """
+    platform = data.get('platform')
+    topic = data.get('topic') # Expecting topic/description from frontend
+    keywords = data.get('keywords', '') # Optional keywords string
+    language = data.get('language', 'en') # Default to English
+    no_cache = bool(data.get('no_cache', False)) # Force a fresh AI run
 
-    print(f"API: Received Shopify analysis request for URL: {store_url}, Language: {language}")
-    # Call the updated scraper
-    scraped_data = scrape_store_data(store_url)
-    # The scraper now returns an error dictionary on failure or disallowed by robots.txt
+    if not platform: return None, ({"error": "Missing 'platform' parameter"}, 400)
+    if not topic: return None, ({"error": "Missing 'topic' or description parameter"}, 400)
+    max_age_hours, invalid = parse_max_age(data)
+    if invalid: return None, invalid
+    return {"platform": platform, "topic": topic, "keywords": keywords, "language": language, "no_cache": no_cache,
+            "max_age_hours": max_age_hours}, None
+
+def parse_multi_social_request(data):
+    """ Validates a /generate-social/multi body. Returns (params, None) or (None, (error_body, status)). """
+    platforms = data.get('platforms')
+    topic = data.get('topic')
+    if not isinstance(platforms, list) or not platforms: return None, ({"error": "Missing or empty 'platforms' list"}, 400)
+    platforms = list(dict.fromkeys(platform for platform in platforms if isinstance(platform, str))) # Drop duplicates, keep order
+    unsupported = [platform for platform in platforms if platform not in SOCIAL_PLATFORMS]
+    if unsupported or not platforms:
+        return None, ({"error": "Unsupported platforms in 'platforms'", "unsupported": unsupported, "supported": list(SOCIAL_PLATFORMS)}, 400)
+    if not topic: return None, ({"error": "Missing 'topic' or description parameter"}, 400)
+    return {"platforms": platforms, "topic": topic, "keywords": data.get('keywords', ''), "language": data.get('language', 'en'),
+            "combined": bool(data.get('combined', False)), # One model call for every platform instead of one call each
+            "no_cache": bool(data.get('no_cache', False))}, None
+
+def scrape_failure(scraped_data):
+    """ (error_body, status) if the scraper failed, else None. """
+    # The scraper returns an error dictionary on failure or disallowed by robots.txt
     if not scraped_data or scraped_data.get("error"):
         error_msg = scraped_data.get("error", "Failed to scrape store data (Unknown Error).") if scraped_data else "Scraper returned None."
-        print(f"API Error (Scraper): {error_msg}")
+        log.warning("API Error (Scraper): %s", error_msg)
         # Return 500 for server-side errors, 400 might be suitable for disallowed robots.txt
         status_code = 400 if "robots.txt" in error_msg else 500
-        return jsonify({"error": error_msg}), status_code
-
-    # Call the updated AI handler which expects richer data and returns structured JSON/error dict
-    ai_results = get_shopify_seo_ai(scraped_data, language)
+        return {"error": error_msg}, status_code
+    return None
 
-    # This error check remains valid as the AI handler returns {"error": ...} on failure
+def ai_failure(ai_results, label):
+    """ (error_body, status) if the AI handler failed, else None. """
+    # The AI handler returns {"error": ...} on failure
     if not ai_results or ai_results.get("error"):
         error_msg = ai_results.get("error", "Unknown error getting AI suggestions") if ai_results else "AI handler returned None or empty."
         raw_snippet = ai_results.get("raw_response_snippet", "") if ai_results else "" # Get snippet if available
-        print(f"API Error (AI Shopify): {error_msg}")
-        if raw_snippet: print(f"Raw AI Response Snippet: {raw_snippet}")
-        return jsonify({"error": error_msg}), 500
+        log.warning("API Error (AI %s): %s", label, error_msg)
+        if raw_snippet: log.warning("Raw AI Response Snippet: %s", raw_snippet)
+        return {"error": error_msg}, 500
+    return None
+
+def stored_shopify_analysis(params):
+    """ The stored analysis to serve instead of a new one (max_age_hours), or None. """
+    if params["mode"] != "full" or params["no_cache"]: return None
+    return analysis_store.latest_shopify(params["store_url"], params["language"], params["max_age_hours"])
+
+def stored_social_generation(params):
+    """ The stored social ideas to serve instead of new ones (max_age_hours), or None. """
+    if params["no_cache"]: return None
+    return analysis_store.latest_social(params["platform"], params["topic"], params["keywords"], params["language"], params["max_age_hours"])
+
+def analyze_and_store(store_url, scraped_data, language, no_cache):
+    """ get_shopify_seo_ai plus saving the result; runs inside the single flight, so coalesced requests store it once. """
+    ai_results = get_shopify_seo_ai(scraped_data, language, bypass_cache=no_cache)
+    analysis_store.save_shopify(store_url, language, scraped_data, ai_results)
+    return ai_results
+
+def generate_social_and_store(platform, topic, keywords, language, no_cache):
+    """ get_social_media_ai plus saving the result (see analyze_and_store). """
+    ai_results = get_social_media_ai(platform=platform, topic=topic, keywords=keywords, target_language=language, bypass_cache=no_cache)
+    analysis_store.save_social(platform, topic, keywords, language, ai_results)
+    return ai_results
+
+@app.route('/analyze-shopify', methods=['POST'])
+@traced("analyze-shopify")
+def analyze_shopify_api():
+    """ Handles the Shopify SEO analysis request using the updated modules. """
+    if not request.is_json: return jsonify({"error": "Request must be JSON"}), 400
+    params, invalid = parse_analyze_request(request.get_json())
+    if invalid: return jsonify(invalid[0]), invalid[1]
+    store_url, language, no_cache = params["store_url"], params["language"], params["no_cache"]
+
+    log.info("API: Received Shopify analysis request for URL: %s, Language: %s, Mode: %s", store_url, language, params['mode'])
+    stored = stored_shopify_analysis(params)
+    if stored: return jsonify(with_trace(stored))
+    # Call the updated scraper (concurrent requests for the same URL share one scrape)
+    try:
+        scraped_data = scrape_flight.do((store_url, no_cache), scrape_store_data, store_url, use_cache=not no_cache)
+    except SingleFlightTimeout as e:
+        log.warning("API Error (Scraper): %s", e)
+        return jsonify({"error": str(e)}), 504
+    failure = scrape_failure(scraped_data)
+    if failure: return jsonify(failure[0]), failure[1]
+    if params["mode"] == "fast": return jsonify(with_trace(fast_analysis(scraped_data, language)))
+
+    # Call the updated AI handler which expects richer data and returns structured JSON/error dict
+    try:
+        ai_results = ai_flight.do(("seo", store_url, language, no_cache), analyze_and_store, store_url, scraped_data, language, no_cache)
+    except SingleFlightTimeout as e:
+        log.warning("API Error (AI Shopify): %s", e)
+        return jsonify({"error": str(e)}), 504
+    failure = ai_failure(ai_results, "Shopify")
+    if failure: return jsonify(failure[0]), failure[1]
 
     # ai_results is now the dictionary parsed from the AI's JSON response
-    return jsonify(ai_results)
+    return jsonify(with_trace(ai_results))
 
 @app.route('/generate-social', methods=['POST'])
+@traced("generate-social")
 def generate_social_api():
     """ Handles the Social Media content generation request using the updated AI handler. """
     if not request.is_json: return jsonify({"error": "Request must be JSON"}), 400
+    params, invalid = parse_social_request(request.get_json())
+    if invalid: return jsonify(invalid[0]), invalid[1]
+    platform, topic, keywords, language, no_cache = (params["platform"], params["topic"], params["keywords"],
+                                                     params["language"], params["no_cache"])
+
+    log.info("API: Received social generation request for Platform: %s, Topic: %s..., Lang: %s", platform, topic[:50], language)
+    stored = stored_social_generation(params)
+    if stored: return jsonify(with_trace(stored))
+
+    # Call the updated AI handler which returns structured JSON/error dict
+    try:
+        ai_results = ai_flight.do(("social", platform, topic, keywords, language, no_cache), generate_social_and_store,
+                                  platform, topic, keywords, language, no_cache)
+    except SingleFlightTimeout as e:
+        log.warning("API Error (AI Social): %s", e)
+        return jsonify({"error": str(e)}), 504
+    failure = ai_failure(ai_results, "Social")
+    if failure: return jsonify(failure[0]), failure[1]
+
+    # ai_results is now the dictionary parsed from the AI's JSON response
+    return jsonify(with_trace(ai_results))
+
+@app.route('/generate-social/multi', methods=['POST'])
+@traced("generate-social-multi")
+def generate_multi_social_api():
+    """ Social content ideas for several platforms in one request; per-platform results and errors come back together. """
+    if not request.is_json: return jsonify({"error": "Request must be JSON"}), 400
+    params, invalid = parse_multi_social_request(request.get_json())
+    if invalid: return jsonify(invalid[0]), invalid[1]
+    platforms = params["platforms"]
+    log.info("API: Received multi-platform social request for Platforms: %s, Combined: %s, Lang: %s", ', '.join(platforms), params['combined'], params['language'])
+
+    try:
+        ai_results = ai_flight.do(("social-multi", tuple(platforms), params["combined"], params["topic"], params["keywords"],
+                                   params["language"], params["no_cache"]), get_multi_social_media_ai, platforms, params["topic"],
+                                  params["keywords"], params["language"], combined=params["combined"], bypass_cache=params["no_cache"])
+    except SingleFlightTimeout as e:
+        log.warning("API Error (AI Social): %s", e)
+        return jsonify({"error": str(e)}), 504
+    failure = multi_social_failure(ai_results)
+    if failure: return jsonify(failure[0]), failure[1]
+    return jsonify(with_trace(ai_results))
+
+def multi_social_failure(ai_results):
+    """ ai_failure for a multi-platform result: fails only if every platform failed, keeping the per-platform errors. """
+    failure = ai_failure(ai_results, "Social")
+    if failure and ai_results and ai_results.get("platforms"):
+        failure[0]["platforms"] = ai_results["platforms"]
+    return failure
+
+# === Streaming API Endpoints (Server-Sent Events, see streaming.py) ===
+
+@app.route('/analyze-shopify/stream', methods=['POST'])
+def analyze_shopify_stream_api():
+    """ /analyze-shopify as an event stream: scrape progress, model output as it is generated, then the JSON. """
+    if not request.is_json: return jsonify({"error": "Request must be JSON"}), 400
+    params, invalid = parse_analyze_request(request.get_json())
+    if invalid: return jsonify(invalid[0]), invalid[1]
+    log.info("API: Received streamed Shopify analysis request for URL: %s, Language: %s", params['store_url'], params['language'])
+    return Response(stream_with_context(traced_events("analyze-shopify/stream", shopify_events(**params))),
+                    mimetype='text/event-stream', headers=SSE_HEADERS)
+
+def shopify_events(store_url, language, no_cache, mode, max_age_hours):
+    stored = stored_shopify_analysis({"store_url": store_url, "language": language, "no_cache": no_cache, "mode": mode,
+                                      "max_age_hours": max_age_hours})
+    if stored:
+        yield sse("result", stored)
+        return
+    yield sse("progress", {"stage": "scraping", "message": f"Fetching {store_url}"})
+    try:
+        scraped_data = scrape_flight.do((store_url, no_cache), scrape_store_data, store_url, use_cache=not no_cache)
+    except SingleFlightTimeout as e:
+        yield error_event({"error": str(e)}, 504)
+        return
+    failure = scrape_failure(scraped_data)
+    if failure:
+        yield error_event(*failure)
+        return
+
+    yield sse("checks", run_seo_rules(scraped_data, language))
+    if mode == "fast":
+        yield sse("result", fast_analysis(scraped_data, language))
+        return
+    yield sse("progress", {"stage": "generating", "message": "Page scraped, generating recommendations", "page": scraped_summary(scraped_data)})
+    ai_stream = stream_shopify_seo_ai(scraped_data, language, bypass_cache=no_cache)
+    yield from ai_events(stored_results(ai_stream, analysis_store.save_shopify, store_url, language, scraped_data), "Shopify")
+
+@app.route('/generate-social/stream', methods=['POST'])
+def generate_social_stream_api():
+    """ /generate-social as an event stream: model output as it is generated, then the JSON. """
+    if not request.is_json: return jsonify({"error": "Request must be JSON"}), 400
+    params, invalid = parse_social_request(request.get_json())
+    if invalid: return jsonify(invalid[0]), invalid[1]
+    log.info("API: Received streamed social generation request for Platform: %s, Lang: %s", params['platform'], params['language'])
+    return Response(stream_with_context(traced_events("generate-social/stream", social_events(**params))),
+                    mimetype='text/event-stream', headers=SSE_HEADERS)
+
+def social_events(platform, topic, keywords, language, no_cache, max_age_hours):
+    stored = stored_social_generation({"platform": platform, "topic": topic, "keywords": keywords, "language": language,
+                                       "no_cache": no_cache, "max_age_hours": max_age_hours})
+    if stored:
+        yield sse("result", stored)
+        return
+    yield sse("progress", {"stage": "generating", "message": f"Generating {platform} ideas"})
+    ai_stream = stream_social_media_ai(platform, topic, keywords, language, bypass_cache=no_cache)
+    yield from ai_events(stored_results(ai_stream, analysis_store.save_social, platform, topic, keywords, language), "Social")
+
+def stored_results(ai_stream, save, *args):
+    """ Passes an ai_handler stream through, calling save(*args, result) on its final result (save ignores error results). """
+    for kind, value in ai_stream:
+        if kind == "result": save(*args, value)
+        yield kind, value
+
+def ai_events(ai_stream, label):
+    """ Turns an ai_handler stream into chunk / section events and a final result or error event. """
+    scanner = JsonSectionScanner()
+    for kind, value in ai_stream:
+        if kind == "chunk":
+            yield sse("chunk", {"text": value})
+            for key, section in scanner.feed(value):
+                yield sse("section", {"key": key, "value": section})
+            continue
+        failure = ai_failure(value, label)
+        yield error_event(*failure) if failure else sse("result", value)
+
+# === Batch API (background worker pool, see jobs.py) ===
+
+def batch_scrape(url, no_cache):
+    """ Scrape stage of a batch URL: (scraped_data, None) or (None, (error_body, status)). """
+    try:
+        scraped_data = scrape_flight.do((url, no_cache), scrape_store_data, url, use_cache=not no_cache)
+    except SingleFlightTimeout as e:
+        return None, ({"error": str(e)}, 504)
+    return scraped_data, scrape_failure(scraped_data)
+
+def batch_analyze(url, scraped_data, language, no_cache):
+    """ AI stage of a batch URL: (ai_results, None) or (None, (error_body, status)). """
+    try:
+        ai_results = ai_flight.do(("seo", url, language, no_cache), analyze_and_store, url, scraped_data, language, no_cache)
+    except SingleFlightTimeout as e:
+        return None, ({"error": str(e)}, 504)
+    return ai_results, ai_failure(ai_results, "Shopify")
+
+batch_jobs = JobManager(batch_scrape, batch_analyze)
+
+@app.route('/batch/analyze-shopify', methods=['POST'])
+def batch_analyze_shopify_api():
+    """ Queues a batch audit: {"urls": [...], "language": "en"} -> 202 with the job id. """
+    if not request.is_json: return jsonify({"error": "Request must be JSON"}), 400
     data = request.get_json()
+    urls = data.get('urls')
+    if not isinstance(urls, list) or not urls: return jsonify({"error": "Missing or empty 'urls' list"}), 400
+    if not all(isinstance(url, str) and url.strip() for url in urls): return jsonify({"error": "Every entry of 'urls' must be a non-empty string"}), 400
+    urls = list(dict.fromkeys(url.strip() for url in urls)) # Drop duplicates, keep order
+    invalid_urls = [url for url in urls if not url.startswith(('http://', 'https://'))]
+    if invalid_urls: return jsonify({"error": "Invalid URLs in 'urls'", "invalid_urls": invalid_urls[:20]}), 400
+    if len(urls) > BATCH_MAX_URLS: return jsonify({"error": f"Too many URLs (max {BATCH_MAX_URLS} per job)"}), 400
 
-    platform = data.get('platform')
-    topic = data.get('topic') # Expecting topic/description from frontend
-    keywords = data.get('keywords', '') # Optional keywords string
-    language = data.get('language', 'en') # Default to English
+    try:
+        job = batch_jobs.submit(urls, data.get('language', 'en'), bool(data.get('no_cache', False)))
+    except BatchQueueFull as e:
+        return jsonify({"error": str(e)}), 429
+    log.info("API: Queued batch job %s with %d URLs", job.id, len(urls))
+    return jsonify({"job_id": job.id, "total": len(urls), "status": job.status,
+                    "status_url": url_for('batch_status_api', job_id=job.id),
+                    "results_url": url_for('batch_results_api', job_id=job.id)}), 202
 
-    if not platform: return jsonify({"error": "Missing 'platform' parameter"}), 400
-    if not topic: return jsonify({"error": "Missing 'topic' or description parameter"}), 400
+@app.route('/batch/<job_id>', methods=['GET'])
+def batch_status_api(job_id):
+    """ Progress counters of a batch job. """
+    job = batch_jobs.get(job_id)
+    if job is None: return jsonify({"error": "Unknown job id"}), 404
+    return jsonify(job.summary())
 
-    print(f"API: Received social generation request for Platform: {platform}, Topic: {topic[:50]}..., Lang: {language}")
+@app.route('/batch/<job_id>/results', methods=['GET'])
+def batch_results_api(job_id):
+    """ Streams results as NDJSON, one line per URL as it completes, until the job is done. ?offset=N resumes. """
+    job = batch_jobs.get(job_id)
+    if job is None: return jsonify({"error": "Unknown job id"}), 404
+    offset = max(request.args.get('offset', 0, type=int), 0)
 
-    # Call the updated AI handler which returns structured JSON/error dict
-    ai_results = get_social_media_ai(platform=platform, topic=topic, keywords=keywords, target_language=language)
+    def result_lines(position):
+        while True:
+            results, drained = job.results_since(position, timeout=15)
+            for result in results:
+                yield json.dumps(result, ensure_ascii=False) + "\n"
+            position += len(results)
+            if drained and position >= len(job.results):
+                return
 
-    # This error check remains valid
-    if not ai_results or ai_results.get("error"):
-        error_msg = ai_results.get("error", "Unknown error getting AI suggestions") if ai_results else "AI handler returned None or empty."
-        raw_snippet = ai_results.get("raw_response_snippet", "") if ai_results else ""
-        print(f"API Error (AI Social): {error_msg}")
-        if raw_snippet: print(f"Raw AI Response Snippet: {raw_snippet}")
-        return jsonify({"error": error_msg}), 500
+    return Response(stream_with_context(result_lines(offset)), mimetype='application/x-ndjson', headers={"Cache-Control": "no-cache"})
 
-    # ai_results is now the dictionary parsed from the AI's JSON response
-    return jsonify(ai_results)
+@app.route('/batch/<job_id>/cancel', methods=['POST'])
+def batch_cancel_api(job_id):
+    """ Cancels the job's queued URLs; URLs already running finish and are still reported. """
+    job = batch_jobs.cancel(job_id)
+    if job is None: return jsonify({"error": "Unknown job id"}), 404
+    return jsonify(job.summary())
+
+# === Site Crawl ===
+
+@app.route('/crawl', methods=['POST'])
+def crawl_api():
+    """ Crawls a whole store: {"url": ..., "max_pages": 200, "use_sitemap": true, "follow_links": true} -> NDJSON records (see crawler.py). """
+    if not request.is_json: return jsonify({"error": "Request must be JSON"}), 400
+    data = request.get_json()
+    start_url = data.get('url')
+    if not start_url or not start_url.startswith(('http://', 'https://')): return jsonify({"error": "Invalid or missing 'url'"}), 400
+    max_pages = data.get('max_pages', CRAWL_MAX_PAGES)
+    if not isinstance(max_pages, int) or not 1 <= max_pages <= CRAWL_MAX_PAGES_LIMIT:
+        return jsonify({"error": f"'max_pages' must be between 1 and {CRAWL_MAX_PAGES_LIMIT}"}), 400
+
+    records = crawl_site(start_url, max_pages, use_sitemap=bool(data.get('use_sitemap', True)),
+                         follow_links=bool(data.get('follow_links', True)), no_cache=bool(data.get('no_cache', False)))
+    try:
+        start = next(records)
+    except CrawlBusy as e:
+        return jsonify({"error": str(e)}), 429
+    log.info("API: Started crawl of %s (max %d pages)", start_url, max_pages)
+
+    def record_lines():
+        try:
+            yield json.dumps(start, ensure_ascii=False) + "\n"
+            for record in records:
+                yield json.dumps(record, ensure_ascii=False) + "\n"
+        finally:
+            records.close() # Client disconnected: stop the crawl instead of finishing it unseen
+
+    return Response(stream_with_context(record_lines()), mimetype='application/x-ndjson', headers={"Cache-Control": "no-cache"})
+
+# === Shopify Catalog ===
+
+@app.route('/shopify/catalog', methods=['POST'])
+def shopify_catalog_api():
+    """ Bulk catalog audit: {"url": ..., "kind": "products"|"collections", "max_items": N} -> NDJSON items, summary last. """
+    if not request.is_json: return jsonify({"error": "Request must be JSON"}), 400
+    data = request.get_json()
+    store_url = data.get('url')
+    if not store_url or not store_url.startswith(('http://', 'https://')): return jsonify({"error": "Invalid or missing 'url'"}), 400
+    kind = data.get('kind', 'products')
+    if kind not in CATALOG_KINDS: return jsonify({"error": f"'kind' must be one of: {', '.join(CATALOG_KINDS)}"}), 400
+    max_items = data.get('max_items')
+    if max_items is not None and (not isinstance(max_items, int) or max_items < 1):
+        return jsonify({"error": "'max_items' must be a positive integer"}), 400
+
+    log.info("API: Received Shopify catalog request for URL: %s, Kind: %s", store_url, kind)
+    records = scrape_shopify_catalog(store_url, kind, max_items)
+    first = next(records, None)
+    failure = scrape_failure(first) if first is not None else None
+    if failure: return jsonify(failure[0]), failure[1]
+
+    def record_lines():
+        aggregate = SiteAggregate()
+        count = 0
+        for item in itertools.chain([first] if first is not None else [], records):
+            if "error" in item: # A later feed page failed; what was streamed so far stands
+                yield json.dumps({"type": "error", "error": item["error"]}, ensure_ascii=False) + "\n"
+                break
+            count += 1
+            aggregate.add_page(item["url"], item)
+            yield json.dumps({"type": "item", "data": item}, ensure_ascii=False) + "\n"
+        summary = aggregate.summary()
+        summary.update(type="summary", kind=kind, items=count)
+        yield json.dumps(summary, ensure_ascii=False) + "\n"
+
+    return Response(stream_with_context(record_lines()), mimetype='application/x-ndjson', headers={"Cache-Control": "no-cache"})
+
+# === Analysis History (see analysis_store.py) ===
+
+def parse_timestamp(value):
+    """ Epoch seconds or an ISO 8601 date/datetime (naive means UTC) as epoch seconds; None if unparsable. """
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    return parsed.timestamp() if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc).timestamp()
+
+def parse_history_filters(args):
+    """ Query-string filters shared by /history and /history/export. Returns (filters, None) or (None, (error_body, status)). """
+    filters = {key: args.get(key) for key in ('kind', 'url', 'domain', 'language') if args.get(key)}
+    if filters.get('kind') and filters['kind'] not in ANALYSIS_KINDS:
+        return None, ({"error": f"'kind' must be one of: {', '.join(ANALYSIS_KINDS)}"}, 400)
+    for key in ('since', 'until'):
+        if args.get(key):
+            filters[key] = parse_timestamp(args[key])
+            if filters[key] is None: return None, ({"error": f"'{key}' must be epoch seconds or an ISO 8601 date"}, 400)
+    return filters, None
+
+@app.route('/history', methods=['GET'])
+def history_api():
+    """ Stored analyses, newest first: ?url= &domain= &kind= &language= &since= &until= &limit= &cursor= (next_cursor of the previous page). """
+    if not history_authorized(): return jsonify({"error": "Forbidden"}), 403
+    filters, invalid = parse_history_filters(request.args)
+    if invalid: return jsonify(invalid[0]), invalid[1]
+    try:
+        items, next_cursor = analysis_store.history(filters, limit=request.args.get('limit', ANALYSIS_HISTORY_PAGE_SIZE, type=int),
+                                                    cursor=request.args.get('cursor', type=int))
+    except AnalysisStoreUnavailable as e:
+        return jsonify({"error": str(e)}), 503
+    return jsonify({"items": items, "next_cursor": next_cursor})
+
+@app.route('/history/<int:analysis_id>', methods=['GET'])
+def history_item_api(analysis_id):
+    """ One stored analysis with its result; ?include_scraped=1 adds the scraped page it was generated from. """
+    if not history_authorized(): return jsonify({"error": "Forbidden"}), 403
+    try:
+        record = analysis_store.get(analysis_id, include_scraped=request.args.get('include_scraped') == '1')
+    except AnalysisStoreUnavailable as e:
+        return jsonify({"error": str(e)}), 503
+    if record is None: return jsonify({"error": "Unknown analysis id"}), 404
+    return jsonify(record)
+
+@app.route('/history/export', methods=['GET'])
+def history_export_api():
+    """ Streams every stored analysis matching the /history filters as NDJSON, newest first (?include_scraped=1 as above). """
+    if not history_authorized(): return jsonify({"error": "Forbidden"}), 403
+    filters, invalid = parse_history_filters(request.args)
+    if invalid: return jsonify(invalid[0]), invalid[1]
+    records = analysis_store.export(filters, include_scraped=request.args.get('include_scraped') == '1')
+    try:
+        first = next(records, None) # Reads the first batch, so an unavailable store is a 503 rather than an empty file
+    except AnalysisStoreUnavailable as e:
+        return jsonify({"error": str(e)}), 503
+
+    def record_lines():
+        if first is None:
+            return
+        yield json.dumps(first, ensure_ascii=False) + "\n"
+        try:
+            for record in records:
+                yield json.dumps(record, ensure_ascii=False) + "\n"
+        except AnalysisStoreUnavailable as e:
+            yield json.dumps({"error": str(e)}) + "\n" # Last line: the export stopped early
+
+    return Response(stream_with_context(record_lines()), mimetype='application/x-ndjson',
+                    headers={"Content-Disposition": "attachment; filename=analyses.ndjson"})
+
+# === Diagnostics ===
+
+@app.route('/stats', methods=['GET'])
+def stats_api():
+    """ Returns in-process cache counters for monitoring. """
+    return jsonify(collect_stats())
+
+def collect_stats():
+    return {"robots_cache": robots_cache.stats(), "politeness": politeness.stats(),
+            "scrape_cache": page_cache.stats(), "ai_cache": ai_cache.stats(), "gemini_governor": gemini_governor.stats(),
+            "single_flight": {"scrape": scrape_flight.stats(), "ai": ai_flight.stats()}, "batch": batch_jobs.stats(), "crawl": crawler.stats(),
+            "prompts": prompt_compiler.stats(), "json_repair": json_repair.stats(), "snapshots": snapshots.stats(), "analysis_store": analysis_store.stats(),
+            "logging": logging_stats(), "startup": startup.stats()}
+
+@app.route('/metrics', methods=['GET'])
+def metrics_api():
+    """ Prometheus metrics of this process: request and stage latency, errors, cache hit ratios, prompt and response sizes. """
+    body, content_type = metrics_payload()
+    return Response(body, content_type=content_type)
+
+# Cache hit ratios on /metrics, from the same counters /stats reports
+register_cache("robots", lambda: (robots_cache.hits, robots_cache.misses))
+register_cache("scrape", lambda: (page_cache.fresh_hits + page_cache.revalidated, page_cache.misses))
+register_cache("ai_response", lambda: (ai_cache.hits, ai_cache.misses))
+register_cache("snapshots", lambda: (snapshots.hits, snapshots.misses))
+register_cache("analysis_store", lambda: (analysis_store.hits, analysis_store.misses))
+
+@app.route('/admin/scrape-cache/invalidate', methods=['POST'])
+def invalidate_scrape_cache_api():
+    """ Drops cached scrapes: {"url": "..."} for one page, {"all": true} for everything. """
+    if not admin_authorized(): return jsonify({"error": "Forbidden"}), 403
+    data = request.get_json(silent=True) or {}
+    if data.get('all'):
+        page_cache.invalidate()
+        robots_cache.invalidate()
+        return jsonify({"invalidated": "all"})
+    url = data.get('url')
+    if not url: return jsonify({"error": "Provide 'url' or 'all': true"}), 400
+    page_cache.invalidate(url)
+    return jsonify({"invalidated": url})
+
+@app.route('/admin/ai-cache/invalidate', methods=['POST'])
+def invalidate_ai_cache_api():
+    """ Drops every cached AI response. """
+    if not admin_authorized(): return jsonify({"error": "Forbidden"}), 403
+    ai_cache.invalidate()
+    return jsonify({"invalidated": "all"})
+
+@app.route('/admin/snapshots/invalidate', methods=['POST'])
+def invalidate_snapshots_api():
+    """ Drops every analysis snapshot, so the next analysis of each page regenerates all sections. """
+    if not admin_authorized(): return jsonify({"error": "Forbidden"}), 403
+    snapshots.invalidate()
+    return jsonify({"invalidated": "all"})
 
 if __name__ == '__main__':
     # Set debug=False for production environments
@@ -0,0 +1,132 @@
+# Inside backend/async_scraper.py
+import random
+import asyncio
+import logging
+
+import httpx
+
+import http_client
+from robots_cache import robots_cache, robots_url, entry_allows, cache_key, ROBOTS_FETCH_TIMEOUT
+from politeness import politeness
+from page_cache import page_cache, SCRAPE_CACHE_ENABLED
+from scraper import USER_AGENTS, PageStream, SCRAPER_CHUNK_SIZE, header_charset
+from single_flight import AsyncSingleFlight
+from observability import span, count_error
+
+log = logging.getLogger(__name__)
+
+# Concurrent misses for one host share a single robots.txt download
+_robots_flight = AsyncSingleFlight("robots.txt")
+
+
+# --- Robots.txt (shared cache, non-blocking fetch) ---
+async def _fetch_robots(url, user_agent):
+    fetch_url = robots_url(url)
+    try:
+        response = await http_client.get_async_client().get(
+            fetch_url, headers={'User-Agent': user_agent},
+            timeout=httpx.Timeout(ROBOTS_FETCH_TIMEOUT, connect=http_client.HTTP_CONNECT_TIMEOUT))
+        text = response.content.decode('utf-8', errors='replace')
+        return robots_cache.store(url, response.status_code, text, response.headers.get('Cache-Control'))
+    except Exception as e:
+        log.warning("Could not read or parse robots.txt at %s: %s", fetch_url, e)
+        return robots_cache.store_unreachable(url)
+
+async def can_fetch_async(url, user_agent):
+    """can_fetch for the event loop: same cache, robots.txt downloaded without blocking."""
+    entry = robots_cache.lookup(url)
+    if entry is None:
+        entry = await _robots_flight.do(cache_key(url), _fetch_robots, url, user_agent)
+    return entry_allows(entry, url, user_agent)
+
+# --- Scraper Function ---
+async def scrape_store_data_async(url, use_cache=True):
+    """
+    scrape_store_data for the ASGI path: same result and error dicts, but the
+    politeness delay, robots.txt and page download are awaited, and parsing
+    runs in a worker thread, so a slow store never pins the event loop.
+    """
+    log.info("Starting scrape for %s", url)
+    selected_user_agent = random.choice(USER_AGENTS)
+    headers = {'User-Agent': selected_user_agent}
+
+    # 1. Check robots.txt
+    with span("robots"):
+        allowed = await can_fetch_async(url, selected_user_agent)
+    if not allowed:
+        log.warning("Scraping disallowed by robots.txt for user agent %s", selected_user_agent)
+        count_error("scrape", "robots_disallowed")
+        return {"error": "Scraping disallowed by robots.txt"}
+
+    cached = None
+    if use_cache and SCRAPE_CACHE_ENABLED:
+        with span("page_cache") as lookup:
+            cached = await asyncio.to_thread(page_cache.lookup, url)
+            lookup.set(hit=cached is not None and cached.is_fresh)
+    if cached is not None:
+        if cached.is_fresh:
+            page_cache.record_fresh_hit()
+            log.info("Scrape served from cache")
+            return cached.result
+        headers.update(cached.conditional_headers())
+
+    try:
+        with span("politeness_wait"):
+            wait = politeness.reserve(url, robots_cache.crawl_delay(url, selected_user_agent))
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+        # The fetch span ends once the headers are in; the body is read (and parsed) under "download"
+        client = http_client.get_async_client()
+        with span("fetch", url=url) as fetch:
+            response = await client.send(client.build_request('GET', url, headers=headers), stream=True)
+            fetch.set(status=response.status_code)
+        try:
+            if response.status_code == 304 and cached is not None:
+                log.info("Scrape revalidated (304 Not Modified), using cached extraction")
+                return await asyncio.to_thread(page_cache.revalidated_304, url, cached, response.headers)
+            response.raise_for_status() # Check for HTTP errors (4xx, 5xx)
+
+            if 'text/html' not in response.headers.get('Content-Type', '').lower():
+                log.warning("Content-Type is not HTML (%s)", response.headers.get('Content-Type'))
+
+            # Same decoding rules as the requests path, so both serve identical results
+            stream = PageStream(url, header_charset(response.headers))
+            with span("download") as download:
+                async for chunk in response.aiter_bytes(SCRAPER_CHUNK_SIZE):
+                    if await asyncio.to_thread(stream.feed, chunk):
+                        break
+                download.set(bytes=stream.bytes_read)
+        finally:
+            await response.aclose()
+        scraped_data = await asyncio.to_thread(stream.finish)
+
+        if SCRAPE_CACHE_ENABLED:
+            await asyncio.to_thread(page_cache.save, url, scraped_data, response.headers)
+
+        log.info("Scraping successful (enhanced data extracted)")
+        return scraped_data
+    except httpx.TimeoutException:
+        count_error("scrape", "Timeout")
+        log.error("Timeout scraping %s", url)
+        return {"error": f"Timeout scraping {url}"}
+    except httpx.HTTPStatusError as e:
+        count_error("scrape", f"HTTP {e.response.status_code}")
+        log.error("HTTP Error %s for %s", e.response.status_code, url)
+        return {"error": f"HTTP Error {e.response.status_code} for {url}"}
+    except httpx.NetworkError:
+        count_error("scrape", "ConnectionError")
+        log.error("Connection error for %s", url)
+        return {"error": f"Connection error for {url}"}
+    except httpx.HTTPError as e:
+        count_error("scrape", type(e).__name__)
+        log.error("General request error scraping %s: %s", url, e)
+        return {"error": f"Request error: {e}"}
+    except AttributeError as e:
+        count_error("scrape", "AttributeError")
+        log.error("Could not parse HTML structure (AttributeError): %s. Page structure might be unexpected.", e)
+        return {"error": f"HTML parsing error (AttributeError): {e}"}
+    except Exception as e:
+        count_error("scrape", type(e).__name__)
+        log.exception("An unexpected error occurred during scraping: %s", e)
+        return {"error": f"An unexpected error occurred: {e}"}
@@ -0,0 +1,85 @@
+# Inside backend/benchmarks/corpus.py
+"""
+Fixture corpus: Shopify-theme pages from a few KB to past SCRAPER_MAX_BYTES.
+
+Pages are generated from fixed seeds, so every run (and every machine)
+benchmarks byte-identical markup without checking megabytes of HTML into
+the repository. `python -m benchmarks.corpus DIR` writes them out for
+inspection or for serving from another tool.
+"""
+import os
+import sys
+import json
+import random
+from functools import lru_cache
+
+from benchmarks.extraction import build_page
+
+_WORDS = ["soft", "bright", "linen", "oak", "wool", "hand-made", "organic", "classic", "summer", "gift"]
+
+
+def build_product_page(variants, paragraphs, seed=0):
+    """A product template: gallery, variant picker, long description and Product/Offer JSON-LD."""
+    rng = random.Random(seed)
+    offers = [{"@type": "Offer", "sku": f"SKU-{i}", "price": f"{rng.randint(5, 500)}.00", "priceCurrency": "EUR",
+               "availability": "https://schema.org/InStock"} for i in range(variants)]
+    product = {"@context": "https://schema.org", "@type": "Product", "name": "Linen Summer Shirt",
+               "image": [f"https://cdn.shopify.com/s/files/shirt-{i}.jpg" for i in range(6)],
+               "description": "A breathable linen shirt.", "brand": {"@type": "Brand", "name": "Bench"}, "offers": offers}
+    parts = [
+        '<!DOCTYPE html><html lang="en"><head><meta charset="utf-8">',
+        '<title>Linen Summer Shirt &ndash; Bench Store</title>',
+        '<meta name="description" content="Breathable linen shirt, hand-finished in small batches. Free shipping over 50 EUR.">',
+        f'<script type="application/ld+json">{json.dumps(product)}</script>',
+        '<script type="application/ld+json">{"@context":"https://schema.org","@type":"BreadcrumbList","itemListElement":[]}</script>',
+        '</head><body><header><nav>',
+    ]
+    parts.extend(f'<a href="/collections/c{i}">Collection {i}</a>' for i in range(12))
+    parts.append('</nav></header><main id="MainContent"><div class="product__media">')
+    parts.extend(f'<img src="//cdn.shopify.com/s/files/shirt-{i}.jpg" alt="{"Linen shirt, view " + str(i) if i % 4 else ""}">'
+                 for i in range(6))
+    parts.append('</div><h1>Linen Summer Shirt</h1><select name="id">')
+    parts.extend(f'<option value="{i}">Size {i}</option>' for i in range(variants))
+    parts.append('</select><div class="product__description"><h2>Details</h2>')
+    for i in range(paragraphs):
+        if i % 5 == 0:
+            parts.append(f'<h3>Care note {i // 5}</h3>')
+        parts.append(f'<p>{" ".join(rng.choice(_WORDS) for _ in range(60))}.</p>')
+    parts.append('</div><a href="https://instagram.com/bench">Instagram</a></main>'
+                 '<footer><p>&copy; Bench Store</p></footer></body></html>')
+    return ''.join(parts)
+
+
+# name -> (builder, arguments). Ordered small to very large; the last page exceeds the default
+# SCRAPER_MAX_BYTES (3 MB), so it also exercises the truncated-download path.
+PAGES = {
+    "product-small": (build_product_page, (3, 5)),
+    "product-large": (build_product_page, (60, 400)),
+    "collection-small": (build_page, (10,)),
+    "collection-medium": (build_page, (100,)),
+    "collection-large": (build_page, (1000,)),
+    "collection-huge": (build_page, (5000,)),
+    "collection-oversize": (build_page, (8000,)),
+}
+
+
+@lru_cache(maxsize=None) # Bounded by PAGES
+def page(name):
+    """The page's markup as UTF-8 bytes."""
+    builder, arguments = PAGES[name]
+    return builder(*arguments).encode('utf-8')
+
+
+def page_names(max_bytes=None):
+    """Corpus page names, optionally only those up to max_bytes."""
+    return [name for name in PAGES if max_bytes is None or len(page(name)) <= max_bytes]
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        raise SystemExit("usage: python -m benchmarks.corpus DIR")
+    os.makedirs(sys.argv[1], exist_ok=True)
+    for name in PAGES:
+        with open(os.path.join(sys.argv[1], f"{name}.html"), 'wb') as f:
+            f.write(page(name))
+        print(f"{name:<22}{len(page(name)):>10} bytes")
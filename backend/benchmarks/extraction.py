@@ -0,0 +1,151 @@
+# Inside backend/benchmarks/extraction.py
+"""
+Extraction benchmark: single-pass extractor vs. the original BeautifulSoup path.
+
+Run from backend/:  python -m benchmarks.extraction [--repeat N]
+
+Every generated page is extracted both ways and the result dicts are compared
+before timing, so the benchmark doubles as an equivalence check.
+"""
+import argparse
+import json
+import random
+import time
+from urllib.parse import urlparse, urljoin
+
+from bs4 import BeautifulSoup
+
+from extractor import extract_page_data
+
+PAGE_URL = "https://bench-store.myshopify.com/products/sample"
+
+
+# --- Reference implementation (scrape_store_data before the extraction engine) ---
+def legacy_extract(html_text, url, parser='html.parser'):
+    soup = BeautifulSoup(html_text, parser)
+
+    title = soup.title.string.strip() if soup.title else "No Title Found"
+
+    meta_desc_tag = soup.find('meta', attrs={'name': 'description'})
+    description = meta_desc_tag['content'].strip() if meta_desc_tag and meta_desc_tag.get('content') else "No Meta Description Found"
+
+    h1_tag = soup.find('h1')
+    h1_text = h1_tag.get_text(strip=True) if h1_tag else "No H1 Found"
+
+    headings = {}
+    for i in range(1, 7):
+        heading_tags = soup.find_all(f'h{i}')
+        if heading_tags:
+            headings[f'h{i}'] = [h.get_text(strip=True) for h in heading_tags]
+
+    alt_texts = []
+    for img in soup.find_all('img', limit=10):
+        alt = img.get('alt', '').strip()
+        if alt:
+            alt_texts.append(alt)
+
+    schema_data = []
+    for script in soup.find_all('script', type='application/ld+json'):
+        try:
+            schema_data.append(json.loads(script.string))
+        except (json.JSONDecodeError, TypeError) as e:
+            print(f"Warning: Could not parse JSON-LD script: {e}")
+            print(f"Script content: {script.string[:100]}...")
+
+    internal_links = 0
+    external_links = 0
+    base_domain = urlparse(url).netloc
+    for link in soup.find_all('a', href=True):
+        parsed_href = urlparse(urljoin(url, link['href']))
+        if parsed_href.netloc == base_domain:
+            internal_links += 1
+        elif parsed_href.scheme in ['http', 'https']:
+            external_links += 1
+
+    content_source = None
+    for selector in ['main', 'article', 'div[role="main"]', 'body']:
+        content_source = soup.select_one(selector)
+        if content_source:
+            break
+
+    if content_source:
+        all_text = content_source.find_all(string=True)
+        body_text = ' '.join(t.strip() for t in all_text if t.parent.name not in ['script', 'style', 'head', 'title', 'meta', '[document]'] and t.strip())
+    else:
+        body_text = "Could not identify main content area."
+    content_snippet = ' '.join(body_text.split())[:5000]
+
+    return {
+        "url": url,
+        "title": title,
+        "meta_description": description,
+        "h1": h1_text,
+        "headings": headings,
+        "alt_texts": alt_texts,
+        "schema_data": schema_data,
+        "links": {"internal": internal_links, "external": external_links},
+        "content_snippet": content_snippet
+    }
+
+
+# --- Synthetic Shopify theme pages ---
+def build_page(products, seed=0):
+    """Builds a Shopify-like product grid page with `products` cards."""
+    rng = random.Random(seed)
+    parts = [
+        '<!DOCTYPE html><html lang="en"><head><meta charset="utf-8">',
+        '<title>\n  Bench Store &ndash; Summer Collection\n</title>',
+        '<meta name="description" content="Hand-made goods &amp; gifts, shipped worldwide.">',
+        '<style>.card{display:grid}</style>',
+        '<script type="application/ld+json">{"@context":"https://schema.org","@type":"Organization","name":"Bench"}</script>',
+        '</head><body><header><nav>',
+    ]
+    parts.extend(f'<a href="/collections/c{i}">Collection {i}</a>' for i in range(20))
+    parts.append('</nav></header><main id="MainContent"><h1>Summer <em>Collection</em></h1>')
+    for i in range(products):
+        variants = json.dumps({"@type": "Product", "name": f"Item {i}", "offers": [{"price": rng.randint(5, 500)} for _ in range(3)]})
+        parts.append(
+            f'<div class="card"><h2>Item {i}</h2><h3>Only {rng.randint(1, 9)} left</h3>'
+            f'<img src="//cdn.shopify.com/{i}.jpg" alt="{"Photo of item " + str(i) if i % 3 else ""}">'
+            f'<p>Lovingly made item number {i} &mdash; {" ".join(rng.choice(["soft", "bright", "linen", "oak", "wool"]) for _ in range(25))}.</p>'
+            f'<!-- card {i} --><a href="/products/item-{i}">View</a> <a href="https://instagram.com/p/{i}">Insta</a>'
+            f'<script type="application/ld+json">{variants}</script><script>window.card{i}=1;</script></div>'
+        )
+    parts.append('</main><footer><p>&copy; Bench Store</p></footer></body></html>')
+    return ''.join(parts)
+
+
+def _time(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(repeat=5):
+    sizes = [("small", 10), ("medium", 100), ("large", 1000), ("huge", 5000)]
+    print(f"{'page':<8}{'bytes':>11}{'bs4 (ms)':>12}{'single-pass (ms)':>18}{'speedup':>9}{'lxml (ms)':>11}{'audit (ms)':>12}")
+    for label, products in sizes:
+        html_text = build_page(products)
+        expected = legacy_extract(html_text, PAGE_URL)
+        actual = extract_page_data(html_text, PAGE_URL, parser='html.parser', audit=False) # The audit summarises instead
+        if {key: actual.get(key) for key in expected} != expected: # The extractor has since gained fields (images)
+            raise SystemExit(f"Result mismatch on {label} page")
+        legacy_time = _time(lambda: legacy_extract(html_text, PAGE_URL), repeat)
+        new_time = _time(lambda: extract_page_data(html_text, PAGE_URL, parser='html.parser', audit=False), repeat)
+        audit_time = _time(lambda: extract_page_data(html_text, PAGE_URL, parser='html.parser', audit=True), repeat)
+        try:
+            import lxml # noqa: F401 (optional backend)
+            lxml_time = f"{_time(lambda: extract_page_data(html_text, PAGE_URL, parser='lxml', audit=False), repeat) * 1000:.1f}"
+        except ImportError:
+            lxml_time = "n/a"
+        print(f"{label:<8}{len(html_text):>11}{legacy_time * 1000:>12.1f}{new_time * 1000:>18.1f}"
+              f"{legacy_time / new_time:>8.1f}x{lxml_time:>11}{audit_time * 1000:>12.1f}")
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument('--repeat', type=int, default=5)
+    run(arg_parser.parse_args().repeat)
@@ -0,0 +1,156 @@
+# Inside backend/benchmarks/fake_gemini.py
+"""
+Local stand-in for the Gemini model, behind the same interface ai_handler
+calls: generate_content(prompt, generation_config=..., safety_settings=...,
+stream=...) and generate_content_async(...).
+
+The answer is the JSON example from the prompt's own "Output Format" block,
+so every prompt (full or partial SEO report, one platform or a combined
+social answer) gets a well-formed response of the requested shape without
+any prompt-specific code here. Latency and failures are injected:
+
+    FakeGeminiModel(latency=0.8, jitter=0.2, failure_rate=0.05)
+
+Injected failures carry code 429, so the governor retries and backs off
+exactly as it would on a real quota error.
+"""
+import re
+import json
+import time
+import random
+import asyncio
+import threading
+
+from prompt_compiler import count_tokens
+
+_SHAPE_RE = re.compile(r"```json\n(.*?)\n```", re.DOTALL)
+_ELLIPSIS_RE = re.compile(r",\s*\.\.\.\s*,") # ["#tag1", ..., "#tag7"] in the example shapes
+STREAM_CHUNK_CHARS = 80
+
+
+class InjectedQuotaError(Exception):
+    """Raised for an injected failure; looks like a 429 to gemini_governor.is_retryable."""
+    code = 429
+
+
+class _Usage:
+    def __init__(self, prompt_token_count, total_token_count):
+        self.prompt_token_count = prompt_token_count
+        self.total_token_count = total_token_count
+
+
+class _Chunk:
+    def __init__(self, text, usage_metadata=None):
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+
+class FakeResponse:
+    """The attributes ai_handler reads from a generate_content() result."""
+
+    def __init__(self, text, prompt_tokens):
+        self.text = text
+        self.candidates = [text]
+        self.prompt_feedback = None
+        self.usage_metadata = _Usage(prompt_tokens, prompt_tokens + count_tokens(text))
+
+
+class _AsyncChunks:
+    def __init__(self, chunks, chunk_delay):
+        self._chunks = chunks
+        self._chunk_delay = chunk_delay
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for chunk in self._chunks:
+            await asyncio.sleep(self._chunk_delay)
+            yield chunk
+
+
+def answer_for(prompt_text):
+    """The response text: the prompt's example JSON, or a minimal object if it has none."""
+    match = _SHAPE_RE.search(prompt_text)
+    if match:
+        try:
+            return json.dumps(json.loads(_ELLIPSIS_RE.sub(",", match.group(1))), ensure_ascii=False)
+        except json.JSONDecodeError:
+            pass
+    return json.dumps({"answer": "benchmark"})
+
+
+class FakeGeminiModel:
+    """
+    latency: mean seconds per call; jitter: +/- uniform spread around it.
+    failure_rate: share of calls that raise InjectedQuotaError (after the latency).
+    stream_chunks: pieces a streamed answer is split into, spread over the latency.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, failure_rate=0.0, stream_chunks=8, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.stream_chunks = max(1, stream_chunks)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.failures = 0
+
+    def _draw(self):
+        """(delay, fail) for one call."""
+        with self._lock:
+            self.calls += 1
+            delay = max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+            fail = self._rng.random() < self.failure_rate
+            if fail:
+                self.failures += 1
+        return delay, fail
+
+    def _respond(self, prompt_text, fail):
+        if fail:
+            raise InjectedQuotaError("429 Resource has been exhausted (injected by the benchmark)")
+        return FakeResponse(answer_for(prompt_text), count_tokens(prompt_text))
+
+    def _chunks(self, response):
+        """The answer in pieces; the last one carries the usage, as in the real stream."""
+        text = response.text
+        size = max(1, -(-len(text) // self.stream_chunks))
+        chunks = [_Chunk(text[i:i + size]) for i in range(0, len(text), size)]
+        if chunks:
+            chunks[-1].usage_metadata = response.usage_metadata
+        return chunks
+
+    def generate_content(self, prompt_text, generation_config=None, safety_settings=None, stream=False):
+        delay, fail = self._draw()
+        if not stream:
+            time.sleep(delay)
+            return self._respond(prompt_text, fail)
+        time.sleep(delay / (self.stream_chunks + 1)) # Time to first chunk; failures surface here, like the real API
+        response = self._respond(prompt_text, fail)
+        return self._stream(response, delay)
+
+    def _stream(self, response, delay):
+        chunk_delay = delay / (self.stream_chunks + 1)
+        for chunk in self._chunks(response):
+            time.sleep(chunk_delay)
+            yield chunk
+
+    async def generate_content_async(self, prompt_text, generation_config=None, safety_settings=None, stream=False):
+        delay, fail = self._draw()
+        if not stream:
+            await asyncio.sleep(delay)
+            return self._respond(prompt_text, fail)
+        await asyncio.sleep(delay / (self.stream_chunks + 1))
+        response = self._respond(prompt_text, fail)
+        return _AsyncChunks(self._chunks(response), delay / (self.stream_chunks + 1))
+
+    def stats(self):
+        with self._lock:
+            return {"calls": self.calls, "injected_failures": self.failures}
+
+
+def install(fake_model):
+    """Points ai_handler at the fake model; returns the model it replaced (restore with install(previous))."""
+    import ai_handler
+    return ai_handler.set_model(fake_model)
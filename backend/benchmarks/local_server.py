@@ -0,0 +1,88 @@
+# Inside backend/benchmarks/local_server.py
+"""
+Local HTTP server for the fixture corpus, so scrape benchmarks never touch
+a real store.
+
+    with CorpusServer() as server:
+        scrape_store_data(server.url("collection-large"), use_cache=False)
+
+GET /pages/<name> serves a corpus page (any query string is ignored, which
+lets callers make every URL distinct to defeat request coalescing), and
+/robots.txt allows everything. `delay` adds a fixed time-to-first-byte.
+"""
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse
+
+from benchmarks import corpus
+
+_ROBOTS = b"User-agent: *\nAllow: /\n"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1' # Keep-alive, like a real storefront
+    disable_nagle_algorithm = True # Headers and body go out in separate writes; don't stall on delayed ACKs
+    delay = 0.0
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == '/robots.txt':
+            self._send(200, 'text/plain', _ROBOTS, cache_control='max-age=3600') # Cached by robots_cache, as in production
+            return
+        name = path[len('/pages/'):] if path.startswith('/pages/') else None
+        if name not in corpus.PAGES:
+            self._send(404, 'text/plain', b"not found")
+            return
+        if self.delay:
+            time.sleep(self.delay)
+        self._send(200, 'text/html; charset=utf-8', corpus.page(name))
+
+    def _send(self, status, content_type, body, cache_control='no-store'):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', cache_control)
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError): # The scraper stops reading oversize pages early
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass # Resets from clients that dropped a keep-alive connection mid-page; not worth a traceback
+
+
+class CorpusServer:
+    """Serves the corpus on 127.0.0.1 (an ephemeral port) from a background thread."""
+
+    def __init__(self, delay=0.0):
+        handler = type("CorpusHandler", (_Handler,), {"delay": delay})
+        self._server = _QuietServer(('127.0.0.1', 0), handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, name="corpus-server", daemon=True)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def url(self, name, tag=None):
+        """URL of a corpus page; a tag makes it unique (e.g. per request) without changing the page."""
+        return f"{self.base_url}/pages/{name}" + (f"?r={tag}" if tag is not None else "")
+
+    def __enter__(self):
+        self._thread.start()
+        for name in corpus.PAGES: # Build the pages now rather than inside the first timed request
+            corpus.page(name)
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+        return False
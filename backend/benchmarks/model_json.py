@@ -0,0 +1,68 @@
+# Inside backend/benchmarks/model_json.py
+"""
+Model JSON benchmark: json_repair.parse_model_json vs. plain json.loads.
+
+Run from backend/:  python -m benchmarks.model_json [--repeat N]
+
+Every answer case is parsed and compared with its expected object before
+timing, so the benchmark doubles as a check of the repair rules: clean JSON
+(including backticks inside strings) must parse exactly as json.loads does,
+and the damaged answers must come back as the object the model meant.
+"""
+import argparse
+import json
+import time
+
+from json_repair import parse_model_json
+
+_CLEAN = {"technical_tips": ["Wrap JSON-LD like ```<script ...>``` in the theme", "b"],
+          "meta": {"title": "Linen shirt", "description": "Breathable ```code``` text"}}
+_BODY = json.dumps(_CLEAN, indent=2)
+
+# (name, answer text, expected object, expected fixes)
+CASES = [
+    ("clean", _BODY, _CLEAN, []),
+    ("clean, backticks in strings", json.dumps({"tips": ["a ``` b", "```json"]}), {"tips": ["a ``` b", "```json"]}, []),
+    ("fenced", f"```json\n{_BODY}\n```", _CLEAN, ["code_fence"]),
+    ("fenced, prose after", f"```json\n{_BODY}\n```\nHope this helps!", _CLEAN, ["code_fence", "trailing_text"]),
+    ("prose around", f"Here is the JSON: {_BODY} Let me know.", _CLEAN, ["leading_text", "trailing_text"]),
+    ("trailing commas", '{"a": [1, 2,], "b": {"c": "d",},}', {"a": [1, 2], "b": {"c": "d"}}, ["trailing_comma"]),
+    ("truncated in a string", '```json\n{"a": "done", "b": ["one", "tw', {"a": "done", "b": ["one"]}, ["code_fence", "truncated"]),
+    ("truncated after a key", '{"a": "done", "b": {"c": 1}, "d":', {"a": "done", "b": {"c": 1}}, ["truncated"]),
+]
+
+
+def check():
+    for name, text, expected, expected_fixes in CASES:
+        parsed, fixes = parse_model_json(text)
+        if parsed != expected or fixes != expected_fixes:
+            raise SystemExit(f"Mismatch on '{name}': {parsed!r} {fixes!r}")
+        if not fixes and parsed != json.loads(text):
+            raise SystemExit(f"Clean answer '{name}' parsed differently from json.loads")
+
+
+def _time(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(repeat=200):
+    check()
+    print(f"{'case':<30}{'json.loads (us)':>17}{'parse_model_json (us)':>23}")
+    for name, text, _, _ in CASES:
+        try:
+            json.loads(text)
+            loads_time = f"{_time(lambda: json.loads(text), repeat) * 1e6:.1f}"
+        except json.JSONDecodeError:
+            loads_time = "rejects"
+        print(f"{name:<30}{loads_time:>17}{_time(lambda: parse_model_json(text), repeat) * 1e6:>23.1f}")
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument('--repeat', type=int, default=200)
+    run(arg_parser.parse_args().repeat)
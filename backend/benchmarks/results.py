@@ -0,0 +1,94 @@
+# Inside backend/benchmarks/results.py
+"""
+Benchmark result files and run-to-run comparison.
+
+A result file is one JSON document:
+  {"meta": {commit, python, platform, started_at, settings...},
+   "suites": {suite: {case: {metric: number, ...}, ...}, ...}}
+
+compare() lines up two files case by case and reports the relative change of
+every shared metric; LOWER_IS_BETTER decides which direction is a regression.
+"""
+import os
+import sys
+import json
+import time
+import platform
+import subprocess
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# Metric name suffixes where a smaller number is an improvement (latencies, sizes); anything else is a rate
+LOWER_IS_BETTER = ("_ms", "_kib", "_bytes", "errors")
+
+
+def run_metadata(settings):
+    return {
+        "commit": _git_commit(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "settings": settings,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              timeout=5, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def save(results, path=None):
+    """Writes the results; by default to benchmarks/results/<timestamp>-<commit>.json. Returns the path."""
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(RESULTS_DIR, f"{stamp}-{results['meta'].get('commit') or 'nogit'}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    return path
+
+
+def load(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _lower_is_better(metric):
+    return metric.endswith(LOWER_IS_BETTER)
+
+
+def compare(baseline, candidate, threshold=0.05):
+    """
+    Rows of (suite, case, metric, before, after, change, verdict) for every
+    metric both runs measured. change is relative (+0.10 = 10% higher);
+    verdict is "better", "worse" or "" when within the threshold.
+    """
+    rows = []
+    for suite, cases in candidate["suites"].items():
+        for case, metrics in cases.items():
+            before_metrics = baseline["suites"].get(suite, {}).get(case, {})
+            for metric, after in metrics.items():
+                before = before_metrics.get(metric)
+                if not isinstance(before, (int, float)) or not isinstance(after, (int, float)):
+                    continue
+                change = (after - before) / before if before else (0.0 if after == before else None)
+                verdict = ""
+                if change is not None and abs(change) >= threshold:
+                    improved = change < 0 if _lower_is_better(metric) else change > 0
+                    verdict = "better" if improved else "worse"
+                rows.append((suite, case, metric, before, after, change, verdict))
+    return rows
+
+
+def print_comparison(rows):
+    print(f"{'suite':<12}{'case':<26}{'metric':<22}{'before':>12}{'after':>12}{'change':>9}  verdict")
+    for suite, case, metric, before, after, change, verdict in rows:
+        change_text = f"{change:+.1%}" if change is not None else "n/a"
+        print(f"{suite:<12}{case:<26}{metric:<22}{before:>12.4g}{after:>12.4g}{change_text:>9}  {verdict}")
+    worse = sum(1 for row in rows if row[6] == "worse")
+    print(f"\n{len(rows)} metrics compared, {worse} worse, {sum(1 for row in rows if row[6] == 'better')} better")
+    return worse
@@ -0,0 +1,236 @@
+# Inside backend/benchmarks/suite.py
+"""
+Offline benchmark suite: fixture corpus on a local server, fake Gemini model.
+
+Run from backend/:
+  python -m benchmarks.suite run [--suites scrape,latency,memory] [--out FILE]
+  python -m benchmarks.suite compare BASELINE.json CANDIDATE.json
+
+Suites:
+  scrape   scrape_store_data throughput per corpus page (pages/s, MB/s, p50)
+  latency  POST /analyze-shopify and /generate-social through the Flask app
+           on a local WSGI server, p50/p90/p99 at each --concurrency level
+  memory   tracemalloc peak of one scrape and one full analysis per page
+
+Nothing leaves the machine: pages come from benchmarks.corpus, the model is
+benchmarks.fake_gemini (--gemini-latency, --gemini-jitter, --failure-rate),
+politeness delays are off and the caches live in a temporary CACHE_DIR.
+Results are written as JSON (benchmarks/results/ by default) for compare.
+"""
+import os
+import sys
+import tempfile
+
+# Settings read at import time by the modules under test: no politeness gaps towards the local
+# server, no client-side rate limit against the fake model, and caches outside the working tree
+os.environ.setdefault("POLITENESS_MIN_DELAY", "0")
+os.environ.setdefault("POLITENESS_MAX_DELAY", "0")
+os.environ.setdefault("GEMINI_RPM", "1000000")
+os.environ.setdefault("GEMINI_TPM", "1000000000")
+os.environ.setdefault("CACHE_DIR", tempfile.mkdtemp(prefix="elementopt-bench-"))
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import argparse
+import logging
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from werkzeug.serving import make_server
+
+from benchmarks import corpus, results
+from benchmarks.fake_gemini import FakeGeminiModel, install
+from benchmarks.local_server import CorpusServer
+from scraper import scrape_store_data, SCRAPER_MAX_BYTES
+
+SUITES = ("scrape", "latency", "memory")
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+def _latency_metrics(durations, errors, elapsed):
+    ordered = sorted(durations)
+    return {
+        "requests": len(durations) + errors,
+        "errors": errors,
+        "mean_ms": round(1000 * sum(ordered) / len(ordered), 2) if ordered else None,
+        "p50_ms": round(1000 * percentile(ordered, 0.50), 2) if ordered else None,
+        "p90_ms": round(1000 * percentile(ordered, 0.90), 2) if ordered else None,
+        "p99_ms": round(1000 * percentile(ordered, 0.99), 2) if ordered else None,
+        "throughput_rps": round(len(ordered) / elapsed, 2) if elapsed else None,
+    }
+
+
+# === Suites ===
+def scrape_suite(server, args):
+    """scrape_store_data over every corpus page, uncached, repeated; one case per page."""
+    cases = {}
+    for name in corpus.page_names():
+        size = len(corpus.page(name))
+        scrape_store_data(server.url(name, tag="warmup"), use_cache=False) # Pool, robots.txt and imports
+        durations = []
+        for i in range(args.repeat):
+            started = time.perf_counter()
+            scraped = scrape_store_data(server.url(name, tag=i), use_cache=False)
+            durations.append(time.perf_counter() - started)
+            if scraped.get("error"):
+                raise SystemExit(f"scrape of {name} failed: {scraped['error']}")
+        total = sum(durations)
+        read_bytes = min(size, SCRAPER_MAX_BYTES)
+        cases[name] = {
+            "page_bytes": size,
+            "truncated": int(bool(scraped.get("truncated"))),
+            "p50_ms": round(1000 * percentile(sorted(durations), 0.5), 2),
+            "mean_ms": round(1000 * total / len(durations), 2),
+            "pages_per_s": round(len(durations) / total, 2),
+            "mb_per_s": round(read_bytes * len(durations) / total / 1e6, 2),
+        }
+        _progress("scrape", name, cases[name])
+    return cases
+
+
+def _endpoint_requests(server, page):
+    """(name, path, body(tag)) for each benchmarked endpoint; no_cache so every request does the full work."""
+    return [
+        ("analyze-shopify", "/analyze-shopify",
+         lambda tag: {"url": server.url(page, tag=tag), "language": "en", "no_cache": True}),
+        ("generate-social", "/generate-social",
+         lambda tag: {"platform": "instagram", "topic": f"Linen summer shirts, batch {tag}", "keywords": "linen, summer",
+                      "no_cache": True}),
+    ]
+
+
+def latency_suite(server, args):
+    """End-to-end latency through the Flask app on a threaded local WSGI server, at each concurrency level."""
+    from app import app as flask_app
+    logging.getLogger("werkzeug").setLevel(logging.WARNING) # One access line per request would swamp the report
+    http_server = make_server('127.0.0.1', 0, flask_app, threaded=True)
+    serving = threading.Thread(target=http_server.serve_forever, name="flask-bench", daemon=True)
+    serving.start()
+    base_url = f"http://127.0.0.1:{http_server.server_port}"
+    sessions = threading.local()
+
+    def post(path, body):
+        session = getattr(sessions, "session", None)
+        if session is None:
+            session = sessions.session = requests.Session()
+        started = time.perf_counter()
+        response = session.post(base_url + path, json=body, timeout=120)
+        return time.perf_counter() - started, response.status_code == 200
+
+    cases = {}
+    try:
+        for endpoint, path, body in _endpoint_requests(server, args.page):
+            for concurrency in args.concurrency:
+                run_id = f"{endpoint}-c{concurrency}-{time.monotonic_ns()}"
+                with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                    list(pool.map(lambda i: post(path, body(f"{run_id}-warmup-{i}")), range(concurrency)))
+                    started = time.perf_counter()
+                    outcomes = list(pool.map(lambda i: post(path, body(f"{run_id}-{i}")), range(args.requests)))
+                    elapsed = time.perf_counter() - started
+                durations = [duration for duration, ok in outcomes if ok]
+                case = f"{endpoint}@c{concurrency}"
+                cases[case] = _latency_metrics(durations, len(outcomes) - len(durations), elapsed)
+                _progress("latency", case, cases[case])
+    finally:
+        http_server.shutdown()
+    return cases
+
+
+def memory_suite(server, args):
+    """Peak Python heap (tracemalloc) of one uncached scrape and one full analysis, per corpus page."""
+    from ai_handler import get_shopify_seo_ai
+    cases = {}
+    for name in corpus.page_names():
+        scrape_store_data(server.url(name, tag="warmup"), use_cache=False)
+        tracemalloc.start()
+        try:
+            scraped = scrape_store_data(server.url(name, tag="memory-scrape"), use_cache=False)
+            _, scrape_peak = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            scraped = scrape_store_data(server.url(name, tag="memory-analysis"), use_cache=False)
+            get_shopify_seo_ai(scraped, "en", bypass_cache=True)
+            _, analysis_peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        cases[name] = {"page_bytes": len(corpus.page(name)), "scrape_peak_kib": round(scrape_peak / 1024, 1),
+                       "analysis_peak_kib": round(analysis_peak / 1024, 1)}
+        _progress("memory", name, cases[name])
+    return cases
+
+
+def _progress(suite, case, metrics):
+    print(f"[{suite}] {case}: " + ", ".join(f"{key}={value}" for key, value in metrics.items()), flush=True)
+
+
+# === CLI ===
+def run(args):
+    fake_model = FakeGeminiModel(latency=args.gemini_latency, jitter=args.gemini_jitter,
+                                 failure_rate=args.failure_rate, seed=args.seed)
+    previous = install(fake_model)
+    settings = {key: value for key, value in vars(args).items() if key not in ("command", "out", "func")}
+    output = {"meta": results.run_metadata(settings), "suites": {}}
+    try:
+        with CorpusServer(delay=args.server_delay) as server:
+            for suite in args.suites:
+                output["suites"][suite] = globals()[f"{suite}_suite"](server, args)
+    finally:
+        install(previous)
+    output["meta"]["fake_gemini"] = fake_model.stats()
+    path = results.save(output, args.out)
+    print(f"\nResults written to {path}")
+
+
+def compare(args):
+    rows = results.compare(results.load(args.baseline), results.load(args.candidate), args.threshold)
+    worse = results.print_comparison(rows)
+    sys.exit(1 if worse and args.fail_on_regression else 0)
+
+
+def _csv(cast):
+    return lambda text: [cast(item) for item in text.split(",") if item]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run benchmark suites and save the results")
+    run_parser.add_argument("--suites", type=_csv(str), default=list(SUITES), help="comma-separated: " + ",".join(SUITES))
+    run_parser.add_argument("--repeat", type=int, default=10, help="scrape suite: fetches per page")
+    run_parser.add_argument("--requests", type=int, default=50, help="latency suite: requests per endpoint and level")
+    run_parser.add_argument("--concurrency", type=_csv(int), default=[1, 4, 16], help="latency suite: comma-separated levels")
+    run_parser.add_argument("--page", default="collection-medium", choices=list(corpus.PAGES), help="latency suite: page analysed")
+    run_parser.add_argument("--gemini-latency", type=float, default=0.25, help="fake model: mean seconds per call")
+    run_parser.add_argument("--gemini-jitter", type=float, default=0.05, help="fake model: +/- seconds around the mean")
+    run_parser.add_argument("--failure-rate", type=float, default=0.0, help="fake model: share of calls failing with a 429")
+    run_parser.add_argument("--server-delay", type=float, default=0.0, help="corpus server: seconds before each page")
+    run_parser.add_argument("--seed", type=int, default=1)
+    run_parser.add_argument("--out", help="result file (default: benchmarks/results/<time>-<commit>.json)")
+    run_parser.set_defaults(func=run)
+
+    compare_parser = commands.add_parser("compare", help="compare two result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("candidate")
+    compare_parser.add_argument("--threshold", type=float, default=0.05, help="relative change reported as better/worse")
+    compare_parser.add_argument("--fail-on-regression", action="store_true", help="exit 1 if any metric got worse")
+    compare_parser.set_defaults(func=compare)
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        unknown = [suite for suite in args.suites if suite not in SUITES]
+        if unknown:
+            parser.error(f"unknown suites: {', '.join(unknown)}")
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+# Inside backend/cache_store.py
+import os
+import json
+import logging
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+
+log = logging.getLogger(__name__)
+
+# --- Storage Location (override via .env) ---
+CACHE_DIR = os.getenv("CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache"))
+
+
+class _DiskTier:
+    """Bounded SQLite table shared by every worker process that points at the same file."""
+
+    TRIM_EVERY = 100 # Check the size bound every N writes
+
+    def __init__(self, path, table, max_entries):
+        self.path = path
+        self.table = table
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self._writes = 0
+
+    def _connection(self):
+        if self._conn is None or self._pid != os.getpid(): # Never reuse a connection across fork()
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {self.table} "
+                         "(key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL, accessed_at REAL NOT NULL)")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_accessed ON {self.table} (accessed_at)")
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def get(self, key):
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(f"SELECT value, stored_at FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                conn.execute(f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            return row
+
+    def set(self, key, value, stored_at):
+        with self._lock:
+            conn = self._connection()
+            conn.execute(f"INSERT OR REPLACE INTO {self.table} (key, value, stored_at, accessed_at) VALUES (?, ?, ?, ?)",
+                         (key, value, stored_at, time.time()))
+            self._writes += 1
+            if self._writes % self.TRIM_EVERY == 0:
+                self._trim(conn)
+
+    def _trim(self, conn):
+        count = conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        if count > self.max_entries:
+            conn.execute(f"DELETE FROM {self.table} WHERE key IN "
+                         f"(SELECT key FROM {self.table} ORDER BY accessed_at LIMIT ?)", (count - self.max_entries,))
+
+    def delete(self, key):
+        with self._lock:
+            self._connection().execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    def clear(self):
+        with self._lock:
+            self._connection().execute(f"DELETE FROM {self.table}")
+
+    def count(self):
+        with self._lock:
+            return self._connection().execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+
+class TieredCache:
+    """
+    Two-tier key/value cache for JSON-serialisable values.
+
+    The memory tier is an LRU bounded by entry count; the optional disk tier
+    is a bounded SQLite table so entries survive restarts and are shared by
+    worker processes. Values are stored serialised, so callers always get a
+    private copy they are free to modify. Freshness is decided by the caller
+    from the stored_at timestamp returned by get().
+    """
+
+    def __init__(self, name, max_entries=256, disk_path=None, disk_max_entries=5000):
+        self.name = name
+        self.max_entries = max_entries
+        self._memory = OrderedDict() # key -> (serialised value, stored_at)
+        self._lock = threading.Lock()
+        self._disk = _DiskTier(disk_path, name, disk_max_entries) if disk_path else None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.disk_errors = 0
+
+    def get(self, key):
+        """Returns (value, stored_at) or None."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+        if entry is None and self._disk is not None:
+            try:
+                entry = self._disk.get(key)
+            except sqlite3.Error as e:
+                self._disk_failed("read", e)
+            if entry is not None:
+                self._remember(key, entry[0], entry[1])
+                with self._lock:
+                    self.disk_hits += 1
+        if entry is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        return json.loads(entry[0]), entry[1]
+
+    def set(self, key, value, stored_at=None):
+        stored_at = time.time() if stored_at is None else stored_at
+        serialised = json.dumps(value)
+        self._remember(key, serialised, stored_at)
+        if self._disk is not None:
+            try:
+                self._disk.set(key, serialised, stored_at)
+            except sqlite3.Error as e:
+                self._disk_failed("write", e)
+
+    def _disk_failed(self, action, error):
+        log.warning("%s disk cache %s failed: %s", self.name, action, error)
+        with self._lock:
+            self.disk_errors += 1
+
+    def _remember(self, key, serialised, stored_at):
+        with self._lock:
+            self._memory[key] = (serialised, stored_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._memory.pop(key, None)
+        if self._disk is not None:
+            try:
+                self._disk.delete(key)
+            except sqlite3.Error as e:
+                self._disk_failed("delete", e)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self._disk is not None:
+            try:
+                self._disk.clear()
+            except sqlite3.Error as e:
+                self._disk_failed("clear", e)
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                "memory_entries": len(self._memory),
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "disk_errors": self.disk_errors,
+            }
+        if self._disk is not None:
+            try:
+                stats["disk_entries"] = self._disk.count()
+            except sqlite3.Error:
+                stats["disk_entries"] = None
+        return stats
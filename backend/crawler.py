@@ -0,0 +1,262 @@
+# Inside backend/crawler.py
+"""
+Multi-page site crawl for whole-store audits.
+
+crawl_site() yields one record per line of the /crawl NDJSON stream:
+  {"type": "start", "url", "max_pages", "use_sitemap", "follow_links"}  first, as soon as the crawl is admitted
+  {"type": "page", "url", "source", "status": "ok", "data": {...}}   scrape_store_data result (crawl mode)
+  {"type": "page", "url", "source", "status": "error"|"skipped", "error"}
+  {"type": "summary", ...}                                            site aggregate, always last
+"""
+import os
+import re
+import random
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlparse, urlunparse
+
+from scraper import scrape_store_data, USER_AGENTS
+from sitemap import SitemapReader, same_site
+
+# --- Crawl Settings (override via .env) ---
+CRAWL_MAX_PAGES = int(os.getenv("CRAWL_MAX_PAGES", 200)) # Default pages per crawl
+CRAWL_MAX_PAGES_LIMIT = int(os.getenv("CRAWL_MAX_PAGES_LIMIT", 2000)) # Upper bound a request may ask for
+CRAWL_MAX_FRONTIER = int(os.getenv("CRAWL_MAX_FRONTIER", 5000)) # Queued URLs; further discoveries are dropped and counted
+CRAWL_CONCURRENCY = int(os.getenv("CRAWL_CONCURRENCY", 4)) # Pages fetched at once per crawl (politeness still spaces them)
+CRAWL_MAX_ACTIVE = int(os.getenv("CRAWL_MAX_ACTIVE", 4)) # Crawls running at once in this process
+CRAWL_SAMPLE_URLS = 5 # URLs listed per duplicate title/meta group in the summary
+CRAWL_MAX_LISTED = 100 # Pages listed per issue (missing H1, missing alt, errors)
+
+# Links that never lead to an HTML page worth auditing
+_ASSET_RE = re.compile(r'\.(?:jpe?g|png|gif|webp|svg|ico|css|js|json|xml|gz|zip|pdf|mp4|webm|woff2?|ttf)$', re.IGNORECASE)
+
+_active = threading.BoundedSemaphore(CRAWL_MAX_ACTIVE)
+_stats_lock = threading.Lock()
+_stats = {"crawls": 0, "rejected": 0, "pages": 0}
+
+
+class CrawlBusy(Exception):
+    """Raised when CRAWL_MAX_ACTIVE crawls are already running."""
+
+
+def normalize_url(url):
+    """Dedup key: fragment dropped, scheme/host lowercased, default port and empty path normalised."""
+    parsed = urlparse(url)
+    netloc = parsed.netloc.lower()
+    if (parsed.scheme == 'http' and netloc.endswith(':80')) or (parsed.scheme == 'https' and netloc.endswith(':443')):
+        netloc = netloc.rsplit(':', 1)[0]
+    return urlunparse((parsed.scheme.lower(), netloc, parsed.path or '/', parsed.params, parsed.query, ''))
+
+
+class Frontier:
+    """
+    Deduplicated FIFO of URLs still to fetch, bounded at max_size.
+
+    A URL is remembered once queued, so memory is bounded by
+    max_pages + max_size however many links or sitemap entries a store has.
+    """
+
+    def __init__(self, site_url, max_size=CRAWL_MAX_FRONTIER):
+        self.site_url = site_url
+        self.max_size = max_size
+        self._queue = deque() # (url, source)
+        self._seen = set()
+        self.dropped = 0
+
+    def add(self, url, source):
+        if not same_site(url, self.site_url) or _ASSET_RE.search(urlparse(url).path):
+            return False
+        key = normalize_url(url)
+        if key in self._seen:
+            return False
+        if len(self._queue) >= self.max_size:
+            self.dropped += 1
+            return False
+        self._seen.add(key)
+        self._queue.append((key, source))
+        return True
+
+    def pop(self):
+        return self._queue.popleft()
+
+    def __len__(self):
+        return len(self._queue)
+
+
+class SiteAggregate:
+    """Site-level findings accumulated page by page (nothing kept per page but its URL)."""
+
+    def __init__(self):
+        self.pages = 0
+        self.errors = 0
+        self.skipped = 0
+        self._titles = {} # title -> [count, sample URLs]
+        self._metas = {}
+        self.missing_meta = []
+        self.missing_meta_count = 0
+        self.missing_h1 = []
+        self.missing_h1_count = 0
+        self.missing_alt = [] # {"url", "missing_alt", "images"}
+        self.images = 0
+        self.images_missing_alt = 0
+        self.truncated_pages = 0
+        self.error_pages = []
+
+    @staticmethod
+    def _group(groups, value, url):
+        group = groups.setdefault(value, [0, []])
+        group[0] += 1
+        if len(group[1]) < CRAWL_SAMPLE_URLS:
+            group[1].append(url)
+
+    @staticmethod
+    def _listed(items, item):
+        if len(items) < CRAWL_MAX_LISTED:
+            items.append(item)
+
+    def add_page(self, url, data):
+        self.pages += 1
+        self._group(self._titles, data.get("title"), url)
+        meta = data.get("meta_description")
+        if meta == "No Meta Description Found":
+            self.missing_meta_count += 1
+            self._listed(self.missing_meta, url)
+        else:
+            self._group(self._metas, meta, url)
+        if data.get("h1") == "No H1 Found":
+            self.missing_h1_count += 1
+            self._listed(self.missing_h1, url)
+        images = data.get("images", {})
+        self.images += images.get("total", 0)
+        self.images_missing_alt += images.get("missing_alt", 0)
+        if images.get("missing_alt"):
+            self._listed(self.missing_alt, {"url": url, "missing_alt": images["missing_alt"], "images": images["total"]})
+        if data.get("truncated"):
+            self.truncated_pages += 1
+
+    def add_failure(self, url, error, skipped):
+        if skipped:
+            self.skipped += 1
+        else:
+            self.errors += 1
+            self._listed(self.error_pages, {"url": url, "error": error})
+
+    @staticmethod
+    def _duplicates(groups):
+        found = [{"value": value, "count": count, "urls": urls} for value, (count, urls) in groups.items() if count > 1]
+        found.sort(key=lambda group: group["count"], reverse=True)
+        return found[:CRAWL_MAX_LISTED]
+
+    def summary(self):
+        return {
+            "pages_crawled": self.pages,
+            "pages_failed": self.errors,
+            "pages_skipped": self.skipped,
+            "truncated_pages": self.truncated_pages,
+            "duplicate_titles": self._duplicates(self._titles),
+            "duplicate_meta_descriptions": self._duplicates(self._metas),
+            "missing_meta_description": {"count": self.missing_meta_count, "urls": self.missing_meta},
+            "missing_h1": {"count": self.missing_h1_count, "urls": self.missing_h1},
+            "missing_alt_text": {"images": self.images, "missing": self.images_missing_alt, "pages": self.missing_alt},
+            "errors": self.error_pages,
+        }
+
+
+def crawl_site(start_url, max_pages=CRAWL_MAX_PAGES, use_sitemap=True, follow_links=True, no_cache=False,
+               concurrency=CRAWL_CONCURRENCY):
+    """
+    Crawls one store, yielding page records as they complete and the summary last.
+
+    The frontier is seeded with the start URL and topped up lazily from the
+    sitemap stream whenever it runs low; internal links found on crawled pages
+    are appended as they come in. Up to `concurrency` pages are fetched at once through scrape_store_data,
+    so robots.txt, the politeness delay, pooled connections and the scrape
+    cache all apply per page.
+
+    The first next() raises CrawlBusy if CRAWL_MAX_ACTIVE crawls are already
+    running, otherwise returns the start record; pull it before committing to
+    a response. Closing the generator early (client went away) stops queuing
+    new pages.
+    """
+    if not _active.acquire(blocking=False):
+        with _stats_lock:
+            _stats["rejected"] += 1
+        raise CrawlBusy(f"Too many crawls running (max {CRAWL_MAX_ACTIVE}), try again later")
+    with _stats_lock:
+        _stats["crawls"] += 1
+    frontier = Frontier(start_url)
+    frontier.add(start_url, "start")
+    sitemap = SitemapReader(start_url, random.choice(USER_AGENTS)) if use_sitemap else None
+    sitemap_urls = sitemap.urls() if sitemap else None
+    aggregate = SiteAggregate()
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="crawl")
+    in_flight = {} # future -> (url, source)
+    submitted = 0
+    try:
+        yield {"type": "start", "url": start_url, "max_pages": max_pages, "use_sitemap": use_sitemap, "follow_links": follow_links}
+        while True:
+            while submitted < max_pages and len(in_flight) < concurrency:
+                if len(frontier) < concurrency and sitemap_urls is not None:
+                    sitemap_urls = _pull_sitemap(sitemap_urls, frontier, concurrency)
+                if not frontier:
+                    break
+                url, source = frontier.pop()
+                future = executor.submit(scrape_store_data, url, not no_cache, True)
+                in_flight[future] = (url, source)
+                submitted += 1
+            if not in_flight:
+                break
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                url, source = in_flight.pop(future)
+                yield _page_record(url, source, future, aggregate, frontier if follow_links else None)
+        summary = aggregate.summary()
+        summary.update(type="summary", start_url=start_url, frontier_remaining=len(frontier),
+                       frontier_dropped=frontier.dropped, max_pages=max_pages,
+                       sitemap=sitemap.stats() if sitemap else None)
+        yield summary
+    finally:
+        for future in in_flight:
+            future.cancel()
+        executor.shutdown(wait=False)
+        if sitemap_urls is not None:
+            sitemap_urls.close() # Releases a sitemap download that was still streaming
+        _active.release()
+
+def _pull_sitemap(sitemap_urls, frontier, count):
+    """Moves up to `count` new sitemap URLs into the frontier; returns None once the sitemaps are exhausted."""
+    added = 0
+    for url in sitemap_urls:
+        if frontier.add(url, "sitemap"):
+            added += 1
+            if added >= count:
+                return sitemap_urls
+    return None
+
+def _page_record(url, source, future, aggregate, frontier):
+    try:
+        data = future.result()
+    except Exception as e:
+        data = {"error": f"An unexpected error occurred: {e}"}
+    with _stats_lock:
+        _stats["pages"] += 1
+    if "error" in data:
+        skipped = "robots.txt" in data["error"]
+        aggregate.add_failure(url, data["error"], skipped)
+        return {"type": "page", "url": url, "source": source, "status": "skipped" if skipped else "error", "error": data["error"]}
+
+    data = dict(data)
+    links = data.pop("internal_urls", [])
+    if frontier is not None:
+        for link in links:
+            frontier.add(link, "link")
+    aggregate.add_page(url, data)
+    return {"type": "page", "url": url, "source": source, "status": "ok", "data": data}
+
+
+def stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["max_active"] = CRAWL_MAX_ACTIVE
+    return stats
@@ -0,0 +1,495 @@
+# Inside backend/extractor.py
+import os
+import re
+import json
+import logging
+from html.entities import html5
+from html.parser import HTMLParser
+from urllib.parse import urlparse, urljoin, urldefrag
+
+from observability import span
+from startup import register_warmer
+from page_audit import ImageAudit, JsonLdAudit
+
+log = logging.getLogger(__name__)
+
+# --- Extraction Settings ---
+# "html.parser" reproduces BeautifulSoup(html, 'html.parser') exactly.
+# "lxml" is faster but, like BeautifulSoup's lxml builder, repairs broken markup differently.
+EXTRACTION_PARSER = os.getenv("EXTRACTION_PARSER", "html.parser")
+MAX_CONTENT_LENGTH = 5000 # Characters of cleaned content text kept
+MAX_IMAGES = 10 # Without the audit, only the first N <img> tags are inspected for alt text
+EXTRACTION_AUDIT = os.getenv("EXTRACTION_AUDIT", "1") == "1" # Every image and compact JSON-LD summaries (page_audit.py); 0 keeps the sampled output
+MAX_INTERNAL_URLS = int(os.getenv("MAX_INTERNAL_URLS", 500)) # Crawl mode: distinct internal link targets kept per page
+
+# Content containers in priority order (first <main>, else first <article>, ...)
+CONTENT_MAIN, CONTENT_ARTICLE, CONTENT_ROLE_MAIN, CONTENT_BODY = range(4)
+_EXCLUDED_TEXT_PARENTS = frozenset(['script', 'style', 'head', 'title', 'meta', '[document]'])
+_HEADING_LEVELS = frozenset(['h1', 'h2', 'h3', 'h4', 'h5', 'h6'])
+
+# Tags BeautifulSoup closes immediately (HTMLTreeBuilder.DEFAULT_EMPTY_ELEMENT_TAGS)
+_VOID_ELEMENTS = frozenset([
+    'area', 'base', 'basefont', 'bgsound', 'br', 'col', 'command', 'embed', 'frame', 'hr', 'image', 'img',
+    'input', 'isindex', 'keygen', 'link', 'menuitem', 'meta', 'nextid', 'param', 'source', 'spacer', 'track', 'wbr',
+])
+# Tags whose strings BeautifulSoup stores as Script/Stylesheet/TemplateString/Ruby* (skipped by get_text)
+_STRING_CONTAINER_TAGS = frozenset(['rt', 'rp', 'style', 'script', 'template'])
+
+# String kinds, mirroring the NavigableString subclasses BeautifulSoup would create
+_TEXT, _COMMENT, _CDATA, _DECLARATION, _DOCTYPE, _PI = range(6)
+
+_ENTITY_TO_CHARACTER = {}
+for _name, _character in sorted(html5.items()):
+    _ENTITY_TO_CHARACTER.setdefault(_name[:-1] if _name.endswith(';') else _name, _character)
+
+_DECIMAL_REFERENCE = re.compile("^([0-9]+)(.*)")
+_HEX_REFERENCE = re.compile("^([0-9a-f]+)(.*)")
+
+
+def _numeric_reference(name):
+    """Dereferences '&#NNN;' the way BeautifulSoup's html.parser builder does."""
+    base, pattern = 10, _DECIMAL_REFERENCE
+    if name[:1] in ('x', 'X'):
+        name, base, pattern = name[1:], 16, _HEX_REFERENCE
+    extra = ""
+    try:
+        number = int(name, base)
+    except ValueError:
+        match = pattern.search(name)
+        if match is None:
+            return "", name
+        number, extra = int(match.group(1), base), match.group(2)
+    if number == 0 or number > 0x10ffff or 0xd800 <= number <= 0xdfff:
+        return "\ufffd", extra
+    if 0x80 <= number <= 0x9f:
+        try:
+            return bytes([number]).decode('cp1252'), extra # Windows-1252 smart quotes etc.
+        except UnicodeDecodeError:
+            pass
+    return chr(number), extra
+
+
+class _Element:
+    """Just enough of a bs4 Tag to answer .string and route text to open elements."""
+    __slots__ = ('name', 'child_count', 'first_child', 'heading_parts', 'content_slots')
+
+    def __init__(self, name):
+        self.name = name
+        self.child_count = 0
+        self.first_child = None # A string or an _Element
+        self.heading_parts = None # Stripped text pieces while this is an open <hN>
+        self.content_slots = None # Content candidates this element is, e.g. (CONTENT_MAIN,)
+
+    def string(self):
+        """Tag.string: the single string inside this element (recursively), else None."""
+        element = self
+        while element.child_count == 1:
+            child = element.first_child
+            if not isinstance(child, _Element):
+                return child
+            element = child
+        return None
+
+
+class _ContentText:
+    """Whitespace-normalised text of one content candidate, capped at MAX_CONTENT_LENGTH."""
+    __slots__ = ('words', 'length')
+
+    def __init__(self):
+        self.words = []
+        self.length = -1 # ' '.join() length of self.words
+
+    @property
+    def full(self):
+        return self.length >= MAX_CONTENT_LENGTH
+
+    def add(self, text):
+        for word in text.split():
+            if self.length >= MAX_CONTENT_LENGTH:
+                return
+            self.words.append(word)
+            self.length += len(word) + 1
+
+    def snippet(self):
+        return ' '.join(self.words)[:MAX_CONTENT_LENGTH]
+
+
+class PageExtractor(HTMLParser):
+    """
+    Single-pass extraction engine for scrape_store_data.
+
+    Collects title, meta description, headings, image alt texts, JSON-LD,
+    link counts and the content snippet while the markup is tokenised,
+    without building a tree. Tree-dependent details (which element a string
+    belongs to, Tag.string, get_text) follow BeautifulSoup's html.parser
+    builder, so close() returns the same dict the BeautifulSoup version did.
+
+    Markup may be fed in pieces via feed(); call close() for the result.
+    With crawl=True the result also carries the page's internal link targets,
+    for the site crawler. With audit=True every image is audited and each
+    JSON-LD script is reduced to compact summaries as soon as it closes
+    (page_audit.py); audit=False returns exactly the BeautifulSoup-era dict.
+    """
+
+    def __init__(self, url, crawl=False, audit=EXTRACTION_AUDIT):
+        super().__init__(convert_charrefs=False)
+        self.url = url
+        self.crawl = crawl
+        self.image_audit = ImageAudit(url) if audit else None
+        self.json_ld_audit = JsonLdAudit() if audit else None
+        self.base_domain = urlparse(url).netloc
+        self.root = _Element('[document]')
+        self.stack = [self.root]
+        self.open_counts = {}
+        self.container_depth = 0 # Open Script/Stylesheet/Template/Ruby containers
+        self.already_closed_empty = [] # bs4: void tags auto-closed, awaiting a stray </tag>
+        self.pending_data = []
+        self.open_headings = []
+        self.open_content = [] # _ContentText of candidates currently on the stack
+
+        self.title = None # First <title> _Element
+        self.meta_description = None # content attribute of the first description meta, if found
+        self.meta_found = False
+        self.headings = {}
+        self.images_seen = 0
+        self.alt_texts = []
+        self.ld_json_scripts = [] # _Element per application/ld+json script (with the audit, only the one still open)
+        self.internal_links = 0
+        self.external_links = 0
+        self.internal_urls = {} # Crawl mode: ordered set of absolute, fragment-free internal URLs
+        self.images_missing_alt = 0 # Over all images, not just the first MAX_IMAGES (without the audit)
+        self.content = [None, None, None, None] # _ContentText per CONTENT_* slot
+
+    # --- Tree emulation ---
+    def _flush(self, kind=_TEXT):
+        if not self.pending_data:
+            return
+        text = ''.join(self.pending_data)
+        self.pending_data = []
+        parent = self.stack[-1]
+        if parent.child_count == 0:
+            parent.first_child = text
+        parent.child_count += 1
+
+        # get_text() only sees NavigableString/CData outside Script/Template/... containers
+        if self.open_headings and (kind == _CDATA or (kind == _TEXT and not self.container_depth)):
+            stripped = text.strip()
+            if stripped:
+                for element in self.open_headings:
+                    element.heading_parts.append(stripped)
+        # find_all(string=True) sees every string; the snippet skips a few parents
+        if self.open_content and parent.name not in _EXCLUDED_TEXT_PARENTS:
+            for content in self.open_content:
+                if not content.full:
+                    content.add(text)
+
+    def _push(self, element):
+        parent = self.stack[-1]
+        if parent.child_count == 0:
+            parent.first_child = element
+        parent.child_count += 1
+        self.stack.append(element)
+        self.open_counts[element.name] = self.open_counts.get(element.name, 0) + 1
+        if element.name in _STRING_CONTAINER_TAGS:
+            self.container_depth += 1
+
+    def _pop(self):
+        element = self.stack.pop()
+        self.open_counts[element.name] -= 1
+        if element.name in _STRING_CONTAINER_TAGS:
+            self.container_depth -= 1
+        if element.heading_parts is not None:
+            self.open_headings.remove(element)
+        if element.content_slots is not None:
+            for slot in element.content_slots:
+                self.open_content.remove(self.content[slot])
+        if self.json_ld_audit is not None and self.ld_json_scripts and element is self.ld_json_scripts[-1]:
+            self.ld_json_scripts.pop()
+            self.json_ld_audit.add(element.string())
+            element.first_child = None # Only the summary is kept, not the script text
+
+    def _end_element(self, name):
+        """BeautifulSoup._popToTag: pop up to the most recent open element with this name."""
+        self._flush()
+        if not self.open_counts.get(name):
+            return
+        while len(self.stack) > 1:
+            element = self.stack[-1]
+            self._pop()
+            if element.name == name:
+                break
+
+    # --- HTMLParser callbacks (same event handling as bs4's BeautifulSoupHTMLParser) ---
+    def handle_starttag(self, tag, attrs, handle_empty_element=True):
+        self._flush()
+        element = _Element(tag)
+        self._collect(element, attrs)
+        self._push(element)
+        if handle_empty_element and tag in _VOID_ELEMENTS:
+            self._end_element(tag)
+            self.already_closed_empty.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs, handle_empty_element=False)
+        self._end_element(tag)
+
+    def handle_endtag(self, tag):
+        if tag in self.already_closed_empty:
+            self.already_closed_empty.remove(tag)
+        else:
+            self._end_element(tag)
+
+    def handle_data(self, data):
+        self.pending_data.append(data)
+
+    def handle_charref(self, name):
+        character, extra = _numeric_reference(name)
+        self.pending_data.append(character + extra)
+
+    def handle_entityref(self, name):
+        self.pending_data.append(_ENTITY_TO_CHARACTER.get(name, "&%s" % name))
+
+    def _handle_special(self, data, kind):
+        self._flush()
+        self.pending_data.append(data)
+        self._flush(kind)
+
+    def handle_comment(self, data):
+        self._handle_special(data, _COMMENT)
+
+    def handle_decl(self, decl):
+        self._handle_special(decl[len("DOCTYPE "):], _DOCTYPE)
+
+    def unknown_decl(self, data):
+        if data.upper().startswith("CDATA["):
+            self._handle_special(data[len("CDATA["):], _CDATA)
+        else:
+            self._handle_special(data, _DECLARATION)
+
+    def handle_pi(self, data):
+        self._handle_special(data, _PI)
+
+    # --- Per-tag extraction ---
+    def _collect(self, element, attrs):
+        tag = element.name
+        if tag in _HEADING_LEVELS:
+            element.heading_parts = []
+            self.headings.setdefault(tag, []).append(element)
+            self.open_headings.append(element)
+            return
+        if tag == 'a':
+            href = _attribute(attrs, 'href')
+            if href is not None:
+                self._count_link(href)
+            return
+        if tag == 'img':
+            self.images_seen += 1
+            if self.image_audit is not None:
+                self.image_audit.add({key: value if value is not None else '' for key, value in attrs})
+                return
+            alt = (_attribute(attrs, 'alt') or '').strip()
+            if not alt:
+                self.images_missing_alt += 1
+            elif self.images_seen <= MAX_IMAGES: # Only include non-empty alt texts
+                self.alt_texts.append(alt)
+            return
+        if tag == 'meta':
+            if not self.meta_found and _attribute(attrs, 'name') == 'description':
+                self.meta_found = True
+                self.meta_description = _attribute(attrs, 'content')
+            return
+        if tag == 'script':
+            if _attribute(attrs, 'type') == 'application/ld+json':
+                self.ld_json_scripts.append(element)
+            return
+        if tag == 'title':
+            if self.title is None:
+                self.title = element
+            return
+        if tag == 'main':
+            self._open_content(element, CONTENT_MAIN)
+        elif tag == 'article':
+            self._open_content(element, CONTENT_ARTICLE)
+        elif tag == 'body':
+            self._open_content(element, CONTENT_BODY)
+        elif tag == 'div' and _attribute(attrs, 'role') == 'main':
+            self._open_content(element, CONTENT_ROLE_MAIN)
+
+    def _open_content(self, element, slot):
+        if self.content[slot] is not None:
+            return # Only the first matching element counts (select_one)
+        self.content[slot] = _ContentText()
+        element.content_slots = (slot,)
+        self.open_content.append(self.content[slot])
+
+    def _count_link(self, href):
+        absolute = urljoin(self.url, href) # Handle relative URLs
+        parsed_href = urlparse(absolute)
+        if parsed_href.netloc == self.base_domain:
+            self.internal_links += 1
+            if self.crawl and parsed_href.scheme in ('http', 'https') and len(self.internal_urls) < MAX_INTERNAL_URLS:
+                self.internal_urls[urldefrag(absolute)[0]] = None
+        elif parsed_href.scheme in ['http', 'https']: # Basic check for external http(s) links
+            self.external_links += 1
+
+    # --- Quotas ---
+    def quotas_filled(self):
+        """
+        True once reading more markup can no longer change the title, meta
+        description, image alt texts or content snippet: the title and meta were
+        seen, MAX_IMAGES images were inspected and the first <main> (the top
+        content priority) already holds MAX_CONTENT_LENGTH characters.
+        Headings, links and JSON-LD after this point would still be missed, and
+        so would the audit's images: its counts cover the markup read.
+        """
+        main = self.content[CONTENT_MAIN]
+        return (self.title is not None and self.title not in self.stack
+                and self.meta_found
+                and self.images_seen >= MAX_IMAGES
+                and main is not None and main.full)
+
+    def truncate(self):
+        """Marks the input as cut short: JSON-LD scripts still open at the cut are incomplete, drop them."""
+        self.ld_json_scripts = [script for script in self.ld_json_scripts if script not in self.stack]
+
+    # --- Results ---
+    def close(self):
+        """Finishes parsing and returns the scraped-data dict."""
+        super().close()
+        self._flush()
+        while len(self.stack) > 1:
+            self._pop()
+        return self.result()
+
+    def result(self):
+        # Same expressions as the original BeautifulSoup code, including its failure modes
+        title = self.title.string().strip() if self.title else "No Title Found"
+        description = self.meta_description.strip() if self.meta_found and self.meta_description else "No Meta Description Found"
+        headings = {level: [''.join(h.heading_parts) for h in found] for level, found in self.headings.items()}
+        h1_text = headings['h1'][0] if 'h1' in headings else "No H1 Found"
+        headings = {level: headings[level] for level in ('h1', 'h2', 'h3', 'h4', 'h5', 'h6') if level in headings}
+
+        schema_data = []
+        with span("extract_json_ld", scripts=len(self.ld_json_scripts)):
+            for script in (self.ld_json_scripts if self.json_ld_audit is None else ()): # The audit summarised them already
+                script_string = script.string()
+                try:
+                    schema_json = json.loads(script_string)
+                    schema_data.append(schema_json)
+                except (json.JSONDecodeError, TypeError) as e:
+                    log.warning("Could not parse JSON-LD script: %s (script content: %r...)", e, (script_string or "")[:100])
+                except Exception as e:
+                     log.warning("Unexpected error parsing JSON-LD script: %s", e)
+
+        content_snippet = "Could not identify main content area."
+        with span("extract_content"):
+            for content in self.content:
+                if content is not None:
+                    content_snippet = content.snippet()
+                    break
+
+        result = {
+            "url": self.url,
+            "title": title,
+            "meta_description": description,
+            "h1": h1_text,
+            "headings": headings, # Dict of lists h1-h6
+            "alt_texts": self.alt_texts, # List of strings
+            "schema_data": schema_data, # List of dicts
+            "links": {"internal": self.internal_links, "external": self.external_links}, # Dict
+            "content_snippet": content_snippet, # String
+            "images": {"total": self.images_seen, "missing_alt": self.images_missing_alt} # Dict, over all <img> tags
+        }
+        if self.image_audit is not None:
+            result["alt_texts"] = self.image_audit.alt_samples # Distinct, from the whole page, at most AUDIT_SAMPLES
+            result["images"] = self.image_audit.counts() # Dict, over all <img> tags, with lazy/srcset/duplicate counts
+            result["image_audit"] = self.image_audit.details() # Dict of bounded examples
+        if self.json_ld_audit is not None:
+            result["schema_data"] = self.json_ld_audit.summaries # List of compact entity summaries, at most JSON_LD_MAX_ENTITIES
+            result["schema_audit"] = self.json_ld_audit.counts() # Dict
+        if self.crawl:
+            result["internal_urls"] = list(self.internal_urls) # List of strings, at most MAX_INTERNAL_URLS
+        return result
+
+
+def _attribute(attrs, name):
+    """Attribute value as bs4 stores it: last duplicate wins, valueless attributes become ''."""
+    value = None
+    for key, attr_value in attrs:
+        if key == name:
+            value = attr_value if attr_value is not None else ''
+    return value
+
+
+class _LxmlTarget:
+    """Adapts lxml's parser-target events onto a PageExtractor."""
+
+    def __init__(self, extractor):
+        self.extractor = extractor
+
+    def start(self, tag, attrib):
+        self.extractor.handle_starttag(tag, list(attrib.items()))
+
+    def end(self, tag):
+        self.extractor.handle_endtag(tag)
+
+    def data(self, data):
+        self.extractor.handle_data(data)
+
+    def comment(self, text):
+        self.extractor.handle_comment(text)
+
+    def pi(self, target, data=None):
+        self.extractor.handle_pi(f"{target} {data}" if data else target)
+
+    def close(self):
+        extractor = self.extractor
+        extractor._flush()
+        while len(extractor.stack) > 1:
+            extractor._pop()
+        return extractor.result()
+
+
+class LxmlPageExtractor:
+    """PageExtractor driven by lxml's C tokenizer instead of html.parser (same feed/close API)."""
+
+    def __init__(self, url, crawl=False, audit=EXTRACTION_AUDIT):
+        from lxml import etree # Optional dependency
+        self.extractor = PageExtractor(url, crawl, audit)
+        self._parser = etree.HTMLParser(target=_LxmlTarget(self.extractor))
+
+    def feed(self, data):
+        self._parser.feed(data)
+
+    def close(self):
+        return self._parser.close()
+
+    def __getattr__(self, name):
+        return getattr(self.extractor, name)
+
+
+def create_extractor(url, parser=None, crawl=False, audit=EXTRACTION_AUDIT):
+    """Returns a feed()/close() extractor for the configured parser backend."""
+    parser = parser or EXTRACTION_PARSER
+    if parser == "lxml":
+        try:
+            return LxmlPageExtractor(url, crawl, audit)
+        except ImportError:
+            log.warning("EXTRACTION_PARSER=lxml but lxml is not installed, using html.parser.")
+    return PageExtractor(url, crawl, audit)
+
+
+def extract_page_data(html_text, url, parser=None, crawl=False, audit=EXTRACTION_AUDIT):
+    """Extracts the scraped-data dict from a complete HTML document in one pass."""
+    extractor = create_extractor(url, parser, crawl, audit)
+    extractor.feed(html_text)
+    return extractor.close()
+
+
+def _warm_parser():
+    """Loads the configured parser backend (lxml is imported on first use) by extracting a tiny page."""
+    extract_page_data('<html><head><title>Warm-up</title></head><body><main><h1>Warm-up</h1><img src="a.png" alt="">'
+                      '</main></body></html>', "https://warm-up.invalid/")
+
+
+register_warmer("html_parser", _warm_parser)
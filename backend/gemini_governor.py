@@ -0,0 +1,455 @@
+# Inside backend/gemini_governor.py
+import os
+import re
+import time
+import random
+import asyncio
+import logging
+import threading
+from collections import deque
+
+from prompt_compiler import count_tokens
+from observability import span, GEMINI_ATTEMPTS
+
+log = logging.getLogger(__name__)
+
+# --- Governor Settings (override via .env) ---
+GEMINI_RPM = float(os.getenv("GEMINI_RPM", 60)) # Requests per minute across the whole process
+GEMINI_TPM = float(os.getenv("GEMINI_TPM", 1000000)) # Tokens (prompt + expected output) per minute
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", 8)) # Model calls in flight at once
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", 2))
+GEMINI_BACKOFF_BASE = float(os.getenv("GEMINI_BACKOFF_BASE", 1.0)) # Seconds; doubled per attempt, fully jittered
+GEMINI_BACKOFF_MAX = float(os.getenv("GEMINI_BACKOFF_MAX", 30))
+GEMINI_MAX_WAIT = float(os.getenv("GEMINI_MAX_WAIT", 30)) # Longest one request may queue before failing fast
+GEMINI_OUTPUT_TOKENS = int(os.getenv("GEMINI_OUTPUT_TOKENS", 1024)) # Output budget reserved per call
+GEMINI_BREAKER_THRESHOLD = int(os.getenv("GEMINI_BREAKER_THRESHOLD", 5)) # Consecutive failures that open the circuit
+GEMINI_BREAKER_COOLDOWN = float(os.getenv("GEMINI_BREAKER_COOLDOWN", 30)) # Seconds the circuit stays open
+
+_RETRY_IN_RE = re.compile(r"retry (?:in|after) ([\d.]+)\s*s", re.IGNORECASE)
+_RETRY_DELAY_RE = re.compile(r"retry_delay\s*\{\s*seconds:\s*(\d+)", re.IGNORECASE)
+_RETRYABLE_NAMES = ("ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "InternalServerError",
+                    "DeadlineExceeded", "GatewayTimeout", "Timeout", "ConnectionError")
+
+
+class GovernorRejected(Exception):
+    """Raised instead of calling the model: circuit open, or the wait would exceed GEMINI_MAX_WAIT."""
+
+
+def estimate_tokens(prompt_text):
+    """Token count for the TPM budget, from the same local counter the prompt compiler budgets with."""
+    return count_tokens(prompt_text) + 1
+
+
+def is_retryable(error):
+    """Quota, overload, server and transport errors are retried (by status code or exception type); bad requests are not."""
+    code = getattr(error, 'code', None)
+    if code is None:
+        code = getattr(error, 'status_code', None)
+    if code in (429, 500, 502, 503, 504):
+        return True
+    return any(name in type(error).__name__ for name in _RETRYABLE_NAMES)
+
+
+def retry_after(error):
+    """Server-suggested delay in seconds from a Retry-After header, RetryInfo detail or message; else None."""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    value = headers.get('Retry-After') if hasattr(headers, 'get') else None
+    if value:
+        try:
+            return float(value)
+        except ValueError:
+            pass
+    for detail in getattr(error, 'details', None) or []:
+        delay = getattr(detail, 'retry_delay', None)
+        if delay is not None and hasattr(delay, 'seconds'):
+            return delay.seconds + getattr(delay, 'nanos', 0) / 1e9
+    match = _RETRY_IN_RE.search(str(error)) or _RETRY_DELAY_RE.search(str(error))
+    return float(match.group(1)) if match else None
+
+
+class TokenBucket:
+    """Per-minute budget refilled continuously; reservations may run it negative (callers then wait)."""
+
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_for(self, amount, now):
+        """Seconds until `amount` could be taken (without taking it)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.level) / self.rate)
+
+    def take(self, amount):
+        self.level -= min(amount, self.capacity)
+
+    def give_back(self, amount):
+        self.level = min(self.capacity, self.level + min(amount, self.capacity))
+
+
+class _Slots:
+    """Concurrency limit shared by threads and event-loop tasks."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.active = 0
+        self._cond = threading.Condition()
+        self._async_waiters = deque() # (loop, future)
+
+    def acquire(self, timeout):
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self.active >= self.limit:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            self.active += 1
+            return True
+
+    async def acquire_async(self, timeout):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            with self._cond:
+                if self.active < self.limit:
+                    self.active += 1
+                    return True
+                waiter = loop.create_future()
+                self._async_waiters.append((loop, waiter))
+            try:
+                await asyncio.wait_for(waiter, max(0.0, deadline - loop.time()))
+            except asyncio.TimeoutError:
+                with self._cond:
+                    self._wake_next() # Hand on a wake-up this waiter may have swallowed
+                return False
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+            self._wake_next()
+
+    def _wake_next(self):
+        while self._async_waiters:
+            loop, waiter = self._async_waiters.popleft()
+            if not waiter.done():
+                loop.call_soon_threadsafe(_set_done, waiter)
+                return
+
+
+def _set_done(waiter):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class GeminiGovernor:
+    """
+    Process-wide client-side governor for model calls.
+
+    Every call passes a circuit breaker, takes one request and its estimated
+    tokens from per-minute token buckets and holds one of a fixed number of
+    concurrency slots. Retryable failures back off with full jitter, or for
+    as long as the API's retry hint asks, and a quota error pauses every
+    caller rather than just the one that hit it. After enough consecutive
+    failures the circuit opens and calls fail fast until a single probe
+    succeeds. A call that would queue longer than max_wait is rejected.
+    """
+
+    def __init__(self, rpm=GEMINI_RPM, tpm=GEMINI_TPM, max_concurrency=GEMINI_MAX_CONCURRENCY,
+                 max_retries=GEMINI_MAX_RETRIES, max_wait=GEMINI_MAX_WAIT,
+                 breaker_threshold=GEMINI_BREAKER_THRESHOLD, breaker_cooldown=GEMINI_BREAKER_COOLDOWN):
+        self.max_retries = max_retries
+        self.max_wait = max_wait
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self._requests = TokenBucket(rpm)
+        self._tokens = TokenBucket(tpm)
+        self._slots = _Slots(max_concurrency)
+        self._lock = threading.Lock()
+        self._paused_until = 0.0 # Global pause after a quota error
+        self._consecutive_failures = 0
+        self._opened_until = 0.0
+        self._probing = False
+        # Counters
+        self.calls = 0
+        self.successes = 0
+        self.failures = 0
+        self.retries = 0
+        self.rejected = 0
+        self.throttled_seconds = 0.0
+        self.breaker_trips = 0
+
+    # --- Admission ---
+    def _admit(self, prompt_tokens, budget_end):
+        """Passes the breaker and reserves rate budget. Returns seconds to wait before calling."""
+        now = time.monotonic()
+        with self._lock:
+            if now < self._opened_until:
+                self.rejected += 1
+                GEMINI_ATTEMPTS.labels("rejected").inc()
+                raise GovernorRejected(f"Gemini circuit open for another {self._opened_until - now:.0f}s")
+            if self._consecutive_failures >= self.breaker_threshold:
+                if self._probing:
+                    self.rejected += 1
+                    GEMINI_ATTEMPTS.labels("rejected").inc()
+                    raise GovernorRejected("Gemini circuit half-open, probe in progress")
+                self._probing = True # Cooldown over: let this one call through as the probe
+            wait = max(self._paused_until - now, self._requests.wait_for(1, now),
+                       self._tokens.wait_for(prompt_tokens + GEMINI_OUTPUT_TOKENS, now))
+            if now + wait > budget_end:
+                self._probing = False
+                self.rejected += 1
+                GEMINI_ATTEMPTS.labels("rejected").inc()
+                raise GovernorRejected(f"Gemini rate limit: would queue {wait:.1f}s")
+            self._requests.take(1)
+            self._tokens.take(prompt_tokens + GEMINI_OUTPUT_TOKENS)
+            self.calls += 1
+            self.throttled_seconds += wait
+        return wait
+
+    def _succeeded(self, response, reserved_tokens):
+        used = getattr(getattr(response, 'usage_metadata', None), 'total_token_count', None)
+        GEMINI_ATTEMPTS.labels("success").inc()
+        with self._lock:
+            self.successes += 1
+            self._consecutive_failures = 0
+            self._probing = False
+            if used:
+                self._tokens.take(used - reserved_tokens) # Settle the estimate against actual usage
+
+    def _failed(self, error, attempt, budget_end):
+        """Records a failed call. Returns the backoff before the next attempt, or None to give up."""
+        backoff = self._backoff(error, attempt, budget_end)
+        GEMINI_ATTEMPTS.labels("failure" if backoff is None else "retry").inc()
+        return backoff
+
+    def _backoff(self, error, attempt, budget_end):
+        now = time.monotonic()
+        retryable = is_retryable(error)
+        hint = retry_after(error) if retryable else None
+        with self._lock:
+            self.failures += 1
+            if retryable:
+                self._consecutive_failures += 1
+            if self._probing or self._consecutive_failures >= self.breaker_threshold:
+                if retryable:
+                    self._opened_until = now + self.breaker_cooldown
+                    self.breaker_trips += 1
+                self._probing = False
+                return None
+            if hint:
+                self._paused_until = max(self._paused_until, now + hint) # Everyone waits out the quota window
+            if not retryable or attempt >= self.max_retries:
+                return None
+            backoff = random.uniform(0, min(GEMINI_BACKOFF_MAX, GEMINI_BACKOFF_BASE * 2 ** attempt))
+            backoff = max(backoff, hint * random.uniform(1.0, 1.1)) if hint else backoff
+            if now + backoff > budget_end:
+                return None
+            self.retries += 1
+            return backoff
+
+    def _queue(self, prompt_tokens, budget_end):
+        """Admits the call, waits out the rate limit and takes a concurrency slot; the reservation is returned if no slot comes free."""
+        wait = self._admit(prompt_tokens, budget_end)
+        try:
+            if wait > 0:
+                time.sleep(wait)
+            acquired = self._slots.acquire(max(0.0, budget_end - time.monotonic()))
+        except BaseException:
+            self._abandon(prompt_tokens)
+            raise
+        if not acquired:
+            self._slot_timeout(prompt_tokens)
+
+    async def _queue_async(self, prompt_tokens, budget_end):
+        wait = self._admit(prompt_tokens, budget_end)
+        try:
+            if wait > 0:
+                await asyncio.sleep(wait)
+            acquired = await self._slots.acquire_async(max(0.0, budget_end - time.monotonic()))
+        except BaseException: # Cancelled while queued
+            self._abandon(prompt_tokens)
+            raise
+        if not acquired:
+            self._slot_timeout(prompt_tokens)
+
+    def _abandon(self, prompt_tokens):
+        """Undoes _admit for a call that never reached the model: its request and tokens go back to the buckets."""
+        with self._lock:
+            self._probing = False
+            self._requests.give_back(1)
+            self._tokens.give_back(prompt_tokens + GEMINI_OUTPUT_TOKENS)
+            self.calls -= 1
+
+    # --- Calls ---
+    def call(self, fn, prompt_text):
+        """Runs fn() (a blocking model call) under the governor and returns its response."""
+        prompt_tokens = estimate_tokens(prompt_text)
+        budget_end = time.monotonic() + self.max_wait
+        attempt = 0
+        while True:
+            with span("gemini_queue", attempt=attempt):
+                self._queue(prompt_tokens, budget_end)
+            try:
+                with span("gemini_attempt", attempt=attempt):
+                    response = fn()
+            except Exception as e:
+                backoff = self._failed(e, attempt, budget_end)
+                if backoff is None:
+                    raise
+                log.warning("Gemini call failed (%s); retrying in %.1fs", e, backoff)
+            else:
+                self._succeeded(response, prompt_tokens + GEMINI_OUTPUT_TOKENS)
+                return response
+            finally:
+                self._slots.release()
+            with span("gemini_backoff", seconds=round(backoff, 2)):
+                time.sleep(backoff)
+            attempt += 1
+
+    async def call_async(self, fn, prompt_text):
+        """Awaits fn() (a coroutine function making the model call) under the governor."""
+        prompt_tokens = estimate_tokens(prompt_text)
+        budget_end = time.monotonic() + self.max_wait
+        attempt = 0
+        while True:
+            with span("gemini_queue", attempt=attempt):
+                await self._queue_async(prompt_tokens, budget_end)
+            try:
+                with span("gemini_attempt", attempt=attempt):
+                    response = await fn()
+            except Exception as e:
+                backoff = self._failed(e, attempt, budget_end)
+                if backoff is None:
+                    raise
+                log.warning("Gemini call failed (%s); retrying in %.1fs", e, backoff)
+            else:
+                self._succeeded(response, prompt_tokens + GEMINI_OUTPUT_TOKENS)
+                return response
+            finally:
+                self._slots.release()
+            with span("gemini_backoff", seconds=round(backoff, 2)):
+                await asyncio.sleep(backoff)
+            attempt += 1
+
+    def stream(self, fn, prompt_text):
+        """
+        Like call(), for a streaming response: fn() starts the stream and its
+        chunks are yielded while the concurrency slot is held. Failures before
+        the first chunk are retried; a stream that breaks later is not.
+        """
+        prompt_tokens = estimate_tokens(prompt_text)
+        budget_end = time.monotonic() + self.max_wait
+        attempt = 0
+        while True:
+            with span("gemini_queue", attempt=attempt):
+                self._queue(prompt_tokens, budget_end)
+            try:
+                with span("gemini_attempt", attempt=attempt, stream=True): # Until the first chunk
+                    response = fn()
+                    chunks = iter(response)
+                    first = next(chunks, None) # Quota and request errors surface here
+                break
+            except Exception as e:
+                self._slots.release()
+                backoff = self._failed(e, attempt, budget_end)
+                if backoff is None:
+                    raise
+                log.warning("Gemini call failed (%s); retrying in %.1fs", e, backoff)
+            with span("gemini_backoff", seconds=round(backoff, 2)):
+                time.sleep(backoff)
+            attempt += 1
+        try:
+            if first is not None:
+                yield first
+            for chunk in chunks:
+                yield chunk
+        except Exception as e:
+            self._failed(e, self.max_retries, budget_end)
+            raise
+        else:
+            self._succeeded(response, prompt_tokens + GEMINI_OUTPUT_TOKENS)
+        finally:
+            self._slots.release()
+
+    async def stream_async(self, fn, prompt_text):
+        """stream() for the event loop: fn() is a coroutine function returning an async-iterable response."""
+        prompt_tokens = estimate_tokens(prompt_text)
+        budget_end = time.monotonic() + self.max_wait
+        attempt = 0
+        while True:
+            with span("gemini_queue", attempt=attempt):
+                await self._queue_async(prompt_tokens, budget_end)
+            try:
+                with span("gemini_attempt", attempt=attempt, stream=True):
+                    response = await fn()
+                    chunks = response.__aiter__()
+                    first = await anext(chunks, None)
+                break
+            except Exception as e:
+                self._slots.release()
+                backoff = self._failed(e, attempt, budget_end)
+                if backoff is None:
+                    raise
+                log.warning("Gemini call failed (%s); retrying in %.1fs", e, backoff)
+            with span("gemini_backoff", seconds=round(backoff, 2)):
+                await asyncio.sleep(backoff)
+            attempt += 1
+        try:
+            if first is not None:
+                yield first
+            async for chunk in chunks:
+                yield chunk
+        except Exception as e:
+            self._failed(e, self.max_retries, budget_end)
+            raise
+        else:
+            self._succeeded(response, prompt_tokens + GEMINI_OUTPUT_TOKENS)
+        finally:
+            self._slots.release()
+
+    def _slot_timeout(self, prompt_tokens):
+        self._abandon(prompt_tokens)
+        with self._lock:
+            self.rejected += 1
+        GEMINI_ATTEMPTS.labels("rejected").inc()
+        raise GovernorRejected(f"Gemini concurrency limit: no free slot within {self.max_wait:.0f}s")
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            if now < self._opened_until:
+                circuit = "open"
+            elif self._consecutive_failures >= self.breaker_threshold:
+                circuit = "half_open"
+            else:
+                circuit = "closed"
+            stats = {
+                "circuit": circuit,
+                "consecutive_failures": self._consecutive_failures,
+                "breaker_trips": self.breaker_trips,
+                "paused_for": round(max(0.0, self._paused_until - now), 2),
+                "requests_available": round(self._requests.level, 2),
+                "tokens_available": round(self._tokens.level),
+                "calls": self.calls,
+                "successes": self.successes,
+                "failures": self.failures,
+                "retries": self.retries,
+                "rejected": self.rejected,
+                "throttled_seconds": round(self.throttled_seconds, 2),
+            }
+        stats["in_flight"] = self._slots.active
+        stats["max_concurrency"] = self._slots.limit
+        return stats
+
+
+# Shared by every request handled in this process
+gemini_governor = GeminiGovernor()
@@ -0,0 +1,107 @@
+# Inside backend/http_client.py
+import os
+import threading
+from http import cookiejar
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from startup import register_warmer
+
+# --- Pool Settings (override via .env) ---
+HTTP_POOL_HOSTS = int(os.getenv("HTTP_POOL_HOSTS", 50)) # Number of per-host pools kept alive
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", 10)) # Keep-alive connections per host
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", 5))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", 20))
+HTTP_ASYNC_MAX_CONNECTIONS = int(os.getenv("HTTP_ASYNC_MAX_CONNECTIONS", 500)) # Async path: open sockets across all hosts
+HTTP_ASYNC_MAX_KEEPALIVE = int(os.getenv("HTTP_ASYNC_MAX_KEEPALIVE", 100)) # Async path: idle keep-alive sockets kept
+
+DEFAULT_TIMEOUT = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+
+
+class _NoCookies(cookiejar.DefaultCookiePolicy):
+    """Never store or send cookies, so one store's session never leaks into another analysis."""
+
+    def set_ok(self, cookie, request):
+        return False
+
+    def return_ok(self, cookie, request):
+        return False
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def _build_session():
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_HOSTS, pool_maxsize=HTTP_POOL_MAXSIZE, max_retries=0)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.cookies.set_policy(_NoCookies())
+    return session
+
+
+def get_session():
+    """Returns the process-wide keep-alive session (created on first use)."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+def get(url, headers=None, timeout=DEFAULT_TIMEOUT, **kwargs):
+    """GET through the shared connection pool; same signature and exceptions as requests.get."""
+    return get_session().get(url, headers=headers, timeout=timeout, **kwargs)
+
+
+def close():
+    """Closes every pooled connection (e.g. on shutdown)."""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+# --- Async Client (ASGI serving path, see main.py) ---
+_async_client = None
+
+
+def get_async_client():
+    """
+    Returns the process-wide httpx.AsyncClient (created on first use).
+    Must be called from the serving event loop; httpx is only needed for main.py.
+    """
+    global _async_client
+    if _async_client is None or _async_client.is_closed:
+        import httpx
+        _async_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=HTTP_ASYNC_MAX_CONNECTIONS, max_keepalive_connections=HTTP_ASYNC_MAX_KEEPALIVE),
+            cookies=cookiejar.CookieJar(policy=_NoCookies()),
+            follow_redirects=True, # Same as requests
+        )
+    return _async_client
+
+
+def _forget_after_fork():
+    """A forked worker opens its own connections; the inherited ones are dropped unclosed (closing would end the parent's TLS sessions)."""
+    global _session, _session_lock, _async_client
+    _session, _session_lock, _async_client = None, threading.Lock(), None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_after_fork)
+
+register_warmer("http_session", get_session)
+
+
+async def aclose():
+    """Closes the async client's connections (ASGI shutdown)."""
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
@@ -0,0 +1,255 @@
+# Inside backend/jobs.py
+import os
+import time
+import logging
+import secrets
+import threading
+from collections import deque
+
+from politeness import host_key
+from observability import start_trace
+
+log = logging.getLogger(__name__)
+
+# --- Batch Settings (override via .env) ---
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", 8)) # URLs processed at once across all jobs
+BATCH_PER_HOST = int(os.getenv("BATCH_PER_HOST", 2)) # Concurrent scrapes of one host across all jobs
+BATCH_MAX_URLS = int(os.getenv("BATCH_MAX_URLS", 500)) # Per job
+BATCH_MAX_QUEUED = int(os.getenv("BATCH_MAX_QUEUED", 5000)) # URLs waiting across all jobs; submits beyond this are rejected
+BATCH_MAX_JOBS = int(os.getenv("BATCH_MAX_JOBS", 200)) # Finished jobs kept for status/results
+BATCH_JOB_TTL = int(os.getenv("BATCH_JOB_TTL", 3600)) # Seconds a finished job is kept
+
+QUEUED, RUNNING, COMPLETED, CANCELLED = "queued", "running", "completed", "cancelled"
+
+
+class BatchQueueFull(Exception):
+    """Raised by submit() when the job would take the queue past BATCH_MAX_QUEUED URLs."""
+
+
+class Job:
+    """One batch of URLs and the results collected so far (in completion order)."""
+
+    def __init__(self, urls, language, no_cache):
+        self.id = secrets.token_urlsafe(12)
+        self.urls = urls
+        self.language = language
+        self.no_cache = no_cache
+        self.status = QUEUED
+        self.created_at = time.time()
+        self.finished_at = None
+        self.results = []
+        self.in_progress = 0
+        self.cond = threading.Condition()
+
+    @property
+    def finished(self):
+        return self.status in (COMPLETED, CANCELLED)
+
+    def summary(self):
+        with self.cond:
+            failed = sum(1 for r in self.results if r["status"] == "error")
+            return {
+                "job_id": self.id,
+                "status": self.status,
+                "language": self.language,
+                "total": len(self.urls),
+                "done": len(self.results),
+                "succeeded": len(self.results) - failed,
+                "failed": failed,
+                "in_progress": self.in_progress,
+                "created_at": self.created_at,
+                "finished_at": self.finished_at,
+            }
+
+    @property
+    def drained(self):
+        """Finished and no URL still running (a cancelled job may still be finishing some)."""
+        return self.finished and self.in_progress == 0
+
+    def results_since(self, offset, timeout):
+        """Results from `offset` on, waiting up to `timeout` for new ones. Returns (results, drained)."""
+        with self.cond:
+            if len(self.results) <= offset and not self.drained:
+                self.cond.wait(timeout)
+            return self.results[offset:], self.drained
+
+
+class JobManager:
+    """
+    Background worker pool for batch audits.
+
+    Each URL runs two stages: scrape(url, no_cache) while holding one of the
+    host's BATCH_PER_HOST slots, then analyze(url, scraped, language, no_cache)
+    without it, so a slow model call never blocks the next page of the same
+    store. Both return (result, None) or (None, (error_body, status)). A fixed
+    set of worker threads bounds global concurrency regardless of how many
+    jobs or HTTP clients there are; the Gemini governor bounds the AI stage.
+
+    Queued URLs are kept in one FIFO per host, and hosts with queued URLs and
+    a free slot take turns in a ready queue, so picking the next URL costs the
+    same with ten queued URLs as with ten thousand.
+    """
+
+    def __init__(self, scrape, analyze, workers=BATCH_WORKERS, per_host=BATCH_PER_HOST, max_queued=BATCH_MAX_QUEUED):
+        self.scrape = scrape
+        self.analyze = analyze
+        self.workers = workers
+        self.per_host = per_host
+        self.max_queued = max_queued
+        self._jobs = {}
+        self._pending = {} # host -> deque of (job, index, url)
+        self._ready = deque() # Hosts with queued URLs and a free slot, each listed once
+        self._queued = 0
+        self._host_active = {}
+        self._cond = threading.Condition()
+        self._threads = []
+        self.busy = 0
+
+    # --- Submission ---
+    def submit(self, urls, language, no_cache=False):
+        """Queues a job; raises ValueError for an empty URL list and BatchQueueFull if its URLs do not fit in the queue."""
+        if not urls:
+            raise ValueError("A batch job needs at least one URL") # It would never complete, nor be pruned
+        job = Job(urls, language, no_cache)
+        with self._cond:
+            if self._queued + len(urls) > self.max_queued:
+                raise BatchQueueFull(f"Batch queue is full ({self._queued} URLs waiting, max {self.max_queued}); retry later")
+            self._prune()
+            self._jobs[job.id] = job
+            for index, url in enumerate(urls):
+                self._enqueue((job, index, url))
+            self._ensure_workers()
+            self._cond.notify_all()
+        return job
+
+    def _enqueue(self, task):
+        host = host_key(task[2])
+        queue = self._pending.get(host)
+        if queue is None:
+            queue = self._pending[host] = deque()
+            if self._host_active.get(host, 0) < self.per_host:
+                self._ready.append(host)
+        queue.append(task)
+        self._queued += 1
+
+    def get(self, job_id):
+        with self._cond:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """Drops the job's queued URLs; URLs already running still finish and are reported."""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            for host in list(self._pending):
+                queue = deque(task for task in self._pending[host] if task[0] is not job)
+                self._queued -= len(self._pending[host]) - len(queue)
+                if queue:
+                    self._pending[host] = queue
+                else:
+                    del self._pending[host]
+            self._ready = deque(host for host in self._ready if host in self._pending)
+        with job.cond:
+            if not job.finished:
+                job.status = CANCELLED
+                job.finished_at = time.time()
+            job.cond.notify_all()
+        return job
+
+    # --- Workers ---
+    def _ensure_workers(self):
+        self._threads = [t for t in self._threads if t.is_alive()]
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._work, name=f"batch-worker-{len(self._threads)}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _next_task(self):
+        """Pops the oldest queued URL of the next ready host (waits if no host is ready)."""
+        with self._cond:
+            while not self._ready:
+                self._cond.wait()
+            host = self._ready.popleft()
+            queue = self._pending[host]
+            job, index, url = queue.popleft()
+            self._queued -= 1
+            active = self._host_active[host] = self._host_active.get(host, 0) + 1
+            if not queue:
+                del self._pending[host]
+            elif active < self.per_host:
+                self._ready.append(host) # Back of the line: hosts take turns
+            self.busy += 1
+            return job, index, url, host
+
+    def _release_host(self, host):
+        with self._cond:
+            active = self._host_active[host] - 1
+            if active:
+                self._host_active[host] = active
+            else:
+                del self._host_active[host]
+            if host in self._pending and active == self.per_host - 1: # Was full, so not in the ready queue
+                self._ready.append(host)
+                self._cond.notify()
+
+    def _work(self):
+        while True:
+            job, index, url, host = self._next_task()
+            host_released = False
+            with job.cond:
+                if job.status == QUEUED:
+                    job.status = RUNNING
+                job.in_progress += 1
+            try:
+                with start_trace("batch-url", job=job.id, url=url): # Timings go to the log line and /metrics
+                    scraped, failure = self.scrape(url, job.no_cache)
+                    self._release_host(host)
+                    host_released = True
+                    if failure is None:
+                        result, failure = self.analyze(url, scraped, job.language, job.no_cache)
+            except Exception as e:
+                log.exception("Batch job %s: unexpected error for %s: %s", job.id, url, e)
+                result, failure = None, ({"error": f"An unexpected error occurred: {e}"}, 500)
+            finally:
+                if not host_released:
+                    self._release_host(host)
+                with self._cond:
+                    self.busy -= 1
+            self._record(job, index, url, result if failure is None else None, failure)
+
+    def _record(self, job, index, url, result, failure):
+        entry = {"url": url, "index": index}
+        if failure is None:
+            entry.update(status="ok", result=result)
+        else:
+            entry.update(status="error", error=failure[0].get("error"), http_status=failure[1])
+        with job.cond:
+            job.results.append(entry)
+            job.in_progress -= 1
+            if len(job.results) == len(job.urls) and not job.finished:
+                job.status = COMPLETED
+                job.finished_at = time.time()
+            job.cond.notify_all()
+
+    def _prune(self):
+        """Forgets expired finished jobs and keeps at most BATCH_MAX_JOBS finished ones."""
+        now = time.time()
+        finished = sorted((job for job in self._jobs.values() if job.finished), key=lambda job: job.finished_at)
+        for i, job in enumerate(finished):
+            if now - job.finished_at > BATCH_JOB_TTL or len(finished) - i > BATCH_MAX_JOBS:
+                del self._jobs[job.id]
+
+    def stats(self):
+        with self._cond:
+            return {
+                "workers": self.workers,
+                "busy": self.busy,
+                "queued_urls": self._queued,
+                "max_queued_urls": self.max_queued,
+                "queued_hosts": len(self._pending),
+                "ready_hosts": len(self._ready),
+                "active_hosts": len(self._host_active),
+                "jobs": len(self._jobs),
+                "running_jobs": sum(1 for job in self._jobs.values() if not job.finished),
+            }
@@ -0,0 +1,214 @@
+# Inside backend/json_repair.py
+"""
+Tolerant parsing of the model's JSON answers.
+
+json.loads() rejects an answer over one stray character, and before this
+module a rejected answer failed the whole request. parse_model_json()
+salvages what it can instead:
+
+- a ```json code fence that opens before the object, or prose around the
+  object, is cut away (backticks inside the JSON strings are left alone);
+- trailing commas before } or ] are dropped;
+- a truncated answer (output limit, dropped stream) is cut back to its last
+  complete value and the open strings, arrays and objects are closed. A
+  half-written value is dropped rather than kept, so the result never holds
+  text the model did not finish.
+
+schema_problems() then checks the result against the example JSON that the
+prompt showed the model (prompt_compiler.shopify_section_shape and
+social_shape). ai_handler re-requests only the sections that are missing or
+malformed, once, instead of failing the request.
+"""
+import os
+import re
+import json
+import threading
+
+from observability import MODEL_JSON
+
+# --- JSON Repair Settings (override via .env) ---
+JSON_SECTION_RETRY = os.getenv("JSON_SECTION_RETRY", "1") == "1" # Re-request (once) the sections a model answer got wrong
+
+_FENCE_OPEN_RE = re.compile(r"```[a-zA-Z]*[ \t]*\n?")
+_CLOSERS = {"{": "}", "[": "]"}
+_decoder = json.JSONDecoder()
+
+
+def strip_fences(text):
+    """
+    (body, stripped): the text after a code fence that opens before the first
+    {, without a closing fence at the very end (a truncated answer has none);
+    otherwise the text unchanged. A fence further in is part of a JSON string.
+    """
+    fence = text.find("```")
+    brace = text.find("{")
+    if fence < 0 or 0 <= brace < fence:
+        return text, False
+    body = text[_FENCE_OPEN_RE.match(text, fence).end():].rstrip()
+    return (body[:-3] if body.endswith("```") else body), True
+
+
+def _drop_trailing_comma(out):
+    index = len(out) - 1
+    while index >= 0 and out[index].isspace():
+        index -= 1
+    if index >= 0 and out[index] == ",":
+        del out[index]
+        return True
+    return False
+
+
+def repair_json(text):
+    """
+    (text, fixes) for a JSON object that json.loads() rejected: trailing
+    commas removed, anything after the top-level object dropped, and a
+    truncated document cut back to its last complete value and closed.
+    """
+    out = []
+    stack = []
+    fixes = set()
+    in_string = escaped = is_key = False
+    last = "" # Last significant character outside strings
+    checkpoint = (0, "") # (length of out, open brackets) where the document could be closed
+    for position, char in enumerate(text):
+        if in_string:
+            out.append(char)
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+                last = char
+                if not is_key:
+                    checkpoint = (len(out), "".join(stack))
+            continue
+        if char == '"':
+            in_string = True
+            is_key = bool(stack) and stack[-1] == "{" and last in ("{", ",")
+            out.append(char)
+        elif char in _CLOSERS:
+            stack.append(char)
+            out.append(char)
+            checkpoint = (len(out), "".join(stack))
+        elif char in "}]":
+            if not stack or _CLOSERS[stack[-1]] != char:
+                fixes.add("stray_bracket")
+                continue
+            if _drop_trailing_comma(out):
+                fixes.add("trailing_comma")
+            stack.pop()
+            out.append(char)
+            checkpoint = (len(out), "".join(stack))
+            if not stack:
+                if text[position + 1:].strip():
+                    fixes.add("trailing_text")
+                break
+        elif char == ",":
+            checkpoint = (len(out), "".join(stack))
+            out.append(char)
+        else:
+            out.append(char)
+        if not char.isspace():
+            last = char
+    if in_string or stack:
+        fixes.add("truncated")
+        length, still_open = checkpoint
+        del out[length:]
+        _drop_trailing_comma(out)
+        out.extend(_CLOSERS[bracket] for bracket in reversed(still_open))
+    return "".join(out), sorted(fixes)
+
+
+def parse_model_json(text):
+    """
+    (object, fixes) from a model answer; fixes is empty for clean JSON.
+    Raises json.JSONDecodeError when there is no object to salvage.
+    """
+    fixes = []
+    body, fenced = strip_fences(text)
+    if fenced:
+        fixes.append("code_fence")
+    start = body.find("{")
+    if start < 0:
+        raise json.JSONDecodeError("No JSON object in the answer", body, 0)
+    if body[:start].strip():
+        fixes.append("leading_text")
+    try:
+        parsed, end = _decoder.raw_decode(body, start)
+        if body[end:].strip():
+            fixes.append("trailing_text")
+    except json.JSONDecodeError:
+        repaired, repairs = repair_json(body[start:])
+        parsed = json.loads(repaired)
+        fixes.extend(fix for fix in repairs if fix not in fixes)
+    return parsed, fixes
+
+
+def schema_problems(value, shape, path=""):
+    """
+    Paths in value that do not match the example shape: missing keys, wrong
+    types, empty lists and empty strings. Example strings that mention null
+    may be null; list items are checked against the example's first item;
+    keys the example does not have are allowed.
+    """
+    if isinstance(shape, dict):
+        if not isinstance(value, dict):
+            return [path or "(root)"]
+        problems = []
+        for key, example in shape.items():
+            key_path = f"{path}.{key}" if path else key
+            problems.extend(schema_problems(value[key], example, key_path) if key in value else [key_path])
+        return problems
+    if isinstance(shape, list):
+        if not isinstance(value, list) or (shape and not value):
+            return [path]
+        problems = []
+        for index, item in enumerate(value if shape else ()):
+            problems.extend(schema_problems(item, shape[0], f"{path}[{index}]"))
+        return problems
+    if isinstance(shape, str):
+        if value is None and "null" in shape:
+            return []
+        return [] if isinstance(value, str) and value.strip() else [path]
+    return []
+
+
+# === Stats ===
+_stats_lock = threading.Lock()
+_stats = {"answers": 0, "clean": 0, "repaired": 0, "unparseable": 0, "invalid_sections": 0,
+          "retries": 0, "retries_recovered": 0, "fixes": {}}
+
+def _count(outcome, amount=1):
+    MODEL_JSON.labels(outcome).inc(amount)
+    _stats[outcome] += amount
+
+def record_answer(fixes):
+    """Counts one parsed answer and the fixes it needed."""
+    with _stats_lock:
+        _stats["answers"] += 1
+        _count("repaired" if fixes else "clean")
+        for fix in fixes:
+            _stats["fixes"][fix] = _stats["fixes"].get(fix, 0) + 1
+
+def record_invalid(sections):
+    """Counts sections (or platforms) of a parsed answer that failed validation."""
+    if sections:
+        with _stats_lock:
+            _count("invalid_sections", sections)
+
+def record_unparseable():
+    with _stats_lock:
+        _stats["answers"] += 1
+        _count("unparseable")
+
+def record_retry(recovered):
+    with _stats_lock:
+        _count("retries")
+        if recovered:
+            _count("retries_recovered")
+
+def stats():
+    with _stats_lock:
+        return dict(_stats, fixes=dict(_stats["fixes"]), retry_enabled=JSON_SECTION_RETRY)
+
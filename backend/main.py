@@ -0,0 +1,292 @@
+# Inside backend/main.py
+"""
+ASGI entry point:  uvicorn main:app  (run from backend/)
+
+/analyze-shopify and /generate-social (plus /generate-social/multi) are served natively on the event loop:
+scraping, politeness delays, Gemini calls and retry backoff are all awaited,
+so one process keeps hundreds of analyses in flight without a thread each.
+Every other route (pages, static files, admin) is the Flask app mounted below,
+and the JSON contract of both endpoints is identical to app.py.
+Request latency of the native routes is recorded by RequestMetricsMiddleware;
+the mounted Flask app records its own, and serves /metrics for both.
+"""
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+_imports_started = time.perf_counter() # Import time of the web stack and the app modules, see startup.py
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.routing import Mount
+from a2wsgi import WSGIMiddleware
+
+import http_client
+from app import (app as flask_app, collect_stats, parse_analyze_request, parse_social_request, parse_multi_social_request,
+                 scrape_failure, ai_failure, multi_social_failure, stored_shopify_analysis, stored_social_generation)
+from analysis_store import analysis_store
+from async_scraper import scrape_store_data_async
+from ai_handler import (get_shopify_seo_ai_async, get_social_media_ai_async, get_multi_social_media_ai_async,
+                        stream_shopify_seo_ai_async, stream_social_media_ai_async)
+from single_flight import AsyncSingleFlight, SingleFlightTimeout
+from streaming import sse, error_event, scraped_summary, traced_events_async, JsonSectionScanner, SSE_HEADERS
+from seo_rules import run_seo_rules, fast_analysis
+from observability import traced, with_trace, REQUEST_SECONDS
+import startup
+
+log = logging.getLogger(__name__)
+startup.record_import("main", _imports_started)
+
+# --- In-flight Coalescing (event-loop counterparts of the ones in app.py) ---
+scrape_flight = AsyncSingleFlight("scrape")
+ai_flight = AsyncSingleFlight("AI")
+
+
+@asynccontextmanager
+async def lifespan(_app):
+    yield
+    await http_client.aclose()
+
+
+class RequestMetricsMiddleware:
+    """ Observes elementopt_request_seconds for the native routes, until the last body chunk (streams included). """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        status = ["500"] # Stays 500 if the app fails before starting a response
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = str(message["status"])
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                self._observe(scope, status[0], started)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            self._observe(scope, status[0], started)
+            raise
+
+    @staticmethod
+    def _observe(scope, status, started):
+        route = scope.get("route")
+        if isinstance(route, Mount): # Served by Flask, which records the request itself
+            return
+        endpoint = getattr(route, "path", None) or "unmatched"
+        seconds = time.perf_counter() - started
+        REQUEST_SECONDS.labels(endpoint, scope["method"], status).observe(seconds)
+        startup.note_request(seconds)
+
+
+app = FastAPI(title="Element Opt", lifespan=lifespan)
+app.add_middleware(RequestMetricsMiddleware)
+
+
+async def _json_body(request):
+    """ The parsed JSON object, or None (Flask's request.is_json equivalent). """
+    if 'application/json' not in request.headers.get('content-type', '').lower():
+        return None
+    try:
+        data = await request.json()
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+def _error(body, status_code):
+    return JSONResponse(body, status_code=status_code)
+
+async def analyze_and_store(store_url, scraped_data, language, no_cache):
+    """ Async counterpart of app.analyze_and_store; the SQLite write runs in a worker thread. """
+    ai_results = await get_shopify_seo_ai_async(scraped_data, language, bypass_cache=no_cache)
+    await asyncio.to_thread(analysis_store.save_shopify, store_url, language, scraped_data, ai_results)
+    return ai_results
+
+async def generate_social_and_store(platform, topic, keywords, language, no_cache):
+    """ Async counterpart of app.generate_social_and_store. """
+    ai_results = await get_social_media_ai_async(platform=platform, topic=topic, keywords=keywords, target_language=language,
+                                                 bypass_cache=no_cache)
+    await asyncio.to_thread(analysis_store.save_social, platform, topic, keywords, language, ai_results)
+    return ai_results
+
+
+# === API Endpoints ===
+
+@app.post('/analyze-shopify')
+@traced("analyze-shopify")
+async def analyze_shopify_api(request: Request):
+    """ Async /analyze-shopify: same request and response contract as the Flask route. """
+    data = await _json_body(request)
+    if data is None: return _error({"error": "Request must be JSON"}, 400)
+    params, invalid = parse_analyze_request(data)
+    if invalid: return _error(*invalid)
+    store_url, language, no_cache = params["store_url"], params["language"], params["no_cache"]
+
+    log.info("API: Received Shopify analysis request for URL: %s, Language: %s, Mode: %s", store_url, language, params['mode'])
+    stored = await asyncio.to_thread(stored_shopify_analysis, params)
+    if stored: return with_trace(stored)
+    try:
+        scraped_data = await scrape_flight.do((store_url, no_cache), scrape_store_data_async, store_url, use_cache=not no_cache)
+    except SingleFlightTimeout as e:
+        log.warning("API Error (Scraper): %s", e)
+        return _error({"error": str(e)}, 504)
+    failure = scrape_failure(scraped_data)
+    if failure: return _error(*failure)
+    if params["mode"] == "fast": return with_trace(fast_analysis(scraped_data, language))
+
+    try:
+        ai_results = await ai_flight.do(("seo", store_url, language, no_cache), analyze_and_store,
+                                        store_url, scraped_data, language, no_cache)
+    except SingleFlightTimeout as e:
+        log.warning("API Error (AI Shopify): %s", e)
+        return _error({"error": str(e)}, 504)
+    failure = ai_failure(ai_results, "Shopify")
+    if failure: return _error(*failure)
+
+    return with_trace(ai_results)
+
+@app.post('/generate-social')
+@traced("generate-social")
+async def generate_social_api(request: Request):
+    """ Async /generate-social: same request and response contract as the Flask route. """
+    data = await _json_body(request)
+    if data is None: return _error({"error": "Request must be JSON"}, 400)
+    params, invalid = parse_social_request(data)
+    if invalid: return _error(*invalid)
+    platform, topic, keywords, language, no_cache = (params["platform"], params["topic"], params["keywords"],
+                                                     params["language"], params["no_cache"])
+
+    log.info("API: Received social generation request for Platform: %s, Topic: %s..., Lang: %s", platform, topic[:50], language)
+    stored = await asyncio.to_thread(stored_social_generation, params)
+    if stored: return with_trace(stored)
+    try:
+        ai_results = await ai_flight.do(("social", platform, topic, keywords, language, no_cache), generate_social_and_store,
+                                        platform, topic, keywords, language, no_cache)
+    except SingleFlightTimeout as e:
+        log.warning("API Error (AI Social): %s", e)
+        return _error({"error": str(e)}, 504)
+    failure = ai_failure(ai_results, "Social")
+    if failure: return _error(*failure)
+
+    return with_trace(ai_results)
+
+@app.post('/generate-social/multi')
+@traced("generate-social-multi")
+async def generate_multi_social_api(request: Request):
+    """ Async /generate-social/multi: the platforms run concurrently on the event loop. """
+    data = await _json_body(request)
+    if data is None: return _error({"error": "Request must be JSON"}, 400)
+    params, invalid = parse_multi_social_request(data)
+    if invalid: return _error(*invalid)
+    platforms = params["platforms"]
+    log.info("API: Received multi-platform social request for Platforms: %s, Combined: %s, Lang: %s", ', '.join(platforms), params['combined'], params['language'])
+
+    try:
+        ai_results = await ai_flight.do(("social-multi", tuple(platforms), params["combined"], params["topic"], params["keywords"],
+                                         params["language"], params["no_cache"]), get_multi_social_media_ai_async, platforms,
+                                        params["topic"], params["keywords"], params["language"], combined=params["combined"],
+                                        bypass_cache=params["no_cache"])
+    except SingleFlightTimeout as e:
+        log.warning("API Error (AI Social): %s", e)
+        return _error({"error": str(e)}, 504)
+    failure = multi_social_failure(ai_results)
+    if failure: return _error(*failure)
+
+    return with_trace(ai_results)
+
+# === Streaming API Endpoints (Server-Sent Events, see streaming.py) ===
+
+@app.post('/analyze-shopify/stream')
+async def analyze_shopify_stream_api(request: Request):
+    """ Async /analyze-shopify/stream: same events as the Flask route. """
+    data = await _json_body(request)
+    if data is None: return _error({"error": "Request must be JSON"}, 400)
+    params, invalid = parse_analyze_request(data)
+    if invalid: return _error(*invalid)
+    log.info("API: Received streamed Shopify analysis request for URL: %s, Language: %s", params['store_url'], params['language'])
+    return StreamingResponse(traced_events_async("analyze-shopify/stream", shopify_events(**params)),
+                             media_type='text/event-stream', headers=SSE_HEADERS)
+
+async def shopify_events(store_url, language, no_cache, mode, max_age_hours):
+    stored = await asyncio.to_thread(stored_shopify_analysis, {"store_url": store_url, "language": language, "no_cache": no_cache,
+                                                               "mode": mode, "max_age_hours": max_age_hours})
+    if stored:
+        yield sse("result", stored)
+        return
+    yield sse("progress", {"stage": "scraping", "message": f"Fetching {store_url}"})
+    try:
+        scraped_data = await scrape_flight.do((store_url, no_cache), scrape_store_data_async, store_url, use_cache=not no_cache)
+    except SingleFlightTimeout as e:
+        yield error_event({"error": str(e)}, 504)
+        return
+    failure = scrape_failure(scraped_data)
+    if failure:
+        yield error_event(*failure)
+        return
+
+    yield sse("checks", run_seo_rules(scraped_data, language))
+    if mode == "fast":
+        yield sse("result", fast_analysis(scraped_data, language))
+        return
+    yield sse("progress", {"stage": "generating", "message": "Page scraped, generating recommendations", "page": scraped_summary(scraped_data)})
+    ai_stream = stream_shopify_seo_ai_async(scraped_data, language, bypass_cache=no_cache)
+    async for event in ai_events(stored_results(ai_stream, analysis_store.save_shopify, store_url, language, scraped_data), "Shopify"):
+        yield event
+
+@app.post('/generate-social/stream')
+async def generate_social_stream_api(request: Request):
+    """ Async /generate-social/stream: same events as the Flask route. """
+    data = await _json_body(request)
+    if data is None: return _error({"error": "Request must be JSON"}, 400)
+    params, invalid = parse_social_request(data)
+    if invalid: return _error(*invalid)
+    log.info("API: Received streamed social generation request for Platform: %s, Lang: %s", params['platform'], params['language'])
+    return StreamingResponse(traced_events_async("generate-social/stream", social_events(**params)),
+                             media_type='text/event-stream', headers=SSE_HEADERS)
+
+async def social_events(platform, topic, keywords, language, no_cache, max_age_hours):
+    stored = await asyncio.to_thread(stored_social_generation, {"platform": platform, "topic": topic, "keywords": keywords,
+                                                                "language": language, "no_cache": no_cache, "max_age_hours": max_age_hours})
+    if stored:
+        yield sse("result", stored)
+        return
+    yield sse("progress", {"stage": "generating", "message": f"Generating {platform} ideas"})
+    ai_stream = stream_social_media_ai_async(platform, topic, keywords, language, bypass_cache=no_cache)
+    async for event in ai_events(stored_results(ai_stream, analysis_store.save_social, platform, topic, keywords, language), "Social"):
+        yield event
+
+async def stored_results(ai_stream, save, *args):
+    """ Async counterpart of app.stored_results: save(*args, result) runs in a worker thread. """
+    async for kind, value in ai_stream:
+        if kind == "result": await asyncio.to_thread(save, *args, value)
+        yield kind, value
+
+async def ai_events(ai_stream, label):
+    scanner = JsonSectionScanner()
+    async for kind, value in ai_stream:
+        if kind == "chunk":
+            yield sse("chunk", {"text": value})
+            for key, section in scanner.feed(value):
+                yield sse("section", {"key": key, "value": section})
+            continue
+        failure = ai_failure(value, label)
+        yield error_event(*failure) if failure else sse("result", value)
+
+# === Diagnostics ===
+
+@app.get('/stats')
+async def stats_api():
+    """ Flask /stats plus the event loop's single-flight counters. """
+    stats = collect_stats()
+    stats["async_single_flight"] = {"scrape": scrape_flight.stats(), "ai": ai_flight.stats()}
+    return stats
+
+
+# Everything else (pages, static files, admin endpoints) is served by the Flask app
+app.mount("/", WSGIMiddleware(flask_app))
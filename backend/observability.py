@@ -0,0 +1,367 @@
+# Inside backend/observability.py
+"""
+Tracing, metrics and logging shared by the whole backend.
+
+- Traces: start_trace() opens a per-request trace held in a contextvar, and
+  span("stage") times one step of the pipeline into it. The context follows
+  the request into awaited coroutines and asyncio.to_thread; executor threads
+  get it through in_context(). Outside a trace, spans still feed the metrics.
+- Metrics: Prometheus histograms and counters, served by the /metrics route.
+  Cache hit ratios are read from the caches' own counters at scrape time.
+- Logging: records are handed to a background thread through a bounded queue,
+  so a slow stdout never holds up a request. When the queue is full, records
+  are dropped and counted. LOG_FORMAT=json prints one JSON object per line,
+  carrying the trace id.
+"""
+import os
+import sys
+import json
+import time
+import queue
+import atexit
+import secrets
+import logging
+import threading
+import contextvars
+import functools
+import inspect
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener
+
+from prometheus_client import Counter, Gauge, Histogram, REGISTRY, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+# --- Observability Settings (override via .env) ---
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text") # "text" or "json"
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000)) # Records waiting for the writer thread; beyond this they are dropped
+TRACE_IN_RESPONSE = os.getenv("TRACE_IN_RESPONSE", "1") == "1" # Attach the trace to analysis responses
+TRACE_MAX_SPANS = int(os.getenv("TRACE_MAX_SPANS", 200)) # Per trace; a crawl-sized request can't grow one without bound
+
+METRICS_CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+# === Metrics ===
+_LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+_TOKEN_BUCKETS = (50, 100, 250, 500, 1000, 1500, 2000, 3000, 5000, 10000)
+_SIZE_BUCKETS = (1e3, 1e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 2e6, 5e6)
+
+REQUEST_SECONDS = Histogram("elementopt_request_seconds", "HTTP request duration, until the response (or stream) is finished",
+                            ["endpoint", "method", "status"], buckets=_LATENCY_BUCKETS)
+STAGE_SECONDS = Histogram("elementopt_stage_seconds", "Duration of one pipeline stage (robots, fetch, parse, prompt, gemini, ...)",
+                          ["stage"], buckets=_LATENCY_BUCKETS)
+ERRORS = Counter("elementopt_errors", "Errors by stage and exception class (or error kind)", ["stage", "error_class"])
+PROMPT_TOKENS = Histogram("elementopt_prompt_tokens", "Compiled prompt size in tokens", ["prompt"], buckets=_TOKEN_BUCKETS)
+RESPONSE_CHARS = Histogram("elementopt_response_chars", "Model response size in characters", ["kind"], buckets=_SIZE_BUCKETS)
+PAGE_BYTES = Histogram("elementopt_page_bytes", "Downloaded page size in bytes", buckets=_SIZE_BUCKETS)
+GEMINI_ATTEMPTS = Counter("elementopt_gemini_attempts", "Model call attempts by outcome (success, retry, failure)", ["outcome"])
+MODEL_JSON = Counter("elementopt_model_json", "Model JSON answers by outcome (clean, repaired, unparseable), invalid sections and re-requests",
+                     ["outcome"])
+STARTUP_SECONDS = Gauge("elementopt_startup_seconds", "Cold-start timings of this worker: imports, lazy resources, warm-up, first request",
+                        ["phase"])
+
+
+class _CacheCollector:
+    """Exports hit/miss counters and hit ratios of the in-process caches at scrape time."""
+
+    def __init__(self):
+        self._sources = {} # name -> callable returning (hits, misses)
+
+    def register(self, name, source):
+        self._sources[name] = source
+
+    def collect(self):
+        hits = CounterMetricFamily("elementopt_cache_hits", "Cache hits", labels=["cache"])
+        misses = CounterMetricFamily("elementopt_cache_misses", "Cache misses", labels=["cache"])
+        ratio = GaugeMetricFamily("elementopt_cache_hit_ratio", "Hits / lookups since start", labels=["cache"])
+        for name, source in list(self._sources.items()):
+            try:
+                cache_hits, cache_misses = source()
+            except Exception:
+                continue
+            hits.add_metric([name], cache_hits)
+            misses.add_metric([name], cache_misses)
+            lookups = cache_hits + cache_misses
+            ratio.add_metric([name], cache_hits / lookups if lookups else 0.0)
+        yield hits
+        yield misses
+        yield ratio
+
+_cache_collector = _CacheCollector()
+REGISTRY.register(_cache_collector)
+
+
+def register_cache(name, source):
+    """Adds a cache to /metrics; source() returns its (hits, misses) counters."""
+    _cache_collector.register(name, source)
+
+
+def metrics_payload():
+    """(body, content type) for the /metrics route."""
+    return generate_latest(REGISTRY), METRICS_CONTENT_TYPE
+
+
+def count_error(stage, error_class):
+    ERRORS.labels(stage, error_class).inc()
+
+
+# === Tracing ===
+_current_trace = contextvars.ContextVar("trace", default=None)
+_current_span = contextvars.ContextVar("span", default=None)
+
+
+class Trace:
+    """Timed spans of one request. Spans may be added from several threads."""
+
+    def __init__(self, name, attrs):
+        self.id = secrets.token_hex(8)
+        self.name = name
+        self.attrs = attrs
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self.duration = None
+        self.spans = []
+        self.dropped = 0
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def _add(self, name, started, duration, parent, attrs, error):
+        with self._lock:
+            self._next_id += 1
+            span_id = self._next_id
+            if len(self.spans) >= TRACE_MAX_SPANS:
+                self.dropped += 1
+                return span_id
+            record = {"id": span_id, "name": name, "start_ms": round((started - self._started) * 1000, 2),
+                      "duration_ms": round(duration * 1000, 2)}
+            if parent is not None:
+                record["parent"] = parent
+            if attrs:
+                record["attrs"] = attrs
+            if error:
+                record["error"] = error
+            self.spans.append(record)
+            return span_id
+
+    def _reserve(self):
+        with self._lock:
+            self._next_id += 1
+            return self._next_id
+
+    def to_dict(self):
+        duration = self.duration if self.duration is not None else time.perf_counter() - self._started
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span["start_ms"])
+        trace = {"trace_id": self.id, "name": self.name, "duration_ms": round(duration * 1000, 2), "spans": spans}
+        if self.attrs:
+            trace["attrs"] = self.attrs
+        if self.dropped:
+            trace["dropped_spans"] = self.dropped
+        return trace
+
+    def stage_totals(self):
+        """Milliseconds per stage name, for the one-line summary logged when the trace ends."""
+        totals = {}
+        with self._lock:
+            for span in self.spans:
+                totals[span["name"]] = round(totals.get(span["name"], 0) + span["duration_ms"], 2)
+        return totals
+
+
+def current_trace():
+    return _current_trace.get()
+
+def trace_id():
+    trace = _current_trace.get()
+    return trace.id if trace is not None else None
+
+
+@contextmanager
+def start_trace(name, **attrs):
+    """Opens a trace for the current request (context); logs its stage totals when it ends."""
+    trace = Trace(name, attrs)
+    trace_token = _current_trace.set(trace)
+    span_token = _current_span.set(None)
+    try:
+        yield trace
+    finally:
+        trace.duration = time.perf_counter() - trace._started
+        try:
+            _current_span.reset(span_token)
+            _current_trace.reset(trace_token)
+        except ValueError: # Ended from another context (a generator closed elsewhere)
+            _current_span.set(None)
+            _current_trace.set(None)
+        logging.getLogger("trace").info("Trace finished", extra={"fields": {
+            "trace_id": trace.id, "trace": name, "duration_ms": round(trace.duration * 1000, 2), "stages": trace.stage_totals()}})
+
+
+class span:
+    """
+    Times one stage: `with span("fetch", url=url) as s: ...; s.set(status=200)`.
+
+    Always observed in elementopt_stage_seconds; recorded in the current trace
+    if there is one. An exception leaving the block is counted in
+    elementopt_errors_total and noted on the span, then re-raised.
+    """
+    __slots__ = ("name", "attrs", "_trace", "_id", "_parent", "_token", "_started")
+
+    def __init__(self, name, **attrs):
+        self.name = name
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self._trace = _current_trace.get()
+        self._parent = _current_span.get()
+        self._id = self._trace._reserve() if self._trace is not None else None
+        self._token = _current_span.set(self._id)
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self._started
+        try:
+            _current_span.reset(self._token)
+        except ValueError:
+            _current_span.set(self._parent)
+        error = exc_type.__name__ if exc_type is not None and not issubclass(exc_type, GeneratorExit) else None
+        STAGE_SECONDS.labels(self.name).observe(duration)
+        if error:
+            ERRORS.labels(self.name, error).inc()
+        if self._trace is not None:
+            self._trace._add(self.name, self._started, duration, self._parent, self.attrs, error)
+        return False
+
+
+def record_span(name, seconds, **attrs):
+    """Records a stage measured elsewhere (e.g. parse time summed over download chunks) as one span ending now."""
+    STAGE_SECONDS.labels(name).observe(seconds)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace._add(name, time.perf_counter() - seconds, seconds, _current_span.get(), attrs, None)
+
+
+def in_context(fn):
+    """Wraps fn to run in a copy of the current context: executor threads then add to the caller's trace."""
+    context = contextvars.copy_context()
+    return functools.partial(context.run, fn)
+
+
+def traced(name):
+    """Decorator: runs a view (sync or async) inside a trace named `name`."""
+    def decorate(view):
+        if inspect.iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def async_wrapper(*args, **kwargs):
+                with start_trace(name):
+                    return await view(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            with start_trace(name):
+                return view(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def with_trace(result):
+    """
+    The result dict plus the current trace (TRACE_IN_RESPONSE). A shallow copy:
+    the result may be shared with coalesced requests or held by a cache.
+    """
+    trace = _current_trace.get()
+    if TRACE_IN_RESPONSE and trace is not None and isinstance(result, dict):
+        return dict(result, trace=trace.to_dict())
+    return result
+
+
+# === Logging ===
+class _TraceFilter(logging.Filter):
+    """Stamps records with the trace id on the calling thread, before they cross the queue."""
+
+    def filter(self, record):
+        record.trace_id = trace_id()
+        return True
+
+
+class _DroppingQueueHandler(QueueHandler):
+    """Never blocks: when the writer thread falls behind, records are dropped and counted."""
+
+    dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _DroppingQueueHandler.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "trace_id", None):
+            entry["trace_id"] = record.trace_id
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s %(name)s%(trace)s: %(message)s%(extra_fields)s")
+
+    def format(self, record):
+        record.trace = f" [{record.trace_id}]" if getattr(record, "trace_id", None) else ""
+        fields = getattr(record, "fields", None)
+        record.extra_fields = " " + json.dumps(fields, ensure_ascii=False, default=str) if fields else ""
+        return super().format(record)
+
+
+_logging_lock = threading.Lock()
+_queue_handler = None
+_listener = None
+
+
+def _start_listener():
+    global _listener
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else TextFormatter())
+    _queue_handler.queue = queue.Queue(LOG_QUEUE_SIZE)
+    _listener = QueueListener(_queue_handler.queue, stream_handler, respect_handler_level=False)
+    _listener.start()
+
+
+def configure_logging():
+    """
+    Routes the root logger through the non-blocking queue handler. Idempotent;
+    leaves logging alone if the host application already configured handlers.
+    """
+    global _queue_handler
+    with _logging_lock:
+        root = logging.getLogger()
+        if _queue_handler is not None or root.handlers:
+            return
+        _queue_handler = _DroppingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+        _queue_handler.addFilter(_TraceFilter())
+        root.addHandler(_queue_handler)
+        root.setLevel(LOG_LEVEL)
+        logging.getLogger("httpx").setLevel(logging.WARNING) # Logs every request at INFO; the scraper's own lines say what was fetched
+        _start_listener()
+        atexit.register(lambda: _listener.stop()) # Flushes what is still queued
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=_start_listener) # The writer thread does not survive fork()
+
+
+def logging_stats():
+    return {"dropped_records": _DroppingQueueHandler.dropped, "queued": _queue_handler.queue.qsize() if _queue_handler else 0}
@@ -0,0 +1,258 @@
+# Inside backend/page_audit.py
+"""
+Full-page image and JSON-LD audit for the extractor, in bounded memory.
+
+ImageAudit looks at every <img> of a page, not a sample of the first few. It
+resolves the source an image will actually show, including lazy-loaded
+data-src and srcset, and counts missing, empty, repeated and file-name alt
+texts. Only counters and at most AUDIT_SAMPLES examples per finding are
+kept, and at most AUDIT_MAX_TRACKED_ALTS distinct alt texts are remembered
+for repeat detection, so a page with ten thousand images costs the same as
+one with a hundred.
+
+JsonLdAudit reduces every JSON-LD script, as soon as it closes, to one
+compact summary per entity: its @type, a few identifying values, the list
+of properties present, offer statistics and the validation issues rich
+results care about. The parsed document is dropped right away. Scripts over
+JSON_LD_MAX_CHARS are not parsed at all (only their @type values are read),
+and at most JSON_LD_MAX_ENTITIES summaries are kept per page.
+
+The summaries keep "@type" where JSON-LD has it, so seo_rules.schema_types()
+reads them like the full documents.
+"""
+import os
+import re
+import json
+from urllib.parse import urljoin
+
+# --- Audit Settings (override via .env) ---
+AUDIT_SAMPLES = int(os.getenv("AUDIT_SAMPLES", 10)) # Examples kept per finding (alt texts, images without alt, repeated alts)
+AUDIT_MAX_TRACKED_ALTS = int(os.getenv("AUDIT_MAX_TRACKED_ALTS", 1000)) # Distinct alt texts remembered for repeat detection
+JSON_LD_MAX_CHARS = int(os.getenv("JSON_LD_MAX_CHARS", 512 * 1024)) # Larger scripts are not parsed, only their @type is read
+JSON_LD_MAX_ENTITIES = int(os.getenv("JSON_LD_MAX_ENTITIES", 20)) # Entity summaries kept per page
+_VALUE_CHARS = 120 # Cap for any text kept from the page (alt texts, URLs, names)
+_MAX_PROPERTIES = 30 # Property names listed per entity
+
+_LAZY_SOURCE_ATTRIBUTES = ('data-src', 'data-lazy-src', 'data-original') # Common lazy-loading conventions
+_FILE_NAME_RE = re.compile(r"^[\w\-. ]+\.(?:jpe?g|png|gif|webp|avif|svg)$", re.IGNORECASE)
+_TYPE_RE = re.compile(r'"@type"\s*:\s*"([^"]{1,80})"')
+
+# Properties an entity of the type needs to be eligible for rich results (Google's required and key recommended ones)
+_REQUIRED_PROPERTIES = {
+    "Product": ("name", "image"),
+    "ProductGroup": ("name",),
+    "Offer": ("price", "priceCurrency"),
+    "BreadcrumbList": ("itemListElement",),
+    "Organization": ("name", "logo"),
+    "WebSite": ("url",),
+    "Article": ("headline", "image", "datePublished"),
+    "BlogPosting": ("headline", "image", "datePublished"),
+    "NewsArticle": ("headline", "image", "datePublished"),
+    "FAQPage": ("mainEntity",),
+    "ItemList": ("itemListElement",),
+}
+_OFFER_PROPERTIES = ("price", "priceCurrency", "availability")
+_SUMMARY_VALUES = ("name", "headline", "sku", "url") # Short identifying values copied into a summary
+
+
+def _short(value):
+    return value.strip()[:_VALUE_CHARS] if isinstance(value, str) else None
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _first_srcset_url(srcset):
+    candidate = srcset.strip().split(",")[0].strip()
+    return candidate.split()[0] if candidate else None
+
+
+class ImageAudit:
+    """Counts over every <img> of one page, with a few examples per finding."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.total = 0
+        self.missing_alt = 0 # No alt attribute, or only whitespace
+        self.empty_alt = 0 # alt="": correct for decorative images, a gap for product images
+        self.duplicate_alt = 0 # Images whose alt text an earlier image already used
+        self.file_name_alt = 0 # alt="IMG_0042.jpg"
+        self.lazy = 0
+        self.srcset = 0
+        self.no_source = 0
+        self.alt_counts = {} # Case-folded alt text -> images using it, at most AUDIT_MAX_TRACKED_ALTS entries
+        self.untracked_alts = 0 # Alt texts seen after alt_counts was full (repeats among them are not counted)
+        self.alt_samples = [] # Distinct alt texts, in page order
+        self.missing_alt_samples = [] # Sources of images without alt text
+
+    def add(self, attrs):
+        """Records one <img>; attrs is the tag's attribute dict (last duplicate wins, valueless is '')."""
+        self.total += 1
+        srcset = attrs.get('srcset') or attrs.get('data-srcset')
+        lazy_source = next((attrs[name] for name in _LAZY_SOURCE_ATTRIBUTES if attrs.get(name)), None)
+        if srcset:
+            self.srcset += 1
+        if lazy_source or attrs.get('data-srcset') or attrs.get('loading') == 'lazy':
+            self.lazy += 1
+        source = attrs.get('src')
+        if not source or source.startswith('data:'): # Placeholder until a script swaps in the lazy source
+            source = lazy_source or (_first_srcset_url(srcset) if srcset else None) or source
+        if not source:
+            self.no_source += 1
+
+        alt = attrs.get('alt')
+        text = alt.strip() if alt is not None else ''
+        if not text:
+            self.missing_alt += 1
+            if alt is not None:
+                self.empty_alt += 1
+            if len(self.missing_alt_samples) < AUDIT_SAMPLES and source:
+                self.missing_alt_samples.append(_short(urljoin(self.base_url, source)))
+            return
+        if _FILE_NAME_RE.match(text):
+            self.file_name_alt += 1
+        key = text.casefold()[:_VALUE_CHARS]
+        if key in self.alt_counts:
+            self.alt_counts[key] += 1
+            self.duplicate_alt += 1
+            return
+        if len(self.alt_counts) < AUDIT_MAX_TRACKED_ALTS:
+            self.alt_counts[key] = 1
+        else:
+            self.untracked_alts += 1
+        if len(self.alt_samples) < AUDIT_SAMPLES:
+            self.alt_samples.append(text[:_VALUE_CHARS])
+
+    def counts(self):
+        """The "images" entry of the scraped data: every count is over the whole page (as far as it was read)."""
+        return {"total": self.total, "missing_alt": self.missing_alt, "empty_alt": self.empty_alt,
+                "duplicate_alt": self.duplicate_alt, "file_name_alt": self.file_name_alt,
+                "lazy": self.lazy, "srcset": self.srcset, "no_source": self.no_source}
+
+    def details(self):
+        """Examples behind the counts, for the report."""
+        repeated = sorted(((count, alt) for alt, count in self.alt_counts.items() if count > 1), reverse=True)[:AUDIT_SAMPLES]
+        return {"missing_alt_examples": self.missing_alt_samples,
+                "repeated_alts": [{"alt": alt, "images": count} for count, alt in repeated],
+                "distinct_alts": len(self.alt_counts) + self.untracked_alts,
+                "alt_tracking_capped": self.untracked_alts > 0}
+
+
+class JsonLdAudit:
+    """Compact summaries of the JSON-LD scripts of one page."""
+
+    def __init__(self):
+        self.scripts = 0
+        self.entities = 0
+        self.invalid = 0
+        self.too_large = 0
+        self.summaries = []
+
+    def add(self, text):
+        """Summarises one script's text (None when the script has no single string, as Tag.string)."""
+        self.scripts += 1
+        if text is not None and len(text) > JSON_LD_MAX_CHARS:
+            self.too_large += 1
+            types = list(dict.fromkeys(_TYPE_RE.findall(text[:JSON_LD_MAX_CHARS])))[:5]
+            self._keep({"@type": types, "chars": len(text), "issues": ["script too large to validate"]})
+            return
+        try:
+            document = json.loads(text)
+        except (json.JSONDecodeError, TypeError):
+            self.invalid += 1
+            self._keep({"@type": None, "issues": ["invalid JSON"]})
+            return
+        for entity in self._entities(document):
+            self._keep(summarize_entity(entity))
+
+    @staticmethod
+    def _entities(document):
+        """Top-level entities: the document (or each item of a list) and the members of an @graph."""
+        for item in _as_list(document):
+            if not isinstance(item, dict):
+                continue
+            if "@type" in item or "@graph" not in item:
+                yield item
+            for member in _as_list(item.get("@graph")):
+                if isinstance(member, dict):
+                    yield member
+
+    def _keep(self, summary):
+        self.entities += 1
+        if len(self.summaries) < JSON_LD_MAX_ENTITIES:
+            self.summaries.append(summary)
+
+    def counts(self):
+        return {"scripts": self.scripts, "entities": self.entities, "summarized": len(self.summaries),
+                "invalid": self.invalid, "too_large": self.too_large,
+                "with_issues": sum(1 for summary in self.summaries if summary["issues"])}
+
+
+def summarize_entity(entity):
+    """{"@type", identifying values, "properties", "offers", "rating", "issues"} of one JSON-LD entity."""
+    types = entity.get("@type")
+    summary = {"@type": types}
+    for key in _SUMMARY_VALUES:
+        value = _short(entity.get(key))
+        if value:
+            summary[key] = value
+    brand = entity.get("brand")
+    brand_name = _short(brand.get("name") if isinstance(brand, dict) else brand)
+    if brand_name:
+        summary["brand"] = brand_name
+    summary["properties"] = sorted(key for key in entity if not key.startswith("@"))[:_MAX_PROPERTIES]
+    if "offers" in entity:
+        summary["offers"] = _summarize_offers(entity["offers"])
+    rating = entity.get("aggregateRating")
+    if isinstance(rating, dict):
+        summary["rating"] = {"value": rating.get("ratingValue"), "count": rating.get("reviewCount", rating.get("ratingCount"))}
+    summary["issues"] = _issues(entity, summary)
+    return summary
+
+
+def _summarize_offers(offers):
+    """Count, price range, currencies and availability over every offer (an AggregateOffer counts as its offerCount)."""
+    count, prices, currencies, availability, incomplete = 0, [], [], [], {}
+    for offer in _as_list(offers):
+        if not isinstance(offer, dict):
+            continue
+        aggregate = offer.get("@type") == "AggregateOffer"
+        offer_count = str(offer.get("offerCount", ""))
+        count += int(offer_count) if aggregate and offer_count.isdigit() else 1
+        for key in (("lowPrice", "highPrice") if aggregate else ("price",)):
+            try:
+                prices.append(float(offer[key]))
+            except (KeyError, TypeError, ValueError):
+                pass
+        currency, stock = _short(offer.get("priceCurrency")), _short(offer.get("availability"))
+        if currency and currency not in currencies:
+            currencies.append(currency)
+        if stock and stock.rsplit("/", 1)[-1] not in availability:
+            availability.append(stock.rsplit("/", 1)[-1]) # https://schema.org/InStock -> InStock
+        for key in _OFFER_PROPERTIES:
+            if key == "price" and aggregate:
+                key = "lowPrice"
+            if offer.get(key) in (None, ""):
+                incomplete[key] = incomplete.get(key, 0) + 1
+    return {"count": count, "low_price": min(prices) if prices else None, "high_price": max(prices) if prices else None,
+            "currencies": currencies[:5], "availability": availability[:5], "missing": incomplete}
+
+
+def _issues(entity, summary):
+    issues = []
+    types = [schema_type for schema_type in _as_list(entity.get("@type")) if isinstance(schema_type, str)]
+    if not types:
+        issues.append("missing @type")
+    for schema_type in types:
+        for key in _REQUIRED_PROPERTIES.get(schema_type, ()):
+            if entity.get(key) in (None, "", []) and f"missing {key}" not in issues:
+                issues.append(f"missing {key}")
+    if "Product" in types and not any(entity.get(key) for key in ("offers", "review", "aggregateRating")):
+        issues.append("missing offers, review or aggregateRating")
+    offers = summary.get("offers")
+    if offers:
+        issues.extend(f"offers missing {key} ({missing})" for key, missing in offers["missing"].items())
+    return issues
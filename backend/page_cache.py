@@ -0,0 +1,134 @@
+# Inside backend/page_cache.py
+import os
+import re
+import time
+import threading
+
+from cache_store import TieredCache, CACHE_DIR
+
+# --- Scrape Cache Settings (override via .env) ---
+SCRAPE_CACHE_ENABLED = os.getenv("SCRAPE_CACHE_ENABLED", "1") == "1"
+SCRAPE_CACHE_MEMORY_ENTRIES = int(os.getenv("SCRAPE_CACHE_MEMORY_ENTRIES", 256))
+SCRAPE_CACHE_DISK_ENTRIES = int(os.getenv("SCRAPE_CACHE_DISK_ENTRIES", 5000)) # 0 disables the disk tier
+SCRAPE_CACHE_PATH = os.getenv("SCRAPE_CACHE_PATH", os.path.join(CACHE_DIR, "scrape_cache.sqlite3"))
+SCRAPE_CACHE_MAX_AGE = int(os.getenv("SCRAPE_CACHE_MAX_AGE", 600)) # Served without revalidation for this long by default
+SCRAPE_CACHE_MAX_MAX_AGE = int(os.getenv("SCRAPE_CACHE_MAX_MAX_AGE", 86400)) # Cap for a page's own Cache-Control max-age
+
+_MAX_AGE_RE = re.compile(r"max-age\s*=\s*(\d+)", re.IGNORECASE)
+
+
+class CachedPage:
+    """A cached extraction plus the validators needed to revalidate it."""
+    __slots__ = ("result", "etag", "last_modified", "max_age", "stored_at")
+
+    def __init__(self, result, etag, last_modified, max_age, stored_at):
+        self.result = result
+        self.etag = etag
+        self.last_modified = last_modified
+        self.max_age = max_age
+        self.stored_at = stored_at
+
+    @property
+    def is_fresh(self):
+        return time.time() - self.stored_at < self.max_age
+
+    def conditional_headers(self):
+        """If-None-Match / If-Modified-Since headers for revalidating this entry."""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+def max_age_for(response_headers):
+    """Per-entry max-age: the page's Cache-Control max-age (capped), else the default. None means don't store."""
+    cache_control = (response_headers.get('Cache-Control') or '').lower()
+    if "no-store" in cache_control:
+        return None
+    if "no-cache" in cache_control:
+        return 0 # May be stored, but must be revalidated every time
+    match = _MAX_AGE_RE.search(cache_control)
+    if match:
+        return min(int(match.group(1)), SCRAPE_CACHE_MAX_MAX_AGE)
+    return SCRAPE_CACHE_MAX_AGE
+
+
+class PageCache:
+    """
+    Conditional-GET cache in front of scrape_store_data.
+
+    Fresh entries are returned without touching the network; stale entries
+    are revalidated with If-None-Match/If-Modified-Since and reused on a 304.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._lock = threading.Lock()
+        self.fresh_hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.stores = 0
+
+    def lookup(self, url):
+        """Returns the CachedPage for the URL (fresh or stale), or None."""
+        cached = self.store.get(url)
+        if cached is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        entry, stored_at = cached
+        return CachedPage(entry["result"], entry.get("etag"), entry.get("last_modified"), entry["max_age"], stored_at)
+
+    def record_fresh_hit(self):
+        with self._lock:
+            self.fresh_hits += 1
+
+    def save(self, url, result, response_headers):
+        """Stores a successful extraction with its validators, if the response allows it."""
+        max_age = max_age_for(response_headers)
+        etag = response_headers.get('ETag')
+        last_modified = response_headers.get('Last-Modified')
+        if max_age is None or (max_age == 0 and not etag and not last_modified):
+            return # Nothing reusable: no lifetime and no way to revalidate
+        self.store.set(url, {"result": result, "etag": etag, "last_modified": last_modified, "max_age": max_age})
+        with self._lock:
+            self.stores += 1
+
+    def revalidated_304(self, url, cached, response_headers):
+        """Handles a 304: keeps the cached extraction, refreshes its validators and age."""
+        # A 304 only updates the headers it carries; the rest stay as stored
+        max_age = max_age_for(response_headers) if response_headers.get('Cache-Control') else cached.max_age
+        etag = response_headers.get('ETag') or cached.etag
+        last_modified = response_headers.get('Last-Modified') or cached.last_modified
+        if max_age is None:
+            self.store.delete(url)
+        else:
+            self.store.set(url, {"result": cached.result, "etag": etag, "last_modified": last_modified, "max_age": max_age})
+        with self._lock:
+            self.revalidated += 1
+        return cached.result
+
+    # --- Admin ---
+    def invalidate(self, url=None):
+        """Drops one URL, or everything when url is None."""
+        if url is None:
+            self.store.clear()
+        else:
+            self.store.delete(url)
+
+    def stats(self):
+        with self._lock:
+            stats = {"fresh_hits": self.fresh_hits, "revalidated_304": self.revalidated,
+                     "misses": self.misses, "stores": self.stores}
+        stats["store"] = self.store.stats()
+        return stats
+
+
+page_cache = PageCache(TieredCache(
+    "scrape_cache",
+    max_entries=SCRAPE_CACHE_MEMORY_ENTRIES,
+    disk_path=SCRAPE_CACHE_PATH if SCRAPE_CACHE_DISK_ENTRIES > 0 else None,
+    disk_max_entries=SCRAPE_CACHE_DISK_ENTRIES,
+))
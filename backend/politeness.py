@@ -0,0 +1,93 @@
+# Inside backend/politeness.py
+import os
+import time
+import random
+import threading
+from urllib.parse import urlparse
+
+# --- Politeness Settings (override via .env) ---
+POLITENESS_MIN_DELAY = float(os.getenv("POLITENESS_MIN_DELAY", 1.0)) # Minimum gap between two fetches to the same host
+POLITENESS_MAX_DELAY = float(os.getenv("POLITENESS_MAX_DELAY", 2.5)) # Gap is jittered between min and max
+POLITENESS_MAX_CRAWL_DELAY = float(os.getenv("POLITENESS_MAX_CRAWL_DELAY", 30)) # Cap for robots.txt Crawl-delay
+POLITENESS_MAX_HOSTS = int(os.getenv("POLITENESS_MAX_HOSTS", 10000))
+
+
+def host_key(url):
+    """Returns the host that politeness delays are tracked for."""
+    return urlparse(url).netloc.lower()
+
+
+class PolitenessScheduler:
+    """
+    Per-host fetch spacing.
+
+    Each host has a 'next free slot'. A request to a host that hasn't been hit
+    recently goes out immediately; only requests that arrive while the host is
+    still inside its delay window wait, and each of them reserves its own slot,
+    so concurrent requests to the same host stay spaced out.
+    """
+
+    def __init__(self, min_delay=POLITENESS_MIN_DELAY, max_delay=POLITENESS_MAX_DELAY,
+                 max_crawl_delay=POLITENESS_MAX_CRAWL_DELAY, max_hosts=POLITENESS_MAX_HOSTS):
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.max_crawl_delay = max_crawl_delay
+        self.max_hosts = max_hosts
+        self._next_slot = {} # host -> monotonic time the host may be fetched again
+        self._lock = threading.Lock()
+        self.immediate = 0
+        self.delayed = 0
+        self.total_wait = 0.0
+
+    def interval_for(self, crawl_delay=None):
+        """Gap to leave after a fetch: jittered default, or robots.txt Crawl-delay if longer."""
+        interval = random.uniform(self.min_delay, self.max_delay)
+        if crawl_delay:
+            interval = max(interval, min(float(crawl_delay), self.max_crawl_delay))
+        return interval
+
+    def reserve(self, url, crawl_delay=None):
+        """
+        Reserves the next fetch slot for the URL's host without blocking.
+        Returns how many seconds the caller must wait before fetching (0 for a cold host).
+        """
+        host = host_key(url)
+        interval = self.interval_for(crawl_delay)
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = start + interval
+            wait = start - now
+            if wait > 0:
+                self.delayed += 1
+                self.total_wait += wait
+            else:
+                self.immediate += 1
+            if len(self._next_slot) > self.max_hosts:
+                self._prune(now)
+        return wait
+
+    def wait(self, url, crawl_delay=None):
+        """Blocks only as long as this host's politeness window requires. Returns the time waited."""
+        delay = self.reserve(url, crawl_delay)
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    def _prune(self, now):
+        # Hosts whose window has passed behave exactly like unknown hosts
+        for host in [h for h, slot in self._next_slot.items() if slot <= now]:
+            del self._next_slot[host]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "tracked_hosts": len(self._next_slot),
+                "immediate": self.immediate,
+                "delayed": self.delayed,
+                "total_wait_seconds": round(self.total_wait, 3),
+            }
+
+
+# Shared by every request handled in this process
+politeness = PolitenessScheduler()
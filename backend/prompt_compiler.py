@@ -0,0 +1,510 @@
+# Inside backend/prompt_compiler.py
+"""
+Token-budgeted prompt assembly for ai_handler.
+
+The instruction and JSON-schema text of every prompt is static per
+(prompt, platform, language). It is compiled once, dedented and
+token-counted, and cached. Per request only the dynamic fields are
+rendered, highest-signal first, each within what is left of
+PROMPT_TOKEN_BUDGET. Large fields (content snippet, headings, alt texts)
+shrink to fit. Fields that don't fit at all are listed as omitted.
+"""
+import os
+import re
+import json
+import textwrap
+import threading
+from functools import lru_cache
+
+from seo_rules import schema_types
+from observability import PROMPT_TOKENS
+
+# --- Prompt Budget Settings (override via .env) ---
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", 1800)) # Whole prompt: static instructions + dynamic fields
+PROMPT_MAX_CONTENT_CHARS = int(os.getenv("PROMPT_MAX_CONTENT_CHARS", 500)) # Content snippet cap even when the budget allows more
+PROMPT_MAX_FIELD_TOKENS = 120 # Cap for any single short field (title, meta, H1, topic), so one bad page can't eat the budget
+
+# Word pieces, single punctuation marks and line breaks roughly match SentencePiece tokens
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]|\n+")
+_PIECE_CHARS = 6 # Long words split into pieces of about this many characters
+
+
+def count_tokens(text):
+    """
+    Local token estimate for budgeting: one per word piece, punctuation mark
+    and line break. It needs no network round-trip (model.count_tokens would
+    cost one per call) but is not calibrated against Gemini's tokenizer;
+    ai_handler reports the model's own count for each call next to it.
+    """
+    tokens = 0
+    for match in _TOKEN_RE.finditer(text):
+        piece = match.group()
+        tokens += 1 + (len(piece) - 1) // _PIECE_CHARS if piece[0].isalnum() or piece[0] == '_' else 1
+    return tokens
+
+
+def truncate_to_tokens(text, max_tokens):
+    """Longest prefix of text (cut at a word boundary where possible) within max_tokens."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    low, high = 0, len(text)
+    while low < high: # Binary search on the character length
+        middle = (low + high + 1) // 2
+        if count_tokens(text[:middle]) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    cut = text[:low]
+    space = cut.rfind(' ')
+    return (cut[:space] if space > len(cut) // 2 else cut).rstrip() + "..."
+
+
+class CompiledPrompt:
+    """The final prompt text with its token accounting."""
+
+    def __init__(self, text, static_tokens, dynamic_tokens, omitted):
+        self.text = text
+        self.static_tokens = static_tokens
+        self.dynamic_tokens = dynamic_tokens
+        self.tokens = static_tokens + dynamic_tokens
+        self.omitted = omitted
+
+    def report(self):
+        return {"tokens": self.tokens, "static": self.static_tokens, "dynamic": self.dynamic_tokens,
+                "budget": PROMPT_TOKEN_BUDGET, "omitted": self.omitted}
+
+
+class _Template:
+    """Static prompt text around one dynamic slot, compiled once."""
+
+    def __init__(self, head, tail):
+        self.head = textwrap.dedent(head).strip() + "\n"
+        self.tail = "\n\n" + textwrap.dedent(tail).strip()
+        self.tokens = count_tokens(self.head) + count_tokens(self.tail)
+
+    def fill(self, lines, omitted):
+        dynamic = "\n".join(lines)
+        return CompiledPrompt(self.head + dynamic + self.tail, self.tokens, count_tokens(dynamic), omitted)
+
+
+class _Budget:
+    def __init__(self, available):
+        self.left = available
+
+    def take(self, text):
+        self.left -= count_tokens(text)
+
+
+def _language_name(target_language):
+    return "Romanian" if target_language == "ro" else "English"
+
+
+# === Shopify SEO Prompt ===
+_SHOPIFY_HEAD = """
+    Analyze the following data scraped from a potential Shopify page for SEO optimization opportunities in {lang_name}.
+"""
+
+# The three report sections: task text, JSON shape, and the scraped fields each one reads (snapshots.py diffs those)
+SHOPIFY_SECTIONS = ("core_seo", "content_keywords", "on_page_technical")
+SHOPIFY_SECTION_FIELDS = {
+    "core_seo": ("title", "meta_description", "h1"),
+    "content_keywords": ("title", "h1", "headings", "content_snippet"),
+    "on_page_technical": ("alt_texts", "images", "schema_data", "links"),
+}
+
+_SHOPIFY_TASKS = {
+    "core_seo": """
+        **Core SEO Elements Critique & Suggestions:**
+            * Critique the current Title (length, clarity, keywords). Suggest 1 improved SEO Title (max 60 chars), explaining the reasoning.
+            * Critique the current Meta Description (length, clarity, call-to-action, keywords). Suggest 1 improved Meta Description (max 155 chars), explaining the reasoning.
+            * Analyze the H1 heading. Is it effective? Suggest an improvement if necessary.
+    """,
+    "content_keywords": """
+        **Content & Keywords:**
+            * Based on the headings and content snippet, identify the main topic and suggest 5-7 relevant keywords (mix of short/long-tail).
+            * Suggest 2 specific Shopify blog post titles relevant to the scraped content that could drive traffic.
+    """,
+    "on_page_technical": """
+        **On-Page & Technical Considerations:**
+            * Based on the sample alt texts, provide 1 specific recommendation for improving image SEO on this page or Shopify stores in general.
+            * Based on the detected schema types (or lack thereof), recommend the MOST appropriate Schema.org type (e.g., Product, Article, CollectionPage) for this page and list 3 essential properties to include. If schema exists, briefly evaluate its type.
+            * Provide 2 actionable, technical SEO tips relevant for Shopify stores (e.g., related to site speed, mobile-friendliness, URL structure, duplicate content).
+    """,
+}
+
+_SHOPIFY_SHAPES = {
+    "core_seo": """
+        "core_seo": {
+          "title_critique": "[Your critique of the current title]",
+          "suggested_title": "[Your suggested title]",
+          "title_reasoning": "[Reasoning for suggested title]",
+          "description_critique": "[Your critique of the current meta description]",
+          "suggested_description": "[Your suggested description]",
+          "description_reasoning": "[Reasoning for suggested description]",
+          "h1_analysis": "[Your analysis of the H1 heading]",
+          "suggested_h1": "[Suggested H1 only if improvement needed, else null]"
+        }
+    """,
+    "content_keywords": """
+        "content_keywords": {
+          "main_topic": "[Identified main topic]",
+          "suggested_keywords": ["[keyword1", "keyword2", "...", "keyword7"],
+          "blog_post_ideas": ["[Blog title idea 1]", "[Blog title idea 2]"]
+        }
+    """,
+    "on_page_technical": """
+        "on_page_technical": {
+          "image_seo_tip": "[Specific alt text/image SEO recommendation]",
+          "schema_recommendation": {
+            "suggested_type": "[Recommended Schema.org type e.g., Product]",
+            "required_properties": ["[property1", "property2", "property3"],
+            "current_schema_evaluation": "[Brief evaluation if schema was found, else null]"
+          },
+          "technical_tips": ["[Technical SEO Tip 1]", "[Technical SEO Tip 2]"]
+        }
+    """,
+}
+
+_SHOPIFY_OUTPUT = """
+    **Output Format:**
+    Generate your response *exclusively* as a single, valid JSON object. Use the following structure precisely. All string values within the JSON should be in {lang_name}.
+"""
+
+
+def _indent_block(text, prefix):
+    return textwrap.indent(textwrap.dedent(text).strip(), prefix)
+
+@lru_cache(maxsize=32) # Keyed by request input, so bounded
+def _shopify_template(target_language, sections=SHOPIFY_SECTIONS):
+    """Head and tail around the data for the given report sections (all three for a full analysis)."""
+    lang_name = _language_name(target_language)
+    tasks = []
+    for number, section in enumerate(sections, 1):
+        task = textwrap.dedent(_SHOPIFY_TASKS[section]).strip()
+        tasks.append(f"{number}.  {task}")
+    shape = ",\n".join([f'  "analysis_language": {json.dumps(target_language)}']
+                       + [_indent_block(_SHOPIFY_SHAPES[section], "  ") for section in sections])
+    tail = "\n\n".join([
+        f"**Analysis Tasks (Perform in {lang_name}, keeping each critique or reasoning to one or two sentences):**",
+        *tasks,
+        textwrap.dedent(_SHOPIFY_OUTPUT).strip().format(lang_name=lang_name),
+        "```json\n{\n" + shape + "\n}\n```",
+        "--- End of Instructions ---",
+    ])
+    return _Template(_SHOPIFY_HEAD.format(lang_name=lang_name), tail)
+
+
+def _short(value, budget):
+    text = truncate_to_tokens(str(value), min(PROMPT_MAX_FIELD_TOKENS, max(budget.left, 30)))
+    budget.take(text)
+    return text
+
+def _items(values, budget, per_item_tokens=40):
+    """JSON list of as many items (each capped) as the budget allows."""
+    kept = []
+    for value in values:
+        item = truncate_to_tokens(str(value), per_item_tokens)
+        cost = count_tokens(json.dumps(item, ensure_ascii=False)) + 1
+        if cost > budget.left:
+            break
+        kept.append(item)
+        budget.take(json.dumps(item, ensure_ascii=False))
+    return kept
+
+def compile_shopify_seo_prompt(scraped_data, target_language, checks_summary, sections=SHOPIFY_SECTIONS):
+    """
+    Shopify SEO prompt within PROMPT_TOKEN_BUDGET.
+
+    Fields are filled in priority order: page identity (URL, title, meta,
+    H1), the automated check findings, link counts, headings (H2/H3 before
+    deeper levels), schema types and the image and JSON-LD audit counts,
+    the content snippet and image alt texts.
+    They are printed in the usual reading order. With a subset of sections
+    (incremental re-analysis) only those tasks, their JSON shape and the
+    fields they read are included.
+    """
+    sections = tuple(section for section in SHOPIFY_SECTIONS if section in sections)
+    template = _shopify_template(target_language, sections)
+    budget = _Budget(PROMPT_TOKEN_BUDGET - template.tokens)
+    wanted = {"url", "title", "h1"}.union(*(SHOPIFY_SECTION_FIELDS[section] for section in sections))
+    omitted = []
+    lines = {}
+
+    # 1. Identity: always present (each capped), everything else is weighed against the rest of the budget
+    lines["url"] = f"- URL: {_short(scraped_data.get('url', 'N/A'), budget)}"
+    lines["title"] = f"- Title: {_short(scraped_data.get('title', 'N/A'), budget)}"
+    if "meta_description" in wanted:
+        lines["meta"] = f"- Meta Description: {_short(scraped_data.get('meta_description', 'N/A'), budget)}"
+    lines["h1"] = f"- H1 Heading: {_short(scraped_data.get('h1', 'N/A'), budget)}"
+
+    # 2. What the rule engine already found (the model builds on it instead of re-measuring)
+    checks = "**Automated Checks (already measured; do not restate lengths or counts, build on these findings):**\n" + checks_summary
+    if count_tokens(checks) <= budget.left:
+        lines["checks"] = checks
+        budget.take(checks)
+    else:
+        omitted.append("automated_checks")
+
+    # 3. Small structural facts
+    if "links" in wanted:
+        links = scraped_data.get('links', {})
+        lines["links"] = f"- Link Counts: Internal: {links.get('internal', 'N/A')}, External: {links.get('external', 'N/A')}"
+        budget.take(lines["links"])
+
+    if "headings" in wanted:
+        headings = scraped_data.get('headings', {})
+        heading_sample = {}
+        for round_size in (2, 4): # Breadth first: two per level, then up to four
+            for level in ('h2', 'h3', 'h4', 'h5', 'h6'):
+                found = headings.get(level, [])
+                already = heading_sample.get(level, [])
+                extra = _items(found[len(already):round_size], budget, per_item_tokens=20)
+                if extra:
+                    heading_sample[level] = already + extra
+        lines["headings"] = f"- Headings Structure (Sample): {json.dumps(heading_sample, ensure_ascii=False)}"
+        budget.take(lines["headings"])
+        if any(headings.get(level) for level in ('h2', 'h3', 'h4', 'h5', 'h6')) and not heading_sample:
+            omitted.append("headings")
+
+    if "schema_data" in wanted:
+        schema_sample = _items(schema_types(scraped_data.get('schema_data', [])), budget, per_item_tokens=10)
+        lines["schema"] = f"- Detected Schema Types (Sample): {json.dumps(schema_sample)}"
+        budget.take(lines["schema"])
+        schema_audit = scraped_data.get('schema_audit')
+        if schema_audit and schema_audit.get("scripts"):
+            lines["schema_audit"] = (f"- JSON-LD Audit: {schema_audit['scripts']} scripts, {schema_audit['entities']} entities, "
+                                     f"{schema_audit['with_issues']} with issues, {schema_audit['invalid']} invalid")
+            budget.take(lines["schema_audit"])
+
+    if "images" in wanted:
+        images = scraped_data.get('images') or {}
+        if "duplicate_alt" in images: # Audit counts cover every image, so the model need not extrapolate from the alt sample
+            lines["images"] = (f"- Image Audit (all {images['total']} images): {images['missing_alt']} without alt text "
+                               f"({images['empty_alt']} alt=\"\"), {images['duplicate_alt']} repeating an alt, "
+                               f"{images['file_name_alt']} with a file-name alt, {images['lazy']} lazy-loaded, {images['srcset']} with srcset")
+            budget.take(lines["images"])
+
+    # 4. Free text: the content snippet gets what is left (up to PROMPT_MAX_CONTENT_CHARS), alt texts the remainder
+    if "content_snippet" in wanted:
+        content = scraped_data.get('content_snippet', 'N/A')[:PROMPT_MAX_CONTENT_CHARS]
+        alt_reserve = min(60, max(budget.left // 4, 0)) if "alt_texts" in wanted else 0
+        content_room = budget.left - alt_reserve - 10
+        if content_room > 20:
+            content = truncate_to_tokens(content, content_room)
+            lines["content"] = f'- Content Snippet: "{content}"'
+            budget.take(lines["content"])
+        else:
+            lines["content"] = '- Content Snippet: (omitted)'
+            omitted.append("content_snippet")
+
+    if "alt_texts" in wanted:
+        alt_sample = _items(scraped_data.get('alt_texts', [])[:5], budget, per_item_tokens=20)
+        lines["alts"] = f"- Image Alt Texts (Sample): {json.dumps(alt_sample, ensure_ascii=False)}"
+        if scraped_data.get('alt_texts') and not alt_sample:
+            omitted.append("alt_texts")
+
+    ordered = ["\n**Scraped Data:**"] + [lines[key] for key in ("url", "title", "meta", "h1", "headings", "alts", "images", "schema",
+                                                              "schema_audit", "links", "content") if key in lines]
+    if "checks" in lines:
+        ordered += ["", lines["checks"]]
+    return _record(template.fill(ordered, omitted), "shopify_seo")
+
+
+# === Social Media Prompt ===
+_SOCIAL_TASKS = {
+    "youtube": """
+        - Generate 2 distinct YouTube video concepts:
+            - For each concept, provide:
+                - An engaging Title (max 70 chars).
+                - A brief Hook (first 5-10 seconds idea).
+                - A 3-4 bullet point Outline covering key segments.
+                - A specific Call-to-Action.
+                - A relevant Thumbnail concept description (visual idea).
+        - Suggest 5 relevant YouTube tags/keywords.
+        - Justify *why* one of the video concepts is particularly suited for YouTube engagement.
+    """,
+    "instagram": """
+        - Generate 2 distinct Instagram post/Reel ideas:
+            - For each idea, provide:
+                - A hook-focused Caption Idea (under 30 words).
+                - A Visual Concept (e.g., type of image, Reel style, trending audio suggestion).
+                - A specific Call-to-Action.
+        - Suggest 1 set of 7 relevant Hashtags (mix broad, niche, specific).
+        - Provide 1 Instagram Story idea (e.g., poll, Q&A, behind-the-scenes) related to the topic.
+        - Briefly explain how one idea uses a common engagement tactic (e.g., question, user-generated content prompt).
+    """,
+    "pinterest": """
+        - Generate 2 distinct Pin concepts:
+            - For each concept, provide:
+                - An SEO-optimized Pin Title (keyword-rich).
+                - A compelling Pin Description (1-3 sentences, include keywords and CTA).
+                - A visual description (what the Pin image/video should show).
+        - Suggest 3 relevant Pinterest Board names.
+        - Explain why one of the Pin concepts is visually appealing for Pinterest.
+    """,
+}
+
+# JSON shape of each platform's answer (%s: the language code)
+_SOCIAL_SHAPES = {
+    "youtube": """
+        {
+          "platform": "youtube",
+          "language": "%s",
+          "concepts": [
+            {
+              "title": "[Generated Title 1]",
+              "hook": "[Hook idea 1]",
+              "outline": ["[Point 1.1]", "[Point 1.2]", "[Point 1.3]"],
+              "call_to_action": "[CTA 1]",
+              "thumbnail_concept": "[Thumbnail description 1]"
+            },
+            {
+              "title": "[Generated Title 2]",
+              "hook": "[Hook idea 2]",
+              "outline": ["[Point 2.1]", "[Point 2.2]", "[Point 2.3]", "[Point 2.4]"],
+              "call_to_action": "[CTA 2]",
+              "thumbnail_concept": "[Thumbnail description 2]"
+            }
+          ],
+          "suggested_tags": ["tag1", "tag2", "tag3", "tag4", "tag5"],
+          "justification": "[Explanation why one concept is well-suited]"
+        }
+    """,
+    "instagram": """
+        {
+          "platform": "instagram",
+          "language": "%s",
+          "post_ideas": [
+            {
+              "caption_idea": "[Generated Caption 1]",
+              "visual_concept": "[Visual/audio concept 1]",
+              "call_to_action": "[CTA 1]"
+            },
+            {
+              "caption_idea": "[Generated Caption 2]",
+              "visual_concept": "[Visual/audio concept 2]",
+              "call_to_action": "[CTA 2]"
+            }
+          ],
+          "suggested_hashtags": ["#hashtag1", "#hashtag2", ..., "#hashtag7"],
+          "story_idea": "[Instagram story idea description]",
+          "engagement_tactic_explanation": "[Explanation of engagement tactic used]"
+        }
+    """,
+    "pinterest": """
+        {
+          "platform": "pinterest",
+          "language": "%s",
+          "pin_concepts": [
+            {
+              "title": "[Generated Title 1]",
+              "description": "[Generated Description 1]",
+              "visual_description": "[Visual description 1]"
+            },
+            {
+              "title": "[Generated Title 2]",
+              "description": "[Generated Description 2]",
+              "visual_description": "[Visual description 2]"
+            }
+          ],
+          "suggested_boards": ["BoardName1", "BoardName2", "BoardName3"],
+          "visual_appeal_explanation": "[Explanation of visual appeal]"
+        }
+    """,
+}
+
+SOCIAL_PLATFORMS = tuple(_SOCIAL_TASKS)
+
+_ELLIPSIS_RE = re.compile(r",\s*\.\.\.\s*,") # ["#tag1", ..., "#tag7"] is an example, not JSON
+
+@lru_cache(maxsize=None)
+def shopify_section_shape(section):
+    """The example JSON of a report section, as the prompt shows it; json_repair validates answers against it."""
+    return json.loads("{" + _SHOPIFY_SHAPES[section] + "}")[section]
+
+@lru_cache(maxsize=None)
+def social_shape(platform):
+    """The example JSON of a platform's answer, as the prompt shows it."""
+    return json.loads(_ELLIPSIS_RE.sub(",", _SOCIAL_SHAPES[platform] % "[language code]"))
+
+@lru_cache(maxsize=32) # Keyed by request input, so bounded
+def _social_template(platform, target_language):
+    lang_name = _language_name(target_language)
+    head = (f"Act as a creative social media marketing expert specializing in {platform.upper()}.\n"
+            f"Generate content ideas in {lang_name} for **{platform.upper()}** based on the following:")
+    tail = ("**Content Requirements:**\n" + textwrap.dedent(_SOCIAL_TASKS[platform]).strip()
+            + "\n\n**Output Format:** Respond *only* with a valid JSON object using this structure:\n"
+            + "```json\n" + textwrap.dedent(_SOCIAL_SHAPES[platform] % target_language).strip() + "\n```"
+            + "\n\n--- End of Instructions ---")
+    return _Template(head, tail)
+
+
+@lru_cache(maxsize=32)
+def _combined_social_template(platforms, target_language):
+    lang_name = _language_name(target_language)
+    names = [platform.upper() for platform in platforms]
+    head = (f"Act as a creative social media marketing expert specializing in {', '.join(names)}.\n"
+            f"Generate content ideas in {lang_name} for each of these platforms based on the following:")
+    requirements = [f"**{name}:**\n" + textwrap.dedent(_SOCIAL_TASKS[platform]).strip() for name, platform in zip(names, platforms)]
+    shape = ",\n".join(f'  "{platform}": ' + textwrap.indent(textwrap.dedent(_SOCIAL_SHAPES[platform] % target_language).strip(), "  ").lstrip()
+                       for platform in platforms)
+    tail = ("**Content Requirements:**\n\n" + "\n\n".join(requirements)
+            + "\n\n**Output Format:** Respond *only* with a valid JSON object holding one answer per platform, using this structure:\n"
+            + "```json\n{\n" + shape + "\n}\n```"
+            + "\n\n--- End of Instructions ---")
+    return _Template(head, tail)
+
+
+def _fill_social(template, topic, keywords, kind):
+    budget = _Budget(PROMPT_TOKEN_BUDGET - template.tokens)
+    omitted = []
+    # The topic is the whole brief: it may use most of the budget; keywords get what is left
+    topic_text = truncate_to_tokens(str(topic), max(budget.left - 40, PROMPT_MAX_FIELD_TOKENS))
+    lines = [f"- Main Topic/Product: '{topic_text}'"]
+    budget.take(lines[0])
+    if keywords:
+        keyword_text = truncate_to_tokens(str(keywords), max(min(budget.left, PROMPT_MAX_FIELD_TOKENS), 0))
+        if keyword_text.strip(". "):
+            lines.append(f"- Keywords: {keyword_text}")
+        else:
+            omitted.append("keywords")
+    lines.append("")
+    return _record(template.fill(lines, omitted), kind)
+
+def compile_social_media_prompt(platform, topic, keywords, target_language):
+    """Content-ideas prompt for a platform within PROMPT_TOKEN_BUDGET; None if the platform is unsupported."""
+    if platform not in _SOCIAL_TASKS:
+        return None
+    return _fill_social(_social_template(platform, target_language), topic, keywords, "social")
+
+def compile_combined_social_prompt(platforms, topic, keywords, target_language):
+    """
+    One prompt asking for several platforms at once; the answer is a JSON
+    object keyed by platform, each value shaped like that platform's own
+    answer. None if any platform is unsupported.
+    """
+    if not platforms or any(platform not in _SOCIAL_TASKS for platform in platforms):
+        return None
+    return _fill_social(_combined_social_template(tuple(platforms), target_language), topic, keywords, "social_combined")
+
+
+# === Stats ===
+_stats_lock = threading.Lock()
+_stats = {"prompts": 0, "tokens": 0, "max_tokens": 0, "over_budget": 0, "with_omissions": 0}
+
+def _record(prompt, kind):
+    PROMPT_TOKENS.labels(kind).observe(prompt.tokens)
+    with _stats_lock:
+        _stats["prompts"] += 1
+        _stats["tokens"] += prompt.tokens
+        _stats["max_tokens"] = max(_stats["max_tokens"], prompt.tokens)
+        _stats["over_budget"] += prompt.tokens > PROMPT_TOKEN_BUDGET
+        _stats["with_omissions"] += bool(prompt.omitted)
+    return prompt
+
+def stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["budget"] = PROMPT_TOKEN_BUDGET
+    stats["avg_tokens"] = round(stats["tokens"] / stats["prompts"], 1) if stats["prompts"] else None
+    return stats
@@ -0,0 +1,196 @@
+# Inside backend/robots_cache.py
+import os
+import re
+import time
+import logging
+import threading
+from collections import OrderedDict
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+
+import http_client
+from single_flight import SingleFlight
+
+log = logging.getLogger(__name__)
+
+# --- Cache Settings (override via .env) ---
+ROBOTS_CACHE_TTL = int(os.getenv("ROBOTS_CACHE_TTL", 3600)) # Lifetime of a fetched robots.txt when no Cache-Control is sent
+ROBOTS_CACHE_MAX_TTL = int(os.getenv("ROBOTS_CACHE_MAX_TTL", 86400)) # Upper bound for Cache-Control max-age
+ROBOTS_NEGATIVE_TTL = int(os.getenv("ROBOTS_NEGATIVE_TTL", 300)) # 4xx/5xx/unreachable results are only kept briefly
+ROBOTS_CACHE_MAX_HOSTS = int(os.getenv("ROBOTS_CACHE_MAX_HOSTS", 5000))
+ROBOTS_FETCH_TIMEOUT = float(os.getenv("ROBOTS_FETCH_TIMEOUT", 10))
+
+_MAX_AGE_RE = re.compile(r"max-age\s*=\s*(\d+)", re.IGNORECASE)
+
+
+def cache_key(url):
+    """Returns the scheme+host key robots.txt rules are scoped to."""
+    parsed_url = urlparse(url)
+    return f"{parsed_url.scheme.lower()}://{parsed_url.netloc.lower()}"
+
+
+def robots_url(url):
+    """Returns the robots.txt URL governing the URL."""
+    return f"{cache_key(url)}/robots.txt"
+
+
+def entry_allows(entry, url, user_agent):
+    """Applies a robots entry to a URL; an unreachable robots.txt allows everything."""
+    if entry.parser is None:
+        return True # Be optimistic if robots.txt could not be read
+    return entry.parser.can_fetch(user_agent, url)
+
+
+def ttl_from_cache_control(cache_control, default_ttl):
+    """Derives how long a robots.txt may be cached from its Cache-Control header."""
+    if not cache_control:
+        return default_ttl
+    directives = cache_control.lower()
+    if "no-store" in directives or "no-cache" in directives:
+        return 0
+    match = _MAX_AGE_RE.search(directives)
+    if match:
+        return min(int(match.group(1)), ROBOTS_CACHE_MAX_TTL)
+    return default_ttl
+
+
+def build_parser(robots_url, status_code, text):
+    """
+    Builds a RobotFileParser from an already fetched response, mirroring
+    RobotFileParser.read(): 401/403 disallow everything, other 4xx allow
+    everything and 5xx leave the parser unread (which disallows).
+    """
+    rp = RobotFileParser()
+    rp.set_url(robots_url)
+    if status_code in (401, 403):
+        rp.disallow_all = True
+    elif 400 <= status_code < 500:
+        rp.allow_all = True
+    elif status_code < 400:
+        rp.parse(text.splitlines())
+    return rp
+
+
+class _RobotsEntry:
+    __slots__ = ("parser", "expires_at", "status")
+
+    def __init__(self, parser, expires_at, status):
+        self.parser = parser # RobotFileParser, or None when robots.txt was unreachable
+        self.expires_at = expires_at
+        self.status = status # HTTP status code, or "unreachable"
+
+
+class RobotsCache:
+    """
+    Process-wide robots.txt cache keyed by scheme+host.
+
+    Parsed RobotFileParser instances are shared between requests until their
+    TTL runs out, so repeat analyses of a store skip the robots.txt round trip.
+    """
+
+    def __init__(self, ttl=ROBOTS_CACHE_TTL, negative_ttl=ROBOTS_NEGATIVE_TTL, max_hosts=ROBOTS_CACHE_MAX_HOSTS):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_hosts = max_hosts
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._flight = SingleFlight("robots.txt") # Concurrent misses for one host share a single robots.txt download
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # --- Lookup ---
+    def lookup(self, url):
+        """Returns the cached entry for the URL's host, or None (counts hit/miss)."""
+        key = cache_key(url)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            if entry is not None:
+                del self._entries[key] # Expired
+            self.misses += 1
+            return None
+
+    def get_entry(self, url, user_agent):
+        """Returns the robots entry for the URL's host, fetching robots.txt on a miss."""
+        entry = self.lookup(url)
+        if entry is None:
+            entry = self._flight.do(cache_key(url), self._fetch, url, user_agent)
+        return entry
+
+    def can_fetch(self, url, user_agent):
+        """Checks (cached) robots.txt to see if the user agent may fetch the URL."""
+        return entry_allows(self.get_entry(url, user_agent), url, user_agent)
+
+    def crawl_delay(self, url, user_agent):
+        """Returns the robots.txt Crawl-delay for the user agent (None if unset or not cached)."""
+        with self._lock:
+            entry = self._entries.get(cache_key(url))
+        if entry is None or entry.parser is None:
+            return None
+        return entry.parser.crawl_delay(user_agent)
+
+    # --- Population ---
+    def _fetch(self, url, user_agent):
+        fetch_url = robots_url(url)
+        try:
+            response = http_client.get(fetch_url, headers={'User-Agent': user_agent},
+                                       timeout=(http_client.HTTP_CONNECT_TIMEOUT, ROBOTS_FETCH_TIMEOUT))
+            text = response.content.decode('utf-8', errors='replace')
+            return self.store(url, response.status_code, text, response.headers.get('Cache-Control'))
+        except Exception as e:
+            log.warning("Could not read or parse robots.txt at %s: %s", fetch_url, e)
+            return self.store_unreachable(url)
+
+    def store(self, url, status_code, text, cache_control=None):
+        """Parses a fetched robots.txt response and caches it for the URL's host."""
+        parser = build_parser(robots_url(url), status_code, text)
+        if status_code < 400:
+            ttl = ttl_from_cache_control(cache_control, self.ttl)
+        else:
+            ttl = min(ttl_from_cache_control(cache_control, self.negative_ttl), self.negative_ttl)
+        return self._put(url, _RobotsEntry(parser, time.monotonic() + ttl, status_code), ttl)
+
+    def store_unreachable(self, url):
+        """Caches a short-lived 'unreachable' result so a dead host isn't retried on every request."""
+        return self._put(url, _RobotsEntry(None, time.monotonic() + self.negative_ttl, "unreachable"), self.negative_ttl)
+
+    def _put(self, url, entry, ttl):
+        if ttl <= 0:
+            return entry # Cache-Control forbids reuse; answer this request only
+        key = cache_key(url)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_hosts:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return entry
+
+    # --- Admin ---
+    def invalidate(self, url=None):
+        """Drops the cached robots.txt for one host, or for every host when url is None."""
+        with self._lock:
+            if url is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(cache_key(url), None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hosts": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+# Shared by every request handled in this process
+robots_cache = RobotsCache()
@@ -1,11 +1,29 @@
 # Inside backend/scraper.py
+import os
+import re
+import codecs
 import requests
-from bs4 import BeautifulSoup
-import time
+from email.message import Message
 import random
-import json
-from urllib.parse import urlparse, urljoin
-from urllib.robotparser import RobotFileParser
+import time
+import logging
+
+import http_client
+from robots_cache import robots_cache
+from politeness import politeness
+from extractor import extract_page_data, create_extractor
+from page_cache import page_cache, SCRAPE_CACHE_ENABLED
+from observability import span, record_span, count_error, PAGE_BYTES
+
+log = logging.getLogger(__name__)
+
+# --- Download Settings (override via .env) ---
+SCRAPER_STREAMING = os.getenv("SCRAPER_STREAMING", "1") == "1" # Decode and parse while downloading
+SCRAPER_MAX_BYTES = int(os.getenv("SCRAPER_MAX_BYTES", 3 * 1024 * 1024)) # Stop reading a page after this many bytes
+SCRAPER_CHUNK_SIZE = int(os.getenv("SCRAPER_CHUNK_SIZE", 64 * 1024))
+SCRAPER_EARLY_STOP = os.getenv("SCRAPER_EARLY_STOP", "0") == "1" # Also stop once title/meta/image/content quotas are filled
+
+_META_CHARSET_RE = re.compile(rb'<meta[^>]+charset=["\']?([a-zA-Z0-9_-]+)', re.IGNORECASE)
 
 # --- User Agents ---
 USER_AGENTS = [
@@ -17,144 +35,191 @@ USER_AGENTS = [
 
 # --- Robots.txt Parser ---
 def can_fetch(url, user_agent):
-    """Checks robots.txt to see if the user agent is allowed to fetch the URL."""
-    parsed_url = urlparse(url)
-    robots_url = f"{parsed_url.scheme}://{parsed_url.netloc}/robots.txt"
-    rp = RobotFileParser()
-    rp.set_url(robots_url)
+    """Checks robots.txt (cached per scheme+host) to see if the user agent is allowed to fetch the URL."""
+    return robots_cache.can_fetch(url, user_agent)
+
+# --- Streaming Download ---
+def header_charset(headers):
+    """The charset= of the Content-Type header, or None (requests' ISO-8859-1 default for text/* would hide <meta charset>)."""
+    content_type = Message()
+    content_type['Content-Type'] = headers.get('Content-Type', '')
+    charset = content_type.get_param('charset') # Unquoted; the parameter name matches case-insensitively
+    if not isinstance(charset, str): # Missing, or an RFC 2231 tuple no server sends for charset
+        return None
+    return charset.strip(' \'"') or None
+
+def _stream_encoding(header_encoding, first_chunk):
+    """Encoding for incremental decoding: HTTP header, else <meta charset>, else UTF-8."""
+    candidates = [header_encoding]
+    match = _META_CHARSET_RE.search(first_chunk[:2048])
+    if match:
+        candidates.append(match.group(1).decode('ascii'))
+    for encoding in candidates:
+        if encoding:
+            try:
+                codecs.lookup(encoding)
+                return encoding
+            except LookupError:
+                continue
+    return 'utf-8'
+
+class PageStream:
+    """
+    Incremental decode-and-extract state for one download, shared by the
+    blocking (requests) and async (httpx) download paths.
+    """
+
+    def __init__(self, url, header_encoding, max_bytes=SCRAPER_MAX_BYTES, early_stop=SCRAPER_EARLY_STOP, crawl=False):
+        self.url = url
+        self.header_encoding = header_encoding
+        self.max_bytes = max_bytes
+        self.early_stop = early_stop and not crawl # Crawl mode needs every link on the page
+        self.extractor = create_extractor(url, crawl=crawl)
+        self.decoder = None
+        self.bytes_read = 0
+        self.truncated = False
+        self.parse_seconds = 0.0 # Time spent decoding and extracting, reported as the "parse" span
+
+    def feed(self, chunk):
+        """Feeds one downloaded chunk; returns True once the caller should stop reading."""
+        if not chunk:
+            return False
+        if self.decoder is None:
+            self.decoder = codecs.getincrementaldecoder(_stream_encoding(self.header_encoding, chunk))(errors='replace')
+        if self.bytes_read + len(chunk) > self.max_bytes:
+            chunk = chunk[:self.max_bytes - self.bytes_read]
+            self.truncated = True
+        self.bytes_read += len(chunk)
+        started = time.perf_counter()
+        self.extractor.feed(self.decoder.decode(chunk))
+        self.parse_seconds += time.perf_counter() - started
+        if self.truncated:
+            return True
+        if self.early_stop and self.extractor.quotas_filled():
+            self.truncated = True
+            return True
+        return False
+
+    def finish(self):
+        """Flushes the decoder and returns the scraped data, flagged if the page was cut short."""
+        started = time.perf_counter()
+        if self.decoder is not None and not self.truncated:
+            self.extractor.feed(self.decoder.decode(b'', final=True))
+        if self.truncated:
+            log.warning("Stopped reading %s after %d bytes", self.url, self.bytes_read)
+            self.extractor.truncate()
+        scraped_data = self.extractor.close()
+        scraped_data["truncated"] = self.truncated
+        self.parse_seconds += time.perf_counter() - started
+        record_span("parse", self.parse_seconds, bytes=self.bytes_read)
+        PAGE_BYTES.observe(self.bytes_read)
+        return scraped_data
+
+def stream_extract(response, url, max_bytes=SCRAPER_MAX_BYTES, early_stop=SCRAPER_EARLY_STOP, crawl=False):
+    """
+    Reads a streamed response chunk by chunk into the incremental extractor.
+    Stops at max_bytes (or when extraction quotas are filled, if early_stop)
+    and reports whether the page was cut short.
+    """
+    stream = PageStream(url, header_charset(response.headers), max_bytes, early_stop, crawl)
     try:
-        rp.read()
-        return rp.can_fetch(user_agent, url)
-    except Exception as e:
-        print(f"Warning: Could not read or parse robots.txt at {robots_url}: {e}")
-        return True # Be optimistic if robots.txt fails
+        with span("download") as download:
+            for chunk in response.iter_content(chunk_size=SCRAPER_CHUNK_SIZE):
+                if stream.feed(chunk):
+                    break
+            download.set(bytes=stream.bytes_read) # Includes the parse time recorded separately under "parse"
+    finally:
+        response.close() # Releases (or discards, if cut short) the pooled connection
+    return stream.finish()
 
 # --- Scraper Function ---
-def scrape_store_data(url):
+def scrape_store_data(url, use_cache=True, crawl=False):
     """
     Scrapes enhanced data from a store URL with basic politeness checks.
+    Fresh cached extractions are returned directly; stale ones are revalidated with a conditional GET.
+    crawl=True adds the crawler's fields (internal_urls, images) and is cached separately.
     """
-    print(f"--- Starting scrape for: {url} ---")
+    log.info("Starting scrape for %s", url)
     selected_user_agent = random.choice(USER_AGENTS)
     headers = {'User-Agent': selected_user_agent}
 
     # 1. Check robots.txt
-    if not can_fetch(url, selected_user_agent):
-        print(f"Error: Scraping disallowed by robots.txt for user agent {selected_user_agent}")
+    with span("robots"):
+        allowed = can_fetch(url, selected_user_agent)
+    if not allowed:
+        log.warning("Scraping disallowed by robots.txt for user agent %s", selected_user_agent)
+        count_error("scrape", "robots_disallowed")
         return {"error": "Scraping disallowed by robots.txt"}
 
+    cache_key = f"crawl:{url}" if crawl else url
+    cached = None
+    if use_cache and SCRAPE_CACHE_ENABLED:
+        with span("page_cache") as lookup:
+            cached = page_cache.lookup(cache_key)
+            lookup.set(hit=cached is not None and cached.is_fresh)
+    if cached is not None:
+        if cached.is_fresh:
+            page_cache.record_fresh_hit()
+            log.info("Scrape served from cache")
+            return cached.result
+        headers.update(cached.conditional_headers())
+
     try:
-        time.sleep(random.uniform(1.0, 2.5)) # Increased random delay
-        response = requests.get(url, headers=headers, timeout=20) # Increased timeout
+        # Only waits if this host was fetched recently (or robots.txt asks for a Crawl-delay)
+        with span("politeness_wait"):
+            politeness.wait(url, robots_cache.crawl_delay(url, selected_user_agent))
+        # Pooled keep-alive connection, see http_client.py; with streaming, this returns once the headers are in
+        with span("fetch", url=url) as fetch:
+            response = http_client.get(url, headers=headers, stream=SCRAPER_STREAMING)
+            fetch.set(status=response.status_code)
+        if response.status_code == 304 and cached is not None:
+            response.close()
+            log.info("Scrape revalidated (304 Not Modified), using cached extraction")
+            return page_cache.revalidated_304(cache_key, cached, response.headers)
+        if not response.ok:
+            response.close() # Don't hold a pooled connection for an error body
         response.raise_for_status() # Check for HTTP errors (4xx, 5xx)
 
         if 'text/html' not in response.headers.get('Content-Type', '').lower():
-             print(f"Warning: Content-Type is not HTML ({response.headers.get('Content-Type')})")
+             log.warning("Content-Type is not HTML (%s)", response.headers.get('Content-Type'))
              # Allow processing anyway, but be aware it might fail
              # return {"error": f"Content-Type is not HTML ({response.headers.get('Content-Type')})"}
 
-        soup = BeautifulSoup(response.text, 'html.parser')
-
-        # --- Extract Core Data ---
-        title = soup.title.string.strip() if soup.title else "No Title Found"
-
-        meta_desc_tag = soup.find('meta', attrs={'name': 'description'})
-        description = meta_desc_tag['content'].strip() if meta_desc_tag and meta_desc_tag.get('content') else "No Meta Description Found"
-
-        h1_tag = soup.find('h1')
-        h1_text = h1_tag.get_text(strip=True) if h1_tag else "No H1 Found"
-
-        # --- Extract Headings ---
-        headings = {}
-        for i in range(1, 7):
-            heading_tags = soup.find_all(f'h{i}')
-            if heading_tags:
-                headings[f'h{i}'] = [h.get_text(strip=True) for h in heading_tags]
-
-        # --- Extract Image Alt Text ---
-        alt_texts = []
-        images = soup.find_all('img', limit=10) # Limit to first 10 images
-        for img in images:
-            alt = img.get('alt', '').strip()
-            if alt: # Only include non-empty alt texts
-                alt_texts.append(alt)
-            # else: # Optionally track images missing alt text
-            #    alt_texts.append("Missing Alt Text")
-
-        # --- Extract Schema.org JSON-LD ---
-        schema_data = []
-        schema_scripts = soup.find_all('script', type='application/ld+json')
-        for script in schema_scripts:
-            try:
-                schema_json = json.loads(script.string)
-                schema_data.append(schema_json)
-            except (json.JSONDecodeError, TypeError) as e:
-                print(f"Warning: Could not parse JSON-LD script: {e}")
-                print(f"Script content: {script.string[:100]}...") # Log snippet
-            except Exception as e:
-                 print(f"Warning: Unexpected error parsing JSON-LD script: {e}")
-
-
-        # --- Extract Links ---
-        internal_links = 0
-        external_links = 0
-        base_domain = urlparse(url).netloc
-        links = soup.find_all('a', href=True)
-        for link in links:
-            href = link['href']
-            parsed_href = urlparse(urljoin(url, href)) # Handle relative URLs
-            if parsed_href.netloc == base_domain:
-                internal_links += 1
-            elif parsed_href.scheme in ['http', 'https']: # Basic check for external http(s) links
-                external_links += 1
-
-        # --- Extract Content Snippet (Improved) ---
-        content_source = None
-        selectors = ['main', 'article', 'div[role="main"]', 'body'] # Try common content containers
-        for selector in selectors:
-            content_source = soup.select_one(selector)
-            if content_source:
-                break
-
-        body_text = ""
-        if content_source:
-             # Extract text more broadly within the chosen container
-             # Join text nodes directly, then clean up whitespace
-             all_text = content_source.find_all(string=True)
-             body_text = ' '.join(t.strip() for t in all_text if t.parent.name not in ['script', 'style', 'head', 'title', 'meta', '[document]'] and t.strip())
+        # Single pass over the markup: title, meta, headings, images, JSON-LD, links and content text
+        if SCRAPER_STREAMING:
+            scraped_data = stream_extract(response, url, crawl=crawl)
         else:
-             body_text = "Could not identify main content area."
-
-        max_length = 5000 # Increased max length
-        content_snippet = ' '.join(body_text.split())[:max_length] # Clean whitespace and truncate
-
-        print("--- Scraping successful (enhanced data extracted) ---")
-        return {
-            "url": url,
-            "title": title,
-            "meta_description": description,
-            "h1": h1_text,
-            "headings": headings, # Dict of lists h1-h6
-            "alt_texts": alt_texts, # List of strings
-            "schema_data": schema_data, # List of dicts
-            "links": {"internal": internal_links, "external": external_links}, # Dict
-            "content_snippet": content_snippet # String
-        }
+            with span("parse", bytes=len(response.content)):
+                scraped_data = extract_page_data(response.text, url, crawl=crawl)
+            scraped_data["truncated"] = False
+            PAGE_BYTES.observe(len(response.content))
+
+        if SCRAPE_CACHE_ENABLED: # Written even when the lookup was bypassed, so the fresh result is reused
+            page_cache.save(cache_key, scraped_data, response.headers)
+
+        log.info("Scraping successful (enhanced data extracted)")
+        return scraped_data
     except requests.exceptions.Timeout:
-         print(f"Error: Timeout scraping {url}")
+         count_error("scrape", "Timeout")
+         log.error("Timeout scraping %s", url)
          return {"error": f"Timeout scraping {url}"}
     except requests.exceptions.HTTPError as e:
-         print(f"Error: HTTP Error {e.response.status_code} for {url}")
+         count_error("scrape", f"HTTP {e.response.status_code}")
+         log.error("HTTP Error %s for %s", e.response.status_code, url)
          return {"error": f"HTTP Error {e.response.status_code} for {url}"}
     except requests.exceptions.ConnectionError:
-        print(f"Error: Connection error for {url}")
+        count_error("scrape", "ConnectionError")
+        log.error("Connection error for %s", url)
         return {"error": f"Connection error for {url}"}
     except requests.exceptions.RequestException as e:
-        print(f"Error: General request error scraping {url}: {e}")
+        count_error("scrape", type(e).__name__)
+        log.error("General request error scraping %s: %s", url, e)
         return {"error": f"Request error: {e}"}
     except AttributeError as e:
-         print(f"Error: Could not parse HTML structure (AttributeError): {e}. Page structure might be unexpected.")
+         count_error("scrape", "AttributeError")
+         log.error("Could not parse HTML structure (AttributeError): %s. Page structure might be unexpected.", e)
          return {"error": f"HTML parsing error (AttributeError): {e}"}
     except Exception as e:
-        print(f"An unexpected error occurred during scraping: {e}")
+        count_error("scrape", type(e).__name__)
+        log.exception("An unexpected error occurred during scraping: %s", e)
         return {"error": f"An unexpected error occurred: {e}"}
\ No newline at end of file
@@ -0,0 +1,256 @@
+# Inside backend/seo_rules.py
+"""
+Deterministic on-page SEO checks computed from a scraped-data dict.
+
+Every rule in RULES reads the dict scrape_store_data (or the crawler /
+catalog modes) returns and reports pass / warn / fail with the measured
+value, so the mechanical checks cost no model call. run_seo_rules() is
+the /analyze-shopify "fast" mode; in full mode the same results are put
+into the prompt so the model only writes the creative parts.
+"""
+
+# --- Thresholds (match the limits the SEO prompt asks the model to respect) ---
+TITLE_MIN, TITLE_MAX = 30, 60
+META_MIN, META_MAX = 70, 155
+MAX_EXTERNAL_SHARE = 0.5 # Warn when more than half the links leave the site
+USEFUL_SCHEMA_TYPES = frozenset(["Product", "ProductGroup", "Offer", "CollectionPage", "ItemList", "BreadcrumbList",
+                                 "Organization", "WebSite", "Article", "BlogPosting", "FAQPage"])
+
+PASS, WARN, FAIL, SKIP = "pass", "warn", "fail", "skip"
+_POINTS = {PASS: 1.0, WARN: 0.5, FAIL: 0.0}
+
+_MISSING = {
+    "title": "No Title Found",
+    "meta_description": "No Meta Description Found",
+    "h1": "No H1 Found",
+}
+
+# --- Messages (same two languages as the AI handler) ---
+_MESSAGES = {
+    "title_missing": {"en": "The page has no <title>.", "ro": "Pagina nu are <title>."},
+    "title_short": {"en": "Title is {value} characters; aim for {min}-{max}.", "ro": "Titlul are {value} caractere; ținta este {min}-{max}."},
+    "title_long": {"en": "Title is {value} characters and will be cut off in results; keep it under {max}.",
+                   "ro": "Titlul are {value} caractere și va fi trunchiat în rezultate; păstrați-l sub {max}."},
+    "title_ok": {"en": "Title length ({value} characters) is within {min}-{max}.", "ro": "Lungimea titlului ({value} caractere) este în intervalul {min}-{max}."},
+    "meta_missing": {"en": "The page has no meta description.", "ro": "Pagina nu are meta descriere."},
+    "meta_short": {"en": "Meta description is {value} characters; aim for {min}-{max}.", "ro": "Meta descrierea are {value} caractere; ținta este {min}-{max}."},
+    "meta_long": {"en": "Meta description is {value} characters and will be cut off; keep it under {max}.",
+                  "ro": "Meta descrierea are {value} caractere și va fi trunchiată; păstrați-o sub {max}."},
+    "meta_ok": {"en": "Meta description length ({value} characters) is within {min}-{max}.",
+                "ro": "Lungimea meta descrierii ({value} caractere) este în intervalul {min}-{max}."},
+    "h1_missing": {"en": "The page has no H1 heading.", "ro": "Pagina nu are un titlu H1."},
+    "h1_ok": {"en": "The page has an H1 heading.", "ro": "Pagina are un titlu H1."},
+    "h1_multiple": {"en": "The page has {value} H1 headings; use exactly one.", "ro": "Pagina are {value} titluri H1; folosiți unul singur."},
+    "h1_unique": {"en": "The H1 heading is unique.", "ro": "Titlul H1 este unic."},
+    "hierarchy_gap": {"en": "Heading levels are skipped: {value}.", "ro": "Niveluri de titluri sărite: {value}."},
+    "hierarchy_ok": {"en": "Heading levels follow in order.", "ro": "Nivelurile titlurilor sunt în ordine."},
+    "alt_missing": {"en": "{value} of {total} images have no alt text.", "ro": "{value} din {total} imagini nu au text alternativ."},
+    "alt_ok": {"en": "All {total} images have alt text.", "ro": "Toate cele {total} imagini au text alternativ."},
+    "alt_repeated": {"en": "{value} of {total} images repeat an alt text already used on the page; {file_names} use a file name as alt text.",
+                     "ro": "{value} din {total} imagini repetă un text alternativ deja folosit pe pagină; {file_names} folosesc numele fișierului ca text alternativ."},
+    "alt_distinct": {"en": "Image alt texts are distinct and descriptive.", "ro": "Textele alternative ale imaginilor sunt distincte și descriptive."},
+    "schema_missing": {"en": "No JSON-LD structured data found.", "ro": "Nu au fost găsite date structurate JSON-LD."},
+    "schema_generic": {"en": "Structured data found ({value}) but no commerce or page type.",
+                       "ro": "Date structurate găsite ({value}), dar niciun tip de comerț sau de pagină."},
+    "schema_ok": {"en": "Structured data types present: {value}.", "ro": "Tipuri de date structurate prezente: {value}."},
+    "schema_issues": {"en": "Structured data problems: {value}.", "ro": "Probleme în datele structurate: {value}."},
+    "schema_valid": {"en": "Structured data has the required properties.", "ro": "Datele structurate au proprietățile obligatorii."},
+    "links_none": {"en": "The page has no internal links.", "ro": "Pagina nu are linkuri interne."},
+    "links_external": {"en": "{value}% of links point to other sites.", "ro": "{value}% din linkuri duc către alte site-uri."},
+    "links_ok": {"en": "{internal} internal and {external} external links.", "ro": "{internal} linkuri interne și {external} externe."},
+}
+
+
+def _present(data, key):
+    value = data.get(key)
+    return value is not None and value != _MISSING[key] and value.strip() != ""
+
+
+def schema_types(schema_data):
+    """All @type values in the JSON-LD blocks, including @graph members and list-valued types."""
+    found = []
+    pending = list(schema_data or [])
+    while pending:
+        item = pending.pop(0)
+        if isinstance(item, list):
+            pending.extend(item)
+            continue
+        if not isinstance(item, dict):
+            continue
+        types = item.get("@type")
+        for schema_type in (types if isinstance(types, list) else [types]):
+            if isinstance(schema_type, str) and schema_type not in found:
+                found.append(schema_type)
+        if isinstance(item.get("@graph"), list):
+            pending.extend(item["@graph"])
+    return found
+
+
+# --- Rules: each returns (status, value, message key, message params) ---
+def _title_length(data):
+    if not _present(data, "title"):
+        return FAIL, 0, "title_missing", {}
+    length = len(data["title"].strip())
+    if length < TITLE_MIN:
+        return WARN, length, "title_short", {}
+    if length > TITLE_MAX:
+        return WARN, length, "title_long", {}
+    return PASS, length, "title_ok", {}
+
+def _meta_length(data):
+    if not _present(data, "meta_description"):
+        return FAIL, 0, "meta_missing", {}
+    length = len(data["meta_description"].strip())
+    if length < META_MIN:
+        return WARN, length, "meta_short", {}
+    if length > META_MAX:
+        return WARN, length, "meta_long", {}
+    return PASS, length, "meta_ok", {}
+
+def _h1_present(data):
+    if not _present(data, "h1"):
+        return FAIL, False, "h1_missing", {}
+    return PASS, True, "h1_ok", {}
+
+def _h1_unique(data):
+    count = len(data.get("headings", {}).get("h1", []))
+    if count == 0:
+        return SKIP, 0, None, {}
+    if count > 1:
+        return WARN, count, "h1_multiple", {}
+    return PASS, count, "h1_unique", {}
+
+def _heading_hierarchy(data):
+    levels = sorted(int(level[1]) for level, found in data.get("headings", {}).items() if found)
+    if not levels:
+        return SKIP, [], None, {}
+    # A level is skipped when a deeper one is used without it (h2 -> h4 with no h3); a missing H1 is h1_present's finding
+    skipped = [f"h{level}" for level in range(2, levels[-1]) if level not in levels]
+    if skipped:
+        return WARN, skipped, "hierarchy_gap", {"value": ", ".join(skipped)}
+    return PASS, [], "hierarchy_ok", {}
+
+def _image_alt(data):
+    images = data.get("images")
+    if not isinstance(images, dict) or not images.get("total"):
+        return SKIP, None, None, {}
+    missing, total = images.get("missing_alt", 0), images["total"]
+    if missing:
+        return (FAIL if missing * 2 > total else WARN), missing, "alt_missing", {"total": total}
+    return PASS, 0, "alt_ok", {"total": total}
+
+def _image_alt_quality(data):
+    images = data.get("images")
+    if not isinstance(images, dict) or "duplicate_alt" not in images or not images.get("total"): # Only the audit counts repeats
+        return SKIP, None, None, {}
+    repeated, file_names = images["duplicate_alt"], images.get("file_name_alt", 0)
+    if repeated or file_names:
+        return WARN, repeated, "alt_repeated", {"total": images["total"], "file_names": file_names}
+    return PASS, 0, "alt_distinct", {}
+
+def _schema(data):
+    types = schema_types(data.get("schema_data"))
+    if not types:
+        return FAIL, [], "schema_missing", {}
+    listed = ", ".join(types[:5])
+    if not USEFUL_SCHEMA_TYPES.intersection(types):
+        return WARN, types, "schema_generic", {"value": listed}
+    return PASS, types, "schema_ok", {"value": listed}
+
+def _schema_validity(data):
+    # Audit summaries (page_audit.py) carry "issues"; full JSON-LD documents are not validated here
+    summaries = [item for item in data.get("schema_data") or [] if isinstance(item, dict) and "issues" in item]
+    if not summaries:
+        return SKIP, None, None, {}
+    problems = [f"{_type_label(item)}: {', '.join(item['issues'][:3])}" for item in summaries if item["issues"]]
+    if problems:
+        return WARN, len(problems), "schema_issues", {"value": "; ".join(problems[:3])}
+    return PASS, 0, "schema_valid", {}
+
+def _type_label(summary):
+    types = summary.get("@type")
+    if isinstance(types, list):
+        types = "/".join(schema_type for schema_type in types if isinstance(schema_type, str))
+    return types or "untyped"
+
+def _link_ratio(data):
+    links = data.get("links") or {}
+    internal, external = links.get("internal", 0), links.get("external", 0)
+    if internal == 0:
+        return WARN, (1.0 if external else None), "links_none", {}
+    share = external / (internal + external)
+    params = {"internal": internal, "external": external}
+    if share > MAX_EXTERNAL_SHARE:
+        return WARN, round(share, 2), "links_external", dict(params, value=round(share * 100))
+    return PASS, round(share, 2), "links_ok", params
+
+
+# (id, category, weight, rule). Categories match the sections of the AI report.
+RULES = (
+    ("title_length", "core_seo", 3, _title_length),
+    ("meta_description_length", "core_seo", 3, _meta_length),
+    ("h1_present", "core_seo", 3, _h1_present),
+    ("h1_unique", "core_seo", 1, _h1_unique),
+    ("heading_hierarchy", "content_keywords", 1, _heading_hierarchy),
+    ("image_alt_text", "on_page_technical", 2, _image_alt),
+    ("image_alt_quality", "on_page_technical", 1, _image_alt_quality),
+    ("schema_types", "on_page_technical", 2, _schema),
+    ("schema_validity", "on_page_technical", 1, _schema_validity),
+    ("link_ratio", "on_page_technical", 1, _link_ratio),
+)
+
+
+def run_seo_rules(scraped_data, target_language="en"):
+    """
+    Runs every rule over one scraped-data dict.
+
+    Returns {"score": 0-100, "counts": {...}, "checks": [...]} where each check
+    is {"id", "category", "status", "value", "message"}. Skipped checks (no
+    data to judge) are listed but do not count towards the score.
+    """
+    language = target_language if target_language == "ro" else "en"
+    checks = []
+    earned = possible = 0.0
+    counts = {PASS: 0, WARN: 0, FAIL: 0, SKIP: 0}
+    for rule_id, category, weight, rule in RULES:
+        status, value, message_key, params = rule(scraped_data)
+        counts[status] += 1
+        message = None
+        if message_key:
+            message = _MESSAGES[message_key][language].format(**{"value": value, **_limits(rule_id), **params})
+        checks.append({"id": rule_id, "category": category, "status": status, "value": value, "message": message})
+        if status != SKIP:
+            earned += weight * _POINTS[status]
+            possible += weight
+    return {
+        "score": round(100 * earned / possible) if possible else None,
+        "counts": counts,
+        "checks": checks,
+    }
+
+def _limits(rule_id):
+    if rule_id == "title_length":
+        return {"min": TITLE_MIN, "max": TITLE_MAX}
+    if rule_id == "meta_description_length":
+        return {"min": META_MIN, "max": META_MAX}
+    return {}
+
+
+def rules_prompt_summary(rule_results, categories=None):
+    """Compact lines for the SEO prompt: only what the model should act on (warnings and failures), optionally for some categories."""
+    lines = [f"- [{check['status'].upper()}] {check['id']}: {check['message']}"
+             for check in rule_results["checks"]
+             if check["status"] in (WARN, FAIL) and (categories is None or check["category"] in categories)]
+    if not lines:
+        return "- All automated checks passed."
+    return "\n".join(lines)
+
+
+def fast_analysis(scraped_data, target_language="en"):
+    """The /analyze-shopify answer in "fast" mode: the local checks only, no model call."""
+    return {
+        "analysis_language": target_language,
+        "mode": "fast",
+        "url": scraped_data.get("url"),
+        "rule_checks": run_seo_rules(scraped_data, target_language),
+    }
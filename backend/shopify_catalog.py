@@ -0,0 +1,140 @@
+# Inside backend/shopify_catalog.py
+"""
+Bulk catalog mode for Shopify stores.
+
+Instead of rendering product pages one by one, the store's public
+/products.json and /collections.json feeds are paged through (up to 250
+items per request) and every item is turned into the same dict
+scrape_store_data returns, so it can go straight into the SEO prompt.
+Catalog records add "kind", "handle", "image_list" ([{"src", "alt"}])
+and a few catalog fields; "images" counts the item's images plus those
+inside its description, and "truncated" is always False.
+"""
+import os
+import random
+import logging
+from urllib.parse import urlparse
+
+import requests
+
+import http_client
+from robots_cache import robots_cache
+from politeness import politeness
+from extractor import extract_page_data, MAX_IMAGES
+from scraper import USER_AGENTS
+
+log = logging.getLogger(__name__)
+
+# --- Catalog Settings (override via .env) ---
+CATALOG_PAGE_SIZE = min(int(os.getenv("CATALOG_PAGE_SIZE", 250)), 250) # Items per request (Shopify's maximum is 250)
+CATALOG_MAX_PAGES = int(os.getenv("CATALOG_MAX_PAGES", 200)) # Requests per feed, i.e. up to 50k items at 250 per page
+META_DESCRIPTION_LENGTH = 160 # Shopify themes fall back to this much of the description when no SEO description is set
+
+CATALOG_KINDS = {"products": "product", "collections": "collection"}
+
+
+def store_root(url):
+    """https://store.example/anything -> https://store.example"""
+    parsed = urlparse(url)
+    return f"{parsed.scheme}://{parsed.netloc}"
+
+
+def fetch_catalog_page(store_url, kind, page, user_agent):
+    """One page of /products.json or /collections.json: (items, None) or (None, error dict)."""
+    feed_url = f"{store_root(store_url)}/{kind}.json"
+    if not robots_cache.can_fetch(feed_url, user_agent):
+        return None, {"error": "Scraping disallowed by robots.txt"}
+    try:
+        politeness.wait(feed_url, robots_cache.crawl_delay(feed_url, user_agent))
+        response = http_client.get(feed_url, headers={'User-Agent': user_agent, 'Accept': 'application/json'},
+                                   params={"limit": CATALOG_PAGE_SIZE, "page": page})
+        if response.status_code == 404:
+            return None, {"error": f"No public /{kind}.json feed (not a Shopify store?)"}
+        response.raise_for_status()
+        items = response.json().get(kind)
+    except requests.exceptions.Timeout:
+        return None, {"error": f"Timeout fetching {feed_url}"}
+    except requests.exceptions.HTTPError as e:
+        return None, {"error": f"HTTP Error {e.response.status_code} for {feed_url}"}
+    except requests.exceptions.RequestException as e:
+        return None, {"error": f"Request error: {e}"}
+    except (ValueError, AttributeError):
+        return None, {"error": f"/{kind}.json did not return a Shopify catalog"}
+    if not isinstance(items, list):
+        return None, {"error": f"/{kind}.json did not return a Shopify catalog"}
+    return items, None
+
+
+def catalog_record(store_url, kind, item):
+    """Maps one products.json / collections.json item onto the scraped-data shape."""
+    item_kind = CATALOG_KINDS[kind]
+    handle = item.get("handle") or ""
+    url = f"{store_root(store_url)}/{kind}/{handle}"
+    title = (item.get("title") or "").strip() or "No Title Found"
+    description_html = item.get("body_html") if item_kind == "product" else item.get("description")
+
+    # The description is HTML: the page extractor supplies its text, headings, image alts and link counts
+    record = extract_page_data(f"<body>{description_html or ''}</body>", url)
+    description = record["content_snippet"]
+    if item_kind == "product":
+        images = item.get("images") or []
+    else:
+        images = [item["image"]] if item.get("image") else []
+    images = [{"src": image.get("src"), "alt": (image.get("alt") or "").strip()} for image in images]
+
+    headings = {"h1": [title] + record["headings"].pop("h1", [])} # Themes render the item title as the H1
+    headings.update(record["headings"])
+    record.update({
+        "title": title,
+        "meta_description": description[:META_DESCRIPTION_LENGTH] if description else "No Meta Description Found",
+        "h1": title,
+        "headings": headings,
+        "alt_texts": ([image["alt"] for image in images if image["alt"]] + record["alt_texts"])[:MAX_IMAGES],
+        "content_snippet": description,
+        "truncated": False,
+        "kind": item_kind,
+        "handle": handle,
+        "images": {"total": len(images) + record["images"]["total"],
+                   "missing_alt": sum(1 for image in images if not image["alt"]) + record["images"]["missing_alt"]},
+        "image_list": images,
+    })
+    if item_kind == "product":
+        record.update({
+            "vendor": item.get("vendor"),
+            "product_type": item.get("product_type"),
+            "tags": item.get("tags"),
+            "variant_count": len(item.get("variants") or []),
+        })
+    else:
+        record["products_count"] = item.get("products_count")
+    return record
+
+
+def scrape_shopify_catalog(store_url, kind="products", max_items=None):
+    """
+    Streams catalog records for a Shopify store, one feed page at a time.
+
+    Yields scraped-data dicts (see catalog_record); a failure yields one
+    {"error": ...} dict and ends the stream, so a failure on the first page
+    means the store has no usable feed. Only one page of the feed is held
+    in memory at a time.
+    """
+    if kind not in CATALOG_KINDS:
+        raise ValueError(f"Unknown catalog kind: {kind}")
+    log.info("Starting Shopify catalog scrape (%s) for %s", kind, store_url)
+    user_agent = random.choice(USER_AGENTS)
+    produced = 0
+    for page in range(1, CATALOG_MAX_PAGES + 1):
+        items, failure = fetch_catalog_page(store_url, kind, page, user_agent)
+        if failure:
+            log.error("Catalog page %d of %s: %s", page, store_url, failure['error'])
+            yield failure
+            return
+        for item in items:
+            if max_items is not None and produced >= max_items:
+                return
+            yield catalog_record(store_url, kind, item)
+            produced += 1
+        if len(items) < CATALOG_PAGE_SIZE:
+            break
+    log.info("Catalog scrape finished: %d %s", produced, kind)
@@ -0,0 +1,151 @@
+# Inside backend/single_flight.py
+import os
+import copy
+import asyncio
+import time
+import threading
+
+# --- Coalescing Settings (override via .env) ---
+SINGLE_FLIGHT_TIMEOUT = float(os.getenv("SINGLE_FLIGHT_TIMEOUT", 120)) # Longest a follower waits for the leader
+
+
+class SingleFlightTimeout(TimeoutError):
+    """Raised to a follower whose leader did not finish within the timeout."""
+
+
+class _Call:
+    __slots__ = ("event", "result", "error", "waiters", "started_at")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+        self.started_at = time.monotonic()
+
+
+class SingleFlight:
+    """
+    In-flight request coalescing.
+
+    The first caller for a key (the leader) runs the function; callers that
+    arrive with the same key while it runs (followers) wait for that single
+    result instead of repeating the work. Exceptions raised by the leader are
+    re-raised in every follower. A follower gives up after `timeout` seconds,
+    and a call older than `timeout` is no longer joined, so a hung leader
+    cannot trap later requests.
+    """
+
+    def __init__(self, name, timeout=SINGLE_FLIGHT_TIMEOUT):
+        self.name = name
+        self.timeout = timeout
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+        self.timeouts = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        """Runs fn(*args, **kwargs) once per concurrent key and returns its result to every caller."""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None and time.monotonic() - call.started_at < self.timeout:
+                call.waiters += 1
+                self.coalesced += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.leaders += 1
+                leader = True
+
+        if leader:
+            return self._lead(key, call, fn, args, kwargs)
+        return self._follow(call)
+
+    def _lead(self, key, call, fn, args, kwargs):
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+            call.event.set()
+
+    def _follow(self, call):
+        try:
+            finished = call.event.wait(self.timeout)
+        finally:
+            with self._lock:
+                call.waiters -= 1
+        if not finished:
+            with self._lock:
+                self.timeouts += 1
+            raise SingleFlightTimeout(f"Timed out after {self.timeout:.0f}s waiting for an identical {self.name} request")
+        if call.error is not None:
+            raise call.error
+        return copy.deepcopy(call.result) # Followers get their own copy to modify
+
+    def stats(self):
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "waiting": sum(call.waiters for call in self._calls.values()),
+                "leaders": self.leaders,
+                "coalesced": self.coalesced,
+                "timeouts": self.timeouts,
+            }
+
+
+class AsyncSingleFlight:
+    """
+    Event-loop counterpart of SingleFlight for the ASGI path (main.py).
+
+    The leader's coroutine runs as its own task, so a caller that disconnects
+    (and is cancelled) neither cancels the shared work nor strands the
+    callers waiting on it.
+    """
+
+    def __init__(self, name, timeout=SINGLE_FLIGHT_TIMEOUT):
+        self.name = name
+        self.timeout = timeout
+        self._tasks = {} # key -> (task, started_at)
+        self.leaders = 0
+        self.coalesced = 0
+        self.timeouts = 0
+
+    async def do(self, key, fn, *args, **kwargs):
+        """Awaits fn(*args, **kwargs) once per concurrent key and returns its result to every caller."""
+        running = self._tasks.get(key)
+        if running is not None and time.monotonic() - running[1] < self.timeout:
+            self.coalesced += 1
+            try:
+                result = await asyncio.wait_for(asyncio.shield(running[0]), self.timeout)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                raise SingleFlightTimeout(f"Timed out after {self.timeout:.0f}s waiting for an identical {self.name} request")
+            return copy.deepcopy(result)
+
+        task = asyncio.ensure_future(fn(*args, **kwargs))
+        self._tasks[key] = (task, time.monotonic())
+        self.leaders += 1
+        task.add_done_callback(lambda done: self._forget(key, done))
+        return await asyncio.shield(task)
+
+    def _forget(self, key, task):
+        if self._tasks.get(key, (None,))[0] is task:
+            del self._tasks[key]
+        if not task.cancelled():
+            task.exception() # Mark retrieved so an unawaited failure isn't logged as never retrieved
+
+    def stats(self):
+        return {
+            "in_flight": len(self._tasks),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "timeouts": self.timeouts,
+        }
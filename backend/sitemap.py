@@ -0,0 +1,165 @@
+# Inside backend/sitemap.py
+import os
+import zlib
+import logging
+from urllib.parse import urlparse, urljoin
+from xml.etree.ElementTree import XMLPullParser, ParseError
+
+import requests
+
+import http_client
+from robots_cache import robots_cache
+from politeness import politeness
+
+log = logging.getLogger(__name__)
+
+# --- Sitemap Settings (override via .env) ---
+SITEMAP_MAX_FILES = int(os.getenv("SITEMAP_MAX_FILES", 50)) # Sitemaps (index + children) read per crawl
+SITEMAP_MAX_BYTES = int(os.getenv("SITEMAP_MAX_BYTES", 50 * 1024 * 1024)) # Per sitemap, after decompression (protocol limit)
+SITEMAP_CHUNK_SIZE = int(os.getenv("SITEMAP_CHUNK_SIZE", 64 * 1024))
+
+_GZIP_MAGIC = b'\x1f\x8b'
+_SITEMAP_NS = '{http://www.sitemaps.org/schemas/sitemap/0.9}'
+
+
+def _sitemap_name(tag):
+    """Local name of a sitemaps.org element (or of one without a namespace); None for extensions such as <image:loc>."""
+    if tag.startswith(_SITEMAP_NS):
+        return tag[len(_SITEMAP_NS):]
+    return None if tag.startswith('{') else tag
+
+
+def same_site(url, site_url):
+    """True if url is an http(s) URL on the same host as site_url."""
+    parsed = urlparse(url)
+    return parsed.scheme in ('http', 'https') and parsed.netloc.lower() == urlparse(site_url).netloc.lower()
+
+
+def _inflate(chunks):
+    """Passes chunks through, gunzipping them (in SITEMAP_CHUNK_SIZE pieces) if the data is gzipped."""
+    inflater = None
+    for chunk in chunks:
+        if not chunk:
+            continue
+        if inflater is None:
+            inflater = zlib.decompressobj(16 + zlib.MAX_WBITS) if chunk.startswith(_GZIP_MAGIC) else False
+        if not inflater:
+            yield chunk
+            continue
+        while chunk:
+            yield inflater.decompress(chunk, SITEMAP_CHUNK_SIZE)
+            chunk = inflater.unconsumed_tail
+
+
+def iter_sitemap_locs(chunks):
+    """
+    Streams ("sitemap" | "url", loc) pairs out of sitemap XML fed as byte chunks.
+
+    Only a <loc> directly inside <url>/<sitemap> is the entry's location;
+    extension elements such as <image:image><image:loc> are ignored. Each
+    entry is dropped from the tree as soon as it has been read, so memory
+    stays flat however many entries the file holds. Gzipped sitemaps
+    (sitemap.xml.gz) are inflated on the fly.
+    """
+    parser = XMLPullParser(events=('start', 'end'))
+    root = None
+    open_names = [] # Sitemap element names from the root down to the current element (None for extensions)
+    loc = None
+    total = 0
+    for data in _inflate(chunks):
+        total += len(data)
+        if total > SITEMAP_MAX_BYTES:
+            log.warning("Sitemap exceeds %d bytes, ignoring the rest", SITEMAP_MAX_BYTES)
+            return
+        parser.feed(data)
+        for event, element in parser.read_events():
+            if event == 'start':
+                if root is None:
+                    root = element
+                open_names.append(_sitemap_name(element.tag))
+                continue
+            name = open_names.pop()
+            if name == 'loc':
+                if len(open_names) == 2 and open_names[1] in ('url', 'sitemap'): # <urlset><url><loc>
+                    loc = (element.text or '').strip()
+            elif name in ('url', 'sitemap') and len(open_names) == 1:
+                if loc:
+                    yield name, loc
+                loc = None
+                root.clear() # Entries are direct children of <urlset>/<sitemapindex>
+    parser.close()
+
+
+class SitemapReader:
+    """
+    Lazily yields the page URLs listed in a site's sitemaps.
+
+    Sitemaps come from robots.txt Sitemap: lines, else /sitemap.xml. Sitemap
+    indexes are followed breadth-first up to SITEMAP_MAX_FILES files; each
+    file is downloaded with the shared pooled session, spaced by the
+    politeness scheduler and parsed while it streams in. Only sitemaps and
+    URLs on the crawled host are followed, so a sitemap index cannot point
+    the server at another host; the caller stops pulling once it has enough.
+    """
+
+    def __init__(self, site_url, user_agent, max_files=SITEMAP_MAX_FILES):
+        self.site_url = site_url
+        self.user_agent = user_agent
+        self.max_files = max_files
+        self.files_read = 0
+        self.urls_listed = 0
+        self.errors = []
+
+    def sitemap_urls(self):
+        """Sitemaps advertised in robots.txt, else the conventional /sitemap.xml."""
+        entry = robots_cache.get_entry(self.site_url, self.user_agent)
+        listed = entry.parser.site_maps() if entry is not None and entry.parser is not None else None
+        return list(listed) if listed else [urljoin(self.site_url, '/sitemap.xml')]
+
+    def urls(self):
+        pending = [url for url in self.sitemap_urls() if self._on_site(url)]
+        queued = set(pending)
+        while pending and self.files_read < self.max_files:
+            sitemap_url = pending.pop(0)
+            self.files_read += 1
+            for kind, loc in self._read(sitemap_url):
+                if kind == 'sitemap':
+                    if loc not in queued and len(queued) < self.max_files and self._on_site(loc):
+                        queued.add(loc)
+                        pending.append(loc)
+                elif same_site(loc, self.site_url):
+                    self.urls_listed += 1
+                    yield loc
+
+    def _on_site(self, sitemap_url):
+        if same_site(sitemap_url, self.site_url):
+            return True
+        self._error(sitemap_url, "Skipped: sitemap is not on the crawled host")
+        return False
+
+    def _read(self, sitemap_url):
+        try:
+            politeness.wait(sitemap_url, robots_cache.crawl_delay(sitemap_url, self.user_agent))
+            response = http_client.get(sitemap_url, headers={'User-Agent': self.user_agent}, stream=True)
+        except requests.exceptions.RequestException as e:
+            self._error(sitemap_url, f"Request error: {e}")
+            return
+        try:
+            if not response.ok:
+                self._error(sitemap_url, f"HTTP Error {response.status_code}")
+                return
+            yield from iter_sitemap_locs(response.iter_content(chunk_size=SITEMAP_CHUNK_SIZE))
+        except (ParseError, zlib.error) as e:
+            self._error(sitemap_url, f"Could not parse sitemap: {e}")
+        except requests.exceptions.RequestException as e:
+            self._error(sitemap_url, f"Request error: {e}")
+        finally:
+            response.close() # Also runs when the caller stops pulling early
+
+    def _error(self, sitemap_url, message):
+        log.warning("Sitemap %s: %s", sitemap_url, message)
+        if len(self.errors) < 20:
+            self.errors.append({"sitemap": sitemap_url, "error": message})
+
+    def stats(self):
+        return {"files_read": self.files_read, "urls_listed": self.urls_listed, "errors": self.errors}
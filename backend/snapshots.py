@@ -0,0 +1,151 @@
+# Inside backend/snapshots.py
+"""
+Per-URL analysis snapshots for incremental re-analysis.
+
+After a successful /analyze-shopify run, the digests of the scraped fields
+each report section reads (prompt_compiler.SHOPIFY_SECTION_FIELDS) are stored
+with the model's sections, keyed by language and URL. The next analysis of
+the same URL compares digests and regenerates only the sections whose inputs
+changed; the rest are taken from the snapshot. A page whose meta description
+changed costs one core_seo call instead of a full report.
+
+Each section keeps the time it was generated, and a reused section carries
+that time over, so a page analysed every day still has every section
+regenerated once it is SNAPSHOT_MAX_AGE old.
+"""
+import os
+import json
+import time
+import hashlib
+import threading
+
+from cache_store import TieredCache, CACHE_DIR
+from prompt_compiler import SHOPIFY_SECTIONS, SHOPIFY_SECTION_FIELDS
+
+# --- Snapshot Settings (override via .env) ---
+SNAPSHOTS_ENABLED = os.getenv("SNAPSHOTS_ENABLED", "1") == "1"
+SNAPSHOT_MAX_AGE = int(os.getenv("SNAPSHOT_MAX_AGE", 30 * 86400)) # Sections (and snapshots) older than this are regenerated
+SNAPSHOT_MEMORY_ENTRIES = int(os.getenv("SNAPSHOT_MEMORY_ENTRIES", 256))
+SNAPSHOT_DISK_ENTRIES = int(os.getenv("SNAPSHOT_DISK_ENTRIES", 20000)) # 0 disables the disk tier
+SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH", os.path.join(CACHE_DIR, "snapshots.sqlite3"))
+
+_TRACKED_FIELDS = sorted(set().union(*SHOPIFY_SECTION_FIELDS.values()))
+
+
+def field_digests(scraped_data):
+    """Short content hash of every scraped field a report section reads."""
+    digests = {}
+    for field in _TRACKED_FIELDS:
+        material = json.dumps(scraped_data.get(field), sort_keys=True, ensure_ascii=False)
+        digests[field] = hashlib.sha256(material.encode('utf-8')).hexdigest()[:16]
+    return digests
+
+
+class Snapshot:
+    """A stored analysis: field digests, the report sections generated from them and when each was generated."""
+    __slots__ = ("digests", "sections", "generated_at", "stored_at")
+
+    def __init__(self, digests, sections, generated_at, stored_at):
+        self.digests = digests
+        self.sections = sections
+        self.generated_at = generated_at
+        self.stored_at = stored_at
+
+    def changed_fields(self, digests):
+        return [field for field in _TRACKED_FIELDS if self.digests.get(field) != digests.get(field)]
+
+    def section_age(self, section, now=None):
+        return (now or time.time()) - self.generated_at.get(section, self.stored_at)
+
+    def stale_sections(self, digests, max_age=SNAPSHOT_MAX_AGE):
+        """Sections to regenerate: an input changed, the snapshot lacks the section, or it is max_age old."""
+        changed = set(self.changed_fields(digests))
+        now = time.time()
+        return [section for section in SHOPIFY_SECTIONS
+                if section not in self.sections or changed.intersection(SHOPIFY_SECTION_FIELDS[section])
+                or self.section_age(section, now) >= max_age]
+
+
+class SnapshotStore:
+    """Latest analysis per (language, URL), with counters of the model work it saved."""
+
+    def __init__(self, store, max_age=SNAPSHOT_MAX_AGE, enabled=SNAPSHOTS_ENABLED):
+        self.store = store
+        self.max_age = max_age
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.stores = 0
+        self.sections_regenerated = 0
+        self.sections_reused = 0
+
+    @staticmethod
+    def _key(url, target_language):
+        return f"{target_language}|{url}"
+
+    def lookup(self, url, target_language):
+        """Returns the Snapshot for the URL, or None if there is none (or it is too old)."""
+        if not self.enabled:
+            return None
+        cached = self.store.get(self._key(url, target_language))
+        with self._lock:
+            if cached is None:
+                self.misses += 1
+                return None
+            entry, stored_at = cached
+            if time.time() - stored_at >= self.max_age:
+                self.expired += 1
+                self.misses += 1
+                return None
+            self.hits += 1
+        # Snapshots stored before per-section times count every section as generated at stored_at
+        return Snapshot(entry["digests"], entry["sections"], entry.get("generated_at", {}), stored_at)
+
+    def save(self, url, target_language, digests, result, regenerated=SHOPIFY_SECTIONS, previous=None):
+        """
+        Stores the report sections of a successful analysis. Sections not in
+        regenerated were reused from previous and keep its generation time.
+        """
+        if not self.enabled:
+            return
+        sections = {section: result[section] for section in SHOPIFY_SECTIONS if isinstance(result.get(section), dict)}
+        if not sections:
+            return
+        now = time.time()
+        generated_at = {section: now if section in regenerated or previous is None else previous.generated_at.get(section, previous.stored_at)
+                        for section in sections}
+        self.store.set(self._key(url, target_language), {"digests": digests, "sections": sections, "generated_at": generated_at})
+        with self._lock:
+            self.stores += 1
+
+    def record(self, regenerated, reused):
+        with self._lock:
+            self.sections_regenerated += regenerated
+            self.sections_reused += reused
+
+    def invalidate(self):
+        self.store.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                "enabled": self.enabled,
+                "hits": self.hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "stores": self.stores,
+                "sections_regenerated": self.sections_regenerated,
+                "sections_reused": self.sections_reused,
+            }
+        stats["store"] = self.store.stats()
+        return stats
+
+
+snapshots = SnapshotStore(TieredCache(
+    "analysis_snapshots",
+    max_entries=SNAPSHOT_MEMORY_ENTRIES,
+    disk_path=SNAPSHOT_PATH if SNAPSHOT_DISK_ENTRIES > 0 else None,
+    disk_max_entries=SNAPSHOT_DISK_ENTRIES,
+))
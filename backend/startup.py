@@ -0,0 +1,130 @@
+# Inside backend/startup.py
+"""
+Worker start-up: optional warm-up and cold-start timings.
+
+The expensive per-process resources (the Gemini client, the language
+detector's profiles, the HTTP session, the HTML parser backend) are created
+on first use by their own modules, in the process that uses them: importing
+the app stays fast, and a preforked worker never inherits its parent's
+sockets or gRPC channels. Each module registers how to build its resource
+here with register_warmer().
+
+WARM_UP=1 builds all of them in a background thread as soon as a process
+starts serving, and again in every child after fork(), so the first request
+does not pay for them either.
+
+Timings are kept per process and reported on /stats ("startup") and as
+elementopt_startup_seconds{phase} on /metrics: module import time, the
+creation time of each resource, the warm-up, and the first request served.
+"""
+import os
+import time
+import logging
+import threading
+
+from observability import STARTUP_SECONDS
+
+log = logging.getLogger(__name__)
+
+# --- Start-up Settings (override via .env) ---
+WARM_UP = os.getenv("WARM_UP", "0") == "1" # Create the lazy resources in the background when a worker starts
+
+_warmers = {} # name -> callable creating the resource (a no-op once it exists)
+
+
+class _Timings:
+    """Cold-start timings of one process."""
+
+    def __init__(self, imports=None):
+        self.pid = os.getpid()
+        self.started = time.perf_counter()
+        self.imports = dict(imports or {}) # A forked child inherits its parent's imports, and their cost
+        self.resources = {}
+        self.warm_up = None
+        self.first_request = None
+
+
+_lock = threading.Lock()
+_timings = _Timings()
+
+
+def _set(phase, seconds):
+    STARTUP_SECONDS.labels(phase).set(seconds)
+
+
+def record_import(module, started):
+    """Records the import time of an entry module (app, main); started is a perf_counter() value."""
+    seconds = time.perf_counter() - started
+    with _lock:
+        _timings.imports[module] = round(seconds, 4)
+    _set(f"import_{module}", seconds)
+    log.info("Imported %s in %.2fs", module, seconds)
+
+
+def record_resource(name, seconds):
+    """Records how long creating a lazy resource took in this process."""
+    with _lock:
+        _timings.resources[name] = round(seconds, 4)
+    _set(f"init_{name}", seconds)
+    log.info("Created %s in %.2fs", name, seconds)
+
+
+def register_warmer(name, create):
+    _warmers[name] = create
+
+
+def warm_up():
+    """Creates every registered resource now; failures are logged, the worker serves regardless."""
+    started = time.perf_counter()
+    failed = []
+    for name, create in list(_warmers.items()):
+        try:
+            create()
+        except Exception as e:
+            log.warning("Warm-up of %s failed: %s", name, e)
+            failed.append(name)
+    seconds = time.perf_counter() - started
+    with _lock:
+        _timings.warm_up = {"seconds": round(seconds, 4), "failed": failed}
+    _set("warm_up", seconds)
+    log.info("Warm-up finished in %.2fs", seconds)
+
+
+def start_warm_up():
+    """Runs warm_up() in a background thread if WARM_UP is set."""
+    if WARM_UP:
+        threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+
+
+def note_request(seconds):
+    """Called for every finished request; keeps the first one of this process."""
+    if _timings.first_request is not None:
+        return
+    with _lock:
+        if _timings.first_request is not None:
+            return
+        after_start = time.perf_counter() - _timings.started
+        _timings.first_request = {"seconds": round(seconds, 4), "after_start_seconds": round(after_start, 4)}
+    _set("first_request", seconds)
+    log.info("First request of worker %d took %.2fs (%.2fs after it started)", os.getpid(), seconds, after_start)
+
+
+def stats():
+    with _lock:
+        return {"pid": _timings.pid, "warm_up_enabled": WARM_UP, "imports": dict(_timings.imports),
+                "resources": dict(_timings.resources), "warm_up": _timings.warm_up, "first_request": _timings.first_request,
+                "uptime_seconds": round(time.perf_counter() - _timings.started, 1)}
+
+
+def _after_fork_in_child():
+    global _lock, _timings
+    _lock = threading.Lock() # A lock held by another thread at fork() time would never be released in the child
+    _timings = _Timings(_timings.imports)
+    STARTUP_SECONDS.clear() # The parent's resources, warm-up and first request are not this worker's
+    for module, seconds in _timings.imports.items():
+        _set(f"import_{module}", seconds)
+    start_warm_up()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
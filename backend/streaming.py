@@ -0,0 +1,136 @@
+# Inside backend/streaming.py
+"""
+Server-Sent Events helpers for the /analyze-shopify/stream and
+/generate-social/stream endpoints (Flask in app.py, ASGI in main.py).
+
+Event stream of one request:
+  progress  {"stage": ..., "message": ...}   scrape / generation milestones
+  checks    {"score", "counts", "checks"}     local rule checks (seo_rules.py), right after the scrape
+  chunk     {"text": ...}                    raw model output as it arrives
+  section   {"key": ..., "value": ...}       a top-level key of the JSON answer, once complete
+  result    {...}                            the same JSON the non-streaming endpoint returns
+  error     {"error": ..., "status": ...}    terminal failure (same message and status code)
+  trace     {"trace_id", "spans", ...}        per-stage timings, last (TRACE_IN_RESPONSE, see observability.py)
+"""
+import json
+
+from observability import start_trace, TRACE_IN_RESPONSE
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no", # Stop nginx from buffering the stream
+}
+
+
+def sse(event, data):
+    """Formats one Server-Sent Event frame."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def error_event(body, status_code):
+    return sse("error", dict(body, status=status_code))
+
+
+def traced_events(name, events):
+    """Runs an event generator inside a trace and ends the stream with its trace event."""
+    with start_trace(name) as trace:
+        yield from events
+    if TRACE_IN_RESPONSE:
+        yield sse("trace", trace.to_dict())
+
+
+async def traced_events_async(name, events):
+    with start_trace(name) as trace:
+        async for event in events:
+            yield event
+    if TRACE_IN_RESPONSE:
+        yield sse("trace", trace.to_dict())
+
+
+def scraped_summary(scraped_data):
+    """The part of a scrape worth showing while the model is still working."""
+    return {
+        "url": scraped_data.get("url"),
+        "title": scraped_data.get("title"),
+        "meta_description": scraped_data.get("meta_description"),
+        "h1": scraped_data.get("h1"),
+        "truncated": scraped_data.get("truncated", False),
+    }
+
+
+class JsonSectionScanner:
+    """
+    Incremental scanner over a streamed JSON object.
+
+    feed() takes the next piece of model output and returns the top-level
+    (key, value) pairs that completed within it, so the frontend can render
+    each section without waiting for the closing brace. Anything before the
+    first '{' (such as a ```json fence) is ignored, and a value that does not
+    parse is skipped; the final result event is authoritative either way.
+    """
+
+    def __init__(self):
+        self._text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._key_start = None
+        self._key = None
+        self._value_start = None
+        self.done = False
+
+    def feed(self, text):
+        self._text += text
+        sections = []
+        t = self._text
+        i = self._pos
+        while i < len(t) and not self.done:
+            c = t[i]
+            if self._depth == 0:
+                if c == '{':
+                    self._depth = 1
+            elif self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == '\\':
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._key_start is not None and self._key is None:
+                        self._key = json.loads(t[self._key_start:i + 1])
+            elif c == '"':
+                self._in_string = True
+                if self._depth == 1 and self._key is None:
+                    self._key_start = i
+            elif c in '{[':
+                self._depth += 1
+            elif c in '}]':
+                self._depth -= 1
+                if self._depth == 0:
+                    self._emit(t, i, sections)
+                    self.done = True
+            elif self._depth == 1 and c == ':' and self._key is not None and self._value_start is None:
+                self._value_start = i + 1
+            elif self._depth == 1 and c == ',':
+                self._emit(t, i, sections)
+            i += 1
+        # Completed sections are no longer needed; keep only the open one
+        keep_from = self._value_start if self._value_start is not None else (self._key_start if self._key_start is not None else i)
+        keep_from = min(keep_from, i)
+        self._text = t[keep_from:]
+        self._pos = i - keep_from
+        for attr in ('_key_start', '_value_start'):
+            if getattr(self, attr) is not None:
+                setattr(self, attr, getattr(self, attr) - keep_from)
+        return sections
+
+    def _emit(self, t, end, sections):
+        if self._key is not None and self._value_start is not None:
+            try:
+                sections.append((self._key, json.loads(t[self._value_start:end])))
+            except ValueError:
+                pass
+        self._key_start = None
+        self._key = None
+        self._value_start = None
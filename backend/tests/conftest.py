@@ -0,0 +1,17 @@
+# Inside backend/tests/conftest.py
+"""
+Shared setup for the backend unit tests. Run from backend/:  python -m pytest tests
+
+The backend modules are flat imports (as app.py uses them), so backend/ goes
+on sys.path. Settings read at import time point the caches at a temporary
+directory and turn off politeness delays before any module is imported.
+"""
+import os
+import sys
+import tempfile
+
+os.environ.setdefault("CACHE_DIR", tempfile.mkdtemp(prefix="elementopt-tests-"))
+os.environ.setdefault("POLITENESS_MIN_DELAY", "0")
+os.environ.setdefault("POLITENESS_MAX_DELAY", "0")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,241 @@
+# Inside backend/tests/test_ai_pipeline.py
+"""
+The analysis pipelines of ai_handler against a scripted stand-in model
+(benchmarks.fake_gemini): blocking, async and both streaming variants must
+produce the same report, re-request only invalid sections and reuse
+unchanged sections from the snapshot.
+"""
+import json
+import asyncio
+import itertools
+
+import pytest
+
+import ai_handler
+from ai_cache import ai_cache
+from benchmarks import corpus
+from benchmarks.fake_gemini import FakeGeminiModel, FakeResponse, InjectedQuotaError, answer_for
+from extractor import extract_page_data
+from gemini_governor import GeminiGovernor
+from prompt_compiler import SHOPIFY_SECTIONS, count_tokens
+
+_urls = itertools.count()
+
+
+class ScriptedModel(FakeGeminiModel):
+    """Answers with the prompt's example JSON, passed through edit(prompt, answer) first; records every prompt."""
+
+    def __init__(self, edit=None, fail=False):
+        super().__init__()
+        self.edit = edit
+        self.fail = fail
+        self.prompts = []
+
+    def _respond(self, prompt_text, fail):
+        self.prompts.append(prompt_text)
+        if self.fail:
+            raise InjectedQuotaError("429 quota (test)")
+        answer = json.loads(answer_for(prompt_text))
+        text = self.edit(prompt_text, answer) if self.edit else json.dumps(answer)
+        return FakeResponse(text, count_tokens(prompt_text))
+
+
+@pytest.fixture
+def model(monkeypatch):
+    monkeypatch.setattr(ai_handler, "gemini_governor", GeminiGovernor(rpm=1e6, tpm=1e9, max_retries=0, breaker_threshold=1000))
+    ai_cache.invalidate() # Every test sees its own model answers
+    installed = []
+
+    def install(edit=None, fail=False):
+        fake = ScriptedModel(edit, fail)
+        ai_handler.set_model(fake)
+        installed.append(fake)
+        return fake
+
+    yield install
+    ai_handler.set_model(None)
+
+
+def scraped_page():
+    """A corpus product page under a URL no other test has analysed (snapshots are per URL)."""
+    url = f"https://tests.myshopify.com/products/item-{next(_urls)}"
+    return extract_page_data(corpus.page("product-small").decode("utf-8"), url)
+
+
+def _collect_stream(events):
+    chunks, results = [], []
+    for kind, value in events:
+        (chunks if kind == "chunk" else results).append(value)
+    assert len(results) == 1
+    return chunks, results[0]
+
+
+async def _collect_stream_async(events):
+    return _collect_stream([event async for event in events])
+
+
+def run_shopify(variant, scraped, language="en", bypass_cache=False):
+    if variant == "blocking":
+        return ai_handler.get_shopify_seo_ai(scraped, language, bypass_cache)
+    if variant == "async":
+        return asyncio.run(ai_handler.get_shopify_seo_ai_async(scraped, language, bypass_cache))
+    if variant == "stream":
+        return _collect_stream(ai_handler.stream_shopify_seo_ai(scraped, language, bypass_cache))[1]
+    return asyncio.run(_collect_stream_async(ai_handler.stream_shopify_seo_ai_async(scraped, language, bypass_cache)))[1]
+
+
+def run_social(variant, platform, topic="Linen shirts for summer", keywords="linen, summer"):
+    if variant == "blocking":
+        return ai_handler.get_social_media_ai(platform, topic, keywords, "en")
+    if variant == "async":
+        return asyncio.run(ai_handler.get_social_media_ai_async(platform, topic, keywords, "en"))
+    if variant == "stream":
+        return _collect_stream(ai_handler.stream_social_media_ai(platform, topic, keywords, "en"))[1]
+    return asyncio.run(_collect_stream_async(ai_handler.stream_social_media_ai_async(platform, topic, keywords, "en")))[1]
+
+
+VARIANTS = ("blocking", "async", "stream", "stream_async")
+
+
+def _report(result):
+    """The parts of a report that do not depend on timing."""
+    return {key: value for key, value in result.items() if key not in ("prompt_tokens",)}
+
+
+@pytest.mark.parametrize("variant", VARIANTS)
+def test_full_report(model, variant):
+    fake = model()
+    result = run_shopify(variant, scraped_page())
+    assert "error" not in result, result
+    assert all(section in result for section in SHOPIFY_SECTIONS)
+    assert result["incremental"]["regenerated"] == list(SHOPIFY_SECTIONS)
+    assert result["prompt_tokens"]["tokens"] > 0
+    assert isinstance(result["rule_checks"], dict)
+    assert len(fake.prompts) == 1
+
+
+def test_variants_agree(model):
+    model()
+    scraped = scraped_page()
+    reports = [_report(run_shopify(variant, scraped, bypass_cache=True)) for variant in VARIANTS]
+    assert all(report == reports[0] for report in reports[1:])
+
+
+@pytest.mark.parametrize("variant", VARIANTS)
+def test_unchanged_page_reuses_the_snapshot(model, variant):
+    fake = model()
+    scraped = scraped_page()
+    run_shopify(variant, scraped)
+    again = run_shopify(variant, scraped)
+    assert len(fake.prompts) == 1 # No model call for the second run
+    assert again["incremental"] == {"regenerated": [], "reused": list(SHOPIFY_SECTIONS), "changed_fields": []}
+
+
+@pytest.mark.parametrize("variant", VARIANTS)
+def test_invalid_section_is_re_requested_alone(model, variant):
+    def drop_on_first_call(prompt, answer):
+        if len(fake.prompts) == 1:
+            answer.pop("on_page_technical")
+        return json.dumps(answer)
+    fake = model(drop_on_first_call)
+    result = run_shopify(variant, scraped_page())
+    assert "error" not in result and "invalid_sections" not in result
+    assert "on_page_technical" in result
+    assert len(fake.prompts) == 2
+    retry_answer = json.loads(answer_for(fake.prompts[1]))
+    assert set(retry_answer) - {"analysis_language"} == {"on_page_technical"}
+
+
+@pytest.mark.parametrize("variant", VARIANTS)
+def test_unusable_answers_are_an_error(model, variant):
+    fake = model(lambda prompt, answer: "I cannot help with that.")
+    result = run_shopify(variant, scraped_page())
+    assert "error" in result
+    assert len(fake.prompts) == 2 # The answer and one re-request
+
+
+@pytest.mark.parametrize("variant", VARIANTS)
+def test_model_failure_is_an_error(model, variant):
+    model(fail=True)
+    result = run_shopify(variant, scraped_page())
+    assert "error" in result
+
+
+@pytest.mark.parametrize("variant", VARIANTS)
+def test_invalid_scraped_data(model, variant):
+    fake = model()
+    assert run_shopify(variant, {"error": "HTTP Error 404"})["error"].startswith("Invalid or missing scraped data")
+    assert fake.prompts == []
+
+
+def test_streaming_yields_the_answer_in_chunks(model):
+    model()
+    chunks, result = _collect_stream(ai_handler.stream_shopify_seo_ai(scraped_page(), "en", True))
+    assert len(chunks) > 1
+    assert json.loads("".join(chunks))["core_seo"] == result["core_seo"]
+
+
+@pytest.mark.parametrize("variant", VARIANTS)
+def test_prompt_tokens_report_the_models_count(model, variant):
+    fake = model()
+    report = run_shopify(variant, scraped_page())["prompt_tokens"]
+    assert report["measured"] == count_tokens(fake.prompts[0]) # The count the fake model reports in usage_metadata
+    assert report["tokens"] > 0
+
+
+def test_cached_answer_has_no_measured_count(model):
+    model()
+    assert run_social("blocking", "youtube", topic="Cached topic")["prompt_tokens"]["measured"] > 0
+    assert run_social("blocking", "youtube", topic="Cached topic")["prompt_tokens"]["measured"] is None
+
+
+@pytest.mark.parametrize("variant", VARIANTS)
+def test_social(model, variant):
+    fake = model()
+    result = run_social(variant, "instagram")
+    assert "error" not in result and "invalid_sections" not in result
+    assert len(fake.prompts) == 1
+
+
+@pytest.mark.parametrize("variant", VARIANTS)
+def test_social_invalid_answer_is_asked_again(model, variant):
+    def empty_first(prompt, answer):
+        return "{}" if len(fake.prompts) == 1 else json.dumps(answer)
+    fake = model(empty_first)
+    result = run_social(variant, "pinterest", topic=f"Topic {variant}")
+    assert "error" not in result and "invalid_sections" not in result
+    assert len(fake.prompts) == 2
+
+
+def test_unsupported_platform(model):
+    model()
+    assert "Unsupported social platform" in ai_handler.get_social_media_ai("myspace", "A topic", "", "en")["error"]
+
+
+@pytest.mark.parametrize("use_async", (False, True))
+def test_combined_social_re_requests_only_invalid_platforms(model, use_async):
+    def drop_youtube(prompt, answer):
+        answer.pop("youtube", None)
+        return json.dumps(answer)
+    fake = model(drop_youtube)
+    arguments = (["instagram", "youtube"], f"Combined {use_async}", "linen", "en", True)
+    if use_async:
+        result = asyncio.run(ai_handler.get_multi_social_media_ai_async(*arguments))
+    else:
+        result = ai_handler.get_multi_social_media_ai(*arguments)
+    assert result["mode"] == "combined"
+    assert result["succeeded"] == ["instagram", "youtube"], result
+    assert len(fake.prompts) == 2
+    assert "combined" not in fake.prompts[1].lower() or "youtube" in fake.prompts[1].lower()
+
+
+@pytest.mark.parametrize("use_async", (False, True))
+def test_concurrent_social(model, use_async):
+    fake = model()
+    arguments = (["instagram", "pinterest", "youtube"], f"Concurrent {use_async}", "", "en")
+    if use_async:
+        result = asyncio.run(ai_handler.get_multi_social_media_ai_async(*arguments))
+    else:
+        result = ai_handler.get_multi_social_media_ai(*arguments)
+    assert result["mode"] == "concurrent" and result["failed"] == []
+    assert len(fake.prompts) == 3
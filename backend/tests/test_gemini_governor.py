@@ -0,0 +1,301 @@
+# Inside backend/tests/test_gemini_governor.py
+"""
+GeminiGovernor on a fake clock: time.monotonic and time.sleep are replaced,
+so rate limits, backoffs and the breaker cooldown are checked by the waits
+the governor asks for instead of by sleeping through them. The model is
+benchmarks.fake_gemini, with quota errors injected on demand.
+"""
+import asyncio
+import types
+
+import pytest
+
+import gemini_governor
+from benchmarks.fake_gemini import FakeGeminiModel, InjectedQuotaError
+from gemini_governor import GeminiGovernor, GovernorRejected, TokenBucket, estimate_tokens, is_retryable, retry_after, GEMINI_OUTPUT_TOKENS
+
+PROMPT = "Write one product title."
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(round(seconds, 3))
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(gemini_governor, "time", fake)
+    # Full jitter draws its upper bound, so backoffs are deterministic
+    monkeypatch.setattr(gemini_governor, "random", types.SimpleNamespace(uniform=lambda low, high: high))
+    return fake
+
+
+def _governor(**overrides):
+    settings = dict(rpm=1000, tpm=10 ** 7, max_concurrency=4, max_retries=2, max_wait=60, breaker_threshold=3, breaker_cooldown=30)
+    settings.update(overrides)
+    return GeminiGovernor(**settings)
+
+
+def _ok(model=None):
+    model = model or FakeGeminiModel()
+    return lambda: model.generate_content(PROMPT)
+
+
+def _quota(message="429 Resource has been exhausted"):
+    def fail():
+        raise InjectedQuotaError(message)
+    return fail
+
+
+def _failing_then_ok(failures, message="429 Resource has been exhausted"):
+    calls = []
+
+    def fn():
+        calls.append(1)
+        if len(calls) <= failures:
+            raise InjectedQuotaError(message)
+        return FakeGeminiModel().generate_content(PROMPT)
+    return fn
+
+
+# --- Token buckets ---
+def test_token_bucket_refills_continuously(clock):
+    bucket = TokenBucket(60)
+    bucket.take(60)
+    assert bucket.wait_for(1, clock.now) == pytest.approx(1.0)
+    clock.now += 0.5
+    assert bucket.wait_for(1, clock.now) == pytest.approx(0.5)
+    clock.now += 3600
+    assert bucket.wait_for(60, clock.now) == 0.0
+    assert bucket.level == 60 # Capped at a minute's worth
+
+
+def test_token_bucket_give_back_is_capped(clock):
+    bucket = TokenBucket(10)
+    bucket.take(4)
+    bucket.give_back(100)
+    assert bucket.level == 10
+
+
+def test_calls_beyond_the_request_budget_wait_their_turn(clock):
+    governor = _governor(rpm=2)
+    for _ in range(3):
+        governor.call(_ok(), PROMPT)
+    assert clock.sleeps == [30.0] # Third call: one request refills every 30s
+    assert governor.stats()["throttled_seconds"] == 30.0
+
+
+def test_calls_wait_for_the_token_budget(clock):
+    per_call = estimate_tokens(PROMPT) + GEMINI_OUTPUT_TOKENS
+    governor = _governor(tpm=per_call)
+    model = FakeGeminiModel()
+    response = governor.call(_ok(model), PROMPT)
+    used = response.usage_metadata.total_token_count
+    assert governor.stats()["tokens_available"] == per_call - used # The reservation is settled against actual usage
+    governor.call(_ok(model), PROMPT)
+    assert clock.sleeps and clock.sleeps[0] > 0
+
+
+def test_call_that_would_queue_past_max_wait_is_rejected(clock):
+    governor = _governor(rpm=1, max_wait=10)
+    governor.call(_ok(), PROMPT)
+    with pytest.raises(GovernorRejected, match="rate limit"):
+        governor.call(_ok(), PROMPT)
+    stats = governor.stats()
+    assert stats["rejected"] == 1 and stats["calls"] == 1 and clock.sleeps == []
+
+
+# --- Backoff and retry hints ---
+def test_retryable_failure_backs_off_and_retries(clock):
+    governor = _governor()
+    governor.call(_failing_then_ok(2), PROMPT)
+    assert clock.sleeps == [1.0, 2.0] # Base 1s, doubled per attempt
+    stats = governor.stats()
+    assert stats["retries"] == 2 and stats["successes"] == 1 and stats["consecutive_failures"] == 0
+
+
+def test_retries_are_limited(clock):
+    governor = _governor(max_retries=1)
+    with pytest.raises(InjectedQuotaError):
+        governor.call(_quota(), PROMPT)
+    assert clock.sleeps == [1.0]
+    assert governor.stats()["failures"] == 2
+
+
+def test_non_retryable_error_is_raised_at_once(clock):
+    governor = _governor()
+
+    def bad_request():
+        raise ValueError("400 Invalid argument")
+    with pytest.raises(ValueError):
+        governor.call(bad_request, PROMPT)
+    assert clock.sleeps == []
+    assert governor.stats()["consecutive_failures"] == 0 # Our mistake, not the API's health
+
+
+def test_retry_hint_sets_the_backoff(clock):
+    governor = _governor()
+    governor.call(_failing_then_ok(1, "429 Quota exceeded, retry in 7s"), PROMPT)
+    assert clock.sleeps == [pytest.approx(7.7)] # Hint plus up to 10% jitter, longer than the 1s base
+
+
+def test_retry_hint_pauses_every_caller(clock):
+    governor = _governor(max_retries=0)
+    with pytest.raises(InjectedQuotaError):
+        governor.call(_quota("429 Quota exceeded, retry in 7s"), PROMPT)
+    assert governor.stats()["paused_for"] == 7.0
+    governor.call(_ok(), PROMPT) # Another caller waits out the quota window too
+    assert clock.sleeps == [7.0]
+
+
+def test_backoff_past_max_wait_gives_up(clock):
+    governor = _governor(max_wait=5)
+    with pytest.raises(InjectedQuotaError):
+        governor.call(_quota("429 Quota exceeded, retry in 20s"), PROMPT)
+    assert clock.sleeps == []
+
+
+def test_stream_failure_before_the_first_chunk_is_retried(clock):
+    governor = _governor()
+    attempts = []
+
+    def start():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise InjectedQuotaError("429 Resource has been exhausted")
+        return FakeGeminiModel(stream_chunks=4).generate_content(PROMPT, stream=True)
+    text = "".join(chunk.text for chunk in governor.stream(start, PROMPT))
+    assert text and len(attempts) == 2 and clock.sleeps == [1.0]
+    assert governor.stats()["in_flight"] == 0
+
+
+# --- Circuit breaker ---
+def _trip(governor):
+    for _ in range(governor.breaker_threshold):
+        with pytest.raises(InjectedQuotaError):
+            governor.call(_quota(), PROMPT)
+
+
+def test_consecutive_failures_open_the_circuit(clock):
+    governor = _governor(max_retries=0)
+    _trip(governor)
+    assert governor.stats()["circuit"] == "open" and governor.breaker_trips == 1
+    model = FakeGeminiModel()
+    with pytest.raises(GovernorRejected, match="circuit open"):
+        governor.call(_ok(model), PROMPT)
+    assert model.calls == 0 # Failed fast, without reaching the model
+
+
+def test_half_open_circuit_lets_one_probe_through(clock):
+    governor = _governor(max_retries=0)
+    _trip(governor)
+    clock.now += 30
+    assert governor.stats()["circuit"] == "half_open"
+    rejected = []
+
+    def probe():
+        with pytest.raises(GovernorRejected, match="probe in progress") as raised:
+            governor.call(_ok(), PROMPT) # A second caller while the probe is out
+        rejected.append(raised.value)
+        return FakeGeminiModel().generate_content(PROMPT)
+    governor.call(probe, PROMPT)
+    assert len(rejected) == 1
+    assert governor.stats()["circuit"] == "closed"
+    governor.call(_ok(), PROMPT)
+
+
+def test_failed_probe_reopens_the_circuit(clock):
+    governor = _governor(max_retries=0)
+    _trip(governor)
+    governor.max_retries = 2
+    clock.now += 30
+    with pytest.raises(InjectedQuotaError):
+        governor.call(_quota(), PROMPT)
+    assert clock.sleeps == [] # The probe is not retried
+    assert governor.stats()["circuit"] == "open" and governor.breaker_trips == 2
+
+
+# --- Reservations of calls that never reach the model ---
+def test_slot_timeout_refunds_the_reservation(clock):
+    governor = _governor(max_concurrency=1, max_wait=0)
+    before = governor.stats()
+    assert governor._slots.acquire(0) # Another call holds the only slot
+    with pytest.raises(GovernorRejected, match="concurrency limit"):
+        governor.call(_ok(), PROMPT)
+    stats = governor.stats()
+    assert stats["requests_available"] == before["requests_available"]
+    assert stats["tokens_available"] == before["tokens_available"]
+    assert stats["calls"] == 0 and stats["rejected"] == 1
+
+
+def test_cancelled_call_refunds_the_reservation(clock):
+    governor = _governor(max_concurrency=1)
+    before = governor.stats()
+    assert governor._slots.acquire(0)
+    model = FakeGeminiModel()
+
+    async def scenario():
+        task = asyncio.create_task(governor.call_async(lambda: model.generate_content_async(PROMPT), PROMPT))
+        await asyncio.sleep(0.01) # Queued for the slot
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+    asyncio.run(scenario())
+    stats = governor.stats()
+    assert stats["requests_available"] == before["requests_available"] and stats["calls"] == 0
+    assert model.calls == 0
+
+
+def test_abandoned_probe_frees_the_half_open_circuit(clock):
+    governor = _governor(max_retries=0, max_concurrency=1, max_wait=0)
+    _trip(governor)
+    clock.now += 30
+    assert governor._slots.acquire(0)
+    with pytest.raises(GovernorRejected, match="concurrency limit"):
+        governor.call(_ok(), PROMPT) # The probe never got a slot
+    governor._slots.release()
+    governor.call(_ok(), PROMPT) # So the next call may probe
+    assert governor.stats()["circuit"] == "closed"
+
+
+# --- Error classification ---
+class _StatusError(Exception):
+    def __init__(self, code, headers=None):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+        self.response = types.SimpleNamespace(headers=headers or {})
+
+
+class ServiceUnavailable(Exception):
+    pass
+
+
+@pytest.mark.parametrize("error, retryable", [
+    (_StatusError(429), True),
+    (_StatusError(503), True),
+    (_StatusError(400), False),
+    (ServiceUnavailable("overloaded"), True),
+    (ValueError("bad"), False),
+])
+def test_is_retryable(error, retryable):
+    assert is_retryable(error) is retryable
+
+
+def test_retry_after_sources():
+    assert retry_after(_StatusError(429, {"Retry-After": "12"})) == 12.0
+    detail = types.SimpleNamespace(retry_delay=types.SimpleNamespace(seconds=3, nanos=500000000))
+    error = InjectedQuotaError("429")
+    error.details = [detail]
+    assert retry_after(error) == 3.5
+    assert retry_after(InjectedQuotaError("Please retry after 4.5s")) == 4.5
+    assert retry_after(InjectedQuotaError("retry_delay { seconds: 9 }")) == 9.0
+    assert retry_after(InjectedQuotaError("429")) is None
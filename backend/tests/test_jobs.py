@@ -0,0 +1,121 @@
+# Inside backend/tests/test_jobs.py
+import time
+import threading
+
+import pytest
+
+from jobs import JobManager, BatchQueueFull, COMPLETED, CANCELLED
+
+
+def _ok_analyze(url, scraped, language, no_cache):
+    return {"url": url}, None
+
+
+def _until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.001)
+
+
+def _wait(job, timeout=5):
+    offset = 0
+    while True:
+        results, drained = job.results_since(offset, timeout)
+        offset += len(results)
+        if drained:
+            return
+        assert results, "job made no progress"
+
+
+def test_empty_job_is_refused():
+    manager = JobManager(lambda url, no_cache: ({}, None), _ok_analyze, workers=0)
+    with pytest.raises(ValueError):
+        manager.submit([], "en")
+    assert manager.stats()["jobs"] == 0
+
+
+def test_job_completes_and_reports_every_url():
+    manager = JobManager(lambda url, no_cache: ({"url": url}, None), _ok_analyze, workers=3)
+    urls = [f"https://shop{i % 3}.com/p{i}" for i in range(30)]
+    job = manager.submit(urls, "en")
+    _wait(job)
+    assert job.status == COMPLETED
+    assert sorted(result["index"] for result in job.results) == list(range(30))
+    assert all(result["status"] == "ok" for result in job.results)
+    assert manager.stats()["queued_urls"] == 0
+
+
+def test_failures_are_recorded():
+    def scrape(url, no_cache):
+        if url.endswith("bad"):
+            return None, ({"error": "HTTP Error 404"}, 404)
+        raise RuntimeError("boom") if url.endswith("boom") else None
+    manager = JobManager(scrape, _ok_analyze, workers=1)
+    job = manager.submit(["https://a.com/bad", "https://a.com/boom"], "en")
+    _wait(job)
+    by_url = {result["url"]: result for result in job.results}
+    assert by_url["https://a.com/bad"]["http_status"] == 404
+    assert by_url["https://a.com/boom"]["http_status"] == 500
+
+
+def test_per_host_limit_and_hosts_take_turns():
+    release = threading.Event()
+    lock = threading.Lock()
+    active, peak, order = {}, {}, []
+
+    def scrape(url, no_cache):
+        host = url.split("/")[2]
+        with lock:
+            active[host] = active.get(host, 0) + 1
+            peak[host] = max(peak.get(host, 0), active[host])
+            order.append(host)
+        release.wait(5)
+        with lock:
+            active[host] -= 1
+        return {}, None
+
+    manager = JobManager(scrape, _ok_analyze, workers=4, per_host=1)
+    first = manager.submit([f"https://a.com/{i}" for i in range(5)], "en")
+    second = manager.submit([f"https://b.com/{i}" for i in range(5)], "en")
+    _until(lambda: len(order) >= 2) # Both hosts' first URLs are running before any finishes
+    release.set()
+    _wait(first)
+    _wait(second)
+    assert peak == {"a.com": 1, "b.com": 1}
+    assert set(order[:2]) == {"a.com", "b.com"} # The second job's host did not wait behind the first job
+
+
+def test_cancel_drops_queued_urls():
+    started = threading.Event()
+    release = threading.Event()
+
+    def scrape(url, no_cache):
+        started.set()
+        release.wait(5)
+        return {}, None
+
+    manager = JobManager(scrape, _ok_analyze, workers=1)
+    job = manager.submit([f"https://a.com/{i}" for i in range(10)], "en")
+    assert started.wait(5)
+    manager.cancel(job.id)
+    assert manager.stats()["queued_urls"] == 0
+    release.set()
+    _wait(job)
+    assert job.status == CANCELLED
+    assert len(job.results) == 1 # Only the URL already running
+
+
+def test_queue_cap():
+    manager = JobManager(lambda url, no_cache: ({}, None), _ok_analyze, workers=0, max_queued=10)
+    manager.submit([f"https://a.com/{i}" for i in range(8)], "en")
+    with pytest.raises(BatchQueueFull):
+        manager.submit([f"https://b.com/{i}" for i in range(3)], "en")
+    assert manager.stats()["queued_urls"] == 8
+
+
+def test_batch_api_rejects_non_string_urls():
+    from app import app
+    client = app.test_client()
+    for urls in ([1, 2], ["https://a.com/", ""], ["https://a.com/", None]):
+        response = client.post("/batch/analyze-shopify", json={"urls": urls})
+        assert response.status_code == 400, urls
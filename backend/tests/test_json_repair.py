@@ -0,0 +1,59 @@
+# Inside backend/tests/test_json_repair.py
+import json
+
+import pytest
+
+from json_repair import parse_model_json, repair_json, schema_problems, strip_fences
+from benchmarks.model_json import CASES
+
+
+@pytest.mark.parametrize("name, text, expected, fixes", CASES, ids=[case[0] for case in CASES])
+def test_model_answers(name, text, expected, fixes):
+    assert parse_model_json(text) == (expected, fixes)
+
+
+def test_clean_json_with_backticks_parses_like_json_loads():
+    text = json.dumps({"tip": "Wrap it in ```html``` tags", "fence": "```"})
+    assert parse_model_json(text) == (json.loads(text), [])
+
+
+def test_fence_inside_a_string_is_not_stripped():
+    text = '{"a": "```json\\n{}\\n```"}'
+    assert strip_fences(text) == (text, False)
+
+
+def test_truncated_answer_keeps_only_finished_values():
+    text, fixes = repair_json('{"done": ["one", "two"], "half": {"x": 1, "y": "wri')
+    assert json.loads(text) == {"done": ["one", "two"], "half": {"x": 1}}
+    assert fixes == ["truncated"]
+
+
+def test_escaped_quote_does_not_end_a_string():
+    text, fixes = repair_json('{"a": "say \\"hi\\"", "b": [1,],}')
+    assert json.loads(text) == {"a": 'say "hi"', "b": [1]}
+    assert fixes == ["trailing_comma"]
+
+
+def test_stray_closing_bracket_is_dropped():
+    text, fixes = repair_json('{"a": [1]]}')
+    assert json.loads(text) == {"a": [1]} and "stray_bracket" in fixes
+
+
+def test_answer_without_an_object_is_rejected():
+    with pytest.raises(json.JSONDecodeError):
+        parse_model_json("I cannot help with that.")
+
+
+SHAPE = {"title": "string", "tags": ["string"], "image": "url or null", "meta": {"length": 0}}
+
+
+def test_matching_value_has_no_problems():
+    value = {"title": "Shirt", "tags": ["linen"], "image": None, "meta": {"length": 5}, "extra": 1}
+    assert schema_problems(value, SHAPE) == []
+
+
+def test_schema_problems_are_reported_by_path():
+    value = {"title": " ", "tags": ["ok", 3], "image": None, "meta": "oops"}
+    assert schema_problems(value, SHAPE, "core_seo") == ["core_seo.title", "core_seo.tags[1]", "core_seo.meta"]
+    assert schema_problems({"title": "x", "tags": []}, SHAPE) == ["tags", "image", "meta"]
+    assert schema_problems([], SHAPE) == ["(root)"]
@@ -0,0 +1,53 @@
+# Inside backend/tests/test_robots_cache.py
+import time
+import threading
+import types
+
+import http_client
+from robots_cache import RobotsCache
+
+AGENT = "ElementOptBot"
+
+
+def _until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.001)
+
+
+def test_concurrent_misses_share_one_download(monkeypatch):
+    release = threading.Event()
+    fetched = []
+
+    def slow_get(url, headers=None, timeout=None):
+        fetched.append(url)
+        release.wait(5)
+        return types.SimpleNamespace(status_code=200, content=b"User-agent: *\nDisallow: /checkout\n", headers={})
+    monkeypatch.setattr(http_client, "get", slow_get)
+    cache = RobotsCache()
+    answers = []
+    threads = [threading.Thread(target=lambda: answers.append(cache.can_fetch("https://shop.com/checkout", AGENT)))
+               for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    _until(lambda: cache._flight.stats()["waiting"] == 4)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert fetched == ["https://shop.com/robots.txt"]
+    assert answers == [False] * 5
+    assert cache.can_fetch("https://shop.com/products/a", AGENT) # Served from the cache
+    assert len(fetched) == 1
+
+
+def test_unreachable_robots_allows_and_is_cached(monkeypatch):
+    fetched = []
+
+    def failing_get(url, headers=None, timeout=None):
+        fetched.append(url)
+        raise ConnectionError("refused")
+    monkeypatch.setattr(http_client, "get", failing_get)
+    cache = RobotsCache()
+    assert cache.can_fetch("https://down.com/a", AGENT)
+    assert cache.can_fetch("https://down.com/b", AGENT)
+    assert len(fetched) == 1
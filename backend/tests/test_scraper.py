@@ -0,0 +1,24 @@
+# Inside backend/tests/test_scraper.py
+import httpx
+import pytest
+from requests.structures import CaseInsensitiveDict
+
+from scraper import header_charset
+
+
+@pytest.mark.parametrize("content_type, charset", [
+    ("text/html; charset=UTF-8", "UTF-8"),
+    ('text/html; Charset="windows-1252"', "windows-1252"),
+    ("text/html; charset='iso-8859-2'", "iso-8859-2"),
+    ("text/html;charset=utf-8;q=1", "utf-8"),
+    ("text/html", None), # Not requests' ISO-8859-1 default: <meta charset> decides
+    ("text/html; charset=", None),
+    ("", None),
+])
+def test_header_charset(content_type, charset):
+    assert header_charset(CaseInsensitiveDict({"content-type": content_type})) == charset
+    assert header_charset(httpx.Headers({"Content-Type": content_type})) == charset
+
+
+def test_header_charset_without_content_type():
+    assert header_charset(CaseInsensitiveDict()) is None
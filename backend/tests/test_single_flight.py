@@ -0,0 +1,150 @@
+# Inside backend/tests/test_single_flight.py
+import time
+import asyncio
+import threading
+
+import pytest
+
+from single_flight import SingleFlight, AsyncSingleFlight, SingleFlightTimeout
+
+
+def _until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.001)
+
+
+def _run_together(flight, key, fn, callers):
+    """Starts the leader, lets every follower join its call, then lets fn finish; returns [(result, error)] in caller order."""
+    outcomes = [None] * callers
+
+    def caller(index):
+        try:
+            outcomes[index] = (flight.do(key, fn), None)
+        except Exception as e:
+            outcomes[index] = (None, e)
+    threads = [threading.Thread(target=caller, args=(index,)) for index in range(callers)]
+    threads[0].start()
+    _until(lambda: flight.stats()["in_flight"] == 1)
+    for thread in threads[1:]:
+        thread.start()
+    _until(lambda: flight.stats()["waiting"] == callers - 1)
+    return threads, outcomes
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight("test")
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        release.wait(5)
+        return {"tags": ["a"]}
+    threads, outcomes = _run_together(flight, "key", fetch, 4)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert [result for result, _ in outcomes] == [{"tags": ["a"]}] * 4
+    assert flight.stats() == {"in_flight": 0, "waiting": 0, "leaders": 1, "coalesced": 3, "timeouts": 0}
+
+
+def test_followers_get_their_own_copy():
+    flight = SingleFlight("test")
+    release = threading.Event()
+
+    def fetch():
+        release.wait(5)
+        return {"tags": ["a"]}
+    threads, outcomes = _run_together(flight, "key", fetch, 2)
+    release.set()
+    for thread in threads:
+        thread.join()
+    leader, follower = outcomes[0][0], outcomes[1][0]
+    follower["tags"].append("b")
+    assert leader == {"tags": ["a"]}
+
+
+def test_leader_error_reaches_every_follower():
+    flight = SingleFlight("test")
+    release = threading.Event()
+
+    def fetch():
+        release.wait(5)
+        raise ConnectionError("robots.txt unreachable")
+    threads, outcomes = _run_together(flight, "key", fetch, 3)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert all(isinstance(error, ConnectionError) for _, error in outcomes)
+
+
+def test_different_keys_do_not_wait_for_each_other():
+    flight = SingleFlight("test")
+    assert flight.do("a", lambda: 1) == 1
+    assert flight.do("b", lambda: 2) == 2
+    assert flight.stats()["leaders"] == 2 and flight.stats()["coalesced"] == 0
+
+
+def test_follower_times_out_on_a_hung_leader():
+    flight = SingleFlight("test", timeout=0.05)
+    release = threading.Event()
+    leader = threading.Thread(target=flight.do, args=("key", lambda: release.wait(5)))
+    leader.start()
+    _until(lambda: flight.stats()["in_flight"] == 1)
+    with pytest.raises(SingleFlightTimeout):
+        flight.do("key", lambda: "follower ran")
+    assert flight.do("key", lambda: "fresh") == "fresh" # The hung call is too old to join
+    release.set()
+    leader.join()
+    assert flight.stats()["timeouts"] == 1
+
+
+def test_async_callers_share_one_call():
+    flight = AsyncSingleFlight("test")
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"tags": ["a"]}
+
+    async def scenario():
+        return await asyncio.gather(*(flight.do("key", fetch) for _ in range(5)))
+    results = asyncio.run(scenario())
+    assert len(calls) == 1 and results == [{"tags": ["a"]}] * 5
+    assert flight.stats() == {"in_flight": 0, "leaders": 1, "coalesced": 4, "timeouts": 0}
+
+
+def test_async_cancelled_caller_does_not_cancel_the_shared_call():
+    flight = AsyncSingleFlight("test")
+
+    async def fetch():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def scenario():
+        leader = asyncio.create_task(flight.do("key", fetch))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do("key", fetch))
+        await asyncio.sleep(0)
+        leader.cancel()
+        return await follower
+    assert asyncio.run(scenario()) == "done"
+
+
+def test_async_follower_times_out():
+    flight = AsyncSingleFlight("test", timeout=0.02)
+
+    async def hang():
+        await asyncio.sleep(1)
+
+    async def scenario():
+        leader = asyncio.create_task(flight.do("key", hang))
+        await asyncio.sleep(0)
+        with pytest.raises(SingleFlightTimeout):
+            await flight.do("key", hang)
+        leader.cancel()
+    asyncio.run(scenario())
+    assert flight.stats()["timeouts"] == 1
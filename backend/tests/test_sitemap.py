@@ -0,0 +1,72 @@
+# Inside backend/tests/test_sitemap.py
+import gzip
+import os
+
+import sitemap
+from sitemap import iter_sitemap_locs, SitemapReader
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def _chunks(data, size=7):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def _locs(data):
+    return list(iter_sitemap_locs(_chunks(data)))
+
+
+def test_image_locs_do_not_replace_the_page_url():
+    with open(os.path.join(FIXTURES, "product_image_sitemap.xml"), "rb") as fixture:
+        data = fixture.read()
+    assert _locs(data) == [("url", "https://shop.com/"), ("url", "https://shop.com/products/a"),
+                           ("url", "https://shop.com/products/b")]
+
+
+def test_inline_image_loc_after_page_loc():
+    data = (b'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9" '
+            b'xmlns:image="http://www.google.com/schemas/sitemap-image/1.1">'
+            b'<url><loc>https://shop.com/products/a</loc><image:image><image:loc>https://cdn.shopify.com/a.jpg'
+            b'</image:loc></image:image></url></urlset>')
+    assert _locs(data) == [("url", "https://shop.com/products/a")]
+
+
+def test_sitemap_index_and_gzip():
+    data = (b'<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+            b'<sitemap><loc> https://shop.com/sitemap_products_1.xml </loc></sitemap>'
+            b'<sitemap><loc>https://shop.com/sitemap_pages_1.xml</loc></sitemap></sitemapindex>')
+    expected = [("sitemap", "https://shop.com/sitemap_products_1.xml"), ("sitemap", "https://shop.com/sitemap_pages_1.xml")]
+    assert _locs(data) == expected
+    assert _locs(gzip.compress(data)) == expected
+
+
+def test_sitemap_without_namespace():
+    assert _locs(b"<urlset><url><loc>https://shop.com/a</loc></url></urlset>") == [("url", "https://shop.com/a")]
+
+
+def test_child_sitemaps_on_other_hosts_are_not_fetched(monkeypatch):
+    files = {
+        "https://shop.com/sitemap.xml": [("sitemap", "http://169.254.169.254/latest/meta-data"),
+                                         ("sitemap", "https://shop.com/sitemap_products_1.xml"),
+                                         ("url", "https://other.com/x")],
+        "https://shop.com/sitemap_products_1.xml": [("url", "https://shop.com/products/a")],
+    }
+    fetched = []
+
+    def read(self, sitemap_url):
+        fetched.append(sitemap_url)
+        return iter(files[sitemap_url])
+
+    monkeypatch.setattr(SitemapReader, "sitemap_urls", lambda self: ["https://shop.com/sitemap.xml", "http://127.0.0.1/sitemap.xml"])
+    monkeypatch.setattr(SitemapReader, "_read", read)
+    reader = SitemapReader("https://shop.com/", "test-agent")
+    assert list(reader.urls()) == ["https://shop.com/products/a"]
+    assert fetched == ["https://shop.com/sitemap.xml", "https://shop.com/sitemap_products_1.xml"]
+    assert {error["sitemap"] for error in reader.stats()["errors"]} == {"http://127.0.0.1/sitemap.xml",
+                                                                        "http://169.254.169.254/latest/meta-data"}
+
+
+def test_size_limit(monkeypatch):
+    monkeypatch.setattr(sitemap, "SITEMAP_MAX_BYTES", 60)
+    data = b"<urlset>" + b"".join(b"<url><loc>https://shop.com/%d</loc></url>" % i for i in range(10)) + b"</urlset>"
+    assert 0 < len(_locs(data)) < 10
@@ -0,0 +1,55 @@
+# Inside backend/tests/test_streaming.py
+import json
+
+import pytest
+
+from streaming import JsonSectionScanner, sse
+
+ANSWER = {
+    "core_seo": {"title": "Linen shirt, {summer} edition", "tags": ["a", "b"]},
+    "content_keywords": ["linen", "quote \" and \\ backslash"],
+    "score": 7,
+    "on_page_technical": {"alt_texts": [{"src": "x.jpg", "alt": "}]"}]},
+}
+
+
+def _scan(pieces):
+    scanner = JsonSectionScanner()
+    sections = []
+    for piece in pieces:
+        sections.extend(scanner.feed(piece))
+    return scanner, sections
+
+
+@pytest.mark.parametrize("size", [1, 3, 17, 10 ** 6])
+def test_every_section_is_reported_once_whatever_the_chunking(size):
+    text = json.dumps(ANSWER, indent=2)
+    scanner, sections = _scan(text[i:i + size] for i in range(0, len(text), size))
+    assert sections == list(ANSWER.items())
+    assert scanner.done
+
+
+def test_section_is_reported_as_soon_as_it_completes():
+    scanner = JsonSectionScanner()
+    assert scanner.feed('{"core_seo": {"title": "A"}') == []
+    assert scanner.feed(', "score"') == [("core_seo", {"title": "A"})]
+    assert scanner.feed(': 3}') == [("score", 3)]
+
+
+def test_fence_before_the_object_is_ignored():
+    _, sections = _scan(['```json\n', '{"score": 1}', '\n```'])
+    assert sections == [("score", 1)]
+
+
+def test_unparseable_value_is_skipped():
+    _, sections = _scan(['{"bad": [1, 2,], "good": "yes"}'])
+    assert sections == [("good", "yes")]
+
+
+def test_nothing_after_the_closing_brace_is_scanned():
+    scanner, sections = _scan(['{"a": 1}', ' {"b": 2}'])
+    assert sections == [("a", 1)] and scanner.done
+
+
+def test_sse_frame():
+    assert sse("chunk", {"text": "ă"}) == 'event: chunk\ndata: {"text": "ă"}\n\n'
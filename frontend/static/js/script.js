@@ -13,6 +13,47 @@ function createResultCard(title, contentHtml, cardClasses = "bg-gray-50 p-4 roun
      return `<div class="${cardClasses}"><h3 class="text-xl font-semibold text-gray-700 mb-3">${escapeHtml(title)}</h3>${contentHtml}</div>`;
 }
 
+// --- Streaming (Server-Sent Events over a POST; EventSource only supports GET) ---
+// handlers maps event names (progress, checks, chunk, section, result, error) to callbacks; a throwing handler aborts the stream.
+async function postEventStream(url, payload, handlers) {
+    const response = await fetch(url, { method: 'POST', headers: { 'Content-Type': 'application/json', 'Accept': 'text/event-stream' }, body: JSON.stringify(payload) });
+    const contentType = response.headers.get("content-type") || '';
+    if (contentType.indexOf("text/event-stream") === -1) {
+        // Validation errors come back as plain JSON, like the non-streaming endpoints
+        if (contentType.indexOf("application/json") !== -1) {
+            const data = await response.json();
+            throw new Error(data.error || `HTTP error! Status: ${response.status}`);
+        }
+        const text = await response.text();
+        throw new Error(`Server returned non-JSON (Status: ${response.status}): ${text.substring(0,100)}...`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    try {
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const frame = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+                let eventName = 'message', data = '';
+                frame.split('\n').forEach(line => {
+                    if (line.startsWith('event: ')) eventName = line.slice(7);
+                    else if (line.startsWith('data: ')) data += line.slice(6);
+                });
+                if (handlers[eventName]) handlers[eventName](data ? JSON.parse(data) : null);
+            }
+        }
+    } catch (error) {
+        reader.cancel();
+        throw error;
+    }
+}
+
 // --- Event Listener Setup ---
 document.addEventListener('DOMContentLoaded', () => {
     const shopifyForm = document.getElementById('shopify-analyze-form');
@@ -22,19 +63,22 @@ document.addEventListener('DOMContentLoaded', () => {
     const socialButtons = document.querySelectorAll('.social-generate-button');
     if (socialButtons.length > 0) {
         socialButtons.forEach(button => button.addEventListener('click', handleSocialGenerate));
+        const allPlatformsButton = document.getElementById('social-generate-all');
+        if (allPlatformsButton) allPlatformsButton.addEventListener('click', handleSocialGenerateAll);
         const socialForm = document.getElementById('social-input-form');
         if(socialForm) socialForm.addEventListener('submit', (e) => e.preventDefault()); // Prevent enter submit
     }
 });
 
 
-// --- Shopify Form Handler (No changes needed from previous version) ---
+// --- Shopify Form Handler ---
 function handleShopifySubmit(event) {
     event.preventDefault();
     console.log("Shopify form submitted");
 
     const storeUrlInput = document.getElementById('store-url');
     const languageSelect = document.getElementById('language');
+    const fastModeCheckbox = document.getElementById('fast-mode'); // Optional: local checks only, no AI
     const resultsOutput = document.getElementById('shopify-results-output');
     const loadingIndicator = document.getElementById('shopify-loading');
     const errorMessage = document.getElementById('shopify-error-message');
@@ -53,31 +97,45 @@ function handleShopifySubmit(event) {
     loadingIndicator.style.display = 'flex'; loadingIndicator.classList.add('flex-col', 'items-center');
     submitButton.disabled = true;
 
-    // Fetch
-    fetch('/analyze-shopify', { method: 'POST', headers: { 'Content-Type': 'application/json', 'Accept': 'application/json' }, body: JSON.stringify({ url: storeUrl, language: language }), })
-    .then(response => {
-        const contentType = response.headers.get("content-type");
-        if (contentType && contentType.indexOf("application/json") !== -1) {
-            return response.json().then(data => ({ ok: response.ok, status: response.status, jsonData: data }));
-        } else {
-            return response.text().then(text => { throw new Error(`Server returned non-JSON (Status: ${response.status}): ${text.substring(0,100)}...`); });
-        }
+    // Stream: scrape progress first, then each report section as soon as the model has written it
+    const loadingText = loadingIndicator.querySelector('p');
+    const defaultLoadingText = loadingText ? loadingText.textContent : '';
+    let pageCardHtml = '';
+    let resultData = null;
+    const mode = fastModeCheckbox && fastModeCheckbox.checked ? 'fast' : 'full';
+    postEventStream('/analyze-shopify/stream', { url: storeUrl, language: language, mode: mode }, {
+        checks: data => { resultsOutput.insertAdjacentHTML('beforeend', createRuleChecksCard(data)); },
+        progress: data => {
+            if (loadingText) loadingText.textContent = data.message;
+            if (data.page) {
+                pageCardHtml = createScrapedPageCard(data.page);
+                resultsOutput.insertAdjacentHTML('beforeend', pageCardHtml);
+            }
+        },
+        section: ({ key, value }) => {
+            if (SHOPIFY_SECTION_CARDS[key]) resultsOutput.insertAdjacentHTML('beforeend', SHOPIFY_SECTION_CARDS[key](value || {}));
+        },
+        result: data => { resultData = data; },
+        error: data => { throw new Error(data.error || `HTTP error! Status: ${data.status}`); },
     })
-    .then(({ ok, status, jsonData }) => {
-        if (!ok) { throw new Error(jsonData.error || `HTTP error! Status: ${status}`); }
+    .then(() => {
+        if (!resultData) throw new Error("The analysis stream ended before a result was received.");
         loadingIndicator.style.display = 'none'; submitButton.disabled = false;
-        displayShopifyResults(jsonData); // Call the updated display function
-        console.log('Shopify Success:', jsonData);
+        if (loadingText) loadingText.textContent = defaultLoadingText;
+        displayShopifyResults(resultData); // Final, authoritative render
+        resultsOutput.insertAdjacentHTML('afterbegin', pageCardHtml);
+        console.log('Shopify Success:', resultData);
      })
     .catch((error) => {
         loadingIndicator.style.display = 'none'; submitButton.disabled = false;
+        if (loadingText) loadingText.textContent = defaultLoadingText;
         errorMessage.textContent = `Error: ${error.message}`; errorMessage.style.display = 'block';
         resultsOutput.innerHTML = '<p class="text-center text-red-500">An error occurred.</p>';
         console.error('Shopify Error Details:', error);
     });
 }
 
-// --- Social Media Button Handler (No changes needed from previous version) ---
+// --- Social Media Button Handler ---
 function handleSocialGenerate(event) {
     const button = event.currentTarget;
     const platform = button.dataset.platform;
@@ -91,7 +149,7 @@ function handleSocialGenerate(event) {
     const resultsOutput = document.getElementById('social-results-output');
     const loadingIndicator = document.getElementById('social-loading');
     const errorMessage = document.getElementById('social-error-message');
-    const allButtons = document.querySelectorAll('.social-generate-button');
+    const allButtons = document.querySelectorAll('.social-generate-button, #social-generate-all');
     const initialMessage = resultsOutput?.querySelector('.initial-message');
 
     // Validate required elements and topic input
@@ -116,38 +174,95 @@ function handleSocialGenerate(event) {
     loadingIndicator.style.display = 'flex'; loadingIndicator.classList.add('flex-col', 'items-center');
     allButtons.forEach(btn => btn.disabled = true);
 
-    // Fetch request with NEW body including topic and keywords
-    fetch('/generate-social', {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json', 'Accept': 'application/json' },
-        body: JSON.stringify({ // Send topic, keywords, language, platform
-            platform: platform,
-            topic: topic,
-            keywords: keywords,
-            language: language
-        }),
+    // Stream: the card fills in as the model writes each part of its answer
+    const loadingText = loadingIndicator.querySelector('p');
+    const defaultLoadingText = loadingText ? loadingText.textContent : '';
+    resultsOutput.insertAdjacentHTML('afterbegin', '<div class="social-stream-card"></div>');
+    const streamCard = resultsOutput.querySelector('.social-stream-card');
+    const partialData = { platform: platform };
+    let resultData = null;
+    postEventStream('/generate-social/stream', { platform: platform, topic: topic, keywords: keywords, language: language }, {
+        progress: data => { if (loadingText) loadingText.textContent = data.message; },
+        section: ({ key, value }) => {
+            partialData[key] = value;
+            if (partialData[SOCIAL_MAIN_LISTS[platform]]) streamCard.innerHTML = createSocialCard(partialData);
+        },
+        result: data => { resultData = data; },
+        error: data => { throw new Error(data.error || `HTTP error! Status: ${data.status}`); },
     })
-    .then(response => {
-        const contentType = response.headers.get("content-type");
-        if (contentType && contentType.indexOf("application/json") !== -1) {
-            return response.json().then(data => ({ ok: response.ok, status: response.status, jsonData: data }));
-        } else {
-            return response.text().then(text => { throw new Error(`Server returned non-JSON (Status: ${response.status}): ${text.substring(0,100)}...`); });
-        }
-     })
-    .then(({ ok, status, jsonData }) => {
-        if (!ok) { throw new Error(jsonData.error || `HTTP error! Status: ${status}`); }
+    .then(() => {
+        if (!resultData) throw new Error("The generation stream ended before a result was received.");
+        streamCard.remove();
         loadingIndicator.style.display = 'none'; allButtons.forEach(btn => btn.disabled = false);
-        displaySocialResults(jsonData); // Call the updated display function
-        console.log('Social Success:', jsonData);
+        if (loadingText) loadingText.textContent = defaultLoadingText;
+        displaySocialResults(resultData); // Final, authoritative render
+        console.log('Social Success:', resultData);
     })
     .catch((error) => {
+        streamCard.remove();
         loadingIndicator.style.display = 'none'; allButtons.forEach(btn => btn.disabled = false);
+        if (loadingText) loadingText.textContent = defaultLoadingText;
         errorMessage.textContent = `Error generating ${platform} content: ${error.message}`; errorMessage.style.display = 'block';
         console.error(`Social Error Details (${platform}):`, error);
     });
 }
 
+// --- All Platforms Button Handler: one request, the platforms are generated concurrently on the server ---
+function handleSocialGenerateAll() {
+    const platforms = Array.from(document.querySelectorAll('.social-generate-button')).map(btn => btn.dataset.platform);
+    const topicInput = document.getElementById('social-topic');
+    const keywordsInput = document.getElementById('social-keywords');
+    const languageSelect = document.getElementById('social-language');
+
+    const resultsOutput = document.getElementById('social-results-output');
+    const loadingIndicator = document.getElementById('social-loading');
+    const errorMessage = document.getElementById('social-error-message');
+    const allButtons = document.querySelectorAll('.social-generate-button, #social-generate-all');
+    const initialMessage = resultsOutput?.querySelector('.initial-message');
+
+    if (!platforms.length || !topicInput || !languageSelect || !resultsOutput || !loadingIndicator || !errorMessage) {
+        console.error("One or more required Social elements not found!");
+        if(errorMessage) { errorMessage.textContent = "Internal page error."; errorMessage.style.display = 'block'; }
+        return;
+    }
+    const topic = topicInput.value.trim();
+    const keywords = keywordsInput ? keywordsInput.value.trim() : '';
+    const language = languageSelect.value;
+
+    if (!topic) {
+        errorMessage.textContent = "Please enter a topic or description.";
+        errorMessage.style.display = 'block';
+        return;
+    }
+
+    if (initialMessage) initialMessage.style.display = 'none';
+    errorMessage.style.display = 'none'; errorMessage.textContent = '';
+    loadingIndicator.style.display = 'flex'; loadingIndicator.classList.add('flex-col', 'items-center');
+    allButtons.forEach(btn => btn.disabled = true);
+
+    fetch('/generate-social/multi', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ platforms: platforms, topic: topic, keywords: keywords, language: language }),
+    })
+    .then(async response => {
+        const data = await response.json();
+        if (!response.ok) throw new Error(data.error || `HTTP error! Status: ${response.status}`);
+        return data;
+    })
+    .then(data => {
+        loadingIndicator.style.display = 'none'; allButtons.forEach(btn => btn.disabled = false);
+        // Cards are prepended, so add them in reverse to keep the button order; failed platforms get an error card each
+        platforms.slice().reverse().forEach(platform => displaySocialResults({ platform: platform, ...data.platforms[platform] }));
+        console.log('Social Success (all platforms):', data);
+    })
+    .catch((error) => {
+        loadingIndicator.style.display = 'none'; allButtons.forEach(btn => btn.disabled = false);
+        errorMessage.textContent = `Error generating content: ${error.message}`; errorMessage.style.display = 'block';
+        console.error('Social Error Details (all platforms):', error);
+    });
+}
+
 
 // --- UPDATED Display function for Shopify SEO Results ---
 function displayShopifyResults(data) {
@@ -163,13 +278,20 @@ function displayShopifyResults(data) {
     }
 
     // --- Access data from the NEW structured JSON ---
-    const coreSeo = data.core_seo || {};
-    const contentKeywords = data.content_keywords || {};
-    const onPageTechnical = data.on_page_technical || {};
-    const schemaRec = onPageTechnical.schema_recommendation || {};
+    const checksCard = data.rule_checks ? createRuleChecksCard(data.rule_checks) : '';
+    if (data.mode === 'fast') { resultsOutput.innerHTML = checksCard; return; } // No AI sections in fast mode
+    resultsOutput.innerHTML = checksCard + SHOPIFY_SECTIONS.map(key => SHOPIFY_SECTION_CARDS[key](data[key] || {})).join('');
+}
 
-    let outputHtml = '';
+// --- Shopify result cards, one per top-level section of the JSON (also rendered one by one while streaming) ---
+const SHOPIFY_SECTIONS = ['core_seo', 'content_keywords', 'on_page_technical'];
+const SHOPIFY_SECTION_CARDS = {
+    core_seo: createCoreSeoCard,
+    content_keywords: createContentKeywordsCard,
+    on_page_technical: createOnPageTechnicalCard,
+};
 
+function createCoreSeoCard(coreSeo) {
     // --- Card 1: Core SEO Critique & Suggestions ---
     let coreSeoContent = `
         <div class="space-y-3">
@@ -190,8 +312,10 @@ function displayShopifyResults(data) {
                 ${coreSeo.suggested_h1 ? `<p><strong>Suggested H1:</strong> <code class="text-sm bg-gray-200 px-1 py-0.5 rounded block break-words">${escapeHtml(coreSeo.suggested_h1)}</code></p>` : ''}
             </div>
         </div>`;
-    outputHtml += createResultCard("Core SEO Analysis", coreSeoContent);
+    return createResultCard("Core SEO Analysis", coreSeoContent);
+}
 
+function createContentKeywordsCard(contentKeywords) {
     // --- Card 2: Content & Keywords ---
     let contentKeywordsContent = `
         <div class="space-y-3">
@@ -199,10 +323,13 @@ function displayShopifyResults(data) {
             <div><p class="font-semibold">Suggested Keywords:</p><ul class="list-disc list-inside space-y-1 text-gray-700">${createListItems(contentKeywords.suggested_keywords)}</ul></div>
             <div><p class="font-semibold mt-3">Blog Post Ideas:</p><ul class="list-disc list-inside space-y-1 text-gray-700">${createListItems(contentKeywords.blog_post_ideas)}</ul></div>
         </div>`;
-    outputHtml += createResultCard("Content & Keywords", contentKeywordsContent);
+    return createResultCard("Content & Keywords", contentKeywordsContent);
+}
 
-     // --- Card 3: On-Page & Technical ---
-     let onPageTechContent = `
+function createOnPageTechnicalCard(onPageTechnical) {
+    // --- Card 3: On-Page & Technical ---
+    const schemaRec = onPageTechnical.schema_recommendation || {};
+    let onPageTechContent = `
         <div class="space-y-3">
             <div><p class="font-semibold">Image SEO Tip:</p><p>${escapeHtml(onPageTechnical.image_seo_tip || 'N/A')}</p></div>
              <hr class="border-gray-200">
@@ -216,10 +343,33 @@ function displayShopifyResults(data) {
              <hr class="border-gray-200">
             <div><p class="font-semibold">Technical SEO Tips:</p><ul class="list-disc list-inside space-y-1 text-gray-700">${createListItems(onPageTechnical.technical_tips)}</ul></div>
         </div>`;
-    outputHtml += createResultCard("On-Page & Technical", onPageTechContent);
-    // ---
+    return createResultCard("On-Page & Technical", onPageTechContent);
+}
+
+// Local rule checks (seo_rules.py): arrive right after the scrape, before any model output
+const RULE_STATUS_CLASSES = { pass: 'text-green-600', warn: 'text-orange-600', fail: 'text-red-600' };
+function createRuleChecksCard(ruleChecks) {
+    const checks = (ruleChecks.checks || []).filter(check => check.status !== 'skip');
+    const checkItems = checks.map(check =>
+        `<li><span class="font-semibold uppercase text-xs ${RULE_STATUS_CLASSES[check.status] || ''}">${escapeHtml(check.status)}</span> ${escapeHtml(check.message || check.id)}</li>`).join('');
+    const checksContent = `
+        <div class="space-y-2">
+            <p><strong>Score:</strong> ${ruleChecks.score ?? 'N/A'} / 100</p>
+            <ul class="space-y-1 text-gray-700">${checkItems || '<li class="text-gray-500 italic">N/A</li>'}</ul>
+        </div>`;
+    return createResultCard("Automated Checks", checksContent);
+}
 
-    resultsOutput.innerHTML = outputHtml;
+// Shown as soon as the scrape finishes, while the model is still working
+function createScrapedPageCard(page) {
+    const pageContent = `
+        <div class="space-y-1 text-gray-700">
+            <p><strong>Title:</strong> ${escapeHtml(page.title || 'N/A')}</p>
+            <p><strong>Meta Description:</strong> ${escapeHtml(page.meta_description || 'N/A')}</p>
+            <p><strong>H1:</strong> ${escapeHtml(page.h1 || 'N/A')}</p>
+            ${page.truncated ? '<p class="text-orange-600"><small>Only the beginning of this (very large) page was analyzed.</small></p>' : ''}
+        </div>`;
+    return createResultCard("Page Scraped", pageContent);
 }
 
 
@@ -238,6 +388,15 @@ function displaySocialResults(data) {
         return;
     }
 
+    // Prepend new result card
+    resultsOutput.insertAdjacentHTML('afterbegin', createSocialCard(data));
+}
+
+// Key of each platform's main list; a streamed card is first drawn once it has arrived
+const SOCIAL_MAIN_LISTS = { youtube: 'concepts', instagram: 'post_ideas', pinterest: 'pin_concepts' };
+
+// Builds the card for a (possibly still partial) social media result
+function createSocialCard(data) {
     const platform = data.platform || 'social'; // Get platform from data
     let cardTitle = `${platform.charAt(0).toUpperCase() + platform.slice(1)} Ideas`;
     let socialContentHtml = '';
@@ -257,8 +416,8 @@ function displaySocialResults(data) {
                     </div>
                 `;
             });
-            socialContentHtml += `<div class="mt-3"><strong>Suggested Tags:</strong> <p class="text-sm text-gray-600">${escapeHtml(data.suggested_tags?.join(', '))} </p></div>`;
-            socialContentHtml += `<div class="mt-3"><strong>Justification:</strong> <p class="text-sm text-gray-600 italic">${escapeHtml(data.justification)}</p></div>`;
+            if (data.suggested_tags) socialContentHtml += `<div class="mt-3"><strong>Suggested Tags:</strong> <p class="text-sm text-gray-600">${escapeHtml(data.suggested_tags?.join(', '))} </p></div>`;
+            if (data.justification) socialContentHtml += `<div class="mt-3"><strong>Justification:</strong> <p class="text-sm text-gray-600 italic">${escapeHtml(data.justification)}</p></div>`;
 
         } else if (platform === 'instagram' && data.post_ideas) {
              socialContentHtml += `<h4 class="text-md font-semibold mb-2 text-gray-600">Post/Reel Ideas:</h4>`;
@@ -271,9 +430,9 @@ function displaySocialResults(data) {
                       </div>
                   `;
               });
-            socialContentHtml += `<div class="mt-3"><strong>Suggested Hashtags:</strong> <p class="text-sm text-gray-600">${escapeHtml(data.suggested_hashtags?.join(' '))}</p></div>`;
-            socialContentHtml += `<div class="mt-3"><strong>Story Idea:</strong> <p class="text-sm text-gray-600">${escapeHtml(data.story_idea)}</p></div>`;
-            socialContentHtml += `<div class="mt-3"><strong>Engagement Tactic:</strong> <p class="text-sm text-gray-600 italic">${escapeHtml(data.engagement_tactic_explanation)}</p></div>`;
+            if (data.suggested_hashtags) socialContentHtml += `<div class="mt-3"><strong>Suggested Hashtags:</strong> <p class="text-sm text-gray-600">${escapeHtml(data.suggested_hashtags?.join(' '))}</p></div>`;
+            if (data.story_idea) socialContentHtml += `<div class="mt-3"><strong>Story Idea:</strong> <p class="text-sm text-gray-600">${escapeHtml(data.story_idea)}</p></div>`;
+            if (data.engagement_tactic_explanation) socialContentHtml += `<div class="mt-3"><strong>Engagement Tactic:</strong> <p class="text-sm text-gray-600 italic">${escapeHtml(data.engagement_tactic_explanation)}</p></div>`;
 
         } else if (platform === 'pinterest' && data.pin_concepts) {
              socialContentHtml += `<h4 class="text-md font-semibold mb-2 text-gray-600">Pin Concepts:</h4>`;
@@ -286,8 +445,8 @@ function displaySocialResults(data) {
                       </div>
                   `;
               });
-            socialContentHtml += `<div class="mt-3"><strong>Suggested Boards:</strong> <p class="text-sm text-gray-600">${escapeHtml(data.suggested_boards?.join(', '))}</p></div>`;
-            socialContentHtml += `<div class="mt-3"><strong>Visual Appeal:</strong> <p class="text-sm text-gray-600 italic">${escapeHtml(data.visual_appeal_explanation)}</p></div>`;
+            if (data.suggested_boards) socialContentHtml += `<div class="mt-3"><strong>Suggested Boards:</strong> <p class="text-sm text-gray-600">${escapeHtml(data.suggested_boards?.join(', '))}</p></div>`;
+            if (data.visual_appeal_explanation) socialContentHtml += `<div class="mt-3"><strong>Visual Appeal:</strong> <p class="text-sm text-gray-600 italic">${escapeHtml(data.visual_appeal_explanation)}</p></div>`;
 
         } else {
             // Fallback for unknown structure or if expected keys are missing
@@ -301,6 +460,5 @@ function displaySocialResults(data) {
     }
 
 
-    // Prepend new result card
-    resultsOutput.insertAdjacentHTML('afterbegin', createResultCard(cardTitle, socialContentHtml));
+    return createResultCard(cardTitle, socialContentHtml);
 }
\ No newline at end of file